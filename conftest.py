@@ -0,0 +1,13 @@
+#!/usr/bin/env python3
+"""
+Shared pytest setup: services/common is importable the way it is inside the service images
+"""
+
+import os
+import sys
+
+COMMON = os.path.join(os.path.dirname(os.path.abspath(__file__)), "services", "common")
+
+sys.path.insert(0, COMMON)
+# Also for services started as subprocesses by tests
+os.environ["PYTHONPATH"] = os.pathsep.join(p for p in (COMMON, os.environ.get("PYTHONPATH")) if p)
@@ -0,0 +1,114 @@
+#!/usr/bin/env python3
+"""
+Asyncio collection loop - every source runs on its own schedule with its own
+timeout, so one slow upstream never delays the others
+
+After a failure a source retries with exponential backoff and full jitter,
+capped at `max_backoff`; after a success it waits `interval` (+/- `jitter`).
+Each source exports the timestamp of its last successful collection and a
+stale flag once that is older than `stale_after`.
+"""
+
+import asyncio
+import logging
+import random
+import time
+
+from prometheus_client import Counter, Gauge
+
+logger = logging.getLogger(__name__)
+
+source_last_success = Gauge(
+    'quota_source_last_success_timestamp_seconds',
+    'Unix time of the last successful collection per source', ['source']
+)
+source_stale = Gauge('quota_source_stale', '1 if the source has not been collected within stale_after', ['source'])
+source_duration = Gauge('quota_source_duration_seconds', 'Duration of the last collection attempt', ['source'])
+source_errors = Counter('quota_source_errors', 'Failed or timed-out collections per source', ['source'])
+
+
+class Source:
+    def __init__(self, name, collect, interval=300, timeout=30, backoff=5, max_backoff=None,
+                 jitter=0.1, stale_after=None):
+        self.name = name
+        self.collect = collect
+        self.interval = interval
+        self.timeout = timeout
+        self.backoff = backoff
+        self.max_backoff = max_backoff or interval
+        self.jitter = jitter
+        self.stale_after = stale_after or 2 * interval
+        self.failures = 0
+        self.last_success = None
+
+
+class AsyncCollector:
+    def __init__(self, sources, clock=time.time, rng=None, watchdog_interval=5):
+        self.sources = list(sources)
+        self.clock = clock
+        self.rng = rng or random.Random()
+        self.watchdog_interval = watchdog_interval
+        self._stopped = asyncio.Event()
+
+    def next_delay(self, source):
+        """Seconds until the next attempt, given the outcome of the last one"""
+        if source.failures == 0:
+            return source.interval * (1 + self.rng.uniform(-source.jitter, source.jitter))
+        ceiling = min(source.max_backoff, source.backoff * 2 ** (source.failures - 1))
+        return self.rng.uniform(0, ceiling)
+
+    async def collect_once(self, source):
+        """One attempt bounded by the source timeout; returns True on success"""
+        start_time = time.perf_counter()
+        try:
+            await asyncio.wait_for(source.collect(), timeout=source.timeout)
+        except Exception as e:
+            source.failures += 1
+            source_errors.labels(source=source.name).inc()
+            reason = f"timed out after {source.timeout}s" if isinstance(e, asyncio.TimeoutError) else e
+            logger.error(f"Collecting {source.name} failed ({source.failures} in a row): {reason}")
+            return False
+        finally:
+            source_duration.labels(source=source.name).set(time.perf_counter() - start_time)
+
+        source.failures = 0
+        source.last_success = self.clock()
+        source_last_success.labels(source=source.name).set(source.last_success)
+        source_stale.labels(source=source.name).set(0)
+        return True
+
+    def mark_stale(self):
+        """Flag sources whose last success is older than their stale_after"""
+        now = self.clock()
+        stale = []
+        for source in self.sources:
+            age = now - source.last_success if source.last_success is not None else float("inf")
+            is_stale = age > source.stale_after
+            source_stale.labels(source=source.name).set(int(is_stale))
+            if is_stale:
+                stale.append(source.name)
+        return stale
+
+    async def _wait(self, seconds):
+        try:
+            await asyncio.wait_for(self._stopped.wait(), timeout=seconds)
+        except asyncio.TimeoutError:
+            pass
+
+    async def run_source(self, source):
+        while not self._stopped.is_set():
+            await self.collect_once(source)
+            await self._wait(self.next_delay(source))
+
+    async def watchdog(self):
+        while not self._stopped.is_set():
+            await self._wait(self.watchdog_interval)
+            self.mark_stale()
+
+    async def run(self):
+        """Run every source concurrently until stop()"""
+        logger.info(f"Collecting {', '.join(s.name for s in self.sources)} concurrently")
+        await asyncio.gather(self.watchdog(), *(self.run_source(source) for source in self.sources))
+
+    def stop(self):
+        self._stopped.set()
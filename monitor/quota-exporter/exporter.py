@@ -3,63 +3,129 @@
 Custom Prometheus exporter for R2 and QStash quota metrics
 """
 
+import asyncio
 import os
+import threading
 import time
+from datetime import datetime, timezone
 import requests
 import boto3
+import httpx
+import redis
 from prometheus_client import start_http_server, Gauge, Info
 import logging
 
+from collector import AsyncCollector, Source
+from r2_usage import R2UsageScanner
+
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
 # Prometheus metrics
 r2_storage_bytes = Gauge('r2_storage_bytes', 'R2 storage usage in bytes')
+r2_objects_total = Gauge('r2_objects_total', 'R2 object count')
+r2_prefix_storage_bytes = Gauge('r2_prefix_storage_bytes', 'R2 storage usage per prefix in bytes', ['prefix'])
+r2_prefix_objects = Gauge('r2_prefix_objects', 'R2 object count per prefix', ['prefix'])
+r2_scan_duration_seconds = Gauge('r2_scan_duration_seconds', 'Duration of the last R2 usage scan', ['mode'])
+r2_scan_prefixes_listed = Gauge('r2_scan_prefixes_listed', 'Prefixes listed in full by the last R2 usage scan')
 qstash_daily_remaining = Gauge('qstash_daily_remaining', 'QStash daily messages remaining')
 qstash_messages_sent_total = Gauge('qstash_messages_sent_total', 'Total QStash messages sent today')
+qstash_budget_remaining = Gauge('qstash_budget_remaining', 'Shared QStash publish budget left today (crawler view)')
+qstash_projected_exhaustion = Gauge(
+    'qstash_projected_exhaustion_timestamp_seconds',
+    'When the crawler projects the QStash daily quota to run out (0 = not before reset)'
+)
 quota_info = Info('quota_exporter', 'Quota exporter information')
 
+QSTASH_API_URL = os.getenv('QSTASH_API_URL', 'https://qstash.upstash.io')
+QSTASH_DAILY_LIMIT = int(os.getenv('QSTASH_DAILY_LIMIT', '500'))
+# Shared with services/crawler/quota.py
+QSTASH_BUDGET_KEY_PREFIX = 'qstash:budget'
+
 class QuotaExporter:
     def __init__(self):
         self.r2_account_id = os.getenv('R2_ACCOUNT_ID')
         self.r2_key = os.getenv('R2_KEY')
         self.r2_secret = os.getenv('R2_SECRET')
         self.qstash_token = os.getenv('QSTASH_TOKEN')
+        self.r2_bucket = os.getenv('R2_BUCKET', 'trading-backups')
+        self.r2_prefixes = set()
+        # The scan thread outlives a timed-out collection; never run two over one snapshot
+        self._r2_lock = threading.Lock()
+        self._r2_scan = None
+        self.redis = redis.Redis.from_url(os.environ['REDIS_URL'], decode_responses=True) \
+            if os.getenv('REDIS_URL') else None
         
         # Initialize R2 client
         if all([self.r2_account_id, self.r2_key, self.r2_secret]):
             self.r2_client = boto3.client(
                 's3',
-                endpoint_url=f'https://{self.r2_account_id}.r2.cloudflarestorage.com',
+                endpoint_url=os.getenv('R2_ENDPOINT_URL', f'https://{self.r2_account_id}.r2.cloudflarestorage.com'),
                 aws_access_key_id=self.r2_key,
                 aws_secret_access_key=self.r2_secret,
                 region_name='auto'
             )
+            self.r2_scanner = R2UsageScanner(
+                self.r2_client,
+                self.r2_bucket,
+                depth=int(os.getenv('R2_PREFIX_DEPTH', '2')),
+                max_workers=int(os.getenv('R2_SCAN_WORKERS', '8')),
+                snapshot_path=os.getenv('R2_USAGE_SNAPSHOT'),
+                full_scan_interval=int(os.getenv('R2_FULL_SCAN_INTERVAL', '86400')),
+            )
         else:
             self.r2_client = None
+            self.r2_scanner = None
             logger.warning("R2 credentials not found, R2 metrics will be unavailable")
     
+    def scan_r2(self):
+        """Scan R2 and export usage gauges; raises on failure"""
+        with self._r2_lock:
+            usage = self.r2_scanner.scan()
+            r2_storage_bytes.set(usage['total_bytes'])
+            self.export_r2_prefixes(usage)
+        
+        logger.info(f"R2 storage usage: {usage['total_bytes']} bytes")
+        return usage['total_bytes']
+    
     def get_r2_usage(self):
-        """Get R2 storage usage"""
-        if not self.r2_client:
+        """Get R2 storage usage (paginated, incremental per-prefix scan)"""
+        if not self.r2_scanner:
             return 0
         
         try:
-            # List objects in trading-backups bucket and calculate total size
-            response = self.r2_client.list_objects_v2(Bucket='trading-backups')
-            total_size = 0
-            
-            if 'Contents' in response:
-                for obj in response['Contents']:
-                    total_size += obj['Size']
-            
-            logger.info(f"R2 storage usage: {total_size} bytes")
-            return total_size
-            
+            return self.scan_r2()
         except Exception as e:
             logger.error(f"Failed to get R2 usage: {e}")
             return 0
     
+    def export_r2_prefixes(self, usage):
+        """Per-prefix gauges; prefixes that disappeared are dropped"""
+        prefixes = usage['prefixes']
+        for prefix in self.r2_prefixes - set(prefixes):
+            r2_prefix_storage_bytes.remove(prefix)
+            r2_prefix_objects.remove(prefix)
+        for prefix, entry in prefixes.items():
+            r2_prefix_storage_bytes.labels(prefix=prefix).set(entry['bytes'])
+            r2_prefix_objects.labels(prefix=prefix).set(entry['objects'])
+        self.r2_prefixes = set(prefixes)
+        
+        r2_objects_total.set(usage['total_objects'])
+        r2_scan_duration_seconds.labels(mode=usage['mode']).set(usage['duration'])
+        r2_scan_prefixes_listed.set(usage['prefixes_listed'])
+    
+    def qstash_headers(self):
+        return {
+            'Authorization': f'Bearer {self.qstash_token}',
+            'Content-Type': 'application/json'
+        }
+    
+    @staticmethod
+    def parse_qstash_usage(data):
+        """(daily_remaining, messages_sent) from a /v2/usage response body"""
+        daily_remaining = data.get('dailyRemaining', 500)
+        return daily_remaining, 500 - daily_remaining
+    
     def get_qstash_usage(self):
         """Get QStash daily usage"""
         if not self.qstash_token:
@@ -67,33 +133,51 @@ class QuotaExporter:
             return 500, 0  # Default values
         
         try:
-            headers = {
-                'Authorization': f'Bearer {self.qstash_token}',
-                'Content-Type': 'application/json'
-            }
-            
-            # Get QStash usage from API
-            response = requests.get(
-                'https://qstash.upstash.io/v2/usage',
-                headers=headers,
-                timeout=10
-            )
+            daily_remaining, messages_sent = self.fetch_qstash_usage()
             
-            if response.status_code == 200:
-                data = response.json()
-                daily_remaining = data.get('dailyRemaining', 500)
-                messages_sent = 500 - daily_remaining
-                
-                logger.info(f"QStash usage: {messages_sent}/500 messages sent today")
-                return daily_remaining, messages_sent
-            else:
-                logger.error(f"QStash API error: {response.status_code}")
-                return 500, 0
+            logger.info(f"QStash usage: {messages_sent}/500 messages sent today")
+            return daily_remaining, messages_sent
                 
         except Exception as e:
             logger.error(f"Failed to get QStash usage: {e}")
             return 500, 0
     
+    def fetch_qstash_usage(self):
+        """(daily_remaining, messages_sent) from the QStash API; raises on failure"""
+        response = requests.get(
+            f'{QSTASH_API_URL}/v2/usage',
+            headers=self.qstash_headers(),
+            timeout=10
+        )
+        response.raise_for_status()
+        return self.parse_qstash_usage(response.json())
+    
+    def sync_budget(self, daily_remaining, now=None):
+        """Write today's remaining QStash quota to the budget the crawler draws from
+        
+        The crawler decrements the budget between syncs, so the lower of the two
+        counts wins; a new UTC day starts a fresh budget key.
+        """
+        if not self.redis:
+            return None
+        
+        now = now or time.time()
+        day = datetime.fromtimestamp(now, tz=timezone.utc).strftime('%Y-%m-%d')
+        key = f'{QSTASH_BUDGET_KEY_PREFIX}:{day}'
+        
+        def update(pipe):
+            current = pipe.hget(key, 'remaining')
+            remaining = daily_remaining if current is None else min(int(current), daily_remaining)
+            pipe.multi()
+            pipe.hset(key, mapping={'remaining': remaining, 'limit': QSTASH_DAILY_LIMIT, 'synced_at': now})
+            pipe.expire(key, 2 * 86400)
+            return remaining
+        
+        remaining = self.redis.transaction(update, key, value_from_callable=True)
+        qstash_budget_remaining.set(remaining)
+        qstash_projected_exhaustion.set(float(self.redis.hget(key, 'projected_exhaustion') or 0))
+        return remaining
+    
     def collect_metrics(self):
         """Collect all quota metrics"""
         logger.info("Collecting quota metrics...")
@@ -102,10 +186,11 @@ class QuotaExporter:
         r2_usage = self.get_r2_usage()
         r2_storage_bytes.set(r2_usage)
         
-        # Get QStash usage
+        # Get QStash usage and share it with the crawler
         daily_remaining, messages_sent = self.get_qstash_usage()
         qstash_daily_remaining.set(daily_remaining)
         qstash_messages_sent_total.set(messages_sent)
+        self.sync_budget(daily_remaining)
         
         # Update info metric
         quota_info.info({
@@ -116,6 +201,55 @@ class QuotaExporter:
         
         logger.info("Metrics collection completed")
 
+    async def collect_r2(self):
+        """Blocking boto3 scan, run off the event loop
+
+        A timeout cannot stop the scan thread, so the scan is shielded and a
+        later collection waits for one still in flight instead of starting
+        another.
+        """
+        if self._r2_scan is None or self._r2_scan.done():
+            self._r2_scan = asyncio.ensure_future(asyncio.to_thread(self.scan_r2))
+        else:
+            logger.info("Previous R2 scan still running; waiting for it instead of starting another")
+        await asyncio.shield(self._r2_scan)
+    
+    async def collect_qstash(self, client):
+        """Fetch QStash usage; raises on HTTP errors so the collector backs off"""
+        response = await client.get(f'{QSTASH_API_URL}/v2/usage', headers=self.qstash_headers())
+        response.raise_for_status()
+        daily_remaining, messages_sent = self.parse_qstash_usage(response.json())
+        qstash_daily_remaining.set(daily_remaining)
+        qstash_messages_sent_total.set(messages_sent)
+        await asyncio.to_thread(self.sync_budget, daily_remaining)
+        logger.info(f"QStash usage: {messages_sent}/500 messages sent today")
+    
+    def sources(self, client):
+        """Collection sources configured for this exporter"""
+        sources = []
+        if self.r2_scanner:
+            sources.append(Source(
+                'r2',
+                self.collect_r2,
+                interval=int(os.getenv('R2_INTERVAL', '300')),
+                timeout=int(os.getenv('R2_TIMEOUT', '120')),
+            ))
+        if self.qstash_token:
+            sources.append(Source(
+                'qstash',
+                lambda: self.collect_qstash(client),
+                interval=int(os.getenv('QSTASH_INTERVAL', '60')),
+                timeout=int(os.getenv('QSTASH_TIMEOUT', '10')),
+            ))
+        else:
+            logger.warning("QStash token not found, QStash metrics will be unavailable")
+        return sources
+
+async def run_collector(exporter):
+    """Collect every source concurrently until cancelled"""
+    async with httpx.AsyncClient() as client:
+        await AsyncCollector(exporter.sources(client)).run()
+
 def main():
     """Main exporter loop"""
     logger.info("Starting quota exporter on port 8080")
@@ -125,14 +259,13 @@ def main():
     # Start Prometheus metrics server
     start_http_server(8080)
     
-    # Collect metrics every 5 minutes
-    while True:
-        try:
-            exporter.collect_metrics()
-        except Exception as e:
-            logger.error(f"Error collecting metrics: {e}")
-        
-        time.sleep(300)  # 5 minutes
+    quota_info.info({
+        'version': '1.1.0',
+        'r2_free_tier_gb': '10',
+        'qstash_free_tier_daily': '500'
+    })
+    
+    asyncio.run(run_collector(exporter))
 
 if __name__ == '__main__':
-    main()
\ No newline at end of file
+    main()
@@ -0,0 +1,166 @@
+#!/usr/bin/env python3
+"""
+R2 bucket usage accounting - paginated, per-prefix and incremental
+
+The bucket is split into "leaf" prefixes `depth` levels deep (for the backup
+layout, `weaviate-data/<date>/`). Leaves are discovered with delimiter
+listings and listed concurrently, one paginated listing per leaf.
+
+Incremental scans reuse a snapshot of per-prefix bytes/object counts plus the
+last-seen key and ETag of every leaf. Backup prefixes are write-once, so only
+new leaves are listed in full; the newest known leaf (which may have been
+mid-upload during the previous scan) is checked for keys after its last-seen
+key, and rescanned if that key's ETag changed. A full rescan runs every
+`full_scan_interval` seconds to pick up deletions.
+"""
+
+import json
+import logging
+import os
+import tempfile
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+logger = logging.getLogger(__name__)
+
+
+class R2UsageScanner:
+    def __init__(self, client, bucket, depth=2, max_workers=8, snapshot_path=None,
+                 full_scan_interval=86400):
+        self.client = client
+        self.bucket = bucket
+        self.depth = depth
+        self.max_workers = max_workers
+        self.snapshot_path = snapshot_path
+        self.full_scan_interval = full_scan_interval
+        self.snapshot = self.load_snapshot()
+
+    def load_snapshot(self):
+        """Previous scan state, or an empty one if missing or for another layout"""
+        empty = {"bucket": self.bucket, "depth": self.depth, "last_full_scan": 0, "prefixes": {}}
+        if not self.snapshot_path or not os.path.exists(self.snapshot_path):
+            return empty
+        try:
+            with open(self.snapshot_path) as f:
+                snapshot = json.load(f)
+        except (OSError, ValueError) as e:
+            logger.warning(f"Ignoring unreadable R2 usage snapshot: {e}")
+            return empty
+        if snapshot.get("bucket") != self.bucket or snapshot.get("depth") != self.depth:
+            return empty
+        return snapshot
+
+    def save_snapshot(self):
+        if not self.snapshot_path:
+            return
+        directory = os.path.dirname(os.path.abspath(self.snapshot_path))
+        os.makedirs(directory, exist_ok=True)
+        fd, tmp_path = tempfile.mkstemp(dir=directory, suffix=".tmp")
+        with os.fdopen(fd, "w") as f:
+            json.dump(self.snapshot, f)
+        os.replace(tmp_path, self.snapshot_path)
+
+    def _pages(self, **kwargs):
+        paginator = self.client.get_paginator("list_objects_v2")
+        return paginator.paginate(Bucket=self.bucket, **kwargs)
+
+    def discover(self):
+        """Leaf prefixes plus usage of objects stored above the leaf level"""
+        leaves, loose = [], {}
+        level = [""]
+        for depth in range(self.depth + 1):
+            next_level = []
+            for prefix in level:
+                if depth == self.depth:
+                    leaves.append(prefix)
+                    continue
+                for page in self._pages(Prefix=prefix, Delimiter="/"):
+                    next_level.extend(p["Prefix"] for p in page.get("CommonPrefixes", []))
+                    for obj in page.get("Contents", []):
+                        usage = loose.setdefault(prefix, {"bytes": 0, "objects": 0})
+                        usage["bytes"] += obj["Size"]
+                        usage["objects"] += 1
+            level = next_level
+        return leaves, loose
+
+    def scan_prefix(self, prefix, start_after=None):
+        """Paginated listing of one prefix (optionally only keys after `start_after`)"""
+        kwargs = {"Prefix": prefix}
+        if start_after:
+            kwargs["StartAfter"] = start_after
+        usage = {"bytes": 0, "objects": 0, "last_key": start_after, "last_etag": None}
+        for page in self._pages(**kwargs):
+            for obj in page.get("Contents", []):
+                usage["bytes"] += obj["Size"]
+                usage["objects"] += 1
+                usage["last_key"] = obj["Key"]
+                usage["last_etag"] = obj.get("ETag")
+        return usage
+
+    def _etag(self, key):
+        try:
+            return self.client.head_object(Bucket=self.bucket, Key=key).get("ETag")
+        except Exception:
+            return None
+
+    def _refresh_tail(self, prefix, known):
+        """Extend the newest known leaf with keys written after the last scan"""
+        if not known.get("last_key") or self._etag(known["last_key"]) != known.get("last_etag"):
+            return self.scan_prefix(prefix)
+        added = self.scan_prefix(prefix, start_after=known["last_key"])
+        if not added["objects"]:
+            return known
+        return {
+            "bytes": known["bytes"] + added["bytes"],
+            "objects": known["objects"] + added["objects"],
+            "last_key": added["last_key"],
+            "last_etag": added["last_etag"],
+        }
+
+    def scan(self, full=False):
+        """Account bucket usage; returns totals, per-prefix usage and scan stats"""
+        start_time = time.perf_counter()
+        now = time.time()
+        full = full or now - self.snapshot["last_full_scan"] >= self.full_scan_interval
+        known = {} if full else self.snapshot["prefixes"]
+
+        leaves, loose = self.discover()
+        new = [p for p in leaves if p not in known]
+        tail = max((p for p in leaves if p in known), default=None)
+
+        with ThreadPoolExecutor(max_workers=self.max_workers) as executor:
+            futures = {p: executor.submit(self.scan_prefix, p) for p in new}
+            if tail is not None:
+                futures[tail] = executor.submit(self._refresh_tail, tail, known[tail])
+            scanned = {p: future.result() for p, future in futures.items()}
+
+        prefixes = {p: scanned.get(p) or known[p] for p in leaves}
+        self.snapshot = {
+            "bucket": self.bucket,
+            "depth": self.depth,
+            "last_full_scan": now if full else self.snapshot["last_full_scan"],
+            "prefixes": prefixes,
+        }
+        self.save_snapshot()
+
+        usage = {p: {"bytes": u["bytes"], "objects": u["objects"]} for p, u in prefixes.items()}
+        for prefix, extra in loose.items():
+            entry = usage.setdefault(prefix, {"bytes": 0, "objects": 0})
+            entry["bytes"] += extra["bytes"]
+            entry["objects"] += extra["objects"]
+
+        duration = time.perf_counter() - start_time
+        result = {
+            "total_bytes": sum(u["bytes"] for u in usage.values()),
+            "total_objects": sum(u["objects"] for u in usage.values()),
+            "prefixes": usage,
+            "mode": "full" if full else "incremental",
+            "prefixes_listed": len(new),
+            "duration": duration,
+        }
+        logger.info(
+            f"R2 {result['mode']} scan of {self.bucket}: {result['total_bytes']} bytes in "
+            f"{result['total_objects']} objects, listed {len(new)} new of {len(leaves)} prefix(es) "
+            f"in {duration:.2f}s"
+        )
+        return result
@@ -0,0 +1,455 @@
+#!/usr/bin/env python3
+"""
+Deduplicated, incremental backups of Weaviate data to R2 (S3-compatible)
+
+Bucket layout, one prefix per backup (same `weaviate-data/<date>/` prefixes
+as the previous rclone script, so R2 usage accounting is unchanged):
+
+    weaviate-data/<backup_id>/packs/<n>.pack   new chunks, concatenated
+    weaviate-data/<backup_id>/index.json       chunk id -> [pack, offset, length] added by this backup
+    weaviate-data/<backup_id>/manifest.json    every file -> ordered chunk locations
+
+Files are split into content-defined chunks; only chunks not already stored
+by an earlier backup are uploaded, packed into multipart-uploaded pack
+objects. A manifest is self-contained, so restoring any backup is a set of
+parallel ranged GETs with no chain of incrementals to replay.
+
+Manifests reference packs under older backups' prefixes, so an old prefix
+must never be deleted by hand: prune() retires backups past retention and
+deletes only the packs no remaining manifest references. A retired backup
+keeps an index.json (and packs) for the chunks still in use.
+"""
+
+import hashlib
+import io
+import json
+import logging
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timedelta, timezone
+
+from boto3.s3.transfer import TransferConfig
+from botocore.exceptions import ClientError
+
+from chunking import Chunker, chunk_id
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_PREFIX = "weaviate-data"
+PACK_SIZE = 64 * 1024 * 1024
+EXCLUDE_SUFFIXES = (".tmp", ".lock", ".log")
+BACKUP_ID_FORMAT = "%Y-%m-%d_%H-%M-%S"
+
+
+def new_backup_id(now=None):
+    return (now or datetime.now(timezone.utc)).strftime(BACKUP_ID_FORMAT)
+
+
+class FilesystemSource:
+    """A directory tree (e.g. a snapshot mount) backed up as-is"""
+
+    def __init__(self, path, exclude=EXCLUDE_SUFFIXES):
+        self.path = path
+        self.exclude = exclude
+
+    def prepare(self, backup_id):
+        return self.path
+
+    def files(self, root):
+        for directory, _, names in os.walk(root):
+            for name in sorted(names):
+                if name.endswith(self.exclude):
+                    continue
+                full = os.path.join(directory, name)
+                yield os.path.relpath(full, root), full
+
+    def describe(self):
+        return {"type": "filesystem", "path": self.path}
+
+    def cleanup(self, backup_id):
+        pass
+
+
+class WeaviateBackupSource(FilesystemSource):
+    """Online snapshot through Weaviate's backup API (backup-filesystem module)
+
+    Weaviate writes a consistent copy to BACKUP_FILESYSTEM_PATH/<id> while it
+    keeps serving; that directory must be mounted here at `backup_path`.
+    """
+
+    def __init__(self, client, backup_path, backend="filesystem", poll_interval=2.0, timeout=3600,
+                 keep_local=False):
+        super().__init__(backup_path, exclude=())
+        self.client = client
+        self.backend = backend
+        self.poll_interval = poll_interval
+        self.timeout = timeout
+        self.keep_local = keep_local
+
+    def _wait(self, url, backup_id, action):
+        deadline = time.monotonic() + self.timeout
+        while True:
+            response = self.client.get(url)
+            response.raise_for_status()
+            status = response.json().get("status")
+            if status == "SUCCESS":
+                return
+            if status == "FAILED":
+                raise RuntimeError(f"Weaviate {action} {backup_id} failed: {response.json().get('error')}")
+            if time.monotonic() > deadline:
+                raise TimeoutError(f"Weaviate {action} {backup_id} still {status} after {self.timeout}s")
+            time.sleep(self.poll_interval)
+
+    def prepare(self, backup_id):
+        response = self.client.post(f"/v1/backups/{self.backend}", json={"id": backup_id})
+        response.raise_for_status()
+        self._wait(f"/v1/backups/{self.backend}/{backup_id}", backup_id, "backup")
+        logger.info(f"Weaviate snapshot {backup_id} complete")
+        return os.path.join(self.path, backup_id)
+
+    def restore(self, backup_id):
+        """Ask Weaviate to load a snapshot restored under backup_path/<id>"""
+        response = self.client.post(f"/v1/backups/{self.backend}/{backup_id}/restore", json={})
+        response.raise_for_status()
+        self._wait(f"/v1/backups/{self.backend}/{backup_id}/restore", backup_id, "restore")
+
+    def describe(self):
+        return {"type": "weaviate", "backend": self.backend, "path": self.path}
+
+    def cleanup(self, backup_id):
+        if self.keep_local:
+            return
+        root = os.path.join(self.path, backup_id)
+        for directory, dirs, names in os.walk(root, topdown=False):
+            for name in names:
+                os.remove(os.path.join(directory, name))
+            os.rmdir(directory)
+
+
+class PackWriter:
+    """Buffers new chunks into packs and uploads full packs in the background"""
+
+    def __init__(self, repo, backup_id, executor, pack_size=PACK_SIZE, max_pending=4):
+        self.repo = repo
+        self.backup_id = backup_id
+        self.executor = executor
+        self.pack_size = pack_size
+        self.max_pending = max_pending
+        self.buffer = io.BytesIO()
+        self.pack_number = 0
+        self.futures = []
+        self.index = {}
+
+    def add(self, cid, data):
+        """Location of the chunk in the pack it is written to"""
+        location = [self.pack_number, self.buffer.tell(), len(data)]
+        self.buffer.write(data)
+        self.index[cid] = location
+        if self.buffer.tell() >= self.pack_size:
+            self.flush()
+        return location
+
+    def flush(self):
+        if not self.buffer.tell():
+            return
+        # Bound memory to max_pending packs waiting for upload
+        pending = [f for f in self.futures if not f.done()]
+        if len(pending) >= self.max_pending:
+            pending[0].result()
+        key = self.repo.pack_key(self.backup_id, self.pack_number)
+        self.buffer.seek(0)
+        self.futures.append(self.executor.submit(self.repo.upload, key, self.buffer))
+        self.buffer = io.BytesIO()
+        self.pack_number += 1
+
+    def close(self):
+        self.flush()
+        for future in self.futures:
+            future.result()
+        return self.pack_number
+
+
+class BackupRepository:
+    def __init__(self, client, bucket, prefix=DEFAULT_PREFIX, chunker=None, workers=8,
+                 pack_size=PACK_SIZE, multipart_chunksize=8 * 1024 * 1024):
+        self.client = client
+        self.bucket = bucket
+        self.prefix = prefix.rstrip("/")
+        self.chunker = chunker or Chunker()
+        self.workers = workers
+        self.pack_size = pack_size
+        self.transfer = TransferConfig(
+            multipart_threshold=multipart_chunksize,
+            multipart_chunksize=multipart_chunksize,
+            max_concurrency=workers,
+        )
+
+    # Keys
+
+    def key(self, backup_id, name):
+        return f"{self.prefix}/{backup_id}/{name}"
+
+    def pack_key(self, backup_id, number):
+        return self.key(backup_id, f"packs/{number:06d}.pack")
+
+    # Object store
+
+    def upload(self, key, fileobj):
+        self.client.upload_fileobj(fileobj, self.bucket, key, Config=self.transfer)
+
+    def put_json(self, key, data):
+        self.upload(key, io.BytesIO(json.dumps(data, separators=(",", ":")).encode()))
+
+    def get_json(self, key):
+        return json.loads(self.client.get_object(Bucket=self.bucket, Key=key)["Body"].read())
+
+    def read_range(self, key, offset, length):
+        response = self.client.get_object(
+            Bucket=self.bucket, Key=key, Range=f"bytes={offset}-{offset + length - 1}"
+        )
+        return response["Body"].read()
+
+    # Catalog
+
+    def backup_ids(self):
+        """Backups that have a manifest (legacy rclone copies are ignored), oldest first"""
+        return [i for i in self._prefix_ids() if self._exists(self.key(i, "manifest.json"))]
+
+    def stored_ids(self):
+        """Prefixes holding chunks (an index.json): complete, retired or interrupted backups, oldest first"""
+        return [i for i in self._prefix_ids() if self._exists(self.key(i, "index.json"))]
+
+    def _prefix_ids(self):
+        ids = []
+        paginator = self.client.get_paginator("list_objects_v2")
+        for page in paginator.paginate(Bucket=self.bucket, Prefix=f"{self.prefix}/", Delimiter="/"):
+            ids.extend(p["Prefix"][len(self.prefix) + 1:-1] for p in page.get("CommonPrefixes", []))
+        return sorted(ids)
+
+    def _list(self, prefix):
+        """{key: size} of every object under `prefix`"""
+        objects = {}
+        paginator = self.client.get_paginator("list_objects_v2")
+        for page in paginator.paginate(Bucket=self.bucket, Prefix=prefix):
+            objects.update((o["Key"], o["Size"]) for o in page.get("Contents", []))
+        return objects
+
+    def _delete(self, keys):
+        keys = list(keys)
+        for i in range(0, len(keys), 1000):
+            self.client.delete_objects(
+                Bucket=self.bucket, Delete={"Objects": [{"Key": k} for k in keys[i:i + 1000]], "Quiet": True}
+            )
+
+    def _exists(self, key):
+        try:
+            self.client.head_object(Bucket=self.bucket, Key=key)
+            return True
+        except ClientError:
+            return False
+
+    def resolve(self, backup_id=None, at=None):
+        """Backup to restore: an explicit id, the latest at or before `at`, or the latest"""
+        ids = self.backup_ids()
+        if backup_id is not None:
+            if backup_id not in ids:
+                raise ValueError(f"No backup {backup_id}")
+            return backup_id
+        if at is not None:
+            cutoff = new_backup_id(at)
+            ids = [i for i in ids if i <= cutoff]
+        if not ids:
+            raise ValueError("No backup found")
+        return ids[-1]
+
+    def chunk_index(self, backup_ids=None):
+        """chunk id -> (backup_id, pack, offset, length) for every stored chunk"""
+        index = {}
+        for backup_id in backup_ids if backup_ids is not None else self.stored_ids():
+            for cid, (pack, offset, length) in self.get_json(self.key(backup_id, "index.json")).items():
+                index.setdefault(cid, (backup_id, pack, offset, length))
+        return index
+
+    # Backup
+
+    def backup(self, source, backup_id=None):
+        """Snapshot `source`, upload new chunks and write the manifest; returns stats"""
+        backup_id = backup_id or new_backup_id()
+        start_time = time.perf_counter()
+        known = self.chunk_index()
+        root = source.prepare(backup_id)
+
+        files, stats = [], {"files": 0, "bytes": 0, "chunks": 0, "new_chunks": 0, "new_bytes": 0}
+        with ThreadPoolExecutor(max_workers=self.workers) as executor:
+            packs = PackWriter(self, backup_id, executor, self.pack_size, max_pending=self.workers)
+            for relpath, path in source.files(root):
+                entry = self._backup_file(relpath, path, backup_id, known, packs, stats)
+                if entry is not None:
+                    files.append(entry)
+            pack_count = packs.close()
+
+        self.put_json(self.key(backup_id, "index.json"), packs.index)
+        manifest = {
+            "id": backup_id,
+            "created_at": datetime.now(timezone.utc).isoformat(),
+            "source": source.describe(),
+            "chunker": {"min": self.chunker.min_size, "max": self.chunker.max_size},
+            "files": files,
+        }
+        # Written last: a backup without a manifest is incomplete and ignored
+        self.put_json(self.key(backup_id, "manifest.json"), manifest)
+        source.cleanup(backup_id)
+
+        stats.update(
+            backup_id=backup_id,
+            packs=pack_count,
+            dedup_ratio=1 - stats["new_bytes"] / stats["bytes"] if stats["bytes"] else 0.0,
+            duration=time.perf_counter() - start_time,
+        )
+        logger.info(
+            f"Backup {backup_id}: {stats['files']} files, {stats['bytes']} bytes, uploaded "
+            f"{stats['new_chunks']}/{stats['chunks']} chunks ({stats['new_bytes']} bytes) in "
+            f"{pack_count} pack(s) in {stats['duration']:.1f}s"
+        )
+        return stats
+
+    def _backup_file(self, relpath, path, backup_id, known, packs, stats, retries=3):
+        """Chunk one file; re-read if it changes while being read"""
+        for _ in range(retries):
+            before = os.stat(path)
+            chunks, digest = [], hashlib.sha256()
+            with open(path, "rb") as f:
+                for data in self.chunker.chunks(f):
+                    cid = chunk_id(data)
+                    digest.update(data)
+                    if cid in known:
+                        owner, pack, offset, length = known[cid]
+                    elif cid in packs.index:
+                        owner, (pack, offset, length) = backup_id, packs.index[cid]
+                    else:
+                        # Chunks from an abandoned read are unreferenced, never wrong
+                        owner, (pack, offset, length) = backup_id, packs.add(cid, data)
+                        stats["new_chunks"] += 1
+                        stats["new_bytes"] += length
+                    chunks.append([cid, owner, pack, offset, length])
+            after = os.stat(path)
+            if (before.st_mtime_ns, before.st_size) == (after.st_mtime_ns, after.st_size):
+                break
+            logger.warning(f"{relpath} changed while reading, retrying")
+        else:
+            raise RuntimeError(f"{relpath} kept changing during backup; use a snapshot source")
+
+        stats["files"] += 1
+        stats["bytes"] += after.st_size
+        stats["chunks"] += len(chunks)
+        return {
+            "path": relpath,
+            "size": after.st_size,
+            "mode": after.st_mode & 0o7777,
+            "mtime": after.st_mtime,
+            "sha256": digest.hexdigest(),
+            "chunks": chunks,
+        }
+
+    # Retention
+
+    def prune(self, keep_last=None, keep_within=None, now=None, dry_run=False):
+        """Retire backups outside retention and delete packs that no kept backup references
+
+        A backup is kept if it is among the `keep_last` newest or newer than
+        `keep_within` (a timedelta); the newest is always kept. Packs are
+        deleted whole, so unreferenced chunks sharing a pack with a
+        referenced one stay until that pack is unreferenced too. Never run
+        this while a backup is in progress: that backup may be reusing chunks
+        from packs about to be deleted.
+        """
+        if keep_last is None and keep_within is None:
+            raise ValueError("prune needs keep_last and/or keep_within")
+        ids = self.backup_ids()
+        cutoff = new_backup_id((now or datetime.now(timezone.utc)) - (keep_within or timedelta(0)))
+        kept = [i for n, i in enumerate(reversed(ids))
+                if n == 0 or (keep_last is not None and n < keep_last) or (keep_within is not None and i >= cutoff)]
+        retired = [i for i in ids if i not in kept]
+
+        referenced = set()
+        for backup_id in kept:
+            for entry in self.get_json(self.key(backup_id, "manifest.json"))["files"]:
+                referenced.update(self.pack_key(owner, pack) for _, owner, pack, _, _ in entry["chunks"])
+
+        stats = {"kept": len(kept), "retired": retired, "packs_deleted": 0, "bytes_freed": 0}
+        for backup_id in self.stored_ids():
+            if backup_id in kept:
+                continue
+            packs = self._list(self.key(backup_id, "packs/"))
+            dropped = {key: size for key, size in packs.items() if key not in referenced}
+            stats["packs_deleted"] += len(dropped)
+            stats["bytes_freed"] += sum(dropped.values())
+            if dry_run or (not dropped and backup_id not in retired):
+                continue
+
+            # Manifest first, then the index, then packs: the index never points at a deleted pack
+            if backup_id in retired:
+                self._delete([self.key(backup_id, "manifest.json")])
+            index = self.get_json(self.key(backup_id, "index.json"))
+            remaining = {cid: location for cid, location in index.items()
+                         if self.pack_key(backup_id, location[0]) not in dropped}
+            if remaining:
+                self.put_json(self.key(backup_id, "index.json"), remaining)
+            self._delete(dropped)
+            if not remaining:
+                self._delete([self.key(backup_id, "index.json")])
+
+        logger.info(
+            f"Prune{' (dry run)' if dry_run else ''}: kept {len(kept)} backup(s), retired {len(retired)}, "
+            f"deleted {stats['packs_deleted']} pack(s) ({stats['bytes_freed']} bytes)"
+        )
+        return stats
+
+    # Restore
+
+    def restore(self, target, backup_id=None, at=None, verify=True):
+        """Rebuild a backup under `target` with parallel ranged reads; returns stats"""
+        backup_id = self.resolve(backup_id, at)
+        start_time = time.perf_counter()
+        manifest = self.get_json(self.key(backup_id, "manifest.json"))
+        lock = threading.Lock()
+        restored = {"bytes": 0}
+
+        def restore_chunk(path, position, cid, owner, pack, offset, length):
+            data = self.read_range(self.pack_key(owner, pack), offset, length)
+            if verify and chunk_id(data) != cid:
+                raise ValueError(f"Chunk {cid} of {path} is corrupt")
+            with open(path, "r+b") as f:
+                f.seek(position)
+                f.write(data)
+            with lock:
+                restored["bytes"] += length
+
+        with ThreadPoolExecutor(max_workers=self.workers) as executor:
+            futures = []
+            for entry in manifest["files"]:
+                path = os.path.join(target, entry["path"])
+                os.makedirs(os.path.dirname(path), exist_ok=True)
+                with open(path, "wb") as f:
+                    f.truncate(entry["size"])
+                position = 0
+                for cid, owner, pack, offset, length in entry["chunks"]:
+                    futures.append(executor.submit(restore_chunk, path, position, cid, owner, pack, offset, length))
+                    position += length
+            for future in futures:
+                future.result()
+
+        for entry in manifest["files"]:
+            path = os.path.join(target, entry["path"])
+            os.chmod(path, entry["mode"])
+            os.utime(path, (entry["mtime"], entry["mtime"]))
+
+        duration = time.perf_counter() - start_time
+        logger.info(
+            f"Restored backup {backup_id}: {len(manifest['files'])} files, {restored['bytes']} bytes "
+            f"to {target} in {duration:.1f}s"
+        )
+        return {"backup_id": backup_id, "files": len(manifest["files"]), "bytes": restored["bytes"],
+                "duration": duration}
@@ -0,0 +1,87 @@
+#!/usr/bin/env python3
+"""
+Content-defined chunking (gear rolling hash, FastCDC-style)
+
+A cut point is placed after byte p when the top bits of the 32-bit gear hash
+of the 32 bytes ending at p are zero, subject to min/max chunk sizes. Boundaries
+depend only on local content, so an insertion early in a file shifts at most
+a chunk or two and every later chunk still deduplicates.
+
+Hashes are computed with numpy by log-doubling the window (5 vector passes
+for 32 bytes) instead of a per-byte Python loop, once per read buffer.
+"""
+
+import hashlib
+import math
+
+import numpy as np
+
+WINDOW = 32
+MIN_SIZE = 256 * 1024
+AVG_SIZE = 1024 * 1024
+MAX_SIZE = 4 * 1024 * 1024
+READ_SIZE = 8 * 1024 * 1024
+
+# Fixed table: chunk boundaries (and therefore dedup) must be stable across runs
+GEAR = np.random.default_rng(0x6765617268617368).integers(0, 2 ** 32, size=256, dtype=np.uint32)
+
+
+def gear_hashes(data):
+    """Gear hash of the (up to) 32 bytes ending at every position of `data`"""
+    h = GEAR[np.frombuffer(data, dtype=np.uint8)]
+    span = 1
+    while span < WINDOW:
+        h[span:] += h[:-span] << np.uint32(span)
+        span *= 2
+    return h
+
+
+class Chunker:
+    def __init__(self, min_size=MIN_SIZE, avg_size=AVG_SIZE, max_size=MAX_SIZE, read_size=READ_SIZE):
+        if not WINDOW <= min_size < avg_size < max_size:
+            raise ValueError("Chunk sizes must satisfy 32 <= min < avg < max")
+        self.min_size = min_size
+        self.max_size = max_size
+        self.read_size = max(read_size, max_size)
+        bits = max(1, round(math.log2(avg_size - min_size)))
+        self.shift = np.uint32(32 - bits)
+
+    def candidates(self, buf):
+        """End offsets in `buf` whose window hash qualifies as a cut point"""
+        return np.flatnonzero((gear_hashes(buf) >> self.shift) == 0) + 1
+
+    def cut_points(self, buf, eof):
+        """Chunk end offsets in `buf`; the tail after the last one needs more data unless `eof`"""
+        # Hashes depend only on the 32 bytes before each position (and min_size >= 32),
+        # so one pass over the whole buffer serves every chunk cut from it
+        candidates = self.candidates(buf)
+        n = len(buf)
+        cuts = []
+        start = 0
+        while n - start >= self.max_size or (eof and start < n):
+            i = np.searchsorted(candidates, start + self.min_size)
+            if i < candidates.size and candidates[i] <= min(n, start + self.max_size):
+                start = int(candidates[i])
+            else:
+                start = min(n, start + self.max_size)
+            cuts.append(start)
+        return cuts
+
+    def chunks(self, f):
+        """Yield content-defined chunks read from a binary file object"""
+        tail = b""
+        eof = False
+        while not eof:
+            data = f.read(self.read_size)
+            eof = not data
+            buf = tail + data
+            view = memoryview(buf)
+            start = 0
+            for cut in self.cut_points(buf, eof):
+                yield bytes(view[start:cut])
+                start = cut
+            tail = bytes(view[start:])
+
+
+def chunk_id(data):
+    return hashlib.sha256(data).hexdigest()
@@ -0,0 +1,132 @@
+#!/usr/bin/env python3
+"""
+Backup service entry point
+Incremental, deduplicated Weaviate backups to Cloudflare R2 without downtime
+"""
+
+import argparse
+import json
+import logging
+import os
+import sys
+from datetime import datetime, timedelta, timezone
+
+import boto3
+import httpx
+
+from backup import BackupRepository, FilesystemSource, WeaviateBackupSource
+from chunking import Chunker
+from log_config import setup_logging
+
+logger = logging.getLogger(__name__)
+
+R2_BUCKET = os.getenv("R2_BUCKET", "trading-backups")
+R2_PREFIX = os.getenv("R2_PREFIX", "weaviate-data")
+WEAVIATE_URL = os.getenv("WEAVIATE_URL", "http://weaviate:8080")
+# Weaviate's BACKUP_FILESYSTEM_PATH, mounted into this container
+WEAVIATE_BACKUP_PATH = os.getenv("WEAVIATE_BACKUP_PATH", "/var/lib/weaviate-backups")
+BACKUP_WORKERS = int(os.getenv("BACKUP_WORKERS", "8"))
+
+def r2_client():
+    """S3 client for R2 (or R2_ENDPOINT_URL, e.g. a local S3 stand-in)"""
+    account_id = os.getenv("R2_ACCOUNT_ID")
+    if not all([account_id, os.getenv("R2_KEY"), os.getenv("R2_SECRET")]):
+        raise RuntimeError("R2 credentials not found. Please set R2_ACCOUNT_ID, R2_KEY, and R2_SECRET")
+    return boto3.client(
+        "s3",
+        endpoint_url=os.getenv("R2_ENDPOINT_URL", f"https://{account_id}.r2.cloudflarestorage.com"),
+        aws_access_key_id=os.environ["R2_KEY"],
+        aws_secret_access_key=os.environ["R2_SECRET"],
+        region_name="auto",
+    )
+
+def weaviate_source(keep_local=False):
+    client = httpx.Client(base_url=WEAVIATE_URL, timeout=30.0)
+    return WeaviateBackupSource(client, WEAVIATE_BACKUP_PATH, keep_local=keep_local)
+
+def parse_time(value):
+    """ISO timestamp for point-in-time restore (UTC if no offset is given)"""
+    at = datetime.fromisoformat(value)
+    return at if at.tzinfo else at.replace(tzinfo=timezone.utc)
+
+def build_parser():
+    parser = argparse.ArgumentParser(description="Incremental Weaviate backups to R2")
+    parser.add_argument("--bucket", default=R2_BUCKET)
+    parser.add_argument("--prefix", default=R2_PREFIX)
+    parser.add_argument("--workers", type=int, default=BACKUP_WORKERS,
+                        help="Parallel uploads/downloads")
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    backup = commands.add_parser("backup", help="Take a snapshot and upload new chunks")
+    backup.add_argument("--source", choices=["weaviate", "filesystem"], default="weaviate",
+                        help="Weaviate backup API (online) or a directory/filesystem snapshot")
+    backup.add_argument("--path", help="Directory to back up with --source filesystem")
+    backup.add_argument("--backup-id", help="Defaults to the current UTC time")
+    backup.add_argument("--keep-local", action="store_true",
+                        help="Keep Weaviate's local snapshot after uploading")
+
+    restore = commands.add_parser("restore", help="Rebuild a backup from R2")
+    restore.add_argument("--target", help="Directory to restore into")
+    when = restore.add_mutually_exclusive_group()
+    when.add_argument("--backup-id", help="Exact backup to restore")
+    when.add_argument("--at", type=parse_time, help="Latest backup at or before this ISO time")
+    restore.add_argument("--to-weaviate", action="store_true",
+                         help="Restore into the Weaviate backup path and load it through the API")
+    restore.add_argument("--no-verify", action="store_true", help="Skip chunk checksum verification")
+
+    commands.add_parser("list", help="List complete backups")
+
+    prune = commands.add_parser("prune", help="Retire old backups and delete packs nothing references")
+    prune.add_argument("--keep-last", type=int, help="Keep the N newest backups")
+    prune.add_argument("--keep-days", type=int, help="Keep backups newer than this many days")
+    prune.add_argument("--dry-run", action="store_true", help="Report what would be deleted")
+    return parser
+
+def main(argv=None):
+    args = build_parser().parse_args(argv)
+    repo = BackupRepository(r2_client(), args.bucket, prefix=args.prefix, chunker=Chunker(),
+                            workers=args.workers)
+
+    if args.command == "list":
+        for backup_id in repo.backup_ids():
+            print(backup_id)
+        return 0
+
+    if args.command == "prune":
+        if args.keep_last is None and args.keep_days is None:
+            logger.error("prune needs --keep-last and/or --keep-days")
+            return 2
+        keep_within = timedelta(days=args.keep_days) if args.keep_days is not None else None
+        stats = repo.prune(keep_last=args.keep_last, keep_within=keep_within, dry_run=args.dry_run)
+        print(json.dumps(stats))
+        return 0
+
+    if args.command == "backup":
+        if args.source == "filesystem":
+            if not args.path:
+                logger.error("--path is required with --source filesystem")
+                return 2
+            source = FilesystemSource(args.path)
+        else:
+            source = weaviate_source(keep_local=args.keep_local)
+        stats = repo.backup(source, backup_id=args.backup_id)
+        print(json.dumps(stats))
+        return 0
+
+    if not args.to_weaviate and not args.target:
+        logger.error("restore needs --target or --to-weaviate")
+        return 2
+    if args.to_weaviate:
+        backup_id = repo.resolve(args.backup_id, args.at)
+        stats = repo.restore(os.path.join(WEAVIATE_BACKUP_PATH, backup_id), backup_id=backup_id,
+                             verify=not args.no_verify)
+        weaviate_source().restore(backup_id)
+        logger.info(f"Weaviate restored from backup {backup_id}")
+    else:
+        stats = repo.restore(args.target, backup_id=args.backup_id, at=args.at, verify=not args.no_verify)
+    print(json.dumps(stats))
+    return 0
+
+if __name__ == "__main__":
+    setup_logging("backup")
+    sys.exit(main())
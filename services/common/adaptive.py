@@ -0,0 +1,81 @@
+#!/usr/bin/env python3
+"""
+Adaptive (AIMD) concurrency limit for outbound calls
+
+    limiter = AdaptiveLimiter("qstash_publish", target_latency=1.0)
+    async with limiter.slot():
+        await client.post(...)
+
+Calls above the current limit wait for a slot. A call that finishes within
+`target_latency` raises the limit by `increase / limit` (about +`increase`
+per limit's worth of calls, i.e. per round trip); one that raises (429s,
+5xx, timeouts, ...) or takes longer than `spike_factor * target_latency`
+multiplies it by `backoff`. Calls that started before the last cut do not
+cut again, so one upstream hiccup seen by many in-flight calls counts once.
+Latencies between target and spike hold the limit.
+"""
+
+import asyncio
+import logging
+import time
+from contextlib import asynccontextmanager
+
+logger = logging.getLogger(__name__)
+
+class AdaptiveLimiter:
+    def __init__(self, name, initial=4, min_limit=1, max_limit=64, target_latency=1.0,
+                 spike_factor=2.0, increase=1.0, backoff=0.5, on_change=None, clock=time.monotonic):
+        self.name = name
+        self.limit = float(initial)
+        self.min_limit = min_limit
+        self.max_limit = max_limit
+        self.target_latency = target_latency
+        self.spike_factor = spike_factor
+        self.increase = increase
+        self.backoff = backoff
+        self.on_change = on_change
+        self.clock = clock
+        self.inflight = 0
+        self.last_cut = float("-inf")
+        self._slots = asyncio.Condition()
+        if on_change is not None:
+            on_change(self.limit)
+
+    @property
+    def capacity(self):
+        """Calls allowed in flight right now"""
+        return max(self.min_limit, int(self.limit))
+
+    @asynccontextmanager
+    async def slot(self):
+        """Hold one of `capacity` slots for the duration of a call"""
+        async with self._slots:
+            await self._slots.wait_for(lambda: self.inflight < self.capacity)
+            self.inflight += 1
+        started = self.clock()
+        error = False
+        try:
+            yield
+        except Exception:
+            error = True
+            raise
+        finally:
+            self.record(self.clock() - started, error=error, started=started)
+            async with self._slots:
+                self.inflight -= 1
+                self._slots.notify_all()
+
+    def record(self, latency, error=False, started=None):
+        """Adjust the limit for one completed call"""
+        previous = self.limit
+        if error or latency > self.spike_factor * self.target_latency:
+            if started is not None and started < self.last_cut:
+                return  # already accounted for by the last cut
+            self.limit = max(self.min_limit, self.limit * self.backoff)
+            self.last_cut = self.clock()
+            logger.warning(f"{self.name}: concurrency limit {previous:.1f} -> {self.limit:.1f} "
+                           f"({'error' if error else f'latency {latency:.2f}s'})")
+        elif latency <= self.target_latency:
+            self.limit = min(self.max_limit, self.limit + self.increase / self.limit)
+        if self.on_change is not None and self.limit != previous:
+            self.on_change(self.limit)
@@ -0,0 +1,101 @@
+#!/usr/bin/env python3
+"""
+Decode + validate throughput: msgspec typed structs vs json.loads + hand checks
+
+The baseline mirrors the old path (json.loads into a dict, then checking the
+fields a consumer relies on); the msgspec path decodes straight into the
+shared structs, which validates types and constraints in the same pass.
+
+    python bench_messages.py --count 100000
+"""
+
+import argparse
+import json
+import time
+import uuid
+from datetime import datetime
+
+import msgspec
+
+from messages import CrawlMessage, ParseResult, crawl_decoder, encode
+
+
+def crawl_payloads(count, batch=0):
+    if batch:
+        messages = [CrawlMessage(id=str(uuid.uuid4()), urls=[f"https://example.com/{i}/{j}" for j in range(batch)],
+                                 ts=datetime.utcnow()) for i in range(count)]
+    else:
+        messages = [CrawlMessage(id=str(uuid.uuid4()), url=f"https://example.com/{i}", ts=datetime.utcnow())
+                    for i in range(count)]
+    return [encode(m) for m in messages]
+
+
+def parse_payloads(count):
+    return [encode(ParseResult(text="x" * 200, embedding=[0.01 * j for j in range(384)],
+                               processed_at=datetime.utcnow(), text_length=200)) for _ in range(count)]
+
+
+def stdlib_crawl(payload):
+    data = json.loads(payload)
+    if not isinstance(data.get("id"), str):
+        raise ValueError("id")
+    if ("url" in data) == ("urls" in data):
+        raise ValueError("url/urls")
+    if "urls" in data and not all(isinstance(u, str) for u in data["urls"]):
+        raise ValueError("urls")
+    if "ts" in data:
+        datetime.fromisoformat(data["ts"])
+    return data
+
+
+def stdlib_parse(payload):
+    data = json.loads(payload)
+    embedding = data["embedding"]
+    if len(embedding) != 384 or not all(isinstance(x, float) for x in embedding):
+        raise ValueError("embedding")
+    if not isinstance(data["text"], str) or not isinstance(data["text_length"], int):
+        raise ValueError("fields")
+    datetime.fromisoformat(data["processed_at"])
+    return data
+
+
+def throughput(fn, payloads, repeat=3):
+    """Best-of-`repeat` messages per second"""
+    best = float("inf")
+    for _ in range(repeat):
+        start_time = time.perf_counter()
+        for payload in payloads:
+            fn(payload)
+        best = min(best, time.perf_counter() - start_time)
+    return len(payloads) / best
+
+
+def run_benchmark(count=100000):
+    parse_decoder = msgspec.json.Decoder(ParseResult)
+    cases = {
+        "crawl_single": (crawl_payloads(count), stdlib_crawl, crawl_decoder.decode),
+        "crawl_batch20": (crawl_payloads(count // 10, batch=20), stdlib_crawl, crawl_decoder.decode),
+        "parse_result": (parse_payloads(count // 10), stdlib_parse, parse_decoder.decode),
+    }
+    report = {}
+    for name, (payloads, baseline, typed) in cases.items():
+        json_rate = throughput(baseline, payloads)
+        msgspec_rate = throughput(typed, payloads)
+        report[name] = {
+            "messages": len(payloads),
+            "json_validate_per_sec": json_rate,
+            "msgspec_per_sec": msgspec_rate,
+            "speedup": msgspec_rate / json_rate,
+        }
+    return report
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Message decode/validate microbenchmark")
+    parser.add_argument("--count", type=int, default=100000)
+    args = parser.parse_args()
+    print(json.dumps(run_benchmark(args.count), indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,191 @@
+#!/usr/bin/env python3
+"""
+Local delayed-delivery queue on Redis sorted sets (alternative to QStash)
+
+    <key>          due time    -> encoded QueueEntry (waiting for delivery)
+    <key>:inflight lease expiry -> QueueEntry being handled by a dispatcher
+    <key>:dead     failure time -> QueueEntry that ran out of attempts
+
+A dispatcher claims due entries by moving them to the in-flight set in one
+MULTI/EXEC under WATCH on the queue; if another dispatcher (or a publish)
+touched the queue since the read, the transaction is dropped and the claim
+re-read, so an entry is only ever moved by the dispatcher that still saw it
+waiting and several dispatchers can share a queue. Entries whose lease expires (their
+dispatcher died) go back to the queue. Failures are retried with capped
+exponential backoff, then dead-lettered.
+"""
+
+import asyncio
+import logging
+import os
+import time
+from typing import Optional
+
+import msgspec
+from redis.exceptions import WatchError
+
+from messages import CrawlMessage
+
+logger = logging.getLogger(__name__)
+
+class QueueEntry(msgspec.Struct, omit_defaults=True):
+    message: CrawlMessage
+    enqueued_at: float
+    attempts: int = 0
+    error: Optional[str] = None
+    failed_at: Optional[float] = None
+
+_encoder = msgspec.json.Encoder()
+_decoder = msgspec.json.Decoder(QueueEntry)
+
+def encode_entry(entry):
+    return _encoder.encode(entry)
+
+def decode_entry(member):
+    return _decoder.decode(member)
+
+class DelayedQueue:
+    def __init__(self, redis, key="crawl:delayed", delay=60.0, max_attempts=5, backoff=5.0,
+                 max_backoff=600.0, lease=300.0, clock=time.time):
+        self.redis = redis
+        self.key = key
+        self.inflight_key = f"{key}:inflight"
+        self.dead_key = f"{key}:dead"
+        self.delay = delay
+        self.max_attempts = max_attempts
+        self.backoff = backoff
+        self.max_backoff = max_backoff
+        self.lease = lease
+        self.clock = clock
+
+    async def publish(self, message, delay=None):
+        """Schedule a message for delivery after `delay` seconds (default: the queue's delay)"""
+        now = self.clock()
+        entry = QueueEntry(message=message, enqueued_at=now)
+        await self.redis.zadd(self.key, {encode_entry(entry): now + (self.delay if delay is None else delay)})
+        return entry
+
+    async def claim(self, limit=100):
+        """Due entries now owned by this caller: [(member, entry)]"""
+        now = self.clock()
+        async with self.redis.pipeline(transaction=True) as pipe:
+            while True:
+                try:
+                    await pipe.watch(self.key)
+                    members = await pipe.zrangebyscore(self.key, "-inf", now, start=0, num=limit)
+                    if not members:
+                        return []
+                    pipe.multi()
+                    for member in members:
+                        pipe.zrem(self.key, member)
+                        pipe.zadd(self.inflight_key, {member: now + self.lease})
+                    await pipe.execute()
+                    return [(member, decode_entry(member)) for member in members]
+                except WatchError:
+                    # The queue changed after the read (another claim, a publish): read again
+                    continue
+
+    async def ack(self, member):
+        await self.redis.zrem(self.inflight_key, member)
+
+    def retry_delay(self, attempts):
+        return min(self.max_backoff, self.backoff * 2 ** (attempts - 1))
+
+    async def fail(self, member, entry, error):
+        """Reschedule with backoff, or dead-letter after max_attempts; returns True if dead-lettered"""
+        now = self.clock()
+        entry = msgspec.structs.replace(entry, attempts=entry.attempts + 1, error=str(error), failed_at=now)
+        dead = entry.attempts >= self.max_attempts
+        async with self.redis.pipeline(transaction=True) as pipe:
+            pipe.zrem(self.inflight_key, member)
+            if dead:
+                pipe.zadd(self.dead_key, {encode_entry(entry): now})
+            else:
+                pipe.zadd(self.key, {encode_entry(entry): now + self.retry_delay(entry.attempts)})
+            await pipe.execute()
+        return dead
+
+    async def recover(self):
+        """Return entries with expired leases to the queue; returns how many"""
+        now = self.clock()
+        members = await self.redis.zrangebyscore(self.inflight_key, "-inf", now)
+        recovered = 0
+        for member in members:
+            async with self.redis.pipeline(transaction=True) as pipe:
+                pipe.zrem(self.inflight_key, member)
+                pipe.zadd(self.key, {member: now})
+                removed, _ = await pipe.execute()
+            recovered += removed
+        if recovered:
+            logger.warning(f"Re-queued {recovered} entr(ies) from {self.inflight_key} with expired leases")
+        return recovered
+
+    async def depth(self):
+        return {
+            "queued": await self.redis.zcard(self.key),
+            "inflight": await self.redis.zcard(self.inflight_key),
+            "dead": await self.redis.zcard(self.dead_key),
+        }
+
+class Dispatcher:
+    """Deliver due queue entries to `handler(message)` with bounded concurrency"""
+
+    def __init__(self, queue, handler, batch_size=100, concurrency=8, poll_interval=1.0):
+        self.queue = queue
+        self.handler = handler
+        self.batch_size = batch_size
+        self.semaphore = asyncio.Semaphore(concurrency)
+        self.poll_interval = poll_interval
+        self.stats = {"delivered": 0, "retried": 0, "dead": 0}
+        self._stopping = asyncio.Event()
+
+    async def deliver(self, member, entry):
+        async with self.semaphore:
+            try:
+                await self.handler(entry.message)
+            except Exception as e:
+                if await self.queue.fail(member, entry, e):
+                    self.stats["dead"] += 1
+                    logger.error(f"Dead-lettered {entry.message.id} after {entry.attempts + 1} attempt(s): {e}")
+                else:
+                    self.stats["retried"] += 1
+                    logger.warning(f"Delivery of {entry.message.id} failed (attempt {entry.attempts + 1}): {e}")
+                return
+            await self.queue.ack(member)
+            self.stats["delivered"] += 1
+
+    async def dispatch_once(self):
+        """Deliver everything currently due; returns the number of entries handled"""
+        claimed = await self.queue.claim(self.batch_size)
+        await asyncio.gather(*(self.deliver(member, entry) for member, entry in claimed))
+        return len(claimed)
+
+    async def run(self):
+        logger.info(f"Dispatching {self.queue.key} (delay {self.queue.delay}s, "
+                    f"max attempts {self.queue.max_attempts})")
+        while not self._stopping.is_set():
+            try:
+                await self.queue.recover()
+                handled = await self.dispatch_once()
+            except Exception as e:
+                logger.error(f"Dispatcher error: {e}")
+                handled = 0
+            if handled < self.batch_size:
+                try:
+                    await asyncio.wait_for(self._stopping.wait(), timeout=self.poll_interval)
+                except asyncio.TimeoutError:
+                    pass
+
+    def stop(self):
+        self._stopping.set()
+
+def queue_from_env(redis):
+    """DelayedQueue configured by LOCAL_QUEUE_* variables"""
+    return DelayedQueue(
+        redis,
+        key=os.getenv("LOCAL_QUEUE_KEY", "crawl:delayed"),
+        delay=float(os.getenv("LOCAL_QUEUE_DELAY", "60")),
+        max_attempts=int(os.getenv("LOCAL_QUEUE_MAX_ATTEMPTS", "5")),
+        backoff=float(os.getenv("LOCAL_QUEUE_BACKOFF", "5")),
+        max_backoff=float(os.getenv("LOCAL_QUEUE_MAX_BACKOFF", "600")),
+    )
@@ -0,0 +1,124 @@
+#!/usr/bin/env python3
+"""
+Import-time budgets per service (`python -X importtime`)
+
+Importing a service's entry module must stay cheap: health checks, CLI
+flags, test collection and container restarts all pay for it. Heavy
+libraries (torch, vectorbt, weaviate clients, ...) belong behind accessors
+or lifespan hooks. This measures the cumulative import time of each entry
+module in a fresh interpreter and compares it with the service's budget.
+
+    python services/common/import_budget.py             # all services, from the repo root
+    python services/common/import_budget.py parser --top 15
+    python import_budget.py --dir . --module main --budget 800   # inside a service image
+"""
+
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+
+COMMON = os.path.dirname(os.path.abspath(__file__))
+ROOT = os.path.dirname(os.path.dirname(COMMON))
+
+# service -> (directory relative to the repo root, entry module, budget in ms)
+BUDGETS = {
+    "crawler": ("services/crawler", "main", 600),
+    "orchestrator": ("services/orchestrator", "main", 1500),
+    "parser": ("services/parser", "main", 1000),
+    "validator": ("services/validator", "main", 1500),
+    "backup": ("services/backup", "main", 1000),
+    "quota-exporter": ("monitor/quota-exporter", "exporter", 1000),
+}
+
+
+def parse_importtime(stderr):
+    """(module, self_us, cumulative_us) rows from -X importtime output"""
+    rows = []
+    for line in stderr.splitlines():
+        if not line.startswith("import time:") or "imported package" in line:
+            continue
+        self_us, cumulative_us, name = line[len("import time:"):].split("|")
+        rows.append((name.strip(), int(self_us), int(cumulative_us)))
+    return rows
+
+
+def measure_once(directory, module):
+    env = dict(os.environ)
+    env["PYTHONPATH"] = os.pathsep.join(p for p in (COMMON, env.get("PYTHONPATH")) if p)
+    result = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", f"import {module}"],
+        cwd=directory, env=env, capture_output=True, text=True, timeout=300,
+    )
+    if result.returncode != 0:
+        error = result.stderr.strip().splitlines()[-1] if result.stderr.strip() else "import failed"
+        raise ImportError(error)
+    return parse_importtime(result.stderr)
+
+
+def measure(directory, module, repeat=3, top=10):
+    """Median cumulative import time (ms) of `module` plus its slowest top-level imports"""
+    measure_once(directory, module)  # compile .pyc files outside the timed runs
+    runs = [measure_once(directory, module) for _ in range(repeat)]
+    totals = [next(cum for name, _, cum in reversed(rows) if name == module) / 1000 for rows in runs]
+    cumulative = {}
+    for name, _, cum in runs[-1]:
+        if name != module:
+            cumulative[name] = max(cumulative.get(name, 0), cum / 1000)
+    slowest = sorted(cumulative.items(), key=lambda item: item[1], reverse=True)[:top]
+    return {"import_ms": statistics.median(totals), "slowest": slowest}
+
+
+def check(services=None, repeat=3, top=10):
+    """Report per service: import time, budget, pass/fail (or the import error)"""
+    report = {}
+    for name in services or BUDGETS:
+        directory, module, budget = BUDGETS[name]
+        try:
+            result = measure(os.path.join(ROOT, directory), module, repeat=repeat, top=top)
+        except ImportError as e:
+            report[name] = {"budget_ms": budget, "error": str(e)}
+            continue
+        report[name] = {**result, "budget_ms": budget, "ok": result["import_ms"] <= budget}
+    return report
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Check service import times against budgets")
+    parser.add_argument("services", nargs="*", help=f"Any of {', '.join(BUDGETS)} (default: all)")
+    parser.add_argument("--dir", help="Measure this directory instead of a named service")
+    parser.add_argument("--module", default="main")
+    parser.add_argument("--budget", type=float, help="Budget in ms for --dir")
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument("--top", type=int, default=10, help="Slowest imports to list")
+    parser.add_argument("--json", action="store_true")
+    args = parser.parse_args()
+    unknown = sorted(set(args.services) - set(BUDGETS))
+    if unknown:
+        parser.error(f"Unknown service(s): {', '.join(unknown)}")
+
+    if args.dir:
+        result = measure(args.dir, args.module, repeat=args.repeat, top=args.top)
+        budget = args.budget if args.budget is not None else float("inf")
+        report = {args.dir: {**result, "budget_ms": budget, "ok": result["import_ms"] <= budget}}
+    else:
+        report = check(args.services, repeat=args.repeat, top=args.top)
+
+    if args.json:
+        print(json.dumps(report, indent=2))
+    else:
+        for name, entry in report.items():
+            if "error" in entry:
+                print(f"{name:16} SKIP  {entry['error']}")
+                continue
+            status = "ok" if entry["ok"] else "OVER"
+            print(f"{name:16} {status:5} {entry['import_ms']:8.1f} ms (budget {entry['budget_ms']} ms)")
+            for module, ms in entry["slowest"]:
+                print(f"{'':22}{ms:8.1f} ms  {module}")
+    return 0 if all(entry.get("ok", True) for entry in report.values()) else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
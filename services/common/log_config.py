@@ -0,0 +1,170 @@
+#!/usr/bin/env python3
+"""
+Shared logging setup: JSON lines for Loki, written off the hot path
+
+setup_logging() routes the root logger through a QueueHandler: callers only
+filter and enqueue the record; a QueueListener thread renders the message,
+formats JSON and writes to stderr. Records must therefore use %-style args
+(rendered in the writer thread) rather than f-strings on hot paths, and
+payloads go through payload(), which renders lazily and caps the size.
+
+Per-message logs pass extra=SAMPLED and are kept at LOG_SAMPLE_RATE;
+warnings and errors are always kept, as is everything not marked sampled.
+
+    LOG_LEVEL=INFO  LOG_FORMAT=json|text  LOG_SAMPLE_RATE=0.1  LOG_PAYLOAD_LIMIT=512
+"""
+
+import atexit
+import copy
+import json
+import logging
+import os
+import queue
+import sys
+from datetime import datetime, timezone
+from logging.handlers import QueueHandler, QueueListener
+
+SAMPLED = {"sampled": True}
+
+LOG_LEVEL = os.getenv("LOG_LEVEL", "INFO")
+LOG_FORMAT = os.getenv("LOG_FORMAT", "json")
+LOG_SAMPLE_RATE = float(os.getenv("LOG_SAMPLE_RATE", "0.1"))
+LOG_PAYLOAD_LIMIT = int(os.getenv("LOG_PAYLOAD_LIMIT", "512"))
+LOG_QUEUE_SIZE = 10000
+
+# LogRecord attributes; anything else on a record came from `extra=`
+_RECORD_FIELDS = set(vars(logging.makeLogRecord({}))) | {"message", "asctime", "sampled"}
+
+_listener = None
+_handler = None
+
+class payload:
+    """Lazily rendered, size-capped log argument: logger.debug("body %s", payload(message))"""
+
+    __slots__ = ("value", "limit")
+
+    def __init__(self, value, limit=None):
+        self.value = value
+        self.limit = LOG_PAYLOAD_LIMIT if limit is None else limit
+
+    def __str__(self):
+        value = self.value
+        if isinstance(value, bytes):
+            value = value.decode("utf-8", "replace")
+        text = value if isinstance(value, str) else repr(value)
+        if len(text) > self.limit:
+            return f"{text[:self.limit]}... ({len(text)} chars)"
+        return text
+
+    __repr__ = __str__
+
+class JsonFormatter(logging.Formatter):
+    """One JSON object per line: ts, level, service, logger, msg, extra fields, exc"""
+
+    def __init__(self, service):
+        super().__init__()
+        self.service = service
+
+    def format(self, record):
+        entry = {
+            "ts": datetime.fromtimestamp(record.created, timezone.utc).isoformat(timespec="milliseconds"),
+            "level": record.levelname,
+            "service": self.service,
+            "logger": record.name,
+            "msg": record.getMessage(),
+        }
+        for key, value in record.__dict__.items():
+            if key not in _RECORD_FIELDS and not key.startswith("_"):
+                entry[key] = value
+        if record.exc_info and not record.exc_text:
+            record.exc_text = self.formatException(record.exc_info)
+        if record.exc_text:
+            entry["exc"] = record.exc_text
+        return json.dumps(entry, default=str)
+
+class SamplingFilter(logging.Filter):
+    """Keep `rate` of the records marked sampled (deterministically); never drop WARNING and above"""
+
+    def __init__(self, rate):
+        super().__init__()
+        self.rate = min(max(rate, 0.0), 1.0)
+        self.credit = 0.0
+
+    def filter(self, record):
+        if record.levelno >= logging.WARNING or not getattr(record, "sampled", False):
+            return True
+        self.credit += self.rate
+        if self.credit < 1.0:
+            return False
+        self.credit -= 1.0
+        record.sample_rate = self.rate
+        return True
+
+class MarkSampled(logging.Filter):
+    """Treat every record of a logger (e.g. uvicorn.access) as per-message"""
+
+    def filter(self, record):
+        record.sampled = True
+        return True
+
+class DeferredQueueHandler(QueueHandler):
+    """Enqueue records unformatted; drop below-ERROR records when the queue is full"""
+
+    def __init__(self, log_queue):
+        super().__init__(log_queue)
+        self.dropped = 0
+
+    def prepare(self, record):
+        # Message rendering and formatting happen in the listener thread
+        record = copy.copy(record)
+        if record.exc_info:
+            record.exc_text = logging.Formatter().formatException(record.exc_info)
+            record.exc_info = None
+        return record
+
+    def enqueue(self, record):
+        try:
+            self.queue.put_nowait(record)
+        except queue.Full:
+            if record.levelno >= logging.ERROR:
+                self.queue.put(record, timeout=1.0)
+            else:
+                self.dropped += 1
+
+def setup_logging(service, level=None, fmt=None, sample_rate=None, stream=None, sampled_loggers=()):
+    """Install the queue handler on the root logger (replacing a previous setup); returns the handler"""
+    global _listener, _handler
+    stop_logging()
+
+    output = logging.StreamHandler(stream or sys.stderr)
+    if (fmt or LOG_FORMAT) == "json":
+        output.setFormatter(JsonFormatter(service))
+    else:
+        output.setFormatter(logging.Formatter(f"%(asctime)s %(levelname)s {service} %(name)s: %(message)s"))
+
+    log_queue = queue.Queue(LOG_QUEUE_SIZE)
+    _handler = DeferredQueueHandler(log_queue)
+    _handler.addFilter(SamplingFilter(LOG_SAMPLE_RATE if sample_rate is None else sample_rate))
+    _listener = QueueListener(log_queue, output, respect_handler_level=True)
+    _listener.start()
+
+    root = logging.getLogger()
+    root.addHandler(_handler)
+    root.setLevel(level or LOG_LEVEL)
+    for name in sampled_loggers:
+        # Route through the root handler so sampling and JSON apply
+        sampled = logging.getLogger(name)
+        sampled.handlers.clear()
+        sampled.propagate = True
+        sampled.addFilter(MarkSampled())
+    return _handler
+
+def stop_logging():
+    """Flush queued records and remove the handler (registered atexit)"""
+    global _listener, _handler
+    if _listener is not None:
+        _listener.stop()
+        logging.getLogger().removeHandler(_handler)
+        _listener = _handler = None
+
+atexit.register(stop_logging)
@@ -0,0 +1,149 @@
+#!/usr/bin/env python3
+"""
+Typed pipeline messages (msgspec)
+
+One definition per message shared by every service, used to encode and
+validate at each boundary instead of passing untyped dicts:
+
+    StartURL          start_urls queue entry (orchestrator /api/concepts -> crawler)
+    CrawlMessage      crawler -> QStash -> orchestrator webhook
+    ParseResult       parser output (Arrow IPC row, or NDJSON -> orchestrator /api/documents)
+    ValidationJob     Redis stream job consumed by the validator worker
+    BacktestResult    validator result rows (Parquet/Arrow, Weaviate)
+
+Messages carry the `trace_id` of the crawl that produced them (see tracing.py).
+
+Each service image copies this directory next to its own code (see the
+service Dockerfiles); outside Docker put services/common on PYTHONPATH.
+"""
+
+from datetime import datetime
+from typing import Annotated, Any, Dict, List, Optional
+
+import msgspec
+
+EMBEDDING_DIMENSIONS = 384  # gte-small
+
+class StartURL(msgspec.Struct, omit_defaults=True):
+    """A URL waiting on `start_urls` and the concept it was queued for"""
+    url: str
+    concept: Optional[str] = None
+
+class CrawlMessage(msgspec.Struct, omit_defaults=True):
+    """One URL (`url`) or a batch of URLs (`urls`) published as a single QStash message
+
+    A batch may mix concepts: `concepts[i]` is the concept of `urls[i]`.
+    """
+    id: str
+    url: Optional[str] = None
+    urls: Optional[List[str]] = None
+    ts: Optional[datetime] = None
+    concept: Optional[str] = None
+    concepts: Optional[List[Optional[str]]] = None
+    trace_id: Optional[str] = None
+
+    def __post_init__(self):
+        if (self.url is None) == (self.urls is None):
+            raise ValueError("Crawl message needs exactly one of `url` or `urls`")
+        if self.concepts is not None and (self.urls is None or len(self.concepts) != len(self.urls)):
+            raise ValueError("`concepts` needs one entry per URL of `urls`")
+
+    def expand(self):
+        """One single-URL message per URL of a batched message"""
+        if self.urls is None:
+            return [self]
+        concepts = self.concepts or [self.concept] * len(self.urls)
+        return [
+            CrawlMessage(id=f"{self.id}-{i}", url=url, ts=self.ts, concept=concept, trace_id=self.trace_id)
+            for i, (url, concept) in enumerate(zip(self.urls, concepts))
+        ]
+
+class ParseResult(msgspec.Struct):
+    """Parsed page; near-duplicates carry `duplicate_of` (the canonical doc_id) and pages the prefilter
+    rejected carry `skipped` (the reason) instead of an embedding"""
+    text: str
+    processed_at: datetime
+    text_length: Annotated[int, msgspec.Meta(ge=0)]
+    embedding: Optional[Annotated[List[float], msgspec.Meta(min_length=EMBEDDING_DIMENSIONS,
+                                                            max_length=EMBEDDING_DIMENSIONS)]] = None
+    url: Optional[str] = None
+    concept: Optional[str] = None
+    doc_id: Optional[str] = None
+    duplicate_of: Optional[str] = None
+    similarity: Optional[float] = None
+    skipped: Optional[str] = None
+    relevance: Optional[float] = None
+    trace_id: Optional[str] = None
+
+    def __post_init__(self):
+        if (self.embedding, self.duplicate_of, self.skipped).count(None) != 2:
+            raise ValueError("Parse result needs exactly one of `embedding`, `duplicate_of` or `skipped`")
+
+class ValidationJob(msgspec.Struct):
+    id: str
+    enqueued_at: float
+    symbols: Annotated[List[str], msgspec.Meta(min_length=1)]
+    concept: Optional[str] = None
+    strategy: str = "buy_and_hold"
+    params: Optional[Dict[str, Any]] = None
+    initial_cash: float = 10000.0
+    engine: str = "vectorbt"
+    rank_by: str = "sharpe_ratio"
+    top_n: int = 20
+    trace_id: Optional[str] = None
+
+class BacktestResult(msgspec.Struct):
+    """One result row; field order and types match the results store's Arrow schema"""
+    portfolio_id: str
+    run_id: str
+    concept: Optional[str]
+    mode: str
+    strategy: str
+    params: str
+    initial_cash: float
+    final_value: float
+    total_return: float
+    sharpe_ratio: Optional[float]
+    max_drawdown: float
+    trades_count: int
+    engine: str
+    gpu_accelerated: bool
+    computation_time: float
+    processed_at: datetime
+    date: str
+    symbol: str
+
+def _enc_hook(obj):
+    # numpy scalars, Timestamps and the like in result summaries
+    if hasattr(obj, "item"):
+        return obj.item()
+    return str(obj)
+
+encoder = msgspec.json.Encoder(enc_hook=_enc_hook)
+crawl_decoder = msgspec.json.Decoder(CrawlMessage)
+start_url_decoder = msgspec.json.Decoder(StartURL)
+parse_result_decoder = msgspec.json.Decoder(ParseResult)
+
+def encode(obj):
+    """JSON bytes for a message struct (or any builtin structure)"""
+    return encoder.encode(obj)
+
+def decode_crawl_message(data):
+    """Validate a webhook body; raises msgspec.ValidationError/DecodeError"""
+    return crawl_decoder.decode(data)
+
+def decode_parse_result(data):
+    """Validate one parser result (JSON); raises msgspec.ValidationError/DecodeError"""
+    return parse_result_decoder.decode(data)
+
+def decode_start_url(entry):
+    """`start_urls` entry -> StartURL; bare URLs (seed scripts, older producers) carry no concept"""
+    if isinstance(entry, bytes):
+        entry = entry.decode()
+    if entry.startswith("{"):
+        return start_url_decoder.decode(entry)
+    return StartURL(url=entry)
+
+def to_dict(message):
+    """Struct -> dict, omitting unset optional fields (datetimes stay datetimes)"""
+    return {k: v for k, v in msgspec.structs.asdict(message).items() if v is not None}
@@ -0,0 +1,339 @@
+#!/usr/bin/env python3
+"""
+Cross-service trace propagation and per-stage span timing
+
+The crawler gives every CrawlMessage a `trace_id` (next to `id` and `ts`) and
+forwards a W3C `traceparent` through QStash; the webhook, the parser's Arrow
+row and the validator's Redis job carry the same id. Each service records
+spans for its stages:
+
+    with span("parser.encode", trace_id, chars=len(text)):
+        embedding = model.encode(text)
+
+Spans nest through a context variable (also across asyncio tasks and
+to_thread). Finished spans are queued and written by a background thread,
+like log records, to TRACE_FILE (JSON lines) or an OTLP/HTTP collector:
+
+    TRACE_EXPORT=jsonl|otlp|none  TRACE_FILE=/traces/spans.jsonl
+    OTEL_EXPORTER_OTLP_ENDPOINT=http://otel-collector:4318
+
+Without setup_tracing() spans are timed but not exported.
+
+    python tracing.py summary spans.jsonl           # critical path per stage
+    python tracing.py summary spans.jsonl --trace <trace_id>
+"""
+
+import argparse
+import atexit
+import contextvars
+import json
+import logging
+import os
+import queue
+import re
+import sys
+import threading
+import time
+import urllib.request
+import uuid
+from contextlib import contextmanager
+
+logger = logging.getLogger(__name__)
+
+TRACE_EXPORT = os.getenv("TRACE_EXPORT", "none")
+TRACE_FILE = os.getenv("TRACE_FILE", "/traces/spans.jsonl")
+OTLP_ENDPOINT = os.getenv("OTEL_EXPORTER_OTLP_ENDPOINT", "http://otel-collector:4318")
+TRACE_QUEUE_SIZE = 10000
+TRACE_BATCH_SIZE = 256
+
+_TRACEPARENT = re.compile(r"^00-([0-9a-f]{32})-([0-9a-f]{16})-[0-9a-f]{2}$")
+
+_current = contextvars.ContextVar("span", default=None)
+_service = None
+_writer = None
+
+def new_trace_id():
+    return uuid.uuid4().hex
+
+def new_span_id():
+    return uuid.uuid4().hex[:16]
+
+def traceparent(trace_id, span_id=None):
+    """W3C traceparent header value"""
+    return f"00-{trace_id}-{span_id or new_span_id()}-01"
+
+def parse_traceparent(value):
+    """(trace_id, parent span_id) from a traceparent header, (None, None) if absent or malformed"""
+    match = _TRACEPARENT.match((value or "").strip().lower())
+    return match.groups() if match else (None, None)
+
+def current_span():
+    return _current.get()
+
+class Span:
+    """One timed stage of a trace; `start`/`end` are epoch seconds"""
+
+    __slots__ = ("name", "trace_id", "span_id", "parent_id", "service", "start", "end", "attrs")
+
+    def __init__(self, name, trace_id, parent_id=None, start=None, attrs=None):
+        self.name = name
+        self.trace_id = trace_id
+        self.span_id = new_span_id()
+        self.parent_id = parent_id
+        self.service = _service
+        self.start = time.time() if start is None else start
+        self.end = None
+        self.attrs = attrs or {}
+
+    def set(self, **attrs):
+        self.attrs.update(attrs)
+
+    @property
+    def duration(self):
+        return (self.end or time.time()) - self.start
+
+    def finish(self, end=None):
+        self.end = time.time() if end is None else end
+        if _writer is not None and self.trace_id:
+            _writer.put(self.to_dict())
+
+    def to_dict(self):
+        return {
+            "trace_id": self.trace_id,
+            "span_id": self.span_id,
+            "parent_id": self.parent_id,
+            "service": self.service,
+            "name": self.name,
+            "start": self.start,
+            "end": self.end,
+            "duration": self.end - self.start,
+            "attrs": self.attrs,
+        }
+
+@contextmanager
+def span(name, trace_id=None, parent_id=None, **attrs):
+    """Time a stage; trace_id/parent default to the enclosing span's"""
+    parent = _current.get()
+    if trace_id is None and parent is not None:
+        trace_id = parent.trace_id
+    if parent_id is None and parent is not None and parent.trace_id == trace_id:
+        parent_id = parent.span_id
+    current = Span(name, trace_id, parent_id=parent_id, attrs=attrs)
+    token = _current.set(current)
+    try:
+        yield current
+    except BaseException as e:
+        current.attrs["error"] = f"{type(e).__name__}: {e}"
+        raise
+    finally:
+        _current.reset(token)
+        current.finish()
+
+def record_span(name, trace_id, start, end, parent_id=None, **attrs):
+    """Export a stage measured elsewhere (e.g. time spent waiting in a queue)"""
+    recorded = Span(name, trace_id, parent_id=parent_id, start=start, attrs=attrs)
+    recorded.finish(end)
+    return recorded
+
+class JsonlExporter:
+    """Append spans as JSON lines (one write per batch; O_APPEND keeps processes from interleaving lines)"""
+
+    def __init__(self, path):
+        self.path = path
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+
+    def export(self, spans):
+        with open(self.path, "a") as f:
+            f.write("".join(json.dumps(s, default=str) + "\n" for s in spans))
+
+class OtlpExporter:
+    """POST spans to an OTLP/HTTP collector as JSON (/v1/traces)"""
+
+    def __init__(self, endpoint, service, timeout=5.0):
+        self.url = endpoint.rstrip("/") + "/v1/traces"
+        self.service = service
+        self.timeout = timeout
+
+    @staticmethod
+    def _attribute(key, value):
+        if isinstance(value, bool):
+            return {"key": key, "value": {"boolValue": value}}
+        if isinstance(value, int):
+            return {"key": key, "value": {"intValue": str(value)}}
+        if isinstance(value, float):
+            return {"key": key, "value": {"doubleValue": value}}
+        return {"key": key, "value": {"stringValue": str(value)}}
+
+    def payload(self, spans):
+        return {"resourceSpans": [{
+            "resource": {"attributes": [self._attribute("service.name", self.service)]},
+            "scopeSpans": [{
+                "scope": {"name": "pipeline"},
+                "spans": [{
+                    "traceId": s["trace_id"],
+                    "spanId": s["span_id"],
+                    **({"parentSpanId": s["parent_id"]} if s["parent_id"] else {}),
+                    "name": s["name"],
+                    "kind": 1,  # internal
+                    "startTimeUnixNano": str(int(s["start"] * 1e9)),
+                    "endTimeUnixNano": str(int(s["end"] * 1e9)),
+                    "attributes": [self._attribute(k, v) for k, v in s["attrs"].items()],
+                    **({"status": {"code": 2, "message": s["attrs"]["error"]}} if "error" in s["attrs"] else {}),
+                } for s in spans],
+            }],
+        }]}
+
+    def export(self, spans):
+        request = urllib.request.Request(self.url, data=json.dumps(self.payload(spans)).encode(),
+                                         headers={"Content-Type": "application/json"}, method="POST")
+        with urllib.request.urlopen(request, timeout=self.timeout):
+            pass
+
+class SpanWriter:
+    """Background thread exporting queued spans in batches; drops spans when the queue is full"""
+
+    def __init__(self, exporter, batch_size=TRACE_BATCH_SIZE):
+        self.exporter = exporter
+        self.batch_size = batch_size
+        self.queue = queue.Queue(TRACE_QUEUE_SIZE)
+        self.dropped = 0
+        self._thread = threading.Thread(target=self._run, name="span-writer", daemon=True)
+        self._thread.start()
+
+    def put(self, record):
+        try:
+            self.queue.put_nowait(record)
+        except queue.Full:
+            self.dropped += 1
+
+    def _run(self):
+        stopping = False
+        while not stopping:
+            batch = [self.queue.get()]
+            while len(batch) < self.batch_size:
+                try:
+                    batch.append(self.queue.get_nowait())
+                except queue.Empty:
+                    break
+            if batch[-1] is None:
+                batch.pop()
+                stopping = True
+            if batch:
+                try:
+                    self.exporter.export(batch)
+                except Exception as e:
+                    logger.warning(f"Dropped {len(batch)} span(s): export failed: {e}")
+
+    def stop(self, timeout=5.0):
+        self.queue.put(None)
+        self._thread.join(timeout)
+
+def setup_tracing(service, export=None, path=None, endpoint=None):
+    """Export this process's spans (replacing a previous setup); returns the writer or None"""
+    global _service, _writer
+    stop_tracing()
+    _service = service
+    export = export or TRACE_EXPORT
+    if export == "jsonl":
+        exporter = JsonlExporter(path or TRACE_FILE)
+    elif export == "otlp":
+        exporter = OtlpExporter(endpoint or OTLP_ENDPOINT, service)
+    elif export == "none":
+        return None
+    else:
+        raise ValueError(f"Unknown TRACE_EXPORT {export!r} (expected jsonl, otlp or none)")
+    _writer = SpanWriter(exporter)
+    return _writer
+
+def stop_tracing():
+    """Flush queued spans and stop exporting (registered atexit)"""
+    global _writer
+    if _writer is not None:
+        _writer.stop()
+        _writer = None
+
+atexit.register(stop_tracing)
+
+def load_spans(path):
+    with open(path) as f:
+        return [json.loads(line) for line in f if line.strip()]
+
+def stage_spans(spans):
+    """A trace's stages: spans without a parent in the same service (nested spans break a stage down)"""
+    services = {s["span_id"]: s["service"] for s in spans}
+    return [s for s in spans if services.get(s["parent_id"]) != s["service"]]
+
+def critical_path(spans):
+    """[(name, seconds)] walking back from the last stage to end: at each step the stage that
+    finished last before the cursor; gaps no stage covers are reported as `untraced`"""
+    stages = stage_spans(spans)
+    if not stages:
+        return []
+    cursor = max(s["end"] for s in stages)
+    path = []
+    remaining = sorted(stages, key=lambda s: s["end"])
+    while True:
+        candidates = [s for s in remaining if s["start"] < cursor]
+        if not candidates:
+            break
+        stage = candidates[-1]
+        remaining.remove(stage)
+        if stage["end"] < cursor:
+            path.append(("untraced", cursor - stage["end"]))
+        path.append((stage["name"], min(stage["end"], cursor) - stage["start"]))
+        cursor = stage["start"]
+    return path[::-1]
+
+def summarize(spans):
+    """Per stage: traces seen, mean duration and share of end-to-end time on the critical path"""
+    traces = {}
+    for s in spans:
+        traces.setdefault(s["trace_id"], []).append(s)
+    totals = {}
+    total = 0.0
+    for trace in traces.values():
+        for s in trace:
+            stage = totals.setdefault(s["name"], {"spans": 0, "time": 0.0, "critical": 0.0})
+            stage["spans"] += 1
+            stage["time"] += s["duration"]
+        for name, seconds in critical_path(trace):
+            totals.setdefault(name, {"spans": 0, "time": 0.0, "critical": 0.0})["critical"] += seconds
+            total += seconds
+    report = {
+        name: {
+            "spans": stage["spans"],
+            "mean_s": stage["time"] / stage["spans"] if stage["spans"] else None,
+            "critical_s": stage["critical"],
+            "critical_share": stage["critical"] / total if total else 0.0,
+        }
+        for name, stage in sorted(totals.items(), key=lambda item: -item[1]["critical"])
+    }
+    return {
+        "traces": len(traces),
+        "critical_path_s": total,
+        "bottleneck": next(iter(report), None),
+        "stages": report,
+    }
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Report which pipeline stage is the critical path")
+    commands = parser.add_subparsers(dest="command", required=True)
+    summary = commands.add_parser("summary")
+    summary.add_argument("path", nargs="?", default=TRACE_FILE)
+    summary.add_argument("--trace", help="Show one trace's critical path instead of the aggregate")
+    args = parser.parse_args(argv)
+
+    spans = load_spans(args.path)
+    if args.trace:
+        trace = [s for s in spans if s["trace_id"] == args.trace]
+        if not trace:
+            sys.exit(f"No spans for trace {args.trace}")
+        print(json.dumps([{"stage": name, "seconds": round(seconds, 6)} for name, seconds in critical_path(trace)],
+                         indent=2))
+    else:
+        print(json.dumps(summarize(spans), indent=2))
+
+if __name__ == "__main__":
+    main()
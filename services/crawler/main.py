@@ -1,80 +1,253 @@
 #!/usr/bin/env python3
 """
 Crawler service main entry point
-Processes URLs from Redis queue and publishes to QStash
+Processes URLs from Redis queue and publishes them through a transport:
+
+    qstash  Upstash QStash (delay header, paced by the shared daily quota)
+    redis   local delayed queue (sorted set) drained by the orchestrator's dispatcher
 """
 
 import asyncio
 import os
 import logging
-import json
 import uuid
 from datetime import datetime
 import httpx
 import redis.asyncio as aioredis
+from prometheus_client import Gauge, start_http_server
+
+from adaptive import AdaptiveLimiter
+from delayed_queue import queue_from_env
+from log_config import SAMPLED, setup_logging
+from messages import CrawlMessage, decode_start_url, encode
+from quota import QuotaBudget, QuotaThrottle
+from tracing import new_trace_id, setup_tracing, span, traceparent
 
-logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
-QSTASH_URL = os.getenv("QSTASH_URL")
-QSTASH_TOKEN = os.getenv("QSTASH_TOKEN")
 REDIS_URL = os.getenv("REDIS_URL", "redis://redis:6379")
+QSTASH_DAILY_LIMIT = int(os.getenv("QSTASH_DAILY_LIMIT", "500"))
+CRAWL_TRANSPORT = os.getenv("CRAWL_TRANSPORT", "qstash")
+LOCAL_BATCH_SIZE = int(os.getenv("LOCAL_BATCH_SIZE", "100"))
+QSTASH_TARGET_LATENCY = float(os.getenv("QSTASH_TARGET_LATENCY", "1.0"))
+QSTASH_MAX_CONCURRENCY = int(os.getenv("QSTASH_MAX_CONCURRENCY", "16"))
+CRAWLER_METRICS_PORT = int(os.getenv("CRAWLER_METRICS_PORT", "9102"))
+
+publish_limit = Gauge("crawler_qstash_publish_concurrency_limit",
+                      "Adaptive limit on concurrent QStash publishes")
+publish_limiter = AdaptiveLimiter("qstash_publish", initial=2, max_limit=QSTASH_MAX_CONCURRENCY,
+                                  target_latency=QSTASH_TARGET_LATENCY, on_change=publish_limit.set)
 
-async def publish_to_qstash(url: str):
+async def publish_to_qstash(url: str, concept=None):
     """Publish URL to QStash with delay header"""
-    message = {
-        "id": str(uuid.uuid4()),
-        "url": url,
-        "ts": datetime.utcnow().isoformat()
-    }
-    
+    message = CrawlMessage(id=str(uuid.uuid4()), url=url, ts=datetime.utcnow(), concept=concept,
+                           trace_id=new_trace_id())
+    return await publish_message(message)
+
+async def publish_batch_to_qstash(urls, concepts=None):
+    """Publish several URLs as one QStash message (one unit of daily quota); concepts[i] belongs to urls[i]"""
+    if concepts is not None and all(c is None for c in concepts):
+        concepts = None
+    message = CrawlMessage(id=str(uuid.uuid4()), urls=list(urls), ts=datetime.utcnow(),
+                           concepts=list(concepts) if concepts is not None else None, trace_id=new_trace_id())
+    return await publish_message(message)
+
+async def publish_message(message):
+    """Publish a CrawlMessage to QStash as-is (also used to replay dead letters)"""
     headers = {
-        "Authorization": f"Bearer {QSTASH_TOKEN}",
+        "Authorization": f"Bearer {os.getenv('QSTASH_TOKEN')}",
         "Upstash-Delay": "60",  # 60 second delay
         "Content-Type": "application/json"
     }
     
-    async with httpx.AsyncClient() as client:
-        response = await client.post(
-            QSTASH_URL,
-            headers=headers,
-            json=message
-        )
-        response.raise_for_status()
-        logger.info(f"Published URL {url} to QStash with ID {message['id']}")
+    # Slows down on 429s, errors and latency spikes instead of just logging them
+    async with httpx.AsyncClient() as client, publish_limiter.slot():
+        with span("crawler.publish", message.trace_id, urls=len(message.urls or [message.url])) as publish:
+            if message.trace_id:
+                # QStash strips the prefix and delivers `traceparent` to the webhook
+                headers["Upstash-Forward-Traceparent"] = traceparent(message.trace_id, publish.span_id)
+            response = await client.post(
+                os.getenv("QSTASH_URL"),
+                headers=headers,
+                content=encode(message)
+            )
+            publish.set(status=response.status_code)
+            response.raise_for_status()
+        target = f"URL {message.url}" if message.urls is None else f"{len(message.urls)} URLs"
+        logger.info("Published %s to QStash with ID %s", target, message.id, extra=SAMPLED)
         return response
 
+async def pop_urls(redis_client, count):
+    """Pop up to `count` entries from the start_urls queue (raw, so they can be requeued as-is)"""
+    urls = await redis_client.lpop("start_urls", count)
+    return [u.decode('utf-8') if isinstance(u, bytes) else u for u in urls or []]
+
+async def requeue_urls(redis_client, urls):
+    """Put entries back at the head of the queue, preserving their order"""
+    if urls:
+        await redis_client.lpush("start_urls", *reversed(urls))
+
+def decode_entries(entries):
+    """(raw entry, StartURL) per queue entry; malformed entries are logged and dropped"""
+    decoded = []
+    for entry in entries:
+        try:
+            decoded.append((entry, decode_start_url(entry)))
+        except Exception as e:
+            logger.error(f"Dropping malformed start_urls entry {entry[:200]!r}: {e}")
+    return decoded
+
+async def publish_entries(redis_client, budget, batch, urls, entries):
+    """Publish popped entries as one message; on failure refund the unit and requeue them. True on success"""
+    try:
+        if batch:
+            await publish_batch_to_qstash([entry.url for entry in entries], [entry.concept for entry in entries])
+        else:
+            await publish_to_qstash(entries[0].url, entries[0].concept)
+    except Exception as e:
+        logger.error(f"Failed to publish {[entry.url for entry in entries]}: {e}")
+        await budget.refund()
+        await requeue_urls(redis_client, urls)
+        return False
+    return True
+
+async def crawl_step(redis_client, budget, throttle, dispatch=None):
+    """Publish the next URL (or batch) within the quota; returns seconds to wait before the next step
+
+    With `dispatch`, the publish is handed to it instead of awaited, so the
+    next step is paced from now rather than from when QStash answers.
+    """
+    remaining = await budget.remaining()
+    mode = throttle.mode(remaining)
+    if mode == throttle.DEFER:
+        # Leave URLs queued until the daily quota resets
+        await budget.report_projection(throttle.projected_exhaustion(remaining))
+        return min(60.0, throttle.interval(remaining))
+    
+    wait = throttle.wait_time()
+    if wait > 0:
+        return wait
+    
+    popped = await pop_urls(redis_client, throttle.batch_size if mode == throttle.BATCH else 1)
+    if not popped:
+        return 1.0
+    decoded = decode_entries(popped)
+    if not decoded:
+        return 0.0
+    urls = [raw for raw, _ in decoded]
+    entries = [entry for _, entry in decoded]
+    
+    remaining = await budget.acquire()
+    if remaining is None:
+        await requeue_urls(redis_client, urls)
+        return 1.0
+    
+    logger.info("Processing %d URL(s) (%s, %d publishes left today)", len(urls), mode, remaining, extra=SAMPLED)
+    publish = publish_entries(redis_client, budget, mode == throttle.BATCH, urls, entries)
+    if dispatch is not None:
+        await dispatch(publish)
+    elif not await publish:
+        return 1.0
+    
+    throttle.record(remaining)
+    await budget.report_projection(throttle.projected_exhaustion(remaining))
+    return throttle.wait_time()
+
+async def local_step(redis_client, queue, batch_size=100):
+    """Move the next URLs onto the local delayed queue; returns seconds to wait before the next step"""
+    popped = await pop_urls(redis_client, batch_size)
+    if not popped:
+        return 1.0
+    decoded = decode_entries(popped)
+    urls = [raw for raw, _ in decoded]
+    
+    try:
+        for i, (_, entry) in enumerate(decoded):
+            message = CrawlMessage(id=str(uuid.uuid4()), url=entry.url, ts=datetime.utcnow(), concept=entry.concept,
+                                   trace_id=new_trace_id())
+            with span("crawler.enqueue", message.trace_id):
+                await queue.publish(message)
+    except Exception as e:
+        logger.error(f"Failed to enqueue {urls[i:]}: {e}")
+        await requeue_urls(redis_client, urls[i:])
+        return 1.0
+    
+    logger.info("Queued %d URL(s) on %s (delay %ss)", len(urls), queue.key, queue.delay, extra=SAMPLED)
+    return 0.0
+
+class QStashTransport:
+    """Publish through QStash within the daily quota"""
+    
+    def __init__(self, redis_client):
+        self.budget = QuotaBudget(redis_client, daily_limit=QSTASH_DAILY_LIMIT)
+        self.throttle = QuotaThrottle(daily_limit=QSTASH_DAILY_LIMIT)
+        self.inflight = set()
+    
+    async def dispatch(self, publish):
+        """Run a publish in the background once fewer than the publish limiter's capacity are in flight"""
+        while len(self.inflight) >= publish_limiter.capacity:
+            await asyncio.wait(self.inflight, return_when=asyncio.FIRST_COMPLETED)
+        task = asyncio.create_task(publish)
+        self.inflight.add(task)
+        task.add_done_callback(self.inflight.discard)
+    
+    async def step(self, redis_client):
+        return await crawl_step(redis_client, self.budget, self.throttle, dispatch=self.dispatch)
+    
+    async def drain(self):
+        """Wait for in-flight publishes (failed ones requeue their URLs)"""
+        if self.inflight:
+            await asyncio.gather(*self.inflight)
+
+class LocalQueueTransport:
+    """Publish onto the Redis delayed queue; no quota, no external round trip"""
+    
+    def __init__(self, redis_client, batch_size=100):
+        self.queue = queue_from_env(redis_client)
+        self.batch_size = batch_size
+    
+    async def step(self, redis_client):
+        return await local_step(redis_client, self.queue, self.batch_size)
+    
+    async def drain(self):
+        """Nothing in flight between steps"""
+
+def make_transport(name, redis_client):
+    """Transport for CRAWL_TRANSPORT; raises ValueError for unknown names or missing config"""
+    if name == "qstash":
+        if not os.getenv("QSTASH_URL") or not os.getenv("QSTASH_TOKEN"):
+            raise ValueError("QSTASH_URL and QSTASH_TOKEN must be set")
+        return QStashTransport(redis_client)
+    if name == "redis":
+        return LocalQueueTransport(redis_client, batch_size=LOCAL_BATCH_SIZE)
+    raise ValueError(f"Unknown CRAWL_TRANSPORT {name!r} (expected qstash or redis)")
+
 async def main():
     """Main crawler service loop"""
-    logger.info("Starting crawler service...")
-    
-    if not QSTASH_URL or not QSTASH_TOKEN:
-        logger.error("QSTASH_URL and QSTASH_TOKEN must be set")
-        return
+    logger.info(f"Starting crawler service ({CRAWL_TRANSPORT} transport)...")
     
+    start_http_server(CRAWLER_METRICS_PORT)
     redis_client = aioredis.from_url(REDIS_URL)
+    try:
+        transport = make_transport(CRAWL_TRANSPORT, redis_client)
+    except ValueError as e:
+        logger.error(str(e))
+        await redis_client.close()
+        return
     
     try:
         while True:
-            # Pop URL from Redis list
-            url = await redis_client.lpop("start_urls")
-            
-            if url:
-                url = url.decode('utf-8') if isinstance(url, bytes) else url
-                logger.info(f"Processing URL: {url}")
-                
-                try:
-                    await publish_to_qstash(url)
-                except Exception as e:
-                    logger.error(f"Failed to publish URL {url}: {e}")
-            else:
-                # No URLs in queue, wait before checking again
-                await asyncio.sleep(1)
+            # Paced by the transport (QStash: shared daily quota, publishes overlap up to
+            # the adaptive limit); waits when idle or deferring
+            await asyncio.sleep(await transport.step(redis_client))
                 
     except KeyboardInterrupt:
         logger.info("Crawler service stopped")
     finally:
+        await transport.drain()
         await redis_client.close()
 
 if __name__ == "__main__":
+    setup_logging("crawler")
+    setup_tracing("crawler")
     asyncio.run(main())
\ No newline at end of file
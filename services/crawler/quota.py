@@ -0,0 +1,125 @@
+#!/usr/bin/env python3
+"""
+Shared QStash daily quota budget and publish pacing
+
+The budget lives in a Redis hash per UTC day (`qstash:budget:<date>`). The
+quota exporter syncs `remaining` from the QStash usage API; every crawler
+publish takes one unit with an atomic HINCRBY (refunded if it overdraws or
+the publish fails).
+
+The throttle spreads what is left over the rest of the day, switches to
+batching several URLs per message when the budget runs low, and defers
+(leaves URLs queued) once it is exhausted.
+"""
+
+import time
+from collections import deque
+from datetime import datetime, timedelta, timezone
+
+BUDGET_KEY_PREFIX = "qstash:budget"
+BUDGET_TTL = 2 * 86400
+
+
+def utc_day(now):
+    return datetime.fromtimestamp(now, tz=timezone.utc).strftime("%Y-%m-%d")
+
+
+def seconds_until_reset(now):
+    """Seconds until the next UTC midnight, when the QStash daily quota resets"""
+    current = datetime.fromtimestamp(now, tz=timezone.utc)
+    midnight = (current + timedelta(days=1)).replace(hour=0, minute=0, second=0, microsecond=0)
+    return (midnight - current).total_seconds()
+
+
+def budget_key(now):
+    return f"{BUDGET_KEY_PREFIX}:{utc_day(now)}"
+
+
+class QuotaBudget:
+    """Atomic daily publish budget shared by every crawler through Redis"""
+
+    def __init__(self, redis_client, daily_limit=500, clock=time.time):
+        self.redis = redis_client
+        self.daily_limit = daily_limit
+        self.clock = clock
+
+    async def _key(self):
+        """Today's budget key, seeded with the full limit on first use"""
+        key = budget_key(self.clock())
+        if await self.redis.hsetnx(key, "remaining", self.daily_limit):
+            await self.redis.hsetnx(key, "limit", self.daily_limit)
+            await self.redis.expire(key, BUDGET_TTL)
+        return key
+
+    async def remaining(self):
+        key = await self._key()
+        return int(await self.redis.hget(key, "remaining"))
+
+    async def acquire(self, n=1):
+        """Take `n` units; returns the new remaining count, or None if exhausted"""
+        key = await self._key()
+        remaining = await self.redis.hincrby(key, "remaining", -n)
+        if remaining < 0:
+            await self.redis.hincrby(key, "remaining", n)
+            return None
+        return remaining
+
+    async def refund(self, n=1):
+        key = await self._key()
+        await self.redis.hincrby(key, "remaining", n)
+
+    async def report_projection(self, projected_exhaustion):
+        """Publish the projected exhaustion time (unix seconds, 0 = not today)"""
+        key = await self._key()
+        await self.redis.hset(key, "projected_exhaustion", projected_exhaustion or 0)
+
+
+class QuotaThrottle:
+    """Pace publishes so the remaining budget lasts until the daily reset"""
+
+    SINGLE, BATCH, DEFER = "single", "batch", "defer"
+
+    def __init__(self, daily_limit=500, low_watermark=None, batch_size=20, window=3600, clock=time.time):
+        self.daily_limit = daily_limit
+        self.low_watermark = low_watermark if low_watermark is not None else daily_limit // 10
+        self.batch_size = batch_size
+        self.window = window
+        self.clock = clock
+        self.next_allowed = 0.0
+        self.published = deque()
+
+    def mode(self, remaining):
+        if remaining <= 0:
+            return self.DEFER
+        if remaining <= self.low_watermark:
+            return self.BATCH
+        return self.SINGLE
+
+    def interval(self, remaining):
+        """Seconds between publishes that spends `remaining` evenly until reset"""
+        if remaining <= 0:
+            return seconds_until_reset(self.clock())
+        return seconds_until_reset(self.clock()) / remaining
+
+    def wait_time(self):
+        return max(0.0, self.next_allowed - self.clock())
+
+    def record(self, remaining):
+        """Account one publish and schedule the next one"""
+        now = self.clock()
+        self.published.append(now)
+        while self.published and self.published[0] < now - self.window:
+            self.published.popleft()
+        self.next_allowed = now + self.interval(remaining)
+
+    def projected_exhaustion(self, remaining):
+        """When the budget runs out at the recent publish rate; None if not before reset"""
+        now = self.clock()
+        if remaining <= 0:
+            return now
+        recent = [t for t in self.published if t >= now - self.window]
+        if not recent:
+            return None
+        rate = len(recent) / self.window
+        projected = now + remaining / rate
+        return projected if projected - now < seconds_until_reset(now) else None
@@ -0,0 +1,368 @@
+#!/usr/bin/env python3
+"""
+Replay dead-lettered crawl messages
+
+Streams dead letters from QStash's DLQ API or the local delayed queue's
+dead-letter set, filters them by failure time, error and URL, and republishes
+them through the crawler's publisher at a target rate and concurrency.
+Replayed entries are removed from the DLQ (unless --keep). The position is
+checkpointed after every page, so an interrupted replay resumes where it
+stopped; entries that fail again stay in the DLQ for a later --restart.
+
+    python replay.py --source qstash --since 2024-06-01T00:00 --error "HTTP 5\\d\\d" --rate 2
+    python replay.py --source local --url "example\\.com" --transport redis --concurrency 16
+    python replay.py --source local --dry-run
+"""
+
+import argparse
+import asyncio
+import base64
+import hashlib
+import json
+import logging
+import os
+import re
+import time
+from datetime import datetime, timezone
+
+import httpx
+import msgspec
+import redis.asyncio as aioredis
+
+from delayed_queue import decode_entry, queue_from_env
+from log_config import setup_logging
+from main import CRAWL_TRANSPORT, QSTASH_DAILY_LIMIT, REDIS_URL, publish_message
+from messages import decode_crawl_message
+from quota import QuotaBudget
+
+logger = logging.getLogger(__name__)
+
+QSTASH_API_URL = os.getenv("QSTASH_API_URL", "https://qstash.upstash.io")
+
+class QuotaExhausted(Exception):
+    pass
+
+class DeadLetter:
+    """A DLQ entry: `message` is None when the stored body is not a valid CrawlMessage"""
+
+    def __init__(self, key, message, failed_at, error=None):
+        self.key = key
+        self.message = message
+        self.failed_at = failed_at
+        self.error = error
+
+    @property
+    def urls(self):
+        if self.message is None:
+            return []
+        return self.message.urls if self.message.urls is not None else [self.message.url]
+
+class LocalDeadLetters:
+    """Dead letters of the Redis delayed queue, oldest failure first"""
+
+    name = "local"
+
+    def __init__(self, queue, page_size=100):
+        self.queue = queue
+        self.redis = queue.redis
+        self.page_size = page_size
+
+    async def pages(self, position=None):
+        """Yield (letters, position after them); `position` is {"score", "members"} or None"""
+        score = position["score"] if position else None
+        seen = set(position["members"]) if position else set()
+        while True:
+            rows = await self.redis.zrangebyscore(
+                self.queue.dead_key, "-inf" if score is None else score, "+inf",
+                start=0, num=self.page_size + len(seen), withscores=True,
+            )
+            # Entries sharing the checkpointed score were handled before
+            rows = [(m.decode() if isinstance(m, bytes) else m, s) for m, s in rows]
+            rows = [(m, s) for m, s in rows if not (s == score and m in seen)][:self.page_size]
+            if not rows:
+                return
+            last = rows[-1][1]
+            seen = {m for m, s in rows if s == last} | (seen if last == score else set())
+            score = last
+            yield [self.letter(member) for member, _ in rows], {"score": score, "members": sorted(seen)}
+
+    def letter(self, member):
+        try:
+            entry = decode_entry(member)
+        except (msgspec.DecodeError, msgspec.ValidationError):
+            return DeadLetter(member, None, 0.0, "undecodable entry")
+        return DeadLetter(member, entry.message, entry.failed_at or entry.enqueued_at, entry.error)
+
+    async def remove(self, letter):
+        await self.redis.zrem(self.queue.dead_key, letter.key)
+
+class QStashDeadLetters:
+    """QStash DLQ (GET/DELETE /v2/dlq), paged by its cursor"""
+
+    name = "qstash"
+
+    def __init__(self, client, token, api_url=QSTASH_API_URL, page_size=100):
+        self.client = client
+        self.headers = {"Authorization": f"Bearer {token}"}
+        self.api_url = api_url.rstrip("/")
+        self.page_size = page_size
+
+    async def pages(self, position=None):
+        cursor = position["cursor"] if position else None
+        while True:
+            params = {"count": self.page_size}
+            if cursor:
+                params["cursor"] = cursor
+            response = await self.client.get(f"{self.api_url}/v2/dlq", params=params, headers=self.headers)
+            response.raise_for_status()
+            data = response.json()
+            cursor = data.get("cursor")
+            yield [self.letter(m) for m in data.get("messages", [])], {"cursor": cursor}
+            if not cursor:
+                return
+
+    def letter(self, entry):
+        if entry.get("bodyBase64"):
+            body = base64.b64decode(entry["bodyBase64"])
+        else:
+            body = (entry.get("body") or "").encode()
+        try:
+            message = decode_crawl_message(body)
+        except (msgspec.DecodeError, msgspec.ValidationError):
+            message = None
+        error = f"HTTP {entry.get('responseStatus')}: {entry.get('responseBody', '')}"
+        return DeadLetter(entry["dlqId"], message, entry.get("createdAt", 0) / 1000, error)
+
+    async def remove(self, letter):
+        response = await self.client.delete(f"{self.api_url}/v2/dlq/{letter.key}", headers=self.headers)
+        response.raise_for_status()
+
+class ReplayFilter:
+    """Failure time window plus regexes on the error text and the message URLs"""
+
+    def __init__(self, since=None, until=None, error=None, url=None):
+        self.since = since
+        self.until = until
+        self.error = re.compile(error) if error else None
+        self.url = re.compile(url) if url else None
+
+    def matches(self, letter):
+        if letter.message is None:
+            return False
+        if self.since is not None and letter.failed_at < self.since:
+            return False
+        if self.until is not None and letter.failed_at >= self.until:
+            return False
+        if self.error and not self.error.search(letter.error or ""):
+            return False
+        if self.url and not any(self.url.search(u) for u in letter.urls):
+            return False
+        return True
+
+    def key(self):
+        return {
+            "since": self.since, "until": self.until,
+            "error": self.error.pattern if self.error else None,
+            "url": self.url.pattern if self.url else None,
+        }
+
+class Checkpoint:
+    """Replay position in a JSON file, valid only for the same source and filter"""
+
+    def __init__(self, path, source, replay_filter):
+        self.path = path
+        key = json.dumps({"source": source, **replay_filter.key()}, sort_keys=True)
+        self.key = hashlib.sha256(key.encode()).hexdigest()[:16]
+
+    def load(self):
+        """Saved state, or None when missing or written for another source/filter"""
+        try:
+            with open(self.path) as f:
+                state = json.load(f)
+        except FileNotFoundError:
+            return None
+        if state.get("key") != self.key:
+            logger.warning(f"Ignoring checkpoint {self.path}: it was written for a different source or filter")
+            return None
+        return state
+
+    def save(self, position, stats, complete=False):
+        tmp_path = f"{self.path}.tmp"
+        with open(tmp_path, "w") as f:
+            json.dump({"key": self.key, "position": position, "stats": stats, "complete": complete,
+                       "updated_at": datetime.now(timezone.utc).isoformat()}, f)
+        os.replace(tmp_path, self.path)
+
+class RateLimiter:
+    """Space starts at 1/rate seconds; rate <= 0 means unlimited"""
+
+    def __init__(self, rate, clock=time.monotonic):
+        self.interval = 1.0 / rate if rate > 0 else 0.0
+        self.clock = clock
+        self.next_at = 0.0
+        self.lock = asyncio.Lock()
+
+    async def wait(self):
+        if not self.interval:
+            return
+        async with self.lock:
+            now = self.clock()
+            if self.next_at > now:
+                await asyncio.sleep(self.next_at - now)
+                now = self.next_at
+            self.next_at = now + self.interval
+
+class Replayer:
+    def __init__(self, source, publish, checkpoint, replay_filter, rate=5.0, concurrency=4,
+                 keep=False, dry_run=False, progress_interval=5.0):
+        self.source = source
+        self.publish = publish
+        self.checkpoint = checkpoint
+        self.filter = replay_filter
+        self.limiter = RateLimiter(rate)
+        self.semaphore = asyncio.Semaphore(concurrency)
+        self.keep = keep
+        self.dry_run = dry_run
+        self.progress_interval = progress_interval
+        self.stats = {"scanned": 0, "matched": 0, "replayed": 0, "failed": 0}
+        self.stopped = False
+
+    async def replay(self, letter):
+        async with self.semaphore:
+            if self.stopped:
+                return
+            await self.limiter.wait()
+            try:
+                await self.publish(letter.message)
+            except QuotaExhausted:
+                self.stopped = True
+                return
+            except Exception as e:
+                self.stats["failed"] += 1
+                logger.error(f"Replay of {letter.message.id} failed: {e}")
+                return
+            self.stats["replayed"] += 1
+            if not self.keep:
+                try:
+                    await self.source.remove(letter)
+                except Exception as e:
+                    logger.warning(f"Replayed {letter.message.id} but could not remove it from the DLQ: {e}")
+
+    def report(self, started):
+        elapsed = max(time.monotonic() - started, 1e-9)
+        logger.info(f"scanned {self.stats['scanned']}, matched {self.stats['matched']}, "
+                    f"replayed {self.stats['replayed']}, failed {self.stats['failed']} "
+                    f"({self.stats['replayed'] / elapsed:.1f}/s)")
+
+    async def run(self, restart=False):
+        """Replay every matching dead letter after the checkpoint; returns stats"""
+        state = None if restart else self.checkpoint.load()
+        if state and state.get("complete"):
+            logger.info(f"Checkpoint {self.checkpoint.path} is complete; use --restart to replay again")
+            return state["stats"]
+        if state:
+            self.stats.update(state["stats"])
+            logger.info(f"Resuming from {self.checkpoint.path} ({self.stats['scanned']} already scanned)")
+        position = state["position"] if state else None
+
+        started = last_report = time.monotonic()
+        async for letters, position in self.source.pages(position):
+            matched = [letter for letter in letters if self.filter.matches(letter)]
+            self.stats["scanned"] += len(letters)
+            self.stats["matched"] += len(matched)
+            if self.dry_run:
+                for letter in matched:
+                    print(json.dumps({"key": letter.key, "id": letter.message.id, "urls": letter.urls,
+                                      "failed_at": letter.failed_at, "error": letter.error}))
+                continue
+            await asyncio.gather(*(self.replay(letter) for letter in matched))
+            if self.stopped:
+                # Quota ran out mid-page: keep the previous position so the page is revisited
+                logger.warning("QStash daily quota exhausted; stopping (rerun to resume)")
+                self.report(started)
+                return self.stats
+            self.checkpoint.save(position, self.stats)
+            if time.monotonic() - last_report >= self.progress_interval:
+                self.report(started)
+                last_report = time.monotonic()
+
+        if not self.dry_run:
+            self.checkpoint.save(position, self.stats, complete=True)
+        self.report(started)
+        return self.stats
+
+def make_publisher(transport, redis_client):
+    """Republish via QStash (within the daily quota) or straight onto the local queue"""
+    if transport == "redis":
+        queue = queue_from_env(redis_client)
+
+        async def publish(message):
+            await queue.publish(message, delay=0)
+        return publish
+
+    budget = QuotaBudget(redis_client, daily_limit=QSTASH_DAILY_LIMIT)
+
+    async def publish(message):
+        if await budget.acquire() is None:
+            raise QuotaExhausted()
+        try:
+            await publish_message(message)
+        except Exception:
+            await budget.refund()
+            raise
+    return publish
+
+def parse_time(value):
+    """ISO-8601 -> epoch seconds (naive times are UTC)"""
+    moment = datetime.fromisoformat(value)
+    if moment.tzinfo is None:
+        moment = moment.replace(tzinfo=timezone.utc)
+    return moment.timestamp()
+
+async def run(args):
+    replay_filter = ReplayFilter(
+        since=parse_time(args.since) if args.since else None,
+        until=parse_time(args.until) if args.until else None,
+        error=args.error, url=args.url,
+    )
+    checkpoint = Checkpoint(args.checkpoint or f"replay-{args.source}.checkpoint.json", args.source, replay_filter)
+    redis_client = aioredis.from_url(REDIS_URL)
+    async with httpx.AsyncClient(timeout=30) as client:
+        if args.source == "qstash":
+            source = QStashDeadLetters(client, os.getenv("QSTASH_TOKEN"), page_size=args.page_size)
+        else:
+            source = LocalDeadLetters(queue_from_env(redis_client), page_size=args.page_size)
+        replayer = Replayer(source, make_publisher(args.transport, redis_client), checkpoint, replay_filter,
+                            rate=args.rate, concurrency=args.concurrency, keep=args.keep, dry_run=args.dry_run)
+        try:
+            return await replayer.run(restart=args.restart)
+        finally:
+            await redis_client.close()
+
+def main():
+    setup_logging("replay")
+    parser = argparse.ArgumentParser(description="Replay dead-lettered crawl messages")
+    parser.add_argument("--source", choices=["qstash", "local"], required=True)
+    parser.add_argument("--transport", choices=["qstash", "redis"], default=CRAWL_TRANSPORT,
+                        help="Where to republish (default: CRAWL_TRANSPORT)")
+    parser.add_argument("--since", help="Only entries that failed at/after this ISO time (UTC if naive)")
+    parser.add_argument("--until", help="Only entries that failed before this ISO time")
+    parser.add_argument("--error", help="Regex matched against the failure (e.g. 'HTTP 5\\d\\d')")
+    parser.add_argument("--url", help="Regex matched against the message URL(s)")
+    parser.add_argument("--rate", type=float, default=5.0, help="Republishes per second (0: unlimited)")
+    parser.add_argument("--concurrency", type=int, default=4)
+    parser.add_argument("--page-size", type=int, default=100)
+    parser.add_argument("--checkpoint", help="Checkpoint file (default: replay-<source>.checkpoint.json)")
+    parser.add_argument("--restart", action="store_true", help="Ignore the checkpoint and start over")
+    parser.add_argument("--keep", action="store_true", help="Leave replayed entries in the DLQ")
+    parser.add_argument("--dry-run", action="store_true", help="Print matching entries, publish nothing")
+    args = parser.parse_args()
+    if args.source == "qstash" and not os.getenv("QSTASH_TOKEN"):
+        parser.error("QSTASH_TOKEN must be set for --source qstash")
+    if args.transport == "qstash" and not args.dry_run and (not os.getenv("QSTASH_URL") or not os.getenv("QSTASH_TOKEN")):
+        parser.error("QSTASH_URL and QSTASH_TOKEN must be set for --transport qstash")
+    stats = asyncio.run(run(args))
+    print(json.dumps(stats))
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,146 @@
+#!/usr/bin/env python3
+"""
+Recall vs latency of Weaviate HNSW (and PQ) settings on synthetic gte-small-sized vectors
+
+Imports clustered random vectors into a throwaway class built with the same
+IndexConfig as the pipeline's schema, then sweeps the query-time `ef` and
+reports recall@k against exact brute-force neighbours and p50/p95 latency.
+Run against a local container:
+
+    docker run -d -p 8080:8080 semitechnologies/weaviate:1.25.4
+    python bench_hnsw.py --url http://localhost:8080 --count 20000 --ef 16,32,64,128,256
+    python bench_hnsw.py --pq --ef 64,128,256
+"""
+
+import argparse
+import json
+import time
+
+import numpy as np
+import weaviate
+
+from schema import VECTOR_DIMENSIONS, IndexConfig
+
+BENCH_CLASS = "HnswBenchVector"
+
+
+def clustered_vectors(count, dims=VECTOR_DIMENSIONS, clusters=50, seed=0):
+    """Unit vectors around random centroids (closer to text embeddings than uniform noise)"""
+    rng = np.random.default_rng(seed)
+    centroids = rng.normal(size=(clusters, dims))
+    vectors = centroids[rng.integers(0, clusters, count)] + 0.35 * rng.normal(size=(count, dims))
+    return (vectors / np.linalg.norm(vectors, axis=1, keepdims=True)).astype(np.float32)
+
+
+def exact_neighbours(data, queries, k):
+    """Indices of the k most cosine-similar rows of `data` for each query"""
+    similarity = queries @ data.T
+    return np.argsort(-similarity, axis=1)[:, :k]
+
+
+def create_class(client, config):
+    if client.schema.exists(BENCH_CLASS):
+        client.schema.delete_class(BENCH_CLASS)
+    client.schema.create_class({
+        "class": BENCH_CLASS,
+        "vectorizer": "none",
+        "vectorIndexType": "hnsw",
+        "vectorIndexConfig": config.vector_index_config(),
+        "properties": [{"name": "row", "dataType": ["int"]}],
+    })
+
+
+def import_vectors(client, data, batch_size=500):
+    start_time = time.perf_counter()
+    client.batch.configure(batch_size=batch_size, dynamic=False)
+    with client.batch as batch:
+        for row, vector in enumerate(data):
+            batch.add_data_object({"row": row}, BENCH_CLASS, vector=vector.tolist())
+    return time.perf_counter() - start_time
+
+
+def run_queries(client, queries, truth, k):
+    latencies, hits = [], 0
+    for query, expected in zip(queries, truth):
+        start_time = time.perf_counter()
+        response = (
+            client.query.get(BENCH_CLASS, ["row"])
+            .with_near_vector({"vector": query.tolist()})
+            .with_limit(k)
+            .do()
+        )
+        latencies.append(time.perf_counter() - start_time)
+        found = {obj["row"] for obj in response["data"]["Get"][BENCH_CLASS]}
+        hits += len(found & set(expected.tolist()))
+    return {
+        "recall": hits / (len(queries) * k),
+        "p50_ms": float(np.percentile(latencies, 50) * 1000),
+        "p95_ms": float(np.percentile(latencies, 95) * 1000),
+        "qps": len(queries) / sum(latencies),
+    }
+
+
+def run_benchmark(url, count=20000, queries=200, k=10, ef_values=(16, 32, 64, 128, 256), config=None):
+    """Import once, then sweep `ef`; returns a JSON-serialisable report"""
+    config = config or IndexConfig()
+    client = weaviate.Client(url)
+    data = clustered_vectors(count)
+    query_vectors = clustered_vectors(queries, seed=1)
+    truth = exact_neighbours(data, query_vectors, k)
+
+    create_class(client, config)
+    try:
+        import_time = import_vectors(client, data)
+        if config.pq_enabled:
+            # PQ trains on the imported vectors when enabled on a populated class
+            client.schema.update_config(BENCH_CLASS, {"vectorIndexConfig": {"pq": config.vector_index_config()["pq"]}})
+            time.sleep(5)
+
+        sweep = []
+        for ef in ef_values:
+            client.schema.update_config(BENCH_CLASS, {"vectorIndexConfig": {"ef": ef}})
+            run_queries(client, query_vectors[:10], truth[:10], k)  # warm up
+            sweep.append({"ef": ef, **run_queries(client, query_vectors, truth, k)})
+    finally:
+        client.schema.delete_class(BENCH_CLASS)
+
+    return {
+        "count": count,
+        "queries": queries,
+        "k": k,
+        "index": config.vector_index_config(),
+        "import_time": import_time,
+        "import_rate": count / import_time,
+        "sweep": sweep,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Weaviate HNSW recall/latency benchmark")
+    parser.add_argument("--url", default="http://localhost:8080")
+    parser.add_argument("--count", type=int, default=20000, help="Vectors to import")
+    parser.add_argument("--queries", type=int, default=200)
+    parser.add_argument("--k", type=int, default=10)
+    parser.add_argument("--ef", default="16,32,64,128,256", help="Comma-separated query-time ef values")
+    parser.add_argument("--ef-construction", type=int, default=128)
+    parser.add_argument("--max-connections", type=int, default=32)
+    parser.add_argument("--pq", action="store_true", help="Enable product quantization")
+    parser.add_argument("--pq-segments", type=int, default=VECTOR_DIMENSIONS // 4)
+    args = parser.parse_args()
+
+    config = IndexConfig(
+        ef_construction=args.ef_construction,
+        max_connections=args.max_connections,
+        pq_enabled=args.pq,
+        pq_segments=args.pq_segments,
+        pq_training_limit=args.count,
+    )
+    report = run_benchmark(
+        args.url, count=args.count, queries=args.queries, k=args.k,
+        ef_values=[int(ef) for ef in args.ef.split(",")], config=config,
+    )
+    print(json.dumps(report, indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,99 @@
+#!/usr/bin/env python3
+"""
+Bulk concept ingestion: expand concepts to URLs and queue them for the crawler
+
+The URL templates mirror services/edge-worker/index.js. URLs are
+deduplicated within a request and appended to `start_urls` as StartURL
+entries ({"url": ..., "concept": ...}, so crawl messages keep their concept)
+with multi-value RPUSH commands of CHUNK_SIZE entries, sent in
+non-transactional pipelines, so 10k concepts (~50k URLs) cost a handful of
+round trips.
+"""
+
+import json
+from urllib.parse import quote
+
+from messages import StartURL, encode
+
+QUERY_SUFFIXES = ("trading", "pinescript", "pdf")
+CHUNK_SIZE = 1000
+CHUNKS_PER_PIPELINE = 10
+
+def encode_uri_component(value):
+    """JavaScript encodeURIComponent"""
+    return quote(value, safe="-_.!~*'()")
+
+def concept_urls(concept):
+    """URLs for a concept, in edge-worker order (which repeats the docs/forum pages per query)"""
+    slug = concept.lower()
+    urls = []
+    for suffix in QUERY_SUFFIXES:
+        urls.extend([
+            f"https://example.com/search?q={encode_uri_component(f'{concept} {suffix}')}&result=1",
+            f"https://docs.example.com/{slug}/trading-guide",
+            f"https://forum.example.com/discussion/{slug}",
+        ])
+    return urls
+
+def parse_ndjson_line(line):
+    """Concept from an NDJSON line: {"concept": "..."} or a bare JSON string; None for blank lines"""
+    line = line.strip()
+    if not line:
+        return None
+    value = json.loads(line)
+    if isinstance(value, dict):
+        value = value.get("concept")
+    if not isinstance(value, str):
+        raise ValueError(f"Expected a concept string or {{\"concept\": ...}}, got {line[:100]!r}")
+    return value
+
+class ConceptIngester:
+    """One request's ingestion: call add() per concept, then flush()"""
+
+    def __init__(self, redis, key="start_urls", chunk_size=CHUNK_SIZE, chunks_per_pipeline=CHUNKS_PER_PIPELINE):
+        self.redis = redis
+        self.key = key
+        self.chunk_size = chunk_size
+        self.chunks_per_pipeline = chunks_per_pipeline
+        self.seen = set()
+        self.pending = []
+        self.counts = {}
+        self.concepts = 0
+        self.duplicates = 0
+        self.queued = 0
+
+    async def add(self, concept):
+        concept = concept.strip()
+        if not concept:
+            return
+        self.concepts += 1
+        queued = 0
+        for url in concept_urls(concept):
+            if url in self.seen:
+                self.duplicates += 1
+                continue
+            self.seen.add(url)
+            self.pending.append(encode(StartURL(url=url, concept=concept)))
+            queued += 1
+        self.counts[concept] = self.counts.get(concept, 0) + queued
+        if len(self.pending) >= self.chunk_size * self.chunks_per_pipeline:
+            await self.flush()
+
+    async def flush(self):
+        """RPUSH pending entries in chunks, one pipeline round trip"""
+        if not self.pending:
+            return
+        async with self.redis.pipeline(transaction=False) as pipe:
+            for start in range(0, len(self.pending), self.chunk_size):
+                pipe.rpush(self.key, *self.pending[start:start + self.chunk_size])
+            await pipe.execute()
+        self.queued += len(self.pending)
+        self.pending = []
+
+    def summary(self):
+        return {
+            "concepts": self.concepts,
+            "queued": self.queued,
+            "duplicates": self.duplicates,
+            "counts": self.counts,
+        }
@@ -3,24 +3,114 @@
 Orchestrator service - FastAPI webhook handler for QStash
 """
 
+import asyncio
+import time
+from contextlib import asynccontextmanager
+from datetime import timezone
 from fastapi import FastAPI, Request, HTTPException
+from prometheus_client import Gauge, make_asgi_app
+from pydantic import BaseModel, Field
+from typing import Any, Dict, List, Optional
 import os
 import logging
-import json
 import jwt
-import weaviate
+import msgspec
 
-logging.basicConfig(level=logging.INFO)
-logger = logging.getLogger(__name__)
+from adaptive import AdaptiveLimiter
+from delayed_queue import Dispatcher, queue_from_env
+from ingest import ConceptIngester, parse_ndjson_line
+from log_config import SAMPLED, payload, setup_logging
+from messages import decode_crawl_message, decode_parse_result
+from schema import ensure_schema
+from search import QueryEmbedder, SearchCache, SearchService
+from tracing import parse_traceparent, record_span, setup_tracing, span
 
-app = FastAPI(title="QStash Pipeline Orchestrator")
+logger = logging.getLogger(__name__)
 
 # Environment variables
-QSTASH_SIGNING_KEY = os.getenv("QSTASH_SIGNING_KEY")
 WEAVIATE_URL = os.getenv("WEAVIATE_URL", "http://weaviate:8080")
+SEARCH_CLASS = os.getenv("SEARCH_CLASS", "ParsedDocument")
+SEARCH_CACHE_SIZE = int(os.getenv("SEARCH_CACHE_SIZE", "1024"))
+SEARCH_CACHE_TTL = float(os.getenv("SEARCH_CACHE_TTL", "300"))
+REDIS_URL = os.getenv("REDIS_URL", "redis://redis:6379")
+CRAWL_TRANSPORT = os.getenv("CRAWL_TRANSPORT", "qstash")
+LOCAL_QUEUE_CONCURRENCY = int(os.getenv("LOCAL_QUEUE_CONCURRENCY", "8"))
+WEAVIATE_TARGET_LATENCY = float(os.getenv("WEAVIATE_TARGET_LATENCY", "0.5"))
+WEAVIATE_MAX_CONCURRENCY = int(os.getenv("WEAVIATE_MAX_CONCURRENCY", "16"))
+
+# Written from ParseResult; the embedding becomes the object's vector (see schema.py)
+PARSED_DOCUMENT_PROPERTIES = ("url", "text", "concept", "text_length", "processed_at")
+
+# Created on first use (or at startup), never at import
+weaviate_client = None
+redis_client = None
+search_service = None
+
+search_cache = SearchCache(maxsize=SEARCH_CACHE_SIZE, ttl=SEARCH_CACHE_TTL)
 
-# Initialize Weaviate client
-weaviate_client = weaviate.Client(WEAVIATE_URL)
+weaviate_write_limit = Gauge("orchestrator_weaviate_write_concurrency_limit",
+                             "Adaptive limit on concurrent Weaviate batch writes")
+weaviate_limiter = AdaptiveLimiter("weaviate_write", initial=2, max_limit=WEAVIATE_MAX_CONCURRENCY,
+                                   target_latency=WEAVIATE_TARGET_LATENCY, on_change=weaviate_write_limit.set)
+
+def get_weaviate_client():
+    """Weaviate client, connected on first use"""
+    global weaviate_client
+    if weaviate_client is None:
+        import weaviate
+        weaviate_client = weaviate.Client(WEAVIATE_URL)
+    return weaviate_client
+
+def get_redis_client():
+    """Async Redis client, created on first use"""
+    global redis_client
+    if redis_client is None:
+        import redis.asyncio as aioredis
+        redis_client = aioredis.from_url(REDIS_URL)
+    return redis_client
+
+def get_search_service():
+    global search_service
+    if search_service is None:
+        search_service = SearchService(get_weaviate_client(), QueryEmbedder(), search_cache,
+                                       class_name=SEARCH_CLASS)
+    return search_service
+
+@asynccontextmanager
+async def lifespan(app):
+    """Connect to Weaviate and define classes (vectorizer none, tuned HNSW) before serving"""
+    setup_logging("orchestrator", sampled_loggers=("uvicorn.access",))
+    setup_tracing("orchestrator")
+    try:
+        created = ensure_schema(get_weaviate_client())
+        logger.info(f"Weaviate schema ready (created: {created or 'none'})")
+    except Exception as e:
+        logger.error(f"Weaviate schema bootstrap failed: {e}")
+    
+    dispatcher = None
+    if CRAWL_TRANSPORT == "redis":
+        # Local transport: deliver the crawler's delayed queue straight to the webhook logic
+        dispatcher = Dispatcher(queue_from_env(get_redis_client()), handle_crawl_message,
+                                concurrency=LOCAL_QUEUE_CONCURRENCY)
+        task = asyncio.create_task(dispatcher.run())
+    yield
+    if dispatcher is not None:
+        dispatcher.stop()
+        await task
+    if redis_client is not None:
+        await redis_client.close()
+
+app = FastAPI(title="QStash Pipeline Orchestrator", lifespan=lifespan)
+app.mount("/metrics", make_asgi_app())
+
+class SearchRequest(BaseModel):
+    query: str = Field(..., min_length=1)
+    concept: Optional[str] = None
+    filters: Dict[str, Any] = Field(default_factory=dict)
+    limit: int = Field(10, ge=1, le=100)
+
+class ConceptBatch(msgspec.Struct):
+    concepts: List[str]
 
 def verify_qstash_signature(request: Request, body: bytes):
     """Verify QStash JWT signature using EdDSA"""
@@ -29,28 +119,102 @@ def verify_qstash_signature(request: Request, body: bytes):
     if not signature:
         raise HTTPException(status_code=401, detail="Missing Upstash-Signature header")
     
-    if not QSTASH_SIGNING_KEY:
+    # Read per request so key rotation (and tests) need no restart
+    signing_key = os.getenv("QSTASH_SIGNING_KEY")
+    if not signing_key:
         raise HTTPException(status_code=500, detail="QSTASH_SIGNING_KEY not configured")
     
     try:
         # Verify JWT signature with EdDSA algorithm
         decoded = jwt.decode(
             signature, 
-            QSTASH_SIGNING_KEY, 
+            signing_key, 
             algorithms=["EdDSA"]
         )
-        logger.info(f"JWT signature verified: {decoded}")
+        # Claims stay out of the logs; issuer/subject are enough to trace a delivery
+        logger.debug("JWT signature verified (iss=%s, sub=%s)", decoded.get("iss"), decoded.get("sub"))
         return decoded
     except jwt.InvalidTokenError as e:
         logger.error(f"JWT verification failed: {e}")
         raise HTTPException(status_code=401, detail="Invalid signature")
 
+def raw_url_object(message):
+    """RawURL properties for one single-URL message (`id` is reserved by Weaviate)"""
+    data_object = msgspec.to_builtins(message)
+    data_object["messageId"] = data_object.pop("id")
+    if "trace_id" in data_object:
+        data_object["traceId"] = data_object.pop("trace_id")
+    return data_object
+
+def new_batch(client):
+    """A batch of our own per write: the client's shared `client.batch` is not thread-safe"""
+    from weaviate.batch import Batch
+    return Batch(client._connection)
+
+def parsed_document_object(result):
+    """ParsedDocument properties for one parse result (its embedding is stored as the object's vector)"""
+    data_object = msgspec.to_builtins(result)
+    return {name: data_object[name] for name in PARSED_DOCUMENT_PROPERTIES if data_object.get(name) is not None}
+
+def write_objects(objects, class_name="RawURL", vectors=None):
+    """Flush objects to Weaviate in one batch request; raises if any object is rejected"""
+    batch = new_batch(get_weaviate_client())
+    for data_object, vector in zip(objects, vectors or [None] * len(objects)):
+        batch.add_data_object(data_object=data_object, class_name=class_name, vector=vector)
+    results = batch.create_objects() or []
+    errors = [r["result"]["errors"] for r in results if (r.get("result") or {}).get("errors")]
+    if errors:
+        raise RuntimeError(f"Weaviate rejected {len(errors)}/{len(objects)} object(s): {errors[0]}")
+
+async def store_crawl_message(message):
+    """Store a crawl message's URLs as RawURL objects; raises on storage errors"""
+    # Batched messages carry several URLs
+    objects = [raw_url_object(item) for item in message.expand()]
+    # Concurrency adapts to Weaviate's latency and errors
+    with span("orchestrator.weaviate_write", message.trace_id, objects=len(objects)):
+        async with weaviate_limiter.slot():
+            await asyncio.to_thread(write_objects, objects)
+    logger.info("Stored data in Weaviate: %s", message.id, extra=SAMPLED)
+
+async def store_parse_results(results):
+    """Store embedded parse results as searchable documents; returns how many were written
+
+    Near-duplicates and prefilter-skipped pages have no embedding and are not
+    stored (the canonical page already answers for a near-duplicate).
+    """
+    documents = [result for result in results if result.embedding is not None]
+    if not documents:
+        return 0
+    objects = [parsed_document_object(result) for result in documents]
+    with span("orchestrator.weaviate_write", documents[0].trace_id, objects=len(objects)):
+        async with weaviate_limiter.slot():
+            await asyncio.to_thread(write_objects, objects, SEARCH_CLASS, [result.embedding for result in documents])
+    # New documents can change /search results for their concept (and unscoped queries)
+    for concept in {result.concept for result in documents}:
+        search_cache.invalidate(concept)
+    logger.info("Stored %d parsed document(s) in %s", len(documents), SEARCH_CLASS, extra=SAMPLED)
+    return len(documents)
+
+def record_delivery_delay(message, transport, parent_id=None):
+    """Span from message creation to delivery (includes the publish round trip and the transport delay)"""
+    if message.trace_id and message.ts:
+        ts = message.ts if message.ts.tzinfo else message.ts.replace(tzinfo=timezone.utc)
+        record_span("transport.delay", message.trace_id, ts.timestamp(), time.time(), parent_id=parent_id,
+                    transport=transport)
+
+async def handle_crawl_message(message):
+    """Local delayed-queue delivery; failures propagate so the dispatcher retries"""
+    logger.info("Processing queued message %s: %s", message.id, payload(message), extra=SAMPLED)
+    record_delivery_delay(message, "redis")
+    with span("orchestrator.deliver", message.trace_id):
+        await store_crawl_message(message)
+
 @app.get("/health")
 async def health_check():
     """Health check endpoint"""
     try:
         # Check Weaviate connection
-        weaviate_status = weaviate_client.is_ready()
+        weaviate_status = get_weaviate_client().is_ready()
         
         return {
             "status": "healthy", 
@@ -76,30 +240,90 @@ async def qstash_webhook(request: Request):
     jwt_payload = verify_qstash_signature(request, body)
     
     try:
-        # Parse the webhook payload
-        data = json.loads(body)
-        logger.info(f"Processing QStash webhook: {data}")
+        # Decode and validate the webhook payload
+        message = decode_crawl_message(body)
+        logger.info("Processing QStash webhook %s: %s", message.id, payload(body), extra=SAMPLED)
+        
+        # Trace id travels in the body; the forwarded traceparent links to the publish span
+        trace_id, parent_id = parse_traceparent(request.headers.get("traceparent"))
+        message.trace_id = message.trace_id or trace_id
+        record_delivery_delay(message, "qstash", parent_id=parent_id)
         
         # Store in Weaviate RawURL class
-        try:
-            weaviate_client.batch.add_data_object(
-                data_object=data,
-                class_name="RawURL"
-            )
-            logger.info(f"Stored data in Weaviate: {data.get('id', 'unknown')}")
-        except Exception as e:
-            logger.error(f"Failed to store in Weaviate: {e}")
-            # Don't fail the webhook for storage errors
+        with span("orchestrator.webhook", message.trace_id, parent_id=parent_id):
+            try:
+                await store_crawl_message(message)
+            except Exception as e:
+                logger.error(f"Failed to store in Weaviate: {e}")
+                # Don't fail the webhook for storage errors
         
-        return {"ok": True, "processed": data.get("id", "unknown")}
+        return {"ok": True, "processed": message.id}
         
-    except json.JSONDecodeError as e:
-        logger.error(f"Invalid JSON payload: {e}")
+    except msgspec.DecodeError as e:
+        logger.error(f"Invalid payload: {e}")
         raise HTTPException(status_code=400, detail="Invalid JSON payload")
     except Exception as e:
         logger.error(f"Webhook processing failed: {e}")
         raise HTTPException(status_code=500, detail="Internal server error")
 
+@app.post("/api/concepts")
+async def ingest_concepts(request: Request):
+    """Expand concepts to crawl URLs and queue them on start_urls: {"concepts": [...]} or an NDJSON stream"""
+    ingester = ConceptIngester(get_redis_client())
+    try:
+        if request.headers.get("content-type", "").startswith("application/x-ndjson"):
+            # Stream: URLs are pushed in chunks while the body is still arriving
+            buffer = b""
+            async for chunk in request.stream():
+                *lines, buffer = (buffer + chunk).split(b"\n")
+                for line in lines:
+                    concept = parse_ndjson_line(line.decode())
+                    if concept is not None:
+                        await ingester.add(concept)
+            concept = parse_ndjson_line(buffer.decode())
+            if concept is not None:
+                await ingester.add(concept)
+        else:
+            for concept in msgspec.json.decode(await request.body(), type=ConceptBatch).concepts:
+                await ingester.add(concept)
+        await ingester.flush()
+    except (msgspec.DecodeError, ValueError) as e:
+        raise HTTPException(status_code=400, detail=f"Invalid concepts payload: {e}")
+    except Exception as e:
+        logger.error(f"Concept ingestion failed after {ingester.queued} URL(s): {e}")
+        raise HTTPException(status_code=503, detail="URL queue unavailable")
+    
+    summary = ingester.summary()
+    logger.info(f"Ingested {summary['concepts']} concept(s): {summary['queued']} URL(s) queued, "
+                f"{summary['duplicates']} duplicate(s) dropped")
+    return summary
+
+@app.post("/api/documents")
+async def ingest_documents(request: Request):
+    """Store parser results for /search: one JSON result per line (`parser main.py --format ndjson`)"""
+    try:
+        results = [decode_parse_result(line) for line in (await request.body()).splitlines() if line.strip()]
+    except msgspec.DecodeError as e:
+        raise HTTPException(status_code=400, detail=f"Invalid parse result: {e}")
+    try:
+        stored = await store_parse_results(results)
+    except Exception as e:
+        logger.error(f"Failed to store {len(results)} parse result(s): {e}")
+        raise HTTPException(status_code=503, detail="Weaviate write failed")
+    return {"received": len(results), "stored": stored}
+
+@app.post("/search")
+async def search(request: SearchRequest):
+    """Semantic search: gte-small query embedding + Weaviate nearVector, cached"""
+    try:
+        results, cached = await get_search_service().search(
+            request.query, concept=request.concept, filters=request.filters, limit=request.limit
+        )
+    except Exception as e:
+        logger.error(f"Search failed: {e}")
+        raise HTTPException(status_code=502, detail="Search backend error")
+    return {"query": request.query, "cached": cached, "count": len(results), "results": results}
+
 if __name__ == "__main__":
     import uvicorn
     uvicorn.run(app, host="0.0.0.0", port=8000)
\ No newline at end of file
@@ -0,0 +1,148 @@
+#!/usr/bin/env python3
+"""
+Weaviate schema bootstrap
+
+Defines the pipeline's classes explicitly instead of relying on auto-schema.
+Every class uses `vectorizer: none` (vectors come from gte-small in the
+parser/orchestrator) and HNSW settings from the environment, optionally with
+product quantization to cut vector memory.
+
+Only `ef` and PQ can be changed on an existing class; `efConstruction` and
+`maxConnections` are fixed at creation, so a mismatch is logged and needs a
+reindex (new class + re-import) to take effect.
+"""
+
+import logging
+import os
+
+logger = logging.getLogger(__name__)
+
+VECTOR_DIMENSIONS = 384  # gte-small
+
+class IndexConfig:
+    """HNSW (and optional PQ) settings shared by the pipeline's classes"""
+
+    def __init__(self, ef=-1, ef_construction=128, max_connections=32, distance="cosine",
+                 pq_enabled=False, pq_segments=VECTOR_DIMENSIONS // 4, pq_centroids=256,
+                 pq_training_limit=100000):
+        self.ef = ef
+        self.ef_construction = ef_construction
+        self.max_connections = max_connections
+        self.distance = distance
+        self.pq_enabled = pq_enabled
+        self.pq_segments = pq_segments
+        self.pq_centroids = pq_centroids
+        self.pq_training_limit = pq_training_limit
+
+    def vector_index_config(self):
+        config = {
+            "distance": self.distance,
+            "ef": self.ef,
+            "efConstruction": self.ef_construction,
+            "maxConnections": self.max_connections,
+        }
+        if self.pq_enabled:
+            config["pq"] = {
+                "enabled": True,
+                "segments": self.pq_segments,
+                "centroids": self.pq_centroids,
+                "trainingLimit": self.pq_training_limit,
+            }
+        return config
+
+def index_config_from_env():
+    """IndexConfig from WEAVIATE_HNSW_* / WEAVIATE_PQ_* (ef -1 = dynamic)"""
+    return IndexConfig(
+        ef=int(os.getenv("WEAVIATE_HNSW_EF", "-1")),
+        ef_construction=int(os.getenv("WEAVIATE_HNSW_EF_CONSTRUCTION", "128")),
+        max_connections=int(os.getenv("WEAVIATE_HNSW_MAX_CONNECTIONS", "32")),
+        distance=os.getenv("WEAVIATE_DISTANCE", "cosine"),
+        pq_enabled=os.getenv("WEAVIATE_PQ_ENABLED", "false").lower() in ("1", "true", "yes"),
+        pq_segments=int(os.getenv("WEAVIATE_PQ_SEGMENTS", str(VECTOR_DIMENSIONS // 4))),
+        pq_centroids=int(os.getenv("WEAVIATE_PQ_CENTROIDS", "256")),
+        pq_training_limit=int(os.getenv("WEAVIATE_PQ_TRAINING_LIMIT", "100000")),
+    )
+
+def _props(**types):
+    return [{"name": name, "dataType": [data_type]} for name, data_type in types.items()]
+
+# Property names follow the objects each service writes
+CLASS_PROPERTIES = {
+    "RawURL": _props(messageId="text", url="text", ts="text", concept="text", traceId="text"),
+    "ParsedDocument": _props(
+        url="text", text="text", concept="text", ts="text", text_length="int", processed_at="text"
+    ),
+    # services/validator/results_store.py SCHEMA
+    "BacktestResult": _props(
+        portfolio_id="text", run_id="text", concept="text", mode="text", strategy="text",
+        params="text", initial_cash="number", final_value="number", total_return="number",
+        sharpe_ratio="number", max_drawdown="number", trades_count="int", engine="text",
+        gpu_accelerated="boolean", computation_time="number", processed_at="date",
+        date="text", symbol="text",
+    ),
+}
+
+CLASS_DESCRIPTIONS = {
+    "RawURL": "URLs delivered by the crawler through QStash",
+    "ParsedDocument": "Parsed page text with its gte-small embedding",
+    "BacktestResult": "Validator backtest metrics per symbol and parameter set",
+}
+
+def class_definitions(config=None):
+    config = config or IndexConfig()
+    return [
+        {
+            "class": name,
+            "description": CLASS_DESCRIPTIONS[name],
+            "vectorizer": "none",
+            "vectorIndexType": "hnsw",
+            "vectorIndexConfig": config.vector_index_config(),
+            "properties": properties,
+        }
+        for name, properties in CLASS_PROPERTIES.items()
+    ]
+
+def _differs(current, wanted):
+    """True if any wanted setting (recursing into dicts) differs from the current config"""
+    for key, value in wanted.items():
+        if isinstance(value, dict):
+            if not isinstance(current.get(key), dict) or _differs(current[key], value):
+                return True
+        elif current.get(key) != value:
+            return True
+    return False
+
+def ensure_schema(client, config=None):
+    """Create missing classes/properties and apply mutable index settings; returns created class names"""
+    config = config or index_config_from_env()
+    existing = {c["class"]: c for c in client.schema.get().get("classes", [])}
+    created = []
+    for definition in class_definitions(config):
+        name = definition["class"]
+        current = existing.get(name)
+        if current is None:
+            client.schema.create_class(definition)
+            created.append(name)
+            logger.info(f"Created Weaviate class {name} ({definition['vectorIndexConfig']})")
+            continue
+
+        have = {p["name"] for p in current.get("properties", [])}
+        for prop in definition["properties"]:
+            if prop["name"] not in have:
+                client.schema.property.create(name, prop)
+                logger.info(f"Added property {name}.{prop['name']}")
+
+        if current.get("vectorizer", "none") != "none":
+            logger.warning(f"Weaviate class {name} uses vectorizer {current['vectorizer']}; expected none")
+        index = current.get("vectorIndexConfig", {})
+        for key in ("efConstruction", "maxConnections"):
+            if key in index and index[key] != definition["vectorIndexConfig"][key]:
+                logger.warning(f"{name}.{key} is {index[key]}, config wants "
+                               f"{definition['vectorIndexConfig'][key]}; requires a reindex")
+        update = {"ef": config.ef}
+        if config.pq_enabled:
+            update["pq"] = definition["vectorIndexConfig"]["pq"]
+        if _differs(index, update):
+            client.schema.update_config(name, {"vectorIndexConfig": update})
+            logger.info(f"Updated {name} vector index config: {update}")
+    return created
@@ -0,0 +1,215 @@
+#!/usr/bin/env python3
+"""
+Vector search over Weaviate with a query-result cache
+
+Queries are embedded with the parser's gte-small model (loaded once, run in a
+thread pool so the event loop keeps serving webhooks) and answered with
+nearVector. Results are cached in an LRU with TTL keyed by the normalized
+query and filters; writes for a concept drop the entries that could include it,
+and a query that was already running during such a write does not cache its
+(possibly older) results.
+"""
+
+import asyncio
+import json
+import logging
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+
+from prometheus_client import Counter, Gauge, Histogram
+
+logger = logging.getLogger(__name__)
+
+MODEL_NAME = "thenlper/gte-small"
+DEFAULT_PROPERTIES = ["url", "text", "concept", "ts"]
+
+search_latency = Histogram(
+    'orchestrator_search_latency_seconds', 'Search request latency', ['cache'],
+    buckets=(0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0)
+)
+search_cache_requests = Counter('orchestrator_search_cache_requests', 'Search cache lookups', ['result'])
+search_cache_hit_ratio = Gauge('orchestrator_search_cache_hit_ratio', 'Search cache hits / lookups since start')
+search_cache_entries = Gauge('orchestrator_search_cache_entries', 'Search results currently cached')
+
+def normalize_query(text):
+    """Case- and whitespace-insensitive form of a query"""
+    return " ".join(text.lower().split())
+
+def cache_key(query, concept=None, filters=None, limit=10):
+    return json.dumps(
+        [normalize_query(query), concept, filters or {}, limit],
+        sort_keys=True, separators=(",", ":")
+    )
+
+def build_where(concept=None, filters=None):
+    """Weaviate `where` filter: equality on the concept and each filter property"""
+    conditions = dict(filters or {})
+    if concept is not None:
+        conditions["concept"] = concept
+    operands = []
+    for path, value in sorted(conditions.items()):
+        if isinstance(value, bool):
+            value_key = "valueBoolean"
+        elif isinstance(value, int):
+            value_key = "valueInt"
+        elif isinstance(value, float):
+            value_key = "valueNumber"
+        else:
+            value_key = "valueText"
+        operands.append({"path": [path], "operator": "Equal", value_key: value})
+    if not operands:
+        return None
+    return operands[0] if len(operands) == 1 else {"operator": "And", "operands": operands}
+
+class SearchCache:
+    """LRU cache with per-entry TTL, indexed by concept for invalidation
+
+    Each concept has a generation bumped by invalidate(); unscoped results
+    follow a generation bumped by every invalidation. A caller reads
+    generation() before querying and passes it to put(), which skips the
+    results if an invalidation ran in between.
+    """
+
+    def __init__(self, maxsize=1024, ttl=300.0, clock=time.monotonic):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self.clock = clock
+        self.entries = OrderedDict()  # key -> (expires_at, concept, value)
+        self.by_concept = {}
+        self.generations = {}  # concept -> invalidations (None: any invalidation)
+        self.cleared = 0
+        self.hits = 0
+        self.misses = 0
+        self.lock = threading.Lock()
+
+    def get(self, key):
+        with self.lock:
+            entry = self.entries.get(key)
+            if entry is not None and entry[0] <= self.clock():
+                self._remove(key)
+                entry = None
+            if entry is None:
+                self.misses += 1
+                search_cache_requests.labels(result="miss").inc()
+            else:
+                self.hits += 1
+                self.entries.move_to_end(key)
+                search_cache_requests.labels(result="hit").inc()
+            search_cache_hit_ratio.set(self.hits / (self.hits + self.misses))
+            return None if entry is None else entry[2]
+
+    def generation(self, concept=None):
+        """Token that changes whenever cached results for `concept` go stale"""
+        with self.lock:
+            return self.cleared, self.generations.get(concept, 0)
+
+    def put(self, key, value, concept=None, generation=None):
+        """Cache `value`; returns False (and caches nothing) if `generation` is no longer current"""
+        with self.lock:
+            if generation is not None and generation != (self.cleared, self.generations.get(concept, 0)):
+                return False
+            if key in self.entries:
+                self._remove(key)
+            self.entries[key] = (self.clock() + self.ttl, concept, value)
+            self.by_concept.setdefault(concept, set()).add(key)
+            while len(self.entries) > self.maxsize:
+                self._remove(next(iter(self.entries)))
+            search_cache_entries.set(len(self.entries))
+            return True
+
+    def invalidate(self, concept=None):
+        """Drop results for `concept` and unscoped results (which may include it)"""
+        with self.lock:
+            scopes = {None, concept}
+            for scope in scopes:
+                self.generations[scope] = self.generations.get(scope, 0) + 1
+            keys = [k for scope in scopes for k in self.by_concept.get(scope, ())]
+            for key in keys:
+                self._remove(key)
+            search_cache_entries.set(len(self.entries))
+            return len(keys)
+
+    def clear(self):
+        with self.lock:
+            self.entries.clear()
+            self.by_concept.clear()
+            self.cleared += 1
+            search_cache_entries.set(0)
+
+    def _remove(self, key):
+        _, concept, _ = self.entries.pop(key)
+        keys = self.by_concept.get(concept)
+        if keys is not None:
+            keys.discard(key)
+            if not keys:
+                del self.by_concept[concept]
+
+    def __len__(self):
+        return len(self.entries)
+
+class QueryEmbedder:
+    """gte-small loaded once on first use; encoding runs off the event loop"""
+
+    def __init__(self, model_name=MODEL_NAME, executor=None):
+        self.model_name = model_name
+        self.executor = executor or ThreadPoolExecutor(max_workers=2, thread_name_prefix="embed")
+        self._model = None
+        self._lock = threading.Lock()
+
+    def model(self):
+        if self._model is None:
+            with self._lock:
+                if self._model is None:
+                    # Deferred: loading torch + the model takes seconds and is only needed by /search
+                    from sentence_transformers import SentenceTransformer
+                    self._model = SentenceTransformer(self.model_name)
+                    logger.info(f"Loaded embedding model {self.model_name}")
+        return self._model
+
+    def encode(self, text):
+        return self.model().encode(text).tolist()
+
+    async def embed(self, text):
+        return await asyncio.get_running_loop().run_in_executor(self.executor, self.encode, text)
+
+class SearchService:
+    def __init__(self, client, embedder, cache, class_name="ParsedDocument", properties=None):
+        self.client = client
+        self.embedder = embedder
+        self.cache = cache
+        self.class_name = class_name
+        self.properties = properties or DEFAULT_PROPERTIES
+
+    def near_vector(self, vector, where=None, limit=10):
+        """Blocking Weaviate nearVector query"""
+        query = (
+            self.client.query.get(self.class_name, self.properties)
+            .with_near_vector({"vector": vector})
+            .with_limit(limit)
+            .with_additional(["id", "distance"])
+        )
+        if where is not None:
+            query = query.with_where(where)
+        response = query.do()
+        if "errors" in response:
+            raise RuntimeError(f"Weaviate search failed: {response['errors']}")
+        return response["data"]["Get"][self.class_name] or []
+
+    async def search(self, query, concept=None, filters=None, limit=10):
+        """Results for a query, from the cache when possible; returns (results, cached)"""
+        start_time = time.perf_counter()
+        key = cache_key(query, concept, filters, limit)
+        results = self.cache.get(key)
+        cached = results is not None
+        if not cached:
+            # Read before querying: a write landing meanwhile makes these results stale
+            generation = self.cache.generation(concept)
+            vector = await self.embedder.embed(normalize_query(query))
+            results = await asyncio.get_running_loop().run_in_executor(
+                None, self.near_vector, vector, build_where(concept, filters), limit
+            )
+            self.cache.put(key, results, concept=concept, generation=generation)
+        search_latency.labels(cache="hit" if cached else "miss").observe(time.perf_counter() - start_time)
+        return results, cached
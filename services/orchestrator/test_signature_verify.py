@@ -95,5 +95,20 @@ def test_health_check_weaviate_down():
         data = response.json()
         assert data["services"]["weaviate"] == "unhealthy"
 
+@patch('main.weaviate_client')
+def test_verified_claims_not_logged(mock_weaviate, caplog):
+    """Test decoded JWT claims never reach INFO logs"""
+    with patch.dict('os.environ', {'QSTASH_SIGNING_KEY': 'test-key'}):
+        with patch('jwt.decode', return_value={"sub": "test", "secret-claim": "s3cr3t"}):
+            with caplog.at_level("INFO"):
+                response = client.post(
+                    "/api/qstash",
+                    json={"id": "test-456", "url": "https://example.com"},
+                    headers={"Upstash-Signature": "valid.jwt.token"}
+                )
+    
+    assert response.status_code == 200
+    assert "s3cr3t" not in caplog.text
+
 if __name__ == "__main__":
     pytest.main([__file__])
\ No newline at end of file
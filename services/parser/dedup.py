@@ -0,0 +1,191 @@
+#!/usr/bin/env python3
+"""
+Near-duplicate detection: shingled MinHash with LSH banding, indexed in Redis
+
+Word 5-shingles are hashed to 32 bits (each distinct token is hashed once,
+shingles are combined with a vectorized rolling hash) and min-hashed under
+NUM_PERM multiply-shift hash functions in numpy, MINHASH_CHUNK shingles at a
+time so memory stays bounded on long pages. The signature is
+split into BANDS bands; each band hashes to a Redis set of canonical
+document ids, so candidate lookup is one pipelined round trip and every
+parser worker shares the index. Candidates are confirmed by the estimated
+Jaccard similarity of the stored signatures; with 16 bands x 8 rows a pair
+at similarity s becomes a candidate with probability 1 - (1 - s^8)^16
+(0.24 at s=0.6, 0.95 at s=0.8, 0.99 at s=0.85).
+
+    dedup:band:<band>:<hash>  SET of canonical doc ids
+    dedup:sig:<doc_id>        signature bytes (uint32 x NUM_PERM)
+    dedup:stats               HASH docs, duplicates, lookup_us
+
+    python dedup.py stats     # dedup rate and mean lookup cost
+"""
+
+import hashlib
+import json
+import logging
+import os
+import re
+import sys
+import time
+
+import numpy as np
+
+from log_config import SAMPLED
+
+logger = logging.getLogger(__name__)
+
+DEDUP_ENABLED = os.getenv("DEDUP_ENABLED", "true").lower() == "true"
+DEDUP_THRESHOLD = float(os.getenv("DEDUP_THRESHOLD", "0.85"))
+DEDUP_TTL = int(os.getenv("DEDUP_TTL_DAYS", "30")) * 86400
+
+NUM_PERM = 128
+BANDS = 16
+SHINGLE_SIZE = 5
+MINHASH_CHUNK = 1024  # shingles per pass: a 1 MiB (chunk x NUM_PERM uint64) temporary
+_TOKEN = re.compile(r"\w+")
+_ROLL = np.uint64(0x100000001B3)  # FNV-64 prime
+_SHIFT = np.uint64(32)
+
+# Fixed seed: signatures must agree across workers and restarts
+_rng = np.random.RandomState(1)
+_A = (_rng.randint(0, 1 << 62, size=NUM_PERM, dtype=np.uint64) << np.uint64(1)) | np.uint64(1)  # odd
+_B = _rng.randint(0, 1 << 62, size=NUM_PERM, dtype=np.uint64)
+
+def shingle_hashes(text, k=SHINGLE_SIZE):
+    """Distinct 32-bit hashes of the word k-shingles of `text` (lowercased)"""
+    tokens = _TOKEN.findall(text.lower())
+    if not tokens:
+        return np.empty(0, dtype=np.uint64)
+    vocab = {}
+    ids = np.fromiter((vocab.setdefault(t, len(vocab)) for t in tokens), dtype=np.int64, count=len(tokens))
+    token_hashes = np.fromiter(
+        (int.from_bytes(hashlib.blake2b(t.encode(), digest_size=8).digest(), "little") for t in vocab),
+        dtype=np.uint64, count=len(vocab),
+    )
+    sequence = token_hashes[ids]
+    n = max(1, len(sequence) - k + 1)
+    hashes = np.zeros(n, dtype=np.uint64)
+    with np.errstate(over="ignore"):
+        for j in range(min(k, len(sequence))):
+            hashes = hashes * _ROLL + sequence[j:j + n]
+    return np.unique(hashes >> _SHIFT)
+
+def minhash(hashes, chunk=MINHASH_CHUNK):
+    """NUM_PERM-value MinHash signature (uint32) of a set of shingle hashes"""
+    # Multiply-shift: (a*x + b) mod 2^64, top 32 bits; running minimum over
+    # slices so the temporary is chunk x NUM_PERM, not shingles x NUM_PERM
+    signature = np.full(NUM_PERM, np.iinfo(np.uint64).max, dtype=np.uint64)
+    with np.errstate(over="ignore"):
+        for start in range(0, len(hashes), chunk):
+            values = (np.outer(hashes[start:start + chunk], _A) + _B) >> _SHIFT
+            np.minimum(signature, values.min(axis=0), out=signature)
+    return signature.astype(np.uint32)
+
+def similarity(sig_a, sig_b):
+    """Estimated Jaccard similarity of two signatures"""
+    return float(np.mean(sig_a == sig_b))
+
+def band_keys(signature, prefix="dedup"):
+    rows = NUM_PERM // BANDS
+    return [
+        f"{prefix}:band:{band}:{hashlib.blake2b(signature[band * rows:(band + 1) * rows].tobytes(), digest_size=8).hexdigest()}"
+        for band in range(BANDS)
+    ]
+
+def content_id(text):
+    return hashlib.sha1(text.encode()).hexdigest()
+
+class Match:
+    def __init__(self, canonical, similarity):
+        self.canonical = canonical
+        self.similarity = similarity
+
+class DedupIndex:
+    """Shared near-duplicate index; check() either returns the canonical match or indexes the document"""
+
+    def __init__(self, redis, threshold=DEDUP_THRESHOLD, ttl=DEDUP_TTL, prefix="dedup"):
+        self.redis = redis
+        self.threshold = threshold
+        self.ttl = ttl
+        self.prefix = prefix
+
+    def check(self, doc_id, text):
+        """Match for a near-duplicate of an indexed document, else None (and `doc_id` becomes canonical)"""
+        start_time = time.perf_counter()
+        hashes = shingle_hashes(text)
+        if not len(hashes):
+            return None
+        signature = minhash(hashes)
+        keys = band_keys(signature, self.prefix)
+
+        pipe = self.redis.pipeline(transaction=False)
+        for key in keys:
+            pipe.smembers(key)
+        candidates = {c.decode() if isinstance(c, bytes) else c for c in set().union(*pipe.execute())}
+        candidates.discard(doc_id)
+        match = self._best(candidates, signature)
+
+        pipe = self.redis.pipeline(transaction=False)
+        if match is None:
+            for key in keys:
+                pipe.sadd(key, doc_id)
+                pipe.expire(key, self.ttl)
+            pipe.set(f"{self.prefix}:sig:{doc_id}", signature.tobytes(), ex=self.ttl)
+        lookup_us = int((time.perf_counter() - start_time) * 1e6)
+        stats = f"{self.prefix}:stats"
+        pipe.hincrby(stats, "docs", 1)
+        pipe.hincrby(stats, "duplicates", int(match is not None))
+        pipe.hincrby(stats, "lookup_us", lookup_us)
+        pipe.execute()
+
+        logger.info("Dedup lookup for %s: %d candidate(s), %s in %dus", doc_id, len(candidates),
+                    f"duplicate of {match.canonical} ({match.similarity:.2f})" if match else "canonical",
+                    lookup_us, extra={**SAMPLED, "lookup_us": lookup_us})
+        return match
+
+    def _best(self, candidates, signature):
+        if not candidates:
+            return None
+        candidates = sorted(candidates)
+        stored = self.redis.mget([f"{self.prefix}:sig:{c}" for c in candidates])
+        best = None
+        for candidate, raw in zip(candidates, stored):
+            if raw is None:
+                continue  # expired signature; its band entries age out too
+            score = similarity(signature, np.frombuffer(raw, dtype=np.uint32))
+            if score >= self.threshold and (best is None or score > best.similarity):
+                best = Match(candidate, score)
+        return best
+
+    def stats(self):
+        """Documents checked, dedup rate and mean lookup cost (ms)"""
+        raw = {k.decode() if isinstance(k, bytes) else k: int(v)
+               for k, v in self.redis.hgetall(f"{self.prefix}:stats").items()}
+        docs = raw.get("docs", 0)
+        return {
+            "docs": docs,
+            "duplicates": raw.get("duplicates", 0),
+            "dedup_rate": raw.get("duplicates", 0) / docs if docs else 0.0,
+            "mean_lookup_ms": raw.get("lookup_us", 0) / docs / 1000 if docs else 0.0,
+        }
+
+def dedup_from_env():
+    """Index on REDIS_URL, or None when disabled or Redis is unreachable (documents are then all embedded)"""
+    redis_url = os.getenv("REDIS_URL")
+    if not DEDUP_ENABLED or not redis_url:
+        return None
+    import redis
+
+    client = redis.Redis.from_url(redis_url, socket_timeout=2)
+    try:
+        client.ping()
+    except redis.RedisError as e:
+        logger.warning(f"Near-duplicate detection disabled, Redis unavailable: {e}")
+        return None
+    return DedupIndex(client)
+
+if __name__ == "__main__":
+    index = dedup_from_env()
+    if index is None or sys.argv[1:] != ["stats"]:
+        sys.exit("usage: REDIS_URL=... python dedup.py stats")
+    print(json.dumps(index.stats(), indent=2))
@@ -1,34 +1,29 @@
 #!/usr/bin/env python3
 """
 Parser service main entry point
-Processes content with Polars and generates embeddings
+Processes content with Polars and generates embeddings; off-topic pages are
+skipped by the relevance prefilter and near-duplicates of an already parsed
+page are linked to it instead of being embedded again
 """
 
+import argparse
 import sys
 import logging
-import re
 from datetime import datetime
+import msgspec
 import polars as pl
-from sentence_transformers import SentenceTransformer
 
-logging.basicConfig(level=logging.INFO)
-logger = logging.getLogger(__name__)
-
-# Initialize the sentence transformer model
-model = SentenceTransformer("thenlper/gte-small")
+from dedup import content_id, dedup_from_env
+from log_config import SAMPLED, setup_logging
+from messages import ParseResult, encode, to_dict
+from page_text import get_model, strip_tags
+from prefilter import prefilter_from_env
+from tracing import setup_tracing, span
 
-def strip_tags(html_content: str) -> str:
-    """Remove HTML tags from content"""
-    # Simple HTML tag removal
-    clean = re.compile('<.*?>')
-    text = re.sub(clean, '', html_content)
-    
-    # Clean up whitespace
-    text = re.sub(r'\s+', ' ', text).strip()
-    return text
+logger = logging.getLogger(__name__)
 
-def process_content(html_content: str) -> dict:
-    """Process HTML content and generate embeddings"""
+def process_content(html_content: str, dedup=None, doc_id=None, prefilter=None) -> dict:
+    """Process HTML content and generate embeddings (or skip it, or link to the canonical near-duplicate)"""
     # Strip HTML tags
     text = strip_tags(html_content)
     
@@ -36,24 +31,73 @@ def process_content(html_content: str) -> dict:
         logger.warning("Empty text after HTML stripping")
         text = "No content"
     
+    relevance = None
+    if prefilter is not None:
+        # Before dedup too: a skipped page must not become a canonical document
+        with span("parser.prefilter"):
+            verdict = prefilter.check(text)
+        if not verdict.keep:
+            result = {
+                "text": text,
+                "processed_at": datetime.utcnow().isoformat(),
+                "text_length": len(text),
+                "skipped": verdict.reason,
+                "relevance": verdict.score,
+            }
+            if doc_id is not None:
+                result["doc_id"] = doc_id
+            return result
+        relevance = verdict.score
+    
+    if dedup is not None:
+        doc_id = doc_id or content_id(text)
+        try:
+            with span("parser.dedup"):
+                match = dedup.check(doc_id, text)
+        except Exception as e:
+            logger.warning(f"Near-duplicate lookup failed, embedding anyway: {e}")
+            match = None
+        if match is not None:
+            return {
+                "text": text,
+                "processed_at": datetime.utcnow().isoformat(),
+                "text_length": len(text),
+                "doc_id": doc_id,
+                "duplicate_of": match.canonical,
+                "similarity": match.similarity,
+            }
+    
     # Generate embedding
     try:
-        embedding = model.encode(text).tolist()
-        logger.info(f"Generated embedding with {len(embedding)} dimensions")
+        with span("parser.encode", chars=len(text)):
+            embedding = get_model().encode(text).tolist()
+        logger.info("Generated embedding with %d dimensions", len(embedding), extra=SAMPLED)
     except Exception as e:
         logger.error(f"Failed to generate embedding: {e}")
         # Fallback to zero vector
         embedding = [0.0] * 384  # gte-small has 384 dimensions
     
-    return {
+    result = {
         "text": text,
         "embedding": embedding,
         "processed_at": datetime.utcnow().isoformat(),
         "text_length": len(text)
     }
+    if doc_id is not None:
+        result["doc_id"] = doc_id
+    if relevance is not None:
+        result["relevance"] = relevance
+    return result
 
-def main():
+def main(argv=None):
     """Main parser service entry point"""
+    parser = argparse.ArgumentParser(description="Parse HTML from stdin into an Arrow IPC row (or NDJSON)")
+    parser.add_argument("--url", help="Source URL (doc id for near-duplicate linking)")
+    parser.add_argument("--concept")
+    parser.add_argument("--trace-id", help="Trace id of the crawl message (carried into the Arrow row)")
+    parser.add_argument("--format", choices=["arrow", "ndjson"], default="arrow",
+                        help="ndjson: one JSON result per line, as accepted by the orchestrator's /api/documents")
+    args = parser.parse_args(argv)
     logger.info("Starting parser service...")
     
     try:
@@ -64,22 +108,32 @@ def main():
             logger.error("No input content received")
             sys.exit(1)
         
-        logger.info(f"Processing {len(html_content)} characters of HTML content")
-        
-        # Process the content
-        processed_data = process_content(html_content)
+        logger.info("Processing %d characters of HTML content", len(html_content), extra=SAMPLED)
         
-        # Create Polars DataFrame
-        df = pl.DataFrame([processed_data])
+        # Process the content and validate it (embedding dimension, types)
+        with span("parser.parse", args.trace_id, chars=len(html_content)):
+            fields = process_content(html_content, dedup=dedup_from_env(), doc_id=args.url,
+                                     prefilter=prefilter_from_env())
+        result = msgspec.convert({**fields, "url": args.url, "concept": args.concept, "trace_id": args.trace_id},
+                                 ParseResult)
         
-        # Write to stdout as Arrow IPC stream
-        df.write_ipc_stream(sys.stdout.buffer)
+        if args.format == "ndjson":
+            sys.stdout.buffer.write(encode(result) + b"\n")
+            sys.stdout.buffer.flush()
+        else:
+            # Create Polars DataFrame
+            df = pl.DataFrame([to_dict(result)])
+            
+            # Write to stdout as Arrow IPC stream
+            df.write_ipc_stream(sys.stdout.buffer)
         
-        logger.info("Successfully processed content and wrote Arrow IPC stream")
+        logger.info("Successfully processed content and wrote %s output", args.format, extra=SAMPLED)
         
     except Exception as e:
         logger.error(f"Parser failed: {e}")
         sys.exit(1)
 
 if __name__ == "__main__":
+    setup_logging("parser")
+    setup_tracing("parser")
     main()
\ No newline at end of file
@@ -0,0 +1,30 @@
+#!/usr/bin/env python3
+"""
+Page text and the gte-small model shared by the parser and its benchmarks
+
+Kept out of main.py so tools and tests can import it by a name no other
+service uses (each service has its own `main`).
+"""
+
+import re
+
+MODEL_NAME = "thenlper/gte-small"
+_model = None
+
+def get_model():
+    """Sentence transformer, loaded on first use (importing torch takes seconds)"""
+    global _model
+    if _model is None:
+        from sentence_transformers import SentenceTransformer
+        _model = SentenceTransformer(MODEL_NAME)
+    return _model
+
+def strip_tags(html_content: str) -> str:
+    """Remove HTML tags from content"""
+    # Simple HTML tag removal
+    clean = re.compile('<.*?>')
+    text = re.sub(clean, ' ', html_content)
+    
+    # Clean up whitespace
+    text = re.sub(r'\s+', ' ', text).strip()
+    return text
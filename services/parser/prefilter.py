@@ -0,0 +1,254 @@
+#!/usr/bin/env python3
+"""
+Relevance prefilter: skip pages not worth a transformer pass before model.encode
+
+Checks run cheapest first and the first failing one is the skip reason:
+
+    boilerplate    share of words in login-wall / cookie-banner phrases > PREFILTER_MAX_BOILERPLATE
+    too_short      fewer than PREFILTER_MIN_WORDS words
+    language       stopwords say the page is not in PREFILTER_LANGUAGES
+    low_relevance  keyword model score < PREFILTER_THRESHOLD
+
+The keyword model is linear over hashed unigram and bigram features (no
+vocabulary lookup per document): each term's count per 100 words, capped,
+times its weight, plus a bias, through a sigmoid. Weights come from a small
+vocabulary, DEFAULT_WEIGHTS or the JSON file at PREFILTER_VOCAB:
+
+    {"bias": -2.0, "weights": {"backtest": 1.2, "moving average": 1.2, "cookie": -1.0}}
+
+Counts go to the prefilter:stats hash (docs, skipped, skipped:<reason>,
+filter_us) when Redis is available.
+
+    python prefilter.py stats     # skip rate per reason and mean filter cost
+"""
+
+import json
+import logging
+import math
+import os
+import re
+import sys
+import time
+import zlib
+
+import numpy as np
+
+from log_config import SAMPLED
+
+logger = logging.getLogger(__name__)
+
+PREFILTER_ENABLED = os.getenv("PREFILTER_ENABLED", "true").lower() == "true"
+PREFILTER_THRESHOLD = float(os.getenv("PREFILTER_THRESHOLD", "0.5"))
+PREFILTER_MIN_WORDS = int(os.getenv("PREFILTER_MIN_WORDS", "40"))
+PREFILTER_MAX_BOILERPLATE = float(os.getenv("PREFILTER_MAX_BOILERPLATE", "0.3"))
+PREFILTER_LANGUAGES = tuple(os.getenv("PREFILTER_LANGUAGES", "en").split(","))
+PREFILTER_VOCAB = os.getenv("PREFILTER_VOCAB")
+
+N_FEATURES = 1 << 18
+DENSITY_CAP = 5.0  # per 100 words; keyword stuffing saturates
+_TOKEN = re.compile(r"\w+")
+_MIX = np.uint64(0x9E3779B1)
+_MASK = np.uint64(0xFFFFFFFF)
+
+DEFAULT_BIAS = -2.0
+DEFAULT_WEIGHTS = {
+    "trading": 1.0, "trader": 0.8, "traders": 0.8, "strategy": 0.8, "strategies": 0.8,
+    "backtest": 1.2, "backtesting": 1.2, "indicator": 1.0, "indicators": 1.0, "moving average": 1.2,
+    "rsi": 1.0, "macd": 1.0, "momentum": 0.8, "volatility": 0.8, "portfolio": 0.8, "sharpe": 1.2,
+    "drawdown": 1.2, "stop loss": 1.0, "position": 0.5, "risk": 0.5, "market": 0.5, "markets": 0.5,
+    "price": 0.5, "prices": 0.5, "stock": 0.6, "stocks": 0.6, "futures": 0.8, "forex": 0.8, "crypto": 0.6,
+    "bitcoin": 0.6, "signal": 0.6, "signals": 0.6, "pinescript": 1.2, "pine script": 1.2,
+    "candlestick": 1.0, "breakout": 0.8, "mean reversion": 1.2, "arbitrage": 1.0, "hedge": 0.6,
+    "returns": 0.5, "equity": 0.6, "liquidity": 0.6, "order book": 1.0,
+    "cookie": -1.0, "cookies": -1.0, "consent": -0.8, "login": -1.0, "password": -1.0,
+    "username": -0.8, "newsletter": -0.6, "javascript": -0.8, "captcha": -1.2, "recipe": -1.0,
+}
+
+BOILERPLATE_PHRASES = (
+    "accept all cookies", "we use cookies", "cookie policy", "cookie settings", "manage preferences",
+    "sign in", "sign up", "log in", "create an account", "forgot your password", "remember me",
+    "enable javascript", "verify you are human", "access denied", "subscribe to continue",
+    "privacy policy", "terms of service", "all rights reserved", "page not found",
+)
+_BOILERPLATE = re.compile(r"\b(?:" + "|".join(re.escape(p) for p in BOILERPLATE_PHRASES) + r")\b")
+
+STOPWORDS = {
+    "en": "the and of to is in that for with you this are on it as be was by not or",
+    "de": "der die und das ist nicht mit ein eine zu den von sie auf für im dem des sich auch",
+    "fr": "le la les et des est une pour que dans pas du qui sur avec au ce sont par il",
+    "es": "el la los las y que de en una por para con es del se al lo como más su",
+    "it": "il di che e la per una sono non con del della gli le un si da al nel è",
+    "pt": "o a os de que e do da em um uma para com não é no na se por mais",
+    "nl": "de het een en van is dat niet op met voor zijn te die er ook als bij",
+}
+_STOPWORDS = {language: frozenset(words.split()) for language, words in STOPWORDS.items()}
+MIN_STOPWORD_SHARE = 0.08
+
+def _token_hashes(tokens):
+    """crc32 of each token (each distinct token hashed once)"""
+    vocab = {}
+    ids = np.fromiter((vocab.setdefault(t, len(vocab)) for t in tokens), dtype=np.int64, count=len(tokens))
+    hashes = np.fromiter((zlib.crc32(t.encode()) for t in vocab), dtype=np.uint64, count=len(vocab))
+    return hashes[ids]
+
+def hashed_features(tokens, n_features=N_FEATURES):
+    """Feature index of every unigram and bigram in `tokens`"""
+    hashes = _token_hashes(tokens)
+    with np.errstate(over="ignore"):
+        bigrams = (hashes[:-1] * _MIX + hashes[1:]) & _MASK
+    return (np.concatenate([hashes, bigrams]) % np.uint64(n_features)).astype(np.int64)
+
+def term_feature(term, n_features=N_FEATURES):
+    """Feature index of a vocabulary term (a word or a two-word phrase)"""
+    words = _TOKEN.findall(term.lower())
+    if len(words) not in (1, 2):
+        raise ValueError(f"Vocabulary terms are one or two words, got {term!r}")
+    features = hashed_features(words, n_features)
+    return int(features[-1])
+
+def detect_language(tokens):
+    """(language, stopword share) of the best-matching stopword list; ("unknown", share) below MIN_STOPWORD_SHARE"""
+    if not tokens:
+        return "unknown", 0.0
+    shares = {language: sum(t in words for t in tokens) / len(tokens) for language, words in _STOPWORDS.items()}
+    language = max(shares, key=shares.get)
+    if shares[language] < MIN_STOPWORD_SHARE:
+        return "unknown", shares[language]
+    return language, shares[language]
+
+def boilerplate_share(text):
+    """Share of words inside boilerplate phrases (text lowercased)"""
+    words = len(_TOKEN.findall(text))
+    if not words:
+        return 0.0
+    covered = sum(len(match.split()) for match in _BOILERPLATE.findall(text))
+    return covered / words
+
+class Verdict:
+    def __init__(self, keep, reason=None, score=None, language=None):
+        self.keep = keep
+        self.reason = reason
+        self.score = score
+        self.language = language
+
+class Prefilter:
+    """Cheap relevance gate in front of model.encode; check() returns a Verdict and counts skips"""
+
+    def __init__(self, weights=None, bias=DEFAULT_BIAS, threshold=PREFILTER_THRESHOLD, min_words=PREFILTER_MIN_WORDS,
+                 max_boilerplate=PREFILTER_MAX_BOILERPLATE, languages=PREFILTER_LANGUAGES, n_features=N_FEATURES,
+                 redis=None, prefix="prefilter"):
+        weights = DEFAULT_WEIGHTS if weights is None else weights
+        self.bias = bias
+        self.threshold = threshold
+        self.min_words = min_words
+        self.max_boilerplate = max_boilerplate
+        self.languages = set(languages)
+        self.n_features = n_features
+        self.redis = redis
+        self.prefix = prefix
+        self.counts = {"docs": 0, "skipped": 0}
+        # Terms sharing a bucket add up, as they would in a trained hashed model
+        model = {}
+        for term, weight in weights.items():
+            feature = term_feature(term, n_features)
+            model[feature] = model.get(feature, 0.0) + weight
+        features = sorted(model)
+        self.features = np.array(features, dtype=np.int64)
+        self.weights = np.array([model[f] for f in features], dtype=np.float64)
+
+    @classmethod
+    def from_vocab_file(cls, path, **options):
+        with open(path) as f:
+            vocab = json.load(f)
+        return cls(weights=vocab["weights"], bias=vocab.get("bias", DEFAULT_BIAS), **options)
+
+    def score(self, tokens):
+        """Relevance in [0, 1] from capped keyword densities"""
+        # Only the model's features matter: look them up instead of counting all n_features buckets
+        doc = hashed_features(tokens, self.n_features)
+        slots = np.minimum(np.searchsorted(self.features, doc), len(self.features) - 1)
+        counts = np.bincount(slots[self.features[slots] == doc], minlength=len(self.features))
+        density = np.minimum(counts * 100.0 / len(tokens), DENSITY_CAP)
+        logit = self.bias + float(density @ self.weights)
+        return 1.0 / (1.0 + math.exp(-logit))
+
+    def verdict(self, text):
+        text = text.lower()
+        if boilerplate_share(text) > self.max_boilerplate:
+            return Verdict(False, "boilerplate")
+        tokens = _TOKEN.findall(text)
+        if len(tokens) < self.min_words:
+            return Verdict(False, "too_short")
+        language, _ = detect_language(tokens)
+        if language != "unknown" and language not in self.languages:
+            return Verdict(False, "language", language=language)
+        score = self.score(tokens)
+        if score < self.threshold:
+            return Verdict(False, "low_relevance", score=score, language=language)
+        return Verdict(True, score=score, language=language)
+
+    def check(self, text):
+        """Verdict for a page's text; counted locally and in Redis"""
+        start_time = time.perf_counter()
+        verdict = self.verdict(text)
+        filter_us = int((time.perf_counter() - start_time) * 1e6)
+
+        self.counts["docs"] += 1
+        if not verdict.keep:
+            self.counts["skipped"] += 1
+            self.counts[f"skipped:{verdict.reason}"] = self.counts.get(f"skipped:{verdict.reason}", 0) + 1
+        if self.redis is not None:
+            try:
+                pipe = self.redis.pipeline(transaction=False)
+                stats = f"{self.prefix}:stats"
+                pipe.hincrby(stats, "docs", 1)
+                pipe.hincrby(stats, "filter_us", filter_us)
+                if not verdict.keep:
+                    pipe.hincrby(stats, "skipped", 1)
+                    pipe.hincrby(stats, f"skipped:{verdict.reason}", 1)
+                pipe.execute()
+            except Exception as e:
+                logger.warning(f"Prefilter stats not recorded: {e}")
+
+        logger.info("Prefilter %s (%s, score %s) in %dus", "kept" if verdict.keep else "skipped",
+                    verdict.reason or "relevant", f"{verdict.score:.2f}" if verdict.score is not None else "-",
+                    filter_us, extra={**SAMPLED, "filter_us": filter_us})
+        return verdict
+
+    def stats(self):
+        """Documents checked, skip rate (overall and per reason) and mean filter cost (ms)"""
+        raw = {k.decode() if isinstance(k, bytes) else k: int(v)
+               for k, v in self.redis.hgetall(f"{self.prefix}:stats").items()}
+        docs = raw.get("docs", 0)
+        return {
+            "docs": docs,
+            "skipped": raw.get("skipped", 0),
+            "skip_rate": raw.get("skipped", 0) / docs if docs else 0.0,
+            "by_reason": {k.split(":", 1)[1]: v for k, v in raw.items() if k.startswith("skipped:")},
+            "mean_filter_ms": raw.get("filter_us", 0) / docs / 1000 if docs else 0.0,
+        }
+
+def prefilter_from_env():
+    """Prefilter from PREFILTER_* (stats in Redis when REDIS_URL answers), or None when disabled"""
+    if not PREFILTER_ENABLED:
+        return None
+    client = None
+    redis_url = os.getenv("REDIS_URL")
+    if redis_url:
+        import redis
+
+        client = redis.Redis.from_url(redis_url, socket_timeout=2)
+        try:
+            client.ping()
+        except redis.RedisError as e:
+            logger.warning(f"Prefilter stats disabled, Redis unavailable: {e}")
+            client = None
+    if PREFILTER_VOCAB:
+        return Prefilter.from_vocab_file(PREFILTER_VOCAB, redis=client)
+    return Prefilter(redis=client)
+
+if __name__ == "__main__":
+    prefilter = prefilter_from_env()
+    if prefilter is None or prefilter.redis is None or sys.argv[1:] != ["stats"]:
+        sys.exit("usage: REDIS_URL=... python prefilter.py stats")
+    print(json.dumps(prefilter.stats(), indent=2))
@@ -0,0 +1,114 @@
+#!/usr/bin/env python3
+"""
+Validator runtime - one-time backend probe, lazy heavy imports and JIT warm-up
+
+CuPy, vectorbt and yfinance are imported only when first needed, the GPU
+probe runs once per process, and warm_up() pays Numba compile (or cache-load)
+cost at startup so it never lands inside a measured backtest.
+"""
+
+import logging
+import time
+
+logger = logging.getLogger(__name__)
+
+_backend = None
+_vectorbt = None
+_warmed = set()
+
+
+def detect_gpu():
+    """Detect GPU availability and fallback to CPU if needed"""
+    try:
+        import cupy as cp
+        device_count = cp.cuda.runtime.getDeviceCount()
+        if device_count > 0:
+            logger.info(f"GPU detected: {device_count} device(s)")
+            return "gpu"
+    except ImportError:
+        logger.warning("CuPy not installed")
+    except Exception as e:
+        logger.warning(f"GPU not available: {e}")
+
+    logger.info("Falling back to CPU")
+    return "cpu"
+
+
+def get_backend(refresh=False):
+    """Backend probed once per process; pass refresh=True to probe again"""
+    global _backend
+    if _backend is None or refresh:
+        _backend = detect_gpu()
+    return _backend
+
+
+def load_vectorbt():
+    """Import vectorbt on first use (after NUMBA_CACHE_DIR is configured)"""
+    global _vectorbt
+    if _vectorbt is None:
+        import cpu_engine  # noqa: F401 - sets NUMBA_CACHE_DIR before numba loads
+        import vectorbt
+
+        _vectorbt = vectorbt
+    return _vectorbt
+
+
+def is_warm(engine):
+    """Whether warm_up() already compiled the kernels for `engine`"""
+    return engine in _warmed
+
+
+def _warm_numba():
+    import cpu_engine
+
+    return cpu_engine.warmup()
+
+
+def _warm_vectorbt():
+    import numpy as np
+    import pandas as pd
+
+    vbt = load_vectorbt()
+    price = pd.Series([1.0, 2.0, 1.5, 3.0], index=pd.date_range("2024-01-01", periods=4, freq="D"))
+    start_time = time.perf_counter()
+    portfolio = vbt.Portfolio.from_holding(price, init_cash=100, freq="1D")
+    portfolio.total_return(), portfolio.sharpe_ratio(), portfolio.max_drawdown()
+    entries = pd.Series(np.array([True, False, False, False]), index=price.index)
+    portfolio = vbt.Portfolio.from_signals(price, entries, ~entries, init_cash=100, freq="1D")
+    portfolio.total_return(), portfolio.trades.count()
+    return time.perf_counter() - start_time
+
+
+WARMERS = {
+    "numba": _warm_numba,
+    "vectorbt": _warm_vectorbt,
+}
+
+
+def warm_up(engines=("vectorbt",)):
+    """Probe the backend, import and compile the requested engines; returns cold-start timings"""
+    report = {"warmup": {}}
+    cold_start = time.perf_counter()
+
+    start_time = time.perf_counter()
+    report["backend"] = get_backend()
+    report["probe_time"] = time.perf_counter() - start_time
+
+    if "vectorbt" in engines:
+        start_time = time.perf_counter()
+        load_vectorbt()
+        report["import_time"] = time.perf_counter() - start_time
+
+    for engine in engines:
+        if engine not in WARMERS:
+            raise ValueError(f"Unknown engine: {engine}")
+        report["warmup"][engine] = WARMERS[engine]()
+        _warmed.add(engine)
+
+    report["cold_start_time"] = time.perf_counter() - cold_start
+    logger.info(
+        f"Validator warm-up: backend={report['backend']} "
+        + " ".join(f"{name}={seconds:.2f}s" for name, seconds in report["warmup"].items())
+        + f" cold_start={report['cold_start_time']:.2f}s"
+    )
+    return report
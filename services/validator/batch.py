@@ -0,0 +1,213 @@
+#!/usr/bin/env python3
+"""
+Multi-symbol batched backtests - symbols sharing a trading calendar are aligned
+into one wide price frame per group and groups are spread across a process pool
+"""
+
+import logging
+import math
+import multiprocessing
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from datetime import datetime
+
+import pandas as pd
+
+logger = logging.getLogger(__name__)
+
+
+def available_cores():
+    """CPU cores this process may run on (respects container CPU affinity)"""
+    try:
+        return len(os.sched_getaffinity(0))
+    except AttributeError:
+        return os.cpu_count() or 1
+
+
+def pool_context():
+    """Fork-safe start method: warmed Numba thread pools must not be forked"""
+    methods = multiprocessing.get_all_start_methods()
+    return multiprocessing.get_context("forkserver" if "forkserver" in methods else "spawn")
+
+
+def download_close(symbol, period="1y"):
+    """Download daily closes for one symbol from yfinance"""
+    import yfinance as yf
+
+    data = yf.download(symbol, period=period, progress=False)
+    if data.empty:
+        raise ValueError(f"No data available for {symbol}")
+
+    close = data["Close"]
+    if isinstance(close, pd.DataFrame):
+        close = close.iloc[:, 0]
+    return close
+
+
+def fetch_prices(symbols, fetch=download_close, period="1y"):
+    """Fetch closes per symbol, collecting failures instead of raising"""
+    prices, errors = {}, {}
+    for symbol in symbols:
+        try:
+            close = fetch(symbol, period)
+            if close is None or close.dropna().empty:
+                raise ValueError(f"No data available for {symbol}")
+            prices[symbol] = close
+        except Exception as e:
+            logger.warning(f"Skipping {symbol}: {e}")
+            errors[symbol] = str(e)
+    return prices, errors
+
+
+def group_by_calendar(prices):
+    """Split {symbol: close} into groups that share the same bars
+
+    Equities next to crypto would otherwise get forward-filled weekend bars
+    with zero return, changing their Sharpe and volatility; each group is
+    backtested in its own column-wise call instead.
+    """
+    groups = {}
+    for symbol, close in prices.items():
+        groups.setdefault(close.index.asi8.tobytes(), {})[symbol] = close
+    return list(groups.values())
+
+
+def align_prices(prices):
+    """Align per-symbol closes on the union of their dates as one wide frame
+
+    Gaps inside a series are forward-filled; leading NaNs are kept so
+    vectorbt enters each column on its own first valid bar. Callers pass
+    one calendar group (see group_by_calendar) so the union adds no bars.
+    """
+    if not prices:
+        return pd.DataFrame()
+    wide = pd.concat(prices, axis=1).sort_index()
+    wide.columns.name = "symbol"
+    return wide.ffill().astype(float)
+
+
+def _group_metrics(wide, initial_cash, freq, engine):
+    """Per-column buy-and-hold metrics for an aligned price frame"""
+    if engine == "numba":
+        from cpu_engine import holding_metrics
+
+        return holding_metrics(wide, init_cash=initial_cash, freq=freq)
+
+    from backend import load_vectorbt
+
+    vbt = load_vectorbt()
+
+    portfolio = vbt.Portfolio.from_holding(wide, init_cash=initial_cash, freq=freq)
+    return pd.DataFrame({
+        "total_return": portfolio.total_return(),
+        "sharpe_ratio": portfolio.sharpe_ratio(),
+        "max_drawdown": portfolio.max_drawdown(),
+        "final_value": portfolio.final_value(),
+        "trades_count": portfolio.orders.count(),
+    })
+
+
+def backtest_group(symbols, initial_cash=10000, period="1y", freq="1D", fetch=download_close,
+                   engine="vectorbt"):
+    """Fetch and backtest one group of symbols, one column-wise call per trading calendar"""
+    prices, errors = fetch_prices(symbols, fetch=fetch, period=period)
+    if not prices:
+        return [], errors
+
+    start_time = time.perf_counter()
+    metrics = pd.concat([
+        _group_metrics(align_prices(calendar), initial_cash, freq, engine)
+        for calendar in group_by_calendar(prices)
+    ])
+    computation_time = time.perf_counter() - start_time
+
+    stamp = datetime.now().strftime('%Y%m%d_%H%M%S')
+    results = []
+    for symbol in prices:
+        try:
+            row = metrics.loc[symbol]
+            results.append({
+                "portfolio_id": f"{symbol}_{stamp}",
+                "symbol": symbol,
+                "initial_cash": initial_cash,
+                "final_value": float(row["final_value"]),
+                "total_return": float(row["total_return"]),
+                "sharpe_ratio": float(row["sharpe_ratio"]) if pd.notna(row["sharpe_ratio"]) else 0.0,
+                "max_drawdown": float(row["max_drawdown"]),
+                "trades_count": int(row["trades_count"]),
+                "gpu_accelerated": False,
+                "engine": engine,
+                "computation_time": computation_time / len(prices),
+                "processed_at": datetime.utcnow().isoformat()
+            })
+        except Exception as e:
+            logger.warning(f"Metrics failed for {symbol}: {e}")
+            errors[symbol] = str(e)
+
+    return results, errors
+
+
+def chunk_symbols(symbols, groups):
+    """Split symbols into at most `groups` contiguous, roughly equal groups"""
+    size = max(1, math.ceil(len(symbols) / max(1, groups)))
+    return [symbols[i:i + size] for i in range(0, len(symbols), size)]
+
+
+def run_batch_backtest(symbols, initial_cash=10000, period="1y", freq="1D",
+                       max_workers=None, group_size=None, fetch=download_close, engine="vectorbt"):
+    """Backtest many symbols; per-symbol failures are reported, never raised"""
+    symbols = list(dict.fromkeys(symbols))
+    if not symbols:
+        raise ValueError("No symbols to backtest")
+
+    if max_workers is None:
+        max_workers = available_cores()
+    max_workers = max(1, min(max_workers, len(symbols)))
+
+    if group_size:
+        groups = [symbols[i:i + group_size] for i in range(0, len(symbols), group_size)]
+    else:
+        groups = chunk_symbols(symbols, max_workers)
+
+    start_time = time.perf_counter()
+    results, errors = [], {}
+
+    if max_workers == 1 or len(groups) == 1:
+        for group in groups:
+            group_results, group_errors = backtest_group(group, initial_cash, period, freq, fetch, engine)
+            results.extend(group_results)
+            errors.update(group_errors)
+    else:
+        with ProcessPoolExecutor(max_workers=min(max_workers, len(groups)), mp_context=pool_context()) as pool:
+            futures = {
+                pool.submit(backtest_group, group, initial_cash, period, freq, fetch, engine): group
+                for group in groups
+            }
+            for future in as_completed(futures):
+                group = futures[future]
+                try:
+                    group_results, group_errors = future.result()
+                except Exception as e:
+                    logger.error(f"Backtest group {group} failed: {e}")
+                    group_results, group_errors = [], {symbol: str(e) for symbol in group}
+                results.extend(group_results)
+                errors.update(group_errors)
+
+    computation_time = time.perf_counter() - start_time
+    order = {symbol: i for i, symbol in enumerate(symbols)}
+    results.sort(key=lambda r: order[r["symbol"]])
+
+    logger.info(
+        f"Batch backtest: {len(results)}/{len(symbols)} symbols in {len(groups)} group(s) "
+        f"on {max_workers} worker(s) in {computation_time:.2f}s"
+    )
+    return {
+        "results": results,
+        "errors": errors,
+        "symbols": len(symbols),
+        "groups": len(groups),
+        "workers": max_workers,
+        "computation_time": computation_time,
+        "symbols_per_sec": len(symbols) / computation_time if computation_time > 0 else float("inf"),
+    }
@@ -0,0 +1,102 @@
+#!/usr/bin/env python3
+"""
+Benchmark the Numba CPU engine against vectorbt on a synthetic price frame
+
+Reports what actually executed (engine, device, threads, threading layer,
+Numba cache hits/misses) and separates JIT compile / cache-load time from
+steady-state run time. Run it twice to see the effect of NUMBA_CACHE_DIR.
+
+    python bench_engine.py --bars 365 --columns 2000 --repeat 5
+"""
+
+import argparse
+import json
+import statistics
+import time
+
+# Imported first so NUMBA_CACHE_DIR is set before vectorbt pulls in numba
+import cpu_engine
+
+import numpy as np
+import pandas as pd
+
+
+def synthetic_prices(bars, columns, seed=0):
+    """Random-walk closes, one column per simulated symbol"""
+    rng = np.random.default_rng(seed)
+    values = 100 * np.cumprod(1 + rng.normal(0.0003, 0.02, (bars, columns)), axis=0)
+    index = pd.date_range("2020-01-01", periods=bars, freq="D")
+    return pd.DataFrame(values, index=index)
+
+
+def time_calls(fn, repeat):
+    """First-call time plus median of `repeat` further calls"""
+    start_time = time.perf_counter()
+    fn()
+    first_call = time.perf_counter() - start_time
+
+    timings = []
+    for _ in range(repeat):
+        start_time = time.perf_counter()
+        fn()
+        timings.append(time.perf_counter() - start_time)
+    return first_call, statistics.median(timings)
+
+
+def run_benchmark(bars=365, columns=1000, repeat=5, include_vectorbt=True):
+    """Time both engines and return a JSON-serialisable report"""
+    price = synthetic_prices(bars, columns)
+
+    jit_time = cpu_engine.warmup()
+    first_call, steady = time_calls(lambda: cpu_engine.holding_metrics(price, 10000), repeat)
+    report = {
+        "bars": bars,
+        "columns": columns,
+        "numba": {
+            **cpu_engine.engine_info(),
+            "jit_compile_time": jit_time,
+            "first_call_time": first_call,
+            "steady_state_time": steady,
+            "columns_per_sec": columns / steady if steady > 0 else None,
+        },
+    }
+
+    if include_vectorbt:
+        import_start = time.perf_counter()
+        import vectorbt as vbt
+        import_time = time.perf_counter() - import_start
+
+        def run_vectorbt():
+            portfolio = vbt.Portfolio.from_holding(price, init_cash=10000, freq="1D")
+            return portfolio.total_return(), portfolio.sharpe_ratio(), portfolio.max_drawdown()
+
+        first_call, steady = time_calls(run_vectorbt, repeat)
+        report["vectorbt"] = {
+            "engine": "vectorbt",
+            "device": "cpu",
+            "version": vbt.__version__,
+            "import_time": import_time,
+            # vectorbt compiles lazily, so its JIT cost is inside the first call
+            "first_call_time": first_call,
+            "steady_state_time": steady,
+            "columns_per_sec": columns / steady if steady > 0 else None,
+        }
+        report["speedup"] = report["vectorbt"]["steady_state_time"] / report["numba"]["steady_state_time"]
+
+    return report
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("--bars", type=int, default=365)
+    parser.add_argument("--columns", type=int, default=1000)
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument("--skip-vectorbt", action="store_true")
+    args = parser.parse_args()
+
+    report = run_benchmark(args.bars, args.columns, args.repeat, not args.skip_vectorbt)
+    print(json.dumps(report, indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,213 @@
+#!/usr/bin/env python3
+"""
+Numba CPU engine - buy-and-hold portfolio values and the reported metrics
+(total return, Sharpe, max drawdown) computed for many columns at once, from
+either price or per-bar return matrices
+
+Kernels are compiled with parallel=True (one prange iteration per column) and
+cache=True, so compiled machine code is persisted under NUMBA_CACHE_DIR and
+the compile cost is paid once per host rather than once per process.
+"""
+
+import os
+import tempfile
+import time
+
+DEFAULT_NUMBA_CACHE_DIR = os.path.join(tempfile.gettempdir(), "validator-numba-cache")
+
+# Must be set before numba is first imported, which reads its config once
+os.environ.setdefault("NUMBA_CACHE_DIR", DEFAULT_NUMBA_CACHE_DIR)
+
+import numba  # noqa: E402
+import numpy as np  # noqa: E402
+import pandas as pd  # noqa: E402
+from numba import njit, prange  # noqa: E402
+
+ENGINE_NAME = "numba"
+
+
+@njit(parallel=True, cache=True)
+def holding_value_nb(price, init_cash):
+    """Portfolio value per bar for buying with all cash on each column's first valid price"""
+    n_rows, n_cols = price.shape
+    value = np.empty((n_rows, n_cols))
+    for col in prange(n_cols):
+        cash = init_cash
+        size = 0.0
+        last_price = np.nan
+        for i in range(n_rows):
+            p = price[i, col]
+            if not np.isnan(p):
+                last_price = p
+                if size == 0.0 and p > 0:
+                    size = cash / p
+                    cash = 0.0
+            if size > 0.0:
+                value[i, col] = cash + size * last_price
+            else:
+                value[i, col] = cash
+    return value
+
+
+@njit(parallel=True, cache=True)
+def value_metrics_nb(value, init_cash, ann_factor):
+    """Total return, annualized Sharpe, max drawdown and final value per column"""
+    n_rows, n_cols = value.shape
+    total_return = np.empty(n_cols)
+    sharpe_ratio = np.empty(n_cols)
+    max_drawdown = np.empty(n_cols)
+    final_value = np.empty(n_cols)
+    for col in prange(n_cols):
+        prev = init_cash
+        peak = value[0, col]
+        worst = 0.0
+        # Welford running mean/variance of per-bar returns
+        count = 0
+        mean = 0.0
+        m2 = 0.0
+        for i in range(n_rows):
+            v = value[i, col]
+            r = v / prev - 1.0
+            count += 1
+            delta = r - mean
+            mean += delta / count
+            m2 += delta * (r - mean)
+            prev = v
+            if v > peak:
+                peak = v
+            dd = v / peak - 1.0
+            if dd < worst:
+                worst = dd
+        final_value[col] = value[n_rows - 1, col]
+        total_return[col] = final_value[col] / init_cash - 1.0
+        max_drawdown[col] = worst
+        std = np.sqrt(m2 / (count - 1)) if count > 1 else np.nan
+        if std > 0:
+            sharpe_ratio[col] = mean / std * np.sqrt(ann_factor)
+        elif mean == 0:
+            sharpe_ratio[col] = np.nan
+        else:
+            sharpe_ratio[col] = np.inf if mean > 0 else -np.inf
+    return total_return, sharpe_ratio, max_drawdown, final_value
+
+
+@njit(parallel=True, cache=True)
+def returns_metrics_nb(returns, ann_factor):
+    """Total return, annualized Sharpe and max drawdown per column of per-bar returns"""
+    n_rows, n_cols = returns.shape
+    total_return = np.empty(n_cols)
+    sharpe_ratio = np.empty(n_cols)
+    max_drawdown = np.empty(n_cols)
+    for col in prange(n_cols):
+        value = 1.0
+        peak = 1.0
+        worst = 0.0
+        mean = 0.0
+        m2 = 0.0
+        for i in range(n_rows):
+            r = returns[i, col]
+            delta = r - mean
+            mean += delta / (i + 1)
+            m2 += delta * (r - mean)
+            value *= 1.0 + r
+            if value > peak:
+                peak = value
+            dd = value / peak - 1.0
+            if dd < worst:
+                worst = dd
+        total_return[col] = value - 1.0
+        max_drawdown[col] = worst
+        std = np.sqrt(m2 / (n_rows - 1)) if n_rows > 1 else np.nan
+        if std > 0:
+            sharpe_ratio[col] = mean / std * np.sqrt(ann_factor)
+        elif mean == 0:
+            sharpe_ratio[col] = np.nan
+        else:
+            sharpe_ratio[col] = np.inf if mean > 0 else -np.inf
+    return total_return, sharpe_ratio, max_drawdown
+
+
+def ann_factor(freq="1D", year_freq="365D"):
+    """Bars per year, matching vectorbt's default year_freq of 365 days"""
+    return pd.Timedelta(year_freq) / pd.Timedelta(freq)
+
+
+def _as_frame(price):
+    if isinstance(price, pd.Series):
+        return price.to_frame(name=price.name if price.name is not None else 0)
+    return price
+
+
+def value_metrics(value, init_cash=10000, freq="1D"):
+    """Metrics table (one row per column) for a frame of portfolio values"""
+    value = _as_frame(value)
+    total_return, sharpe_ratio, max_drawdown, final_value = value_metrics_nb(
+        np.ascontiguousarray(value.to_numpy(dtype=np.float64)),
+        float(init_cash),
+        ann_factor(freq),
+    )
+    return pd.DataFrame({
+        "total_return": total_return,
+        "sharpe_ratio": sharpe_ratio,
+        "max_drawdown": max_drawdown,
+        "final_value": final_value,
+    }, index=value.columns)
+
+
+def returns_metrics(returns, freq="1D"):
+    """Metrics table (one row per column) for a frame or 2-D array of per-bar returns"""
+    columns = returns.columns if isinstance(returns, pd.DataFrame) else None
+    values = np.asarray(returns, dtype=np.float64)
+    if values.ndim == 1:
+        values = values[:, None]
+    total_return, sharpe_ratio, max_drawdown = returns_metrics_nb(
+        np.ascontiguousarray(values), ann_factor(freq)
+    )
+    return pd.DataFrame({
+        "total_return": total_return,
+        "sharpe_ratio": sharpe_ratio,
+        "max_drawdown": max_drawdown,
+    }, index=columns)
+
+
+def holding_metrics(price, init_cash=10000, freq="1D"):
+    """Buy-and-hold metrics for every price column in one parallel pass"""
+    price = _as_frame(price)
+    values = np.ascontiguousarray(price.to_numpy(dtype=np.float64))
+    value = holding_value_nb(values, float(init_cash))
+    metrics = value_metrics(pd.DataFrame(value, index=price.index, columns=price.columns), init_cash, freq)
+    # One entry order per column that ever had a valid price
+    metrics["trades_count"] = (~np.isnan(values)).any(axis=0).astype(int)
+    return metrics
+
+
+KERNELS = (holding_value_nb, value_metrics_nb, returns_metrics_nb)
+
+
+def warmup():
+    """Compile (or load from cache) every kernel; returns seconds spent"""
+    start_time = time.perf_counter()
+    price = np.array([[1.0, np.nan], [2.0, 2.0], [3.0, 1.0]])
+    value = holding_value_nb(price, 1.0)
+    value_metrics_nb(value, 1.0, 365.0)
+    returns_metrics_nb(np.array([[0.01, -0.02], [0.0, 0.03]]), 365.0)
+    return time.perf_counter() - start_time
+
+
+def engine_info():
+    """Describe what actually executes: engine, threads, threading layer, cache"""
+    try:
+        threading_layer = numba.threading_layer()
+    except ValueError:
+        # Only known after the first parallel kernel has run
+        threading_layer = None
+    return {
+        "engine": ENGINE_NAME,
+        "device": "cpu",
+        "numba_version": numba.__version__,
+        "threads": numba.get_num_threads(),
+        "threading_layer": threading_layer,
+        "cache_dir": numba.config.CACHE_DIR,
+        "cache_hits": sum(sum(k.stats.cache_hits.values()) for k in KERNELS),
+        "cache_misses": sum(sum(k.stats.cache_misses.values()) for k in KERNELS),
+    }
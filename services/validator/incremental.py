@@ -0,0 +1,277 @@
+#!/usr/bin/env python3
+"""
+Incremental buy-and-hold backtests: update metrics in O(new bars)
+
+Each (symbol, strategy) keeps its running state in a JSON file under
+VALIDATOR_STATE_DIR (default $RESULTS_DIR/state):
+
+    <root>/buy_and_hold/BTC-USD.json   key, start, state, previous
+
+`state` holds what the metrics need after the last processed bar: cash and
+position, the last portfolio value, the running peak and worst drawdown, and
+Welford moments of the per-bar returns (the same recurrences as
+cpu_engine.value_metrics_nb, so results match vbt.Portfolio.from_holding).
+`previous` is the state one bar earlier: every update restarts from it and
+re-applies the last bar, because the newest bar may still have been forming.
+
+A run recomputes from scratch over `period` when there is no state, when the
+parameter key (strategy, params, initial cash, frequency) changed, or when
+the bar `previous` ended on no longer matches the source (revised history).
+Otherwise only bars after it are read and processed; metrics then cover
+[start, newest bar], i.e. the window grows from the last full recompute.
+"""
+
+import hashlib
+import json
+import logging
+import math
+import os
+import tempfile
+import time
+from datetime import datetime
+from pathlib import Path
+from urllib.parse import quote
+
+import pandas as pd
+
+from cpu_engine import ann_factor
+
+logger = logging.getLogger(__name__)
+
+ENGINE_NAME = "incremental"
+
+class HoldingState:
+    """Running buy-and-hold accumulators after the bar at `ts`"""
+
+    FIELDS = ("ts", "close", "last_price", "cash", "size", "value", "peak", "worst", "count", "mean", "m2")
+
+    def __init__(self, init_cash, ts=None, close=None, last_price=None, cash=None, size=0.0, value=None,
+                 peak=None, worst=0.0, count=0, mean=0.0, m2=0.0):
+        self.ts = ts
+        self.close = close
+        self.last_price = last_price
+        self.cash = init_cash if cash is None else cash
+        self.size = size
+        self.value = init_cash if value is None else value
+        self.peak = peak
+        self.worst = worst
+        self.count = count
+        self.mean = mean
+        self.m2 = m2
+
+    def step(self, ts, price):
+        """Apply one bar: enter on the first valid positive price, then mark to market"""
+        if not math.isnan(price):
+            self.last_price = price
+            if self.size == 0.0 and price > 0:
+                self.size = self.cash / price
+                self.cash = 0.0
+        value = self.cash + self.size * self.last_price if self.size > 0.0 else self.cash
+        r = value / self.value - 1.0
+        self.count += 1
+        delta = r - self.mean
+        self.mean += delta / self.count
+        self.m2 += delta * (r - self.mean)
+        self.value = value
+        if self.peak is None or value > self.peak:
+            self.peak = value
+        self.worst = min(self.worst, value / self.peak - 1.0)
+        self.ts = ts
+        self.close = price
+
+    def copy(self):
+        return HoldingState(0.0, **{name: getattr(self, name) for name in self.FIELDS})
+
+    def to_dict(self):
+        state = {name: getattr(self, name) for name in self.FIELDS}
+        state["ts"] = self.ts.isoformat() if self.ts is not None else None
+        # JSON has no NaN; a missing close is stored as null
+        state["close"] = None if self.close is None or math.isnan(self.close) else self.close
+        return state
+
+    @classmethod
+    def from_dict(cls, data):
+        data = dict(data)
+        data["ts"] = pd.Timestamp(data["ts"]) if data["ts"] is not None else None
+        data["close"] = float("nan") if data["close"] is None else data["close"]
+        return cls(0.0, **data)
+
+    def metrics(self, init_cash, freq="1D"):
+        """Total return, annualized Sharpe, max drawdown, final value and trades so far"""
+        std = math.sqrt(self.m2 / (self.count - 1)) if self.count > 1 else float("nan")
+        if std > 0:
+            sharpe = self.mean / std * math.sqrt(ann_factor(freq))
+        elif self.mean == 0 or math.isnan(std):
+            sharpe = float("nan")
+        else:
+            sharpe = math.inf if self.mean > 0 else -math.inf
+        return {
+            "total_return": self.value / init_cash - 1.0,
+            "sharpe_ratio": sharpe,
+            "max_drawdown": self.worst,
+            "final_value": self.value,
+            "trades_count": int(self.size > 0.0),
+        }
+
+def advance(state, price):
+    """Apply bars in order; returns the state before the last bar (None if `price` is empty)"""
+    previous = None
+    for ts, value in zip(price.index, price.to_numpy(dtype=float)):
+        previous = state.copy()
+        state.step(ts, float(value))
+    return previous
+
+def params_key(strategy, params, initial_cash, freq):
+    """Parameters that invalidate the state when they change"""
+    spec = json.dumps({"strategy": strategy, "params": params or {}, "initial_cash": float(initial_cash),
+                       "freq": freq}, sort_keys=True, default=str)
+    return hashlib.sha1(spec.encode()).hexdigest()[:16]
+
+def _same_close(a, b):
+    if math.isnan(a) or math.isnan(b):
+        return math.isnan(a) and math.isnan(b)
+    return math.isclose(a, b, rel_tol=1e-9)
+
+class StateStore:
+    """One JSON state file per (strategy, symbol), replaced atomically"""
+
+    def __init__(self, root):
+        self.root = Path(root)
+
+    def _path(self, strategy, symbol):
+        return self.root / strategy / f"{quote(symbol, safe='-_.')}.json"
+
+    def load(self, strategy, symbol):
+        path = self._path(strategy, symbol)
+        if not path.exists():
+            return None
+        with open(path) as f:
+            return json.load(f)
+
+    def save(self, strategy, symbol, record):
+        path = self._path(strategy, symbol)
+        path.parent.mkdir(parents=True, exist_ok=True)
+        fd, tmp = tempfile.mkstemp(dir=path.parent, prefix=f".{path.name}.")
+        try:
+            with os.fdopen(fd, "w") as f:
+                json.dump(record, f)
+            os.replace(tmp, path)
+        except BaseException:
+            os.unlink(tmp)
+            raise
+
+class IncrementalBacktester:
+    """Buy-and-hold backtests that only process bars added since the previous run"""
+
+    strategy = "buy_and_hold"
+
+    def __init__(self, states, store=None, fetch=None, period="1y", freq="1D"):
+        if store is None and fetch is None:
+            raise ValueError("IncrementalBacktester needs a market-data store or a fetch function")
+        self.states = states
+        self.store = store
+        self.fetch = fetch or store.fetch_close
+        self.period = period
+        self.freq = freq
+
+    def _closes_since(self, symbol, since):
+        """Closes from `since` (inclusive) on: only the store's newer partitions, or a sliced download"""
+        if self.store is None:
+            close = self.fetch(symbol, self.period)
+        else:
+            end = pd.Timestamp.now().normalize() + pd.Timedelta(days=1)
+            self.store.update(symbol, since, end)
+            close = self.store.read(symbol, start=since)["close"]
+        return close[close.index >= since]
+
+    def _full(self, symbol, initial_cash, key, reason):
+        price = self.fetch(symbol, self.period)
+        state = HoldingState(float(initial_cash))
+        previous = advance(state, price)
+        logger.info(f"{symbol}: full recompute over {len(price)} bar(s) ({reason})")
+        return state, previous, pd.Timestamp(price.index[0]), len(price)
+
+    def run(self, symbol, initial_cash=10000, params=None, full=False):
+        """Metrics for `symbol` through its newest bar; `update` says how they were obtained"""
+        start_time = time.perf_counter()
+        key = params_key(self.strategy, params, initial_cash, self.freq)
+        record = None if full else self.states.load(self.strategy, symbol)
+
+        reason = None
+        if full:
+            reason = "requested"
+        elif record is None:
+            reason = "no state"
+        elif record["key"] != key:
+            reason = "parameters changed"
+        elif record["previous"] is None:
+            reason = "single bar"
+
+        if reason is None:
+            base = HoldingState.from_dict(record["previous"])
+            close = self._closes_since(symbol, base.ts)
+            if not len(close) or close.index[0] != base.ts or not _same_close(float(close.iloc[0]), base.close):
+                reason = "history revised"
+            elif len(close) == 1:
+                reason = "last bar removed"
+
+        if reason is None:
+            state = base
+            previous = advance(state, close.iloc[1:])
+            start = pd.Timestamp(record["start"])
+            processed = len(close) - 1
+            update = "incremental"
+        else:
+            state, previous, start, processed = self._full(symbol, initial_cash, key, reason)
+            update = "full"
+
+        self.states.save(self.strategy, symbol, {
+            "key": key,
+            "symbol": symbol,
+            "start": start.isoformat(),
+            "state": state.to_dict(),
+            "previous": previous.to_dict() if previous is not None and previous.ts is not None else None,
+        })
+        metrics = state.metrics(initial_cash, self.freq)
+        return {
+            "portfolio_id": f"{symbol}_{datetime.now().strftime('%Y%m%d_%H%M%S')}",
+            "symbol": symbol,
+            "initial_cash": initial_cash,
+            **metrics,
+            "sharpe_ratio": metrics["sharpe_ratio"] if not math.isnan(metrics["sharpe_ratio"]) else 0.0,
+            "gpu_accelerated": False,
+            "engine": ENGINE_NAME,
+            "update": update,
+            "update_reason": reason,
+            "bars_processed": processed,
+            "start": start.isoformat(),
+            "end": state.ts.isoformat(),
+            "computation_time": time.perf_counter() - start_time,
+            "processed_at": datetime.utcnow().isoformat(),
+        }
+
+    def run_batch(self, symbols, initial_cash=10000, full=False):
+        """Batch-shaped result (see batch.run_batch_backtest); per-symbol failures are reported, never raised"""
+        start_time = time.perf_counter()
+        results, errors = [], {}
+        for symbol in dict.fromkeys(symbols):
+            try:
+                results.append(self.run(symbol, initial_cash=initial_cash, full=full))
+            except Exception as e:
+                logger.warning(f"Skipping {symbol}: {e}")
+                errors[symbol] = str(e)
+        computation_time = time.perf_counter() - start_time
+        return {
+            "results": results,
+            "errors": errors,
+            "symbols": len(results) + len(errors),
+            "computation_time": computation_time,
+            "updates": {mode: sum(r["update"] == mode for r in results) for mode in ("full", "incremental")},
+        }
+
+def state_store_from_env():
+    """State under VALIDATOR_STATE_DIR (default $RESULTS_DIR/state), or None if neither is set"""
+    root = os.getenv("VALIDATOR_STATE_DIR")
+    if not root and os.getenv("RESULTS_DIR"):
+        root = os.path.join(os.getenv("RESULTS_DIR"), "state")
+    return StateStore(root) if root else None
@@ -1,79 +1,85 @@
 #!/usr/bin/env python3
 """
-Validator service - GPU-accelerated back-testing with vectorbt
+Validator service - back-testing with vectorbt and Numba CPU kernels
 """
 
+import argparse
+import json
 import logging
+import os
 import pickle
 import time
 from datetime import datetime
-import yfinance as yf
-import vectorbt as vbt
 
-logging.basicConfig(level=logging.INFO)
+from backend import detect_gpu, get_backend, is_warm, load_vectorbt, warm_up  # noqa: F401 - detect_gpu re-exported
+from batch import download_close, run_batch_backtest
+from log_config import setup_logging
+from market_data import store_from_env
+from results_store import results_store_from_env, rows_from_results, weaviate_writer_from_env
+from sweep import run_sweep
+from tracing import setup_tracing
+
 logger = logging.getLogger(__name__)
 
-def detect_gpu():
-    """Detect GPU availability and fallback to CPU if needed"""
-    try:
-        import cupy as cp
-        device_count = cp.cuda.runtime.getDeviceCount()
-        if device_count > 0:
-            logger.info(f"GPU detected: {device_count} device(s)")
-            return "gpu"
-    except ImportError:
-        logger.warning("CuPy not installed")
-    except Exception as e:
-        logger.warning(f"GPU not available: {e}")
+def load_close(symbol, period="1y", store=None):
+    """Daily closes from the local market-data store, or straight from yfinance"""
+    if store is None:
+        store = store_from_env()
+    if store is not None:
+        return store.fetch_close(symbol, period=period)
+
+    import yfinance as yf
+
+    logger.info(f"Downloading {symbol} data...")
+    data = yf.download(symbol, period=period, progress=False)
+    
+    if data.empty:
+        raise ValueError(f"No data available for {symbol}")
     
-    logger.info("Falling back to CPU")
-    return "cpu"
+    return data["Close"]
+
+ENGINES = ("vectorbt", "numba")
+
+def run_backtest(symbol="BTC-USD", backend="auto", initial_cash=10000, store=None, engine="vectorbt"):
+    """Run a buy-and-hold backtest and report which engine actually executed it"""
+    if engine not in ENGINES:
+        raise ValueError(f"Unknown engine: {engine}")
 
-def run_backtest(symbol="BTC-USD", backend="auto", initial_cash=10000):
-    """Run vectorbt backtest with GPU/CPU backend selection"""
     if backend == "auto":
-        backend = detect_gpu()
+        backend = get_backend()
+    gpu_available = backend == "gpu"
+    if gpu_available:
+        # Neither vectorbt nor the Numba kernels have a CUDA path for these metrics
+        logger.info("GPU present but no GPU backtest engine exists; executing on CPU")
     
     start_time = time.time()
     
     try:
-        # Download price data
-        logger.info(f"Downloading {symbol} data...")
-        data = yf.download(symbol, period="1y", progress=False)
+        price = load_close(symbol, store=store)
+        logger.info(f"Loaded {len(price)} price points")
         
-        if data.empty:
-            raise ValueError(f"No data available for {symbol}")
-        
-        price = data["Close"]
-        logger.info(f"Downloaded {len(price)} price points")
-        
-        # Configure vectorbt for GPU/CPU
-        if backend == "gpu":
-            try:
-                # Enable GPU acceleration
-                import cupy as cp
-                logger.info("Configuring vectorbt for GPU acceleration")
-                # vectorbt will automatically use GPU if available
-                portfolio = vbt.Portfolio.from_holding(
-                    price, 
-                    init_cash=initial_cash,
-                    jitted=dict(parallel=True)
-                )
-            except Exception as e:
-                logger.warning(f"GPU acceleration failed, falling back to CPU: {e}")
-                backend = "cpu"
-                portfolio = vbt.Portfolio.from_holding(price, init_cash=initial_cash)
+        warm = is_warm(engine)
+        if engine == "numba":
+            from cpu_engine import holding_metrics
+
+            metrics = holding_metrics(price, init_cash=initial_cash).iloc[0]
+            computation_time = time.time() - start_time
+            total_return = metrics["total_return"]
+            sharpe_ratio = metrics["sharpe_ratio"]
+            max_drawdown = metrics["max_drawdown"]
+            final_value = metrics["final_value"]
+            trades_count = int(metrics["trades_count"])
         else:
-            # CPU-only execution
+            vbt = load_vectorbt()
             portfolio = vbt.Portfolio.from_holding(price, init_cash=initial_cash)
-        
-        computation_time = time.time() - start_time
-        
-        # Calculate performance metrics
-        total_return = portfolio.total_return()
-        sharpe_ratio = portfolio.sharpe_ratio()
-        max_drawdown = portfolio.max_drawdown()
-        final_value = portfolio.value().iloc[-1]
+            computation_time = time.time() - start_time
+            
+            # Calculate performance metrics
+            total_return = portfolio.total_return()
+            sharpe_ratio = portfolio.sharpe_ratio()
+            max_drawdown = portfolio.max_drawdown()
+            final_value = portfolio.value().iloc[-1]
+            trades_count = len(portfolio.orders.records_readable)
         
         results = {
             "portfolio_id": f"{symbol}_{datetime.now().strftime('%Y%m%d_%H%M%S')}",
@@ -83,13 +89,18 @@ def run_backtest(symbol="BTC-USD", backend="auto", initial_cash=10000):
             "total_return": float(total_return),
             "sharpe_ratio": float(sharpe_ratio) if sharpe_ratio is not None else 0.0,
             "max_drawdown": float(max_drawdown),
-            "trades_count": len(portfolio.orders.records_readable),
-            "gpu_accelerated": backend == "gpu",
+            "trades_count": trades_count,
+            "gpu_accelerated": False,
+            "gpu_available": gpu_available,
+            "backend": "cpu",
+            "engine": engine,
             "computation_time": computation_time,
+            # False means computation_time includes JIT compilation
+            "warm": warm,
             "processed_at": datetime.utcnow().isoformat()
         }
         
-        logger.info(f"Backtest completed in {computation_time:.2f}s using {backend}")
+        logger.info(f"Backtest completed in {computation_time:.2f}s using {engine} on cpu ({'warm' if warm else 'cold'})")
         logger.info(f"Total return: {total_return:.2%}, Sharpe: {sharpe_ratio:.2f}")
         
         return results
@@ -98,8 +109,82 @@ def run_backtest(symbol="BTC-USD", backend="auto", initial_cash=10000):
         logger.error(f"Backtest failed: {e}")
         raise
 
+DEFAULT_PARAM_GRIDS = {
+    "ma_crossover": {
+        "fast_window": list(range(5, 55, 5)),
+        "slow_window": list(range(20, 220, 20)),
+    },
+    "rsi_threshold": {
+        "window": [7, 14, 21],
+        "entry": [20, 25, 30, 35],
+        "exit": [60, 65, 70, 75, 80],
+    },
+}
+
+def run_parameter_sweep(symbol="BTC-USD", strategy="ma_crossover", param_grid=None,
+                        initial_cash=10000, rank_by="sharpe_ratio", top_n=20, store=None):
+    """Sweep a strategy parameter grid for one symbol in a single vectorized run"""
+    if param_grid is None:
+        param_grid = DEFAULT_PARAM_GRIDS[strategy]
+
+    sweep = run_sweep(
+        load_close(symbol, store=store),
+        param_grid,
+        strategy=strategy,
+        initial_cash=initial_cash,
+        rank_by=rank_by,
+        top_n=top_n,
+    )
+
+    return {
+        "portfolio_id": f"{symbol}_sweep_{datetime.now().strftime('%Y%m%d_%H%M%S')}",
+        "symbol": symbol,
+        "initial_cash": initial_cash,
+        **sweep,
+        "gpu_accelerated": False,
+        "processed_at": datetime.utcnow().isoformat()
+    }
+
+def run_robustness_checks(symbol="BTC-USD", strategy="ma_crossover", param_grid=None,
+                          initial_cash=10000, train_size=180, test_size=30, n_resamples=10000,
+                          block_size=5, rank_by="sharpe_ratio", store=None, seed=None):
+    """Walk-forward and Monte Carlo validation of a strategy parameter grid"""
+    from robustness import monte_carlo, walk_forward
+
+    if param_grid is None:
+        param_grid = DEFAULT_PARAM_GRIDS[strategy]
+
+    price = load_close(symbol, period="5y", store=store)
+    sweep = run_sweep(
+        price,
+        param_grid,
+        strategy=strategy,
+        initial_cash=initial_cash,
+        rank_by=rank_by,
+        keep_returns=True,
+    )
+    returns = sweep.pop("returns")
+    forward = walk_forward(returns, train_size=train_size, test_size=test_size, rank_by=rank_by)
+
+    # Bootstrap the full-history returns of the in-sample winner
+    names = list(returns.columns.names)
+    best_key = next(sweep["ranked"][names].itertuples(index=False, name=None))
+    bootstrap = monte_carlo(returns[best_key], n_resamples=n_resamples, block_size=block_size, seed=seed)
+
+    return {
+        "portfolio_id": f"{symbol}_robustness_{datetime.now().strftime('%Y%m%d_%H%M%S')}",
+        "symbol": symbol,
+        "strategy": strategy,
+        "best_params": dict(zip(names, best_key)),
+        "sweep": sweep,
+        "walk_forward": forward,
+        "monte_carlo": bootstrap,
+        "gpu_accelerated": False,
+        "processed_at": datetime.utcnow().isoformat()
+    }
+
 def save_results(results, filename=None):
-    """Save backtest results to pickle file"""
+    """Save backtest results to a single pickle file (legacy export)"""
     if filename is None:
         filename = f"backtest_{results['portfolio_id']}.pkl"
     
@@ -112,16 +197,178 @@ def save_results(results, filename=None):
         logger.error(f"Failed to save results: {e}")
         raise
 
-def main():
+def store_results(results, results_store=None, weaviate_writer=None):
+    """Append results to the columnar results store, optionally mirroring to Weaviate"""
+    rows = rows_from_results(results)
+    if results_store is None:
+        results_store = results_store_from_env()
+    results_store.append(rows)
+    if weaviate_writer is not None:
+        weaviate_writer.write(rows)
+    return rows
+
+def parse_args(argv=None):
+    """Parse validator command line flags"""
+    parser = argparse.ArgumentParser(description="Validator service")
+    parser.add_argument("--symbol", default="BTC-USD")
+    parser.add_argument("--symbols", type=lambda v: [s.strip() for s in v.split(",") if s.strip()],
+                        default=None, help="Comma-separated symbol list for a batched backtest")
+    parser.add_argument("--engine", choices=ENGINES, default="vectorbt",
+                        help="Buy-and-hold engine: vectorbt or the Numba CPU kernels")
+    parser.add_argument("--workers", type=int, default=None,
+                        help="Process pool size for batched backtests (default: available cores)")
+    parser.add_argument("--initial-cash", type=float, default=10000)
+    parser.add_argument("--sweep", action="store_true",
+                        help="Sweep a strategy parameter grid instead of buy-and-hold")
+    parser.add_argument("--robustness", action="store_true",
+                        help="Walk-forward and Monte Carlo validation of the strategy grid")
+    parser.add_argument("--train-bars", type=int, default=180)
+    parser.add_argument("--test-bars", type=int, default=30)
+    parser.add_argument("--resamples", type=int, default=10000)
+    parser.add_argument("--block-size", type=int, default=5,
+                        help="Bootstrap block length in bars (1 = iid resampling)")
+    parser.add_argument("--strategy", choices=sorted(DEFAULT_PARAM_GRIDS), default="ma_crossover")
+    parser.add_argument("--param-grid", type=json.loads, default=None,
+                        help='JSON grid, e.g. \'{"fast_window": [5, 10], "slow_window": [50, 100]}\'')
+    parser.add_argument("--offline", action="store_true",
+                        help="Read market data only from MARKET_DATA_DIR, never the network")
+    parser.add_argument("--no-warmup", action="store_true",
+                        help="Skip the startup JIT warm-up (first call then includes compile time)")
+    parser.add_argument("--incremental", action="store_true",
+                        help="Update buy-and-hold metrics from bars added since the last run (state in VALIDATOR_STATE_DIR)")
+    parser.add_argument("--full-recompute", action="store_true",
+                        help="With --incremental, rebuild the state from the whole period")
+    parser.add_argument("--rank-by", default="sharpe_ratio")
+    parser.add_argument("--top-n", type=int, default=20)
+    parser.add_argument("--weaviate", action="store_true",
+                        help="Also write results to Weaviate as BacktestResult objects")
+    parser.add_argument("--pickle", action="store_true",
+                        help="Also export the full results dict to a pickle file")
+    parser.add_argument("--worker", action="store_true",
+                        help="Serve validation jobs from the Redis stream until stopped")
+    parser.add_argument("--concurrency", type=int, default=int(os.getenv("VALIDATOR_CONCURRENCY", "1")),
+                        help="Jobs processed in parallel in worker mode")
+    return parser.parse_args(argv)
+
+def main(argv=None):
     """Main validator service entry point"""
     logger.info("Starting validator service...")
+    args = parse_args(argv)
+    store = store_from_env(offline=args.offline)
+    if args.offline and store is None:
+        logger.error("--offline requires MARKET_DATA_DIR to be set")
+        return 1
+    states = None
+    if args.incremental:
+        from incremental import state_store_from_env
+
+        states = state_store_from_env()
+        if states is None or args.sweep or args.robustness:
+            logger.error("--incremental needs VALIDATOR_STATE_DIR or RESULTS_DIR and applies to buy-and-hold runs only")
+            return 1
+    
+    if args.worker:
+        from worker import run_worker
+
+        run_worker(concurrency=args.concurrency, offline=args.offline)
+        return 0
     
     try:
-        # Run backtest
-        results = run_backtest()
+        startup = None
+        # The incremental path is plain Python per new bar; neither engine needs warming
+        if not args.no_warmup and not args.incremental:
+            if args.robustness:
+                engines = ("vectorbt", "numba")
+            elif args.sweep:
+                engines = ("vectorbt",)
+            else:
+                engines = ("vectorbt", args.engine)
+            startup = warm_up(engines=tuple(dict.fromkeys(engines)))
+        
+        if args.robustness:
+            results = run_robustness_checks(
+                symbol=args.symbol,
+                strategy=args.strategy,
+                param_grid=args.param_grid,
+                initial_cash=args.initial_cash,
+                train_size=args.train_bars,
+                test_size=args.test_bars,
+                n_resamples=args.resamples,
+                block_size=args.block_size,
+                rank_by=args.rank_by,
+                store=store,
+            )
+            logger.info(
+                f"Walk-forward out-of-sample distribution:\n"
+                f"{results['walk_forward']['distribution'].to_string()}"
+            )
+            logger.info(
+                f"Monte Carlo ({results['monte_carlo']['n_resamples']} resamples in "
+                f"{results['monte_carlo']['computation_time']:.2f}s), "
+                f"P(loss)={results['monte_carlo']['probability_of_loss']:.1%}:\n"
+                f"{results['monte_carlo']['distribution'].to_string()}"
+            )
+        elif args.sweep:
+            results = run_parameter_sweep(
+                symbol=args.symbol,
+                strategy=args.strategy,
+                param_grid=args.param_grid,
+                initial_cash=args.initial_cash,
+                rank_by=args.rank_by,
+                top_n=args.top_n,
+                store=store,
+            )
+            logger.info(
+                f"Sweep ranked {results['combinations']} combinations at "
+                f"{results['combos_per_sec']:,.0f} combos/sec:\n"
+                f"{results['ranked'].to_string(index=False)}"
+            )
+        elif args.incremental:
+            from incremental import IncrementalBacktester
+
+            backtester = IncrementalBacktester(states, store=store, fetch=None if store is not None else download_close)
+            results = backtester.run_batch(args.symbols or [args.symbol], initial_cash=args.initial_cash,
+                                           full=args.full_recompute)
+            results["portfolio_id"] = f"incremental_{datetime.now().strftime('%Y%m%d_%H%M%S')}"
+            for symbol, error in results["errors"].items():
+                logger.warning(f"{symbol} failed: {error}")
+            logger.info(f"Updated {results['updates']['incremental']} symbol(s) incrementally, "
+                        f"recomputed {results['updates']['full']}")
+        elif args.symbols:
+            results = run_batch_backtest(
+                args.symbols,
+                initial_cash=args.initial_cash,
+                max_workers=args.workers,
+                engine=args.engine,
+                fetch=store.fetch_close if store is not None else download_close,
+            )
+            results["portfolio_id"] = f"batch_{datetime.now().strftime('%Y%m%d_%H%M%S')}"
+            for symbol, error in results["errors"].items():
+                logger.warning(f"{symbol} failed: {error}")
+        else:
+            # Run backtest
+            results = run_backtest(
+                symbol=args.symbol,
+                initial_cash=args.initial_cash,
+                store=store,
+                engine=args.engine,
+            )
+        
+        if startup is not None:
+            results["startup"] = startup
+            logger.info(
+                f"Cold start {startup['cold_start_time']:.2f}s, "
+                f"warm call {results.get('computation_time', 0.0):.3f}s"
+            )
         
         # Save results
-        filename = save_results(results)
+        rows = store_results(
+            results,
+            weaviate_writer=weaviate_writer_from_env() if args.weaviate else None,
+        )
+        logger.info(f"Stored {len(rows)} result row(s)")
+        if args.pickle:
+            save_results(results)
         
         logger.info("Validator service completed successfully")
         logger.info(f"Results: {results}")
@@ -133,4 +380,6 @@ def main():
     return 0
 
 if __name__ == "__main__":
+    setup_logging("validator")
+    setup_tracing("validator")
     exit(main())
\ No newline at end of file
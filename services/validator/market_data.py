@@ -0,0 +1,279 @@
+#!/usr/bin/env python3
+"""
+Local columnar market-data cache for the validator
+
+Bars are stored as Arrow IPC files partitioned by symbol, interval and year:
+
+    <root>/symbol=BTC-USD/interval=1d/year=2024.arrow
+    <root>/symbol=BTC-USD/interval=1d/_coverage.json
+
+Only date ranges missing from the store are requested from the provider, and
+reads go through memory-mapped Arrow files. With no provider configured the
+store is read-only, so backtests can run without any network access.
+"""
+
+import json
+import logging
+import os
+import re
+import tempfile
+from abc import ABC, abstractmethod
+from pathlib import Path
+from urllib.parse import quote
+
+import pandas as pd
+import pyarrow as pa
+
+logger = logging.getLogger(__name__)
+
+COLUMNS = ["open", "high", "low", "close", "volume"]
+
+SCHEMA = pa.schema(
+    [("timestamp", pa.timestamp("ns"))] + [(name, pa.float64()) for name in COLUMNS]
+)
+
+_PERIOD_RE = re.compile(r"^(\d+)(d|wk|mo|y)$")
+
+
+def period_to_offset(period):
+    """Translate a yfinance-style period ("30d", "6mo", "1y") to a DateOffset"""
+    match = _PERIOD_RE.match(period)
+    if not match:
+        raise ValueError(f"Unsupported period: {period}")
+    count, unit = int(match.group(1)), match.group(2)
+    return {
+        "d": pd.DateOffset(days=count),
+        "wk": pd.DateOffset(weeks=count),
+        "mo": pd.DateOffset(months=count),
+        "y": pd.DateOffset(years=count),
+    }[unit]
+
+
+def normalize_bars(frame):
+    """Coerce provider output to the store layout: timestamp index + OHLCV floats"""
+    if frame is None or frame.empty:
+        return pd.DataFrame(columns=COLUMNS, index=pd.DatetimeIndex([], name="timestamp"), dtype=float)
+
+    frame = frame.copy()
+    if isinstance(frame.columns, pd.MultiIndex):
+        # yfinance >= 0.2.4x returns (Price, Ticker) columns even for one symbol
+        frame.columns = frame.columns.get_level_values(0)
+    frame.columns = [str(c).lower().replace(" ", "_") for c in frame.columns]
+    if "close" not in frame.columns and "adj_close" in frame.columns:
+        frame["close"] = frame["adj_close"]
+
+    missing = [c for c in COLUMNS if c not in frame.columns]
+    if "close" in missing:
+        raise ValueError("Market data has no close column")
+    for column in missing:
+        frame[column] = float("nan")
+
+    index = pd.DatetimeIndex(frame.index)
+    if index.tz is not None:
+        index = index.tz_convert("UTC").tz_localize(None)
+    frame.index = index.as_unit("ns").rename("timestamp")
+
+    frame = frame[COLUMNS].astype(float)
+    return frame[~frame.index.duplicated(keep="last")].sort_index()
+
+
+class MarketDataProvider(ABC):
+    """Source of OHLCV bars for the market-data store"""
+
+    @abstractmethod
+    def fetch(self, symbol, start, end, interval="1d"):
+        """Return bars for symbol in the half-open range [start, end)"""
+
+
+class YFinanceProvider(MarketDataProvider):
+    """Yahoo Finance via yfinance (network)"""
+
+    def fetch(self, symbol, start, end, interval="1d"):
+        import yfinance as yf
+
+        logger.info(f"Downloading {symbol} {interval} bars {start:%Y-%m-%d} -> {end:%Y-%m-%d}")
+        data = yf.download(
+            symbol,
+            start=start.strftime("%Y-%m-%d"),
+            end=end.strftime("%Y-%m-%d"),
+            interval=interval,
+            progress=False,
+            auto_adjust=False,
+        )
+        return normalize_bars(data)
+
+
+class LocalFileProvider(MarketDataProvider):
+    """Fixture provider reading <root>/<symbol>.csv or <symbol>.parquet (no network)"""
+
+    def __init__(self, root):
+        self.root = Path(root)
+
+    def fetch(self, symbol, start, end, interval="1d"):
+        parquet = self.root / f"{symbol}.parquet"
+        csv = self.root / f"{symbol}.csv"
+        if parquet.exists():
+            frame = pd.read_parquet(parquet)
+        elif csv.exists():
+            frame = pd.read_csv(csv, index_col=0, parse_dates=True)
+        else:
+            raise FileNotFoundError(f"No fixture data for {symbol} in {self.root}")
+
+        bars = normalize_bars(frame)
+        return bars[(bars.index >= start) & (bars.index < end)]
+
+
+class MarketDataStore:
+    """Partitioned Arrow cache of OHLCV bars keyed by symbol and interval"""
+
+    def __init__(self, root, provider=None):
+        self.root = Path(root)
+        self.provider = provider
+        self.root.mkdir(parents=True, exist_ok=True)
+
+    def _series_dir(self, symbol, interval):
+        return self.root / f"symbol={quote(symbol, safe='-_.')}" / f"interval={interval}"
+
+    def _partition(self, symbol, interval, year):
+        return self._series_dir(symbol, interval) / f"year={year}.arrow"
+
+    def coverage(self, symbol, interval="1d"):
+        """Half-open [start, end) range already fetched, or None"""
+        path = self._series_dir(symbol, interval) / "_coverage.json"
+        if not path.exists():
+            return None
+        with open(path) as f:
+            meta = json.load(f)
+        return pd.Timestamp(meta["start"]), pd.Timestamp(meta["end"])
+
+    def _write_coverage(self, symbol, interval, start, end):
+        meta = {"start": start.isoformat(), "end": end.isoformat()}
+        self._atomic_write(
+            self._series_dir(symbol, interval) / "_coverage.json",
+            lambda f: f.write(json.dumps(meta).encode()),
+        )
+
+    @staticmethod
+    def _atomic_write(path, write):
+        """Write via a temp file + rename so concurrent readers never see partial files"""
+        path.parent.mkdir(parents=True, exist_ok=True)
+        fd, tmp = tempfile.mkstemp(dir=path.parent, prefix=f".{path.name}.")
+        try:
+            with os.fdopen(fd, "wb") as f:
+                write(f)
+            os.replace(tmp, path)
+        except BaseException:
+            os.unlink(tmp)
+            raise
+
+    def _read_partition(self, path):
+        """Read one Arrow partition through a memory map"""
+        with pa.memory_map(str(path), "r") as source:
+            table = pa.ipc.open_file(source).read_all()
+        return table.to_pandas().set_index("timestamp")
+
+    def _write_partition(self, path, bars):
+        table = pa.Table.from_pandas(bars.reset_index(), schema=SCHEMA, preserve_index=False)
+
+        def write(f):
+            with pa.ipc.new_file(f, SCHEMA) as writer:
+                writer.write_table(table)
+
+        self._atomic_write(path, write)
+
+    def append(self, symbol, bars, interval="1d"):
+        """Merge bars into the store, rewriting only the year partitions they touch"""
+        bars = normalize_bars(bars)
+        for year, rows in bars.groupby(bars.index.year):
+            path = self._partition(symbol, interval, year)
+            if path.exists():
+                rows = pd.concat([self._read_partition(path), rows])
+                rows = rows[~rows.index.duplicated(keep="last")].sort_index()
+            self._write_partition(path, rows)
+        return len(bars)
+
+    def read(self, symbol, start=None, end=None, interval="1d"):
+        """Read stored bars in [start, end) without touching the provider"""
+        series_dir = self._series_dir(symbol, interval)
+        paths = sorted(series_dir.glob("year=*.arrow"))
+        if start is not None:
+            paths = [p for p in paths if int(p.stem.split("=")[1]) >= start.year]
+        if end is not None:
+            paths = [p for p in paths if int(p.stem.split("=")[1]) <= end.year]
+
+        if not paths:
+            return normalize_bars(None)
+
+        bars = pd.concat([self._read_partition(p) for p in paths]).sort_index()
+        if start is not None:
+            bars = bars[bars.index >= start]
+        if end is not None:
+            bars = bars[bars.index < end]
+        return bars
+
+    def missing_ranges(self, symbol, start, end, interval="1d"):
+        """Sub-ranges to fetch so the store covers [start, end)
+
+        Coverage is one contiguous span, so a request disjoint from it is
+        extended to meet it: the gap in between is fetched too, never
+        recorded as covered without its bars.
+        """
+        covered = self.coverage(symbol, interval)
+        if covered is None:
+            return [(start, end)]
+
+        covered_start, covered_end = covered
+        ranges = []
+        if start < covered_start:
+            ranges.append((start, covered_start))
+        if end > covered_end:
+            ranges.append((covered_end, end))
+        return ranges
+
+    def update(self, symbol, start, end, interval="1d"):
+        """Fetch only the missing parts of [start, end) from the provider"""
+        ranges = self.missing_ranges(symbol, start, end, interval)
+        if not ranges or self.provider is None:
+            return 0
+
+        fetched = 0
+        covered = self.coverage(symbol, interval)
+        covered_start, covered_end = covered if covered else (start, start)
+        for range_start, range_end in ranges:
+            bars = self.provider.fetch(symbol, range_start, range_end, interval=interval)
+            fetched += self.append(symbol, bars, interval=interval)
+            covered_start = min(covered_start, range_start)
+            if not bars.empty:
+                # Coverage stops at the newest bar so a still-forming bar is re-fetched
+                covered_end = max(covered_end, bars.index.max())
+
+        self._write_coverage(symbol, interval, covered_start, covered_end)
+        logger.info(f"Market data for {symbol} {interval}: fetched {fetched} new bar(s) in {len(ranges)} range(s)")
+        return fetched
+
+    def get(self, symbol, start=None, end=None, interval="1d", period="1y"):
+        """Bars in [start, end), fetching only what the store is missing"""
+        if end is None:
+            end = pd.Timestamp.now().normalize() + pd.Timedelta(days=1)
+        if start is None:
+            start = end - period_to_offset(period)
+        start, end = pd.Timestamp(start), pd.Timestamp(end)
+
+        self.update(symbol, start, end, interval=interval)
+        bars = self.read(symbol, start, end, interval=interval)
+        if bars.empty:
+            raise ValueError(f"No data available for {symbol}")
+        return bars
+
+    def fetch_close(self, symbol, period="1y"):
+        """Daily closes for `period`; signature matches batch.download_close"""
+        return self.get(symbol, period=period)["close"].rename(symbol)
+
+
+def store_from_env(offline=False):
+    """Build the store configured by MARKET_DATA_DIR, or None if unset"""
+    root = os.getenv("MARKET_DATA_DIR")
+    if not root:
+        return None
+    provider = None if offline else YFinanceProvider()
+    return MarketDataStore(root, provider=provider)
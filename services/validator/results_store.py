@@ -0,0 +1,233 @@
+#!/usr/bin/env python3
+"""
+Columnar backtest results store
+
+Results are appended to a Parquet dataset with a fixed schema, hive-partitioned
+by run date and symbol:
+
+    <root>/date=2024-06-01/symbol=BTC-USD/part-<uuid>-0.parquet
+
+Queries read only the requested columns and prune partitions by symbol/date.
+Rows can also be written to Weaviate as BacktestResult objects in batches.
+"""
+
+import json
+import logging
+import os
+import uuid
+from datetime import datetime
+from pathlib import Path
+from typing import List
+
+import msgspec
+import pandas as pd
+import pyarrow as pa
+import pyarrow.dataset as ds
+import pyarrow.parquet as pq
+
+from messages import BacktestResult
+
+logger = logging.getLogger(__name__)
+
+SCHEMA = pa.schema([
+    ("portfolio_id", pa.string()),
+    ("run_id", pa.string()),
+    ("concept", pa.string()),
+    ("mode", pa.string()),
+    ("strategy", pa.string()),
+    ("params", pa.string()),
+    ("initial_cash", pa.float64()),
+    ("final_value", pa.float64()),
+    ("total_return", pa.float64()),
+    ("sharpe_ratio", pa.float64()),
+    ("max_drawdown", pa.float64()),
+    ("trades_count", pa.int64()),
+    ("engine", pa.string()),
+    ("gpu_accelerated", pa.bool_()),
+    ("computation_time", pa.float64()),
+    ("processed_at", pa.timestamp("us")),
+    ("date", pa.string()),
+    ("symbol", pa.string()),
+])
+
+PARTITIONING = ds.partitioning(
+    pa.schema([("date", pa.string()), ("symbol", pa.string())]),
+    flavor="hive",
+)
+
+DEFAULT_COLUMNS = [
+    "portfolio_id", "symbol", "date", "strategy", "params",
+    "total_return", "sharpe_ratio", "max_drawdown", "trades_count",
+]
+
+
+def _row(result, run_id, mode, strategy=None, params=None, concept=None):
+    """One schema row from a run_backtest()-style result dict"""
+    processed_at = pd.Timestamp(result.get("processed_at") or datetime.utcnow()).to_pydatetime()
+    sharpe = result.get("sharpe_ratio")
+    return {
+        "portfolio_id": result.get("portfolio_id", run_id),
+        "run_id": run_id,
+        "concept": concept,
+        "mode": mode,
+        "strategy": strategy or result.get("strategy") or "buy_and_hold",
+        "params": json.dumps(params or {}, sort_keys=True, default=str),
+        "initial_cash": float(result.get("initial_cash", 0.0)),
+        "final_value": float(result.get("final_value", float("nan"))),
+        "total_return": float(result["total_return"]),
+        "sharpe_ratio": float(sharpe) if sharpe is not None else None,
+        "max_drawdown": float(result["max_drawdown"]),
+        "trades_count": int(result.get("trades_count", 0)),
+        "engine": result.get("engine", "vectorbt"),
+        "gpu_accelerated": bool(result.get("gpu_accelerated", False)),
+        "computation_time": float(result.get("computation_time", 0.0)),
+        "processed_at": processed_at,
+        "date": processed_at.strftime("%Y-%m-%d"),
+        "symbol": result["symbol"],
+    }
+
+
+def rows_from_results(results):
+    """Flatten any validator result (single, batch, sweep, robustness) into schema rows"""
+    run_id = results.get("portfolio_id") or uuid.uuid4().hex
+    concept = results.get("concept")
+
+    if "results" in results:
+        return [_row(r, run_id, "batch", concept=concept) for r in results["results"]]
+
+    sweep = results.get("sweep") if "walk_forward" in results else results
+    if "ranked" in sweep:
+        ranked = sweep["ranked"]
+        metrics = {"rank", "total_return", "sharpe_ratio", "max_drawdown", "final_value", "trades_count"}
+        param_names = [c for c in ranked.columns if c not in metrics]
+        per_combo = sweep["computation_time"] / max(1, sweep["combinations"])
+        rows = []
+        for record in ranked.to_dict("records"):
+            params = {name: record[name] for name in param_names}
+            rows.append(_row(
+                {
+                    **record,
+                    "portfolio_id": f"{run_id}_{'_'.join(str(v) for v in params.values())}",
+                    "symbol": results["symbol"],
+                    "initial_cash": results.get("initial_cash", 0.0),
+                    "computation_time": per_combo,
+                    "processed_at": results.get("processed_at"),
+                },
+                run_id,
+                "robustness" if sweep is not results else "sweep",
+                strategy=sweep["strategy"],
+                params=params,
+                concept=concept,
+            ))
+        return rows
+
+    return [_row(results, run_id, "backtest", concept=concept)]
+
+
+class ResultsStore:
+    """Append-only Parquet dataset of backtest results"""
+
+    def __init__(self, root):
+        self.root = Path(root)
+        self.root.mkdir(parents=True, exist_ok=True)
+
+    def append(self, rows):
+        """Write rows as new Parquet files in their date/symbol partitions"""
+        if not rows:
+            return 0
+        # Validate against the shared BacktestResult model before it reaches Arrow
+        rows = msgspec.convert(rows, List[BacktestResult])
+        table = pa.Table.from_pylist([msgspec.structs.asdict(row) for row in rows], schema=SCHEMA)
+        ds.write_dataset(
+            table,
+            self.root,
+            format="parquet",
+            partitioning=PARTITIONING,
+            basename_template=f"part-{uuid.uuid4().hex}-{{i}}.parquet",
+            existing_data_behavior="overwrite_or_ignore",
+        )
+        logger.info(f"Appended {len(rows)} result row(s) to {self.root}")
+        return len(rows)
+
+    def dataset(self):
+        return ds.dataset(self.root, format="parquet", partitioning=PARTITIONING, schema=SCHEMA)
+
+    @staticmethod
+    def _filter(symbol=None, start=None, end=None):
+        expression = None
+
+        def conjoin(condition):
+            return condition if expression is None else expression & condition
+
+        if symbol is not None:
+            symbols = [symbol] if isinstance(symbol, str) else list(symbol)
+            expression = conjoin(ds.field("symbol").isin(symbols))
+        if start is not None:
+            expression = conjoin(ds.field("date") >= pd.Timestamp(start).strftime("%Y-%m-%d"))
+        if end is not None:
+            expression = conjoin(ds.field("date") <= pd.Timestamp(end).strftime("%Y-%m-%d"))
+        return expression
+
+    def query(self, columns=None, symbol=None, start=None, end=None):
+        """Rows matching symbol(s) and an inclusive date range, reading only `columns`"""
+        if not any(self.root.rglob("*.parquet")):
+            return pd.DataFrame(columns=columns or DEFAULT_COLUMNS)
+        table = self.dataset().to_table(
+            columns=columns or DEFAULT_COLUMNS,
+            filter=self._filter(symbol, start, end),
+        )
+        return table.to_pandas()
+
+    def top_n(self, n=10, by="sharpe_ratio", symbol=None, start=None, end=None, columns=None):
+        """Best `n` results by a metric (descending), e.g. top-N by Sharpe"""
+        columns = list(dict.fromkeys((columns or DEFAULT_COLUMNS) + [by]))
+        frame = self.query(columns=columns, symbol=symbol, start=start, end=end)
+        return frame.sort_values(by, ascending=False, na_position="last").head(n).reset_index(drop=True)
+
+    def compact(self, date):
+        """Rewrite every symbol partition of one date as a single file"""
+        date = pd.Timestamp(date).strftime("%Y-%m-%d")
+        for partition in sorted((self.root / f"date={date}").glob("symbol=*")):
+            parts = sorted(partition.glob("*.parquet"))
+            if len(parts) < 2:
+                continue
+            table = ds.dataset(parts, format="parquet").to_table()
+            merged = partition / f"part-{uuid.uuid4().hex}-0.parquet"
+            pq.write_table(table, merged)
+            for part in parts:
+                part.unlink()
+            logger.info(f"Compacted {len(parts)} file(s) in {partition}")
+
+
+class WeaviateResultsWriter:
+    """Write result rows to Weaviate as BacktestResult objects in batches"""
+
+    def __init__(self, client, class_name="BacktestResult", batch_size=100):
+        self.client = client
+        self.class_name = class_name
+        self.batch_size = batch_size
+
+    def write(self, rows):
+        self.client.batch.configure(batch_size=self.batch_size)
+        with self.client.batch as batch:
+            for row in rows:
+                data_object = {
+                    **row,
+                    "processed_at": row["processed_at"].isoformat() + "Z",
+                }
+                batch.add_data_object(data_object=data_object, class_name=self.class_name)
+        logger.info(f"Queued {len(rows)} {self.class_name} object(s) to Weaviate")
+        return len(rows)
+
+
+def results_store_from_env():
+    """Results store rooted at RESULTS_DIR (default ./results)"""
+    return ResultsStore(os.getenv("RESULTS_DIR", "results"))
+
+
+def weaviate_writer_from_env():
+    """BacktestResult writer for WEAVIATE_URL"""
+    import weaviate
+
+    client = weaviate.Client(os.getenv("WEAVIATE_URL", "http://weaviate:8080"))
+    return WeaviateResultsWriter(client)
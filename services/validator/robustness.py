@@ -0,0 +1,173 @@
+#!/usr/bin/env python3
+"""
+Robustness checks - walk-forward splits and Monte Carlo (bootstrap) resampling
+of strategy returns, evaluated as whole matrices by the Numba metric kernels
+"""
+
+import logging
+import math
+import time
+
+import numpy as np
+import pandas as pd
+
+from cpu_engine import returns_metrics
+
+logger = logging.getLogger(__name__)
+
+METRICS = ("total_return", "sharpe_ratio", "max_drawdown")
+PERCENTILES = (5, 25, 50, 75, 95)
+
+
+def summarize(metrics, percentiles=PERCENTILES):
+    """Distribution of each metric column: mean, std and percentiles"""
+    rows = {}
+    for name in metrics.columns:
+        values = metrics[name].to_numpy(dtype=float)
+        values = values[np.isfinite(values)]
+        if values.size == 0:
+            rows[name] = {"mean": np.nan, "std": np.nan, **{f"p{p}": np.nan for p in percentiles}}
+            continue
+        rows[name] = {
+            "mean": values.mean(),
+            "std": values.std(ddof=1) if values.size > 1 else 0.0,
+            **dict(zip((f"p{p}" for p in percentiles), np.percentile(values, percentiles))),
+        }
+    return pd.DataFrame.from_dict(rows, orient="index")
+
+
+def walk_forward_splits(n_bars, train_size, test_size, step=None):
+    """Start offsets of rolling train windows, each followed by its test window"""
+    step = step or test_size
+    window = train_size + test_size
+    if train_size < 2 or test_size < 2:
+        raise ValueError("Walk-forward windows need at least 2 bars each")
+    if window > n_bars:
+        raise ValueError(f"Walk-forward window of {window} bars exceeds {n_bars} bars of history")
+    return np.arange(0, n_bars - window + 1, step)
+
+
+def _stack_windows(values, starts, offset, size):
+    """Gather (n_splits, size, n_cols) windows and lay them out as (size, n_splits * n_cols)"""
+    index = starts[:, None] + offset + np.arange(size)
+    windows = values[index]
+    return windows.transpose(1, 0, 2).reshape(size, -1)
+
+
+def _split_metrics(values, starts, offset, size, freq):
+    """Metric name -> (n_splits, n_cols) array for one side of every split"""
+    n_splits, n_cols = len(starts), values.shape[1]
+    metrics = returns_metrics(_stack_windows(values, starts, offset, size), freq=freq)
+    return {name: metrics[name].to_numpy().reshape(n_splits, n_cols) for name in METRICS}
+
+
+def walk_forward(returns, train_size=180, test_size=30, step=None, rank_by="sharpe_ratio", freq="1D"):
+    """Pick the best column in-sample per split and score it out-of-sample
+
+    `returns` is a (bars x combinations) frame, e.g. the per-bar returns of a
+    parameter sweep. All splits and combinations are scored in one pass.
+    """
+    if rank_by not in METRICS:
+        raise ValueError(f"Cannot rank by {rank_by}; choose one of {METRICS}")
+    if isinstance(returns, pd.Series):
+        returns = returns.to_frame()
+
+    start_time = time.perf_counter()
+    values = np.nan_to_num(returns.to_numpy(dtype=np.float64), nan=0.0)
+    starts = walk_forward_splits(len(returns), train_size, test_size, step)
+
+    train = _split_metrics(values, starts, 0, train_size, freq)
+    test = _split_metrics(values, starts, train_size, test_size, freq)
+
+    score = np.where(np.isfinite(train[rank_by]), train[rank_by], -np.inf)
+    best = score.argmax(axis=1)
+    splits = np.arange(len(starts))
+
+    index = returns.index
+    names = [str(n) for n in returns.columns.names] if returns.columns.nlevels > 1 else ["column"]
+    best_params = pd.DataFrame(
+        [c if isinstance(c, tuple) else (c,) for c in returns.columns[best]], columns=names
+    )
+    per_split = pd.concat([
+        pd.DataFrame({
+            "split": splits,
+            "train_start": index[starts],
+            "test_start": index[starts + train_size],
+            "test_end": index[starts + train_size + test_size - 1],
+        }),
+        best_params,
+        pd.DataFrame({
+            f"in_sample_{rank_by}": train[rank_by][splits, best],
+            **{f"oos_{name}": test[name][splits, best] for name in METRICS},
+        }),
+    ], axis=1)
+
+    oos = per_split[[f"oos_{name}" for name in METRICS]]
+    oos.columns = list(METRICS)
+    computation_time = time.perf_counter() - start_time
+
+    logger.info(
+        f"Walk-forward: {len(starts)} split(s) x {values.shape[1]} combination(s) "
+        f"scored in {computation_time:.3f}s"
+    )
+    return {
+        "splits": len(starts),
+        "train_size": train_size,
+        "test_size": test_size,
+        "per_split": per_split,
+        "distribution": summarize(oos),
+        "computation_time": computation_time,
+    }
+
+
+def bootstrap_indices(rng, n_bars, horizon, n_resamples, block_size=1):
+    """(horizon, n_resamples) bar indices; block_size > 1 keeps autocorrelation (circular blocks)"""
+    n_blocks = math.ceil(horizon / block_size)
+    block_starts = rng.integers(0, n_bars, size=(n_resamples, n_blocks))
+    index = (block_starts[:, :, None] + np.arange(block_size)) % n_bars
+    return index.reshape(n_resamples, -1)[:, :horizon].T
+
+
+def monte_carlo(returns, n_resamples=10000, horizon=None, block_size=1, chunk_size=2000,
+                seed=None, freq="1D"):
+    """Bootstrap the return series and report metric distributions
+
+    Resamples are generated and scored `chunk_size` at a time, so peak memory
+    is bounded by horizon * chunk_size floats regardless of n_resamples.
+    """
+    if isinstance(returns, pd.DataFrame):
+        if returns.shape[1] != 1:
+            raise ValueError("Monte Carlo expects a single return series")
+        returns = returns.iloc[:, 0]
+    values = np.asarray(returns, dtype=np.float64)
+    values = values[np.isfinite(values)]
+    if values.size < 2:
+        raise ValueError("Monte Carlo needs at least 2 returns")
+
+    horizon = horizon or values.size
+    rng = np.random.default_rng(seed)
+
+    start_time = time.perf_counter()
+    chunks = []
+    for offset in range(0, n_resamples, chunk_size):
+        size = min(chunk_size, n_resamples - offset)
+        sample = values[bootstrap_indices(rng, values.size, horizon, size, block_size)]
+        chunks.append(returns_metrics(sample, freq=freq))
+    metrics = pd.concat(chunks, ignore_index=True)
+    computation_time = time.perf_counter() - start_time
+
+    resamples_per_sec = n_resamples / computation_time if computation_time > 0 else float("inf")
+    logger.info(
+        f"Monte Carlo: {n_resamples} resamples x {horizon} bars in {computation_time:.3f}s "
+        f"({resamples_per_sec:,.0f} resamples/sec)"
+    )
+    return {
+        "n_resamples": n_resamples,
+        "horizon": horizon,
+        "block_size": block_size,
+        "chunk_size": chunk_size,
+        "distribution": summarize(metrics),
+        "probability_of_loss": float((metrics["total_return"] < 0).mean()),
+        "computation_time": computation_time,
+        "resamples_per_sec": resamples_per_sec,
+    }
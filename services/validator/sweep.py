@@ -0,0 +1,198 @@
+#!/usr/bin/env python3
+"""
+Parameter-sweep backtesting - every parameter combination is one column of a
+2-D signal matrix evaluated by a single vectorbt Portfolio.from_signals call
+"""
+
+import itertools
+import logging
+import time
+
+import numpy as np
+import pandas as pd
+
+logger = logging.getLogger(__name__)
+
+RANK_METRICS = ("sharpe_ratio", "total_return", "max_drawdown")
+
+
+def _as_price_series(price):
+    """Coerce a single-column price frame (new yfinance layout) to a Series"""
+    if isinstance(price, pd.DataFrame):
+        if price.shape[1] != 1:
+            raise ValueError("Parameter sweep expects a single price series")
+        price = price.iloc[:, 0]
+    return price.astype(float)
+
+
+def _crossed(a, b):
+    """Boolean matrix of where `a` crosses above `b` (column-wise)"""
+    above = a > b
+    prev_above = np.zeros_like(above)
+    prev_above[1:] = above[:-1]
+    return above & ~prev_above
+
+
+def build_param_grid(param_grid, constraint=None):
+    """Expand {name: [values]} into a list of parameter dicts (cartesian product)"""
+    if not param_grid:
+        raise ValueError("Parameter grid must not be empty")
+
+    names = list(param_grid)
+    combos = [
+        dict(zip(names, values))
+        for values in itertools.product(*(param_grid[name] for name in names))
+    ]
+    if constraint is not None:
+        combos = [combo for combo in combos if constraint(combo)]
+
+    if not combos:
+        raise ValueError("Parameter grid produced no valid combinations")
+    return combos
+
+
+def ma_crossover_signals(price, param_grid):
+    """Entries/exits for every (fast_window, slow_window) pair with fast < slow"""
+    price = _as_price_series(price)
+    combos = build_param_grid(
+        {"fast_window": param_grid["fast_window"], "slow_window": param_grid["slow_window"]},
+        constraint=lambda c: c["fast_window"] < c["slow_window"],
+    )
+
+    # One rolling mean per unique window, then gather columns per combination
+    windows = sorted({c["fast_window"] for c in combos} | {c["slow_window"] for c in combos})
+    ma = np.column_stack([price.rolling(w).mean().to_numpy() for w in windows])
+    position = {w: i for i, w in enumerate(windows)}
+    fast = ma[:, [position[c["fast_window"]] for c in combos]]
+    slow = ma[:, [position[c["slow_window"]] for c in combos]]
+
+    with np.errstate(invalid="ignore"):
+        entries = _crossed(fast, slow)
+        exits = _crossed(slow, fast)
+
+    columns = pd.MultiIndex.from_tuples(
+        [(c["fast_window"], c["slow_window"]) for c in combos],
+        names=["fast_window", "slow_window"],
+    )
+    return (
+        pd.DataFrame(entries, index=price.index, columns=columns),
+        pd.DataFrame(exits, index=price.index, columns=columns),
+    )
+
+
+def _rsi(price, window):
+    """Wilder RSI as a NumPy array"""
+    delta = price.diff()
+    gain = delta.clip(lower=0).ewm(alpha=1 / window, adjust=False, min_periods=window).mean()
+    loss = (-delta.clip(upper=0)).ewm(alpha=1 / window, adjust=False, min_periods=window).mean()
+    return (100 - 100 / (1 + gain / loss)).to_numpy()
+
+
+def rsi_threshold_signals(price, param_grid):
+    """Enter when RSI crosses below `entry`, exit when it crosses above `exit`"""
+    price = _as_price_series(price)
+    combos = build_param_grid(
+        {
+            "window": param_grid["window"],
+            "entry": param_grid["entry"],
+            "exit": param_grid["exit"],
+        },
+        constraint=lambda c: c["entry"] < c["exit"],
+    )
+
+    windows = sorted({c["window"] for c in combos})
+    rsi = np.column_stack([_rsi(price, w) for w in windows])
+    position = {w: i for i, w in enumerate(windows)}
+    rsi = rsi[:, [position[c["window"]] for c in combos]]
+    entry = np.array([c["entry"] for c in combos], dtype=float)
+    exit_ = np.array([c["exit"] for c in combos], dtype=float)
+
+    with np.errstate(invalid="ignore"):
+        entries = _crossed(np.broadcast_to(entry, rsi.shape), rsi)
+        exits = _crossed(rsi, np.broadcast_to(exit_, rsi.shape))
+
+    columns = pd.MultiIndex.from_tuples(
+        [(c["window"], c["entry"], c["exit"]) for c in combos],
+        names=["window", "entry", "exit"],
+    )
+    return (
+        pd.DataFrame(entries, index=price.index, columns=columns),
+        pd.DataFrame(exits, index=price.index, columns=columns),
+    )
+
+
+STRATEGIES = {
+    "ma_crossover": ma_crossover_signals,
+    "rsi_threshold": rsi_threshold_signals,
+}
+
+
+def run_sweep(price, param_grid, strategy="ma_crossover", initial_cash=10000,
+              fees=0.0, freq="1D", rank_by="sharpe_ratio", top_n=None, keep_returns=False):
+    """Evaluate every parameter combination in one vectorized pass"""
+    from backend import load_vectorbt
+
+    vbt = load_vectorbt()
+
+    if strategy not in STRATEGIES:
+        raise ValueError(f"Unknown strategy: {strategy}")
+    if rank_by not in RANK_METRICS:
+        raise ValueError(f"Cannot rank by {rank_by}; choose one of {RANK_METRICS}")
+
+    price = _as_price_series(price)
+    if price.empty:
+        raise ValueError("No price data to sweep")
+
+    start_time = time.perf_counter()
+
+    entries, exits = STRATEGIES[strategy](price, param_grid)
+    signal_time = time.perf_counter() - start_time
+
+    portfolio = vbt.Portfolio.from_signals(
+        price,
+        entries,
+        exits,
+        init_cash=initial_cash,
+        fees=fees,
+        freq=freq,
+    )
+
+    table = pd.DataFrame({
+        "total_return": portfolio.total_return(),
+        "sharpe_ratio": portfolio.sharpe_ratio(),
+        "max_drawdown": portfolio.max_drawdown(),
+        "final_value": portfolio.final_value(),
+        "trades_count": portfolio.trades.count(),
+    })
+    computation_time = time.perf_counter() - start_time
+
+    # max_drawdown is negative in vectorbt, so "best" is always descending
+    table = table.sort_values(rank_by, ascending=False, na_position="last")
+    table.insert(0, "rank", np.arange(1, len(table) + 1))
+    table = table.reset_index()
+    if top_n is not None:
+        table = table.head(top_n)
+
+    combinations = entries.shape[1]
+    combos_per_sec = combinations / computation_time if computation_time > 0 else float("inf")
+
+    logger.info(
+        f"Swept {combinations} {strategy} combinations over {len(price)} bars "
+        f"in {computation_time:.3f}s ({combos_per_sec:,.0f} combos/sec)"
+    )
+
+    results = {
+        "strategy": strategy,
+        "combinations": combinations,
+        "bars": len(price),
+        "ranked": table,
+        "rank_by": rank_by,
+        "signal_time": signal_time,
+        "computation_time": computation_time,
+        "combos_per_sec": combos_per_sec,
+        "backend": "cpu",
+    }
+    if keep_returns:
+        # Per-bar returns of every combination (bars x combinations) for robustness checks
+        results["returns"] = portfolio.returns()
+    return results
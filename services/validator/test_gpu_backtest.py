@@ -35,7 +35,9 @@ def test_run_backtest_gpu():
     """Test backtest with GPU backend (only if GPU available)"""
     results = run_backtest(symbol="BTC-USD", backend="gpu", initial_cash=1000)
     
-    assert results["gpu_accelerated"] is True
+    # No GPU engine exists for these metrics, so execution is reported as CPU
+    assert results["gpu_accelerated"] is False
+    assert results["gpu_available"] is True
     assert results["initial_cash"] == 1000
     assert "total_return" in results
     assert "sharpe_ratio" in results
@@ -0,0 +1,370 @@
+#!/usr/bin/env python3
+"""
+Validator worker - long-running consumer of validation jobs from a Redis stream
+
+Jobs are read with XREADGROUP from VALIDATION_STREAM and executed by a pool of
+`concurrency` slots. Each slot imports the libraries, opens the market-data
+store and warms the JIT kernels once, then serves jobs until shutdown, so a
+job pays only for its own compute. Results and timings are written to the
+results store and published to VALIDATION_RESULTS_STREAM.
+
+Job fields (all strings, lists/dicts JSON-encoded):
+    concept, symbols, strategy (buy_and_hold or a sweep strategy),
+    params (parameter grid), initial_cash, engine, rank_by, top_n,
+    trace_id (the crawl's trace; queue wait, backtest and store become spans)
+
+With VALIDATOR_INCREMENTAL=true, buy_and_hold jobs update per-symbol state
+from the bars added since the previous job (see incremental.py) instead of
+recomputing the whole period; sweep jobs always recompute.
+
+Jobs left pending by a consumer that died are reclaimed with XAUTOCLAIM once
+idle for VALIDATION_CLAIM_IDLE_MS; after VALIDATION_MAX_DELIVERIES attempts a
+job is published as failed instead of being retried again.
+"""
+
+import json
+import logging
+import multiprocessing
+import os
+import signal
+import socket
+import time
+from concurrent.futures import FIRST_COMPLETED, Future, ProcessPoolExecutor, wait
+
+import msgspec
+
+from messages import ValidationJob, encode
+from tracing import record_span, span
+
+logger = logging.getLogger(__name__)
+
+REDIS_URL = os.getenv("REDIS_URL", "redis://redis:6379")
+JOBS_STREAM = os.getenv("VALIDATION_STREAM", "validation_jobs")
+RESULTS_STREAM = os.getenv("VALIDATION_RESULTS_STREAM", "validation_results")
+CONSUMER_GROUP = os.getenv("VALIDATION_GROUP", "validators")
+VALIDATOR_INCREMENTAL = os.getenv("VALIDATOR_INCREMENTAL", "false").lower() == "true"
+CLAIM_IDLE_MS = int(os.getenv("VALIDATION_CLAIM_IDLE_MS", "1800000"))  # longer than any job runs
+CLAIM_INTERVAL = 60.0
+MAX_DELIVERIES = int(os.getenv("VALIDATION_MAX_DELIVERIES", "3"))
+RESULTS_MAXLEN = 10000
+
+# Per-slot state, created once by init_slot() and reused by every job
+_state = {}
+
+
+def submit_job(client, concept, symbols, strategy="buy_and_hold", params=None, stream=JOBS_STREAM, **options):
+    """Enqueue a validation job; returns its stream id"""
+    fields = {
+        "concept": concept,
+        "symbols": json.dumps(list(symbols)),
+        "strategy": strategy,
+        "params": json.dumps(params or {}),
+    }
+    fields.update({key: str(value) for key, value in options.items() if value is not None})
+    return client.xadd(stream, fields)
+
+
+def _decode(value):
+    return value.decode() if isinstance(value, bytes) else value
+
+
+def parse_job(job_id, fields):
+    """Validate raw stream fields against ValidationJob; returns a job dict"""
+    fields = {_decode(k): _decode(v) for k, v in fields.items()}
+    symbols = fields.get("symbols", "")
+    if symbols.startswith("["):
+        symbols = json.loads(symbols)
+    else:
+        symbols = [s.strip() for s in symbols.split(",") if s.strip()]
+    if not symbols:
+        raise ValueError("Job has no symbols")
+
+    job_id = _decode(job_id)
+    job = msgspec.convert(
+        {
+            **fields,
+            "id": job_id,
+            "enqueued_at": int(job_id.split("-")[0]) / 1000,
+            "symbols": symbols,
+            "params": json.loads(fields.get("params") or "{}") or None,
+        },
+        ValidationJob,
+        strict=False,  # numeric fields arrive as strings
+    )
+    return msgspec.structs.asdict(job)
+
+
+def init_slot(engines=("vectorbt", "numba"), offline=False):
+    """Open stores and warm kernels once per worker slot"""
+    from backend import warm_up
+    from incremental import state_store_from_env
+    from market_data import store_from_env
+    from results_store import results_store_from_env
+
+    if multiprocessing.parent_process() is not None:
+        # Spawned pool slot: the parent's logging and tracing setup does not carry over
+        from log_config import setup_logging
+        from tracing import setup_tracing
+        setup_logging("validator")
+        setup_tracing("validator")
+
+    _state["market_data"] = store_from_env(offline=offline)
+    _state["results"] = results_store_from_env()
+    _state["states"] = state_store_from_env() if VALIDATOR_INCREMENTAL else None
+    _state["startup"] = warm_up(engines=engines) if engines else None
+
+
+def run_job(job):
+    """Execute one job in a warm slot; returns the summary published back"""
+    from batch import download_close, run_batch_backtest
+    from incremental import IncrementalBacktester
+    from main import run_parameter_sweep, store_results
+
+    if not _state:
+        init_slot()
+
+    started_at = time.time()
+    start_time = time.perf_counter()
+    market_data = _state["market_data"]
+    runs, errors = [], {}
+    trace_id = job.get("trace_id")
+    record_span("validator.queue_wait", trace_id, job["enqueued_at"], started_at, job_id=job["id"])
+
+    with span("validator.backtest", trace_id, strategy=job["strategy"], symbols=len(job["symbols"])):
+        if job["strategy"] == "buy_and_hold" and _state.get("states") is not None:
+            backtester = IncrementalBacktester(_state["states"], store=market_data,
+                                               fetch=None if market_data is not None else download_close)
+            batch = backtester.run_batch(job["symbols"], initial_cash=job["initial_cash"])
+            batch["portfolio_id"] = job["id"]
+            errors.update(batch["errors"])
+            runs.append(batch)
+        elif job["strategy"] == "buy_and_hold":
+            batch = run_batch_backtest(
+                job["symbols"],
+                initial_cash=job["initial_cash"],
+                max_workers=1,
+                engine=job["engine"],
+                fetch=market_data.fetch_close if market_data is not None else download_close,
+            )
+            batch["portfolio_id"] = job["id"]
+            errors.update(batch["errors"])
+            runs.append(batch)
+        else:
+            for symbol in job["symbols"]:
+                try:
+                    runs.append(run_parameter_sweep(
+                        symbol=symbol,
+                        strategy=job["strategy"],
+                        param_grid=job["params"],
+                        initial_cash=job["initial_cash"],
+                        rank_by=job["rank_by"],
+                        top_n=job["top_n"],
+                        store=market_data,
+                    ))
+                except Exception as e:
+                    logger.warning(f"Job {job['id']}: {symbol} failed: {e}")
+                    errors[symbol] = str(e)
+    compute_time = time.perf_counter() - start_time
+
+    rows = []
+    with span("validator.store", trace_id):
+        for run in runs:
+            run["concept"] = job["concept"]
+            rows.extend(store_results(run, results_store=_state["results"]))
+
+    best = max(
+        (row for row in rows if row["sharpe_ratio"] is not None),
+        key=lambda row: row["sharpe_ratio"],
+        default=None,
+    )
+    return {
+        "job_id": job["id"],
+        "concept": job["concept"],
+        "trace_id": trace_id,
+        "status": "completed" if rows else "failed",
+        "rows": len(rows),
+        "best": {k: best[k] for k in ("symbol", "params", "total_return", "sharpe_ratio", "max_drawdown")}
+        if best else None,
+        "errors": errors,
+        "timings": {
+            "queue_wait": started_at - job["enqueued_at"],
+            "compute_time": compute_time,
+            "total_time": time.perf_counter() - start_time,
+        },
+        "pid": os.getpid(),
+    }
+
+
+class InlineExecutor:
+    """Single slot on the calling thread
+
+    Numba's parallel kernels must run on the main thread: started from a
+    worker thread, the TBB threading layer keeps the interpreter from exiting.
+    """
+
+    def __init__(self, initializer, initargs=()):
+        self.initializer = initializer
+        self.initargs = initargs
+
+    def __enter__(self):
+        self.initializer(*self.initargs)
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+    def submit(self, fn, *args):
+        future = Future()
+        try:
+            future.set_result(fn(*args))
+        except Exception as e:
+            future.set_exception(e)
+        return future
+
+
+class ValidationWorker:
+    """Consume jobs from a Redis stream group at a fixed concurrency"""
+
+    def __init__(self, client, concurrency=1, engines=("vectorbt", "numba"), offline=False,
+                 stream=JOBS_STREAM, results_stream=RESULTS_STREAM, group=CONSUMER_GROUP,
+                 consumer=None, block_ms=5000, claim_idle_ms=CLAIM_IDLE_MS, max_deliveries=MAX_DELIVERIES):
+        self.client = client
+        self.concurrency = max(1, concurrency)
+        self.engines = tuple(engines)
+        self.offline = offline
+        self.stream = stream
+        self.results_stream = results_stream
+        self.group = group
+        self.consumer = consumer or f"{socket.gethostname()}-{os.getpid()}"
+        self.block_ms = block_ms
+        self.claim_idle_ms = claim_idle_ms
+        self.max_deliveries = max_deliveries
+        self._claimed_at = None
+        self.processed = 0
+        self._running = False
+
+    def ensure_group(self):
+        import redis
+
+        try:
+            self.client.xgroup_create(self.stream, self.group, id="0", mkstream=True)
+        except redis.ResponseError as e:
+            if "BUSYGROUP" not in str(e):
+                raise
+
+    def executor(self):
+        """Slot on the main thread for concurrency 1, otherwise warmed worker processes"""
+        initargs = (self.engines, self.offline)
+        if self.concurrency == 1:
+            return InlineExecutor(init_slot, initargs)
+
+        from batch import pool_context
+
+        return ProcessPoolExecutor(
+            max_workers=self.concurrency,
+            mp_context=pool_context(),
+            initializer=init_slot,
+            initargs=initargs,
+        )
+
+    def publish(self, message_id, summary):
+        self.client.xadd(
+            self.results_stream,
+            {"job_id": summary["job_id"], "status": summary["status"],
+             "result": encode(summary).decode()},
+            maxlen=RESULTS_MAXLEN,
+            approximate=True,
+        )
+        self.client.xack(self.stream, self.group, message_id)
+        self.processed += 1
+        logger.info(
+            f"Job {summary['job_id']} {summary['status']}: {summary.get('rows', 0)} row(s), "
+            f"compute {summary.get('timings', {}).get('compute_time', 0.0):.3f}s"
+        )
+
+    def reclaim(self, count):
+        """Entries idle in other consumers' pending lists (they died mid-job), at most once per CLAIM_INTERVAL"""
+        now = time.monotonic()
+        if self._claimed_at is not None and now - self._claimed_at < CLAIM_INTERVAL:
+            return []
+        self._claimed_at = now
+        response = self.client.xautoclaim(self.stream, self.group, self.consumer, self.claim_idle_ms,
+                                          start_id="0-0", count=count)
+        entries = []
+        for message_id, fields in response[1]:
+            if fields is None:  # deleted from the stream while pending
+                self.client.xack(self.stream, self.group, message_id)
+                continue
+            (info,) = self.client.xpending_range(self.stream, self.group, min=message_id, max=message_id, count=1)
+            if info["times_delivered"] > self.max_deliveries:
+                self.publish(message_id, {"job_id": _decode(message_id), "status": "failed",
+                                          "error": f"Gave up after {info['times_delivered'] - 1} deliveries"})
+                continue
+            logger.warning(f"Reclaimed job {_decode(message_id)} (delivery {info['times_delivered']})")
+            entries.append((message_id, fields))
+        return entries
+
+    def read(self, count, block_ms):
+        claimed = self.reclaim(count)
+        if claimed:
+            yield from claimed
+            return
+        response = self.client.xreadgroup(
+            self.group, self.consumer, {self.stream: ">"}, count=count, block=block_ms
+        )
+        for _, entries in response or []:
+            yield from entries
+
+    def stop(self, *_):
+        logger.info("Stopping validator worker after in-flight jobs")
+        self._running = False
+
+    def run(self, max_jobs=None):
+        """Serve jobs until stop() (or until max_jobs have been handled)"""
+        self.ensure_group()
+        self._running = True
+        pending = {}
+        logger.info(f"Validator worker {self.consumer} consuming {self.stream} at concurrency {self.concurrency}")
+
+        with self.executor() as executor:
+            while self._running or pending:
+                budget = self.concurrency - len(pending)
+                if max_jobs is not None:
+                    budget = min(budget, max_jobs - self.processed - len(pending))
+                if self._running and budget > 0:
+                    # Block on Redis only when nothing is in flight
+                    for message_id, fields in self.read(budget, 100 if pending else self.block_ms):
+                        try:
+                            job = parse_job(message_id, fields)
+                        except Exception as e:
+                            self.publish(message_id, {"job_id": _decode(message_id), "status": "rejected",
+                                                      "error": str(e)})
+                            continue
+                        pending[executor.submit(run_job, job)] = (message_id, job)
+
+                if pending:
+                    done, _ = wait(pending, timeout=0.1, return_when=FIRST_COMPLETED)
+                    for future in done:
+                        message_id, job = pending.pop(future)
+                        try:
+                            summary = future.result()
+                        except Exception as e:
+                            logger.error(f"Job {job['id']} failed: {e}")
+                            summary = {"job_id": job["id"], "concept": job["concept"],
+                                       "trace_id": job.get("trace_id"), "status": "failed", "error": str(e)}
+                        self.publish(message_id, summary)
+
+                if max_jobs is not None and self.processed >= max_jobs:
+                    self._running = False
+
+        return self.processed
+
+
+def run_worker(concurrency=1, offline=False, max_jobs=None):
+    """Connect to REDIS_URL and serve validation jobs until SIGTERM/SIGINT"""
+    import redis
+
+    worker = ValidationWorker(redis.Redis.from_url(REDIS_URL), concurrency=concurrency, offline=offline)
+    signal.signal(signal.SIGTERM, worker.stop)
+    signal.signal(signal.SIGINT, worker.stop)
+    return worker.run(max_jobs=max_jobs)
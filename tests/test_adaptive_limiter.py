@@ -0,0 +1,126 @@
+#!/usr/bin/env python3
+"""
+Unit tests for the AIMD concurrency limiter and its use around QStash publishes
+"""
+
+import asyncio
+import pytest
+import sys
+
+import httpx
+respx = pytest.importorskip("respx")
+pytest.importorskip("prometheus_client")
+
+from adaptive import AdaptiveLimiter
+
+sys.path.append('services/crawler')
+import main as crawler
+
+def test_additive_increase_multiplicative_decrease():
+    """Test fast calls raise the limit ~1 per window, errors and spikes halve it once"""
+    changes = []
+    limiter = AdaptiveLimiter("test", initial=4, max_limit=6, target_latency=0.1, on_change=changes.append,
+                              clock=lambda: 10.0)
+    for _ in range(4):
+        limiter.record(0.05)
+    assert limiter.limit == pytest.approx(4.92, abs=0.01)
+
+    limiter.record(0.15)  # between target and spike: hold
+    assert limiter.limit == pytest.approx(4.92, abs=0.01)
+
+    limiter.record(0.05, error=True, started=9.0)
+    assert limiter.limit == pytest.approx(2.46, abs=0.01)
+    limiter.record(0.5, started=9.5)  # in flight before the cut: not cut again
+    assert limiter.limit == pytest.approx(2.46, abs=0.01)
+
+    for _ in range(200):
+        limiter.record(0.01)
+    assert limiter.limit == 6
+    assert changes[0] == 4 and changes[-1] == 6
+
+@pytest.mark.asyncio
+async def test_slots_bound_concurrency():
+    """Test no more than `capacity` calls run at once"""
+    limiter = AdaptiveLimiter("test", initial=3, max_limit=3, target_latency=1.0)
+    running, peak = 0, 0
+
+    async def call():
+        nonlocal running, peak
+        async with limiter.slot():
+            running += 1
+            peak = max(peak, running)
+            await asyncio.sleep(0.01)
+            running -= 1
+
+    await asyncio.gather(*(call() for _ in range(20)))
+    assert peak == 3
+
+class StandIn:
+    """Local QStash stand-in: fast up to `capacity` concurrent publishes, then slower, then 429"""
+
+    def __init__(self, capacity=4, base_latency=0.01):
+        self.capacity = capacity
+        self.base_latency = base_latency
+        self.inflight = 0
+        self.peak = 0
+        self.throttled = 0
+
+    async def __call__(self, request):
+        self.inflight += 1
+        self.peak = max(self.peak, self.inflight)
+        try:
+            if self.inflight > 2 * self.capacity:
+                self.throttled += 1
+                return httpx.Response(429)
+            overload = max(0, self.inflight - self.capacity)
+            await asyncio.sleep(self.base_latency * (1 + 4 * overload))
+            return httpx.Response(200, json={"messageId": "m"})
+        finally:
+            self.inflight -= 1
+
+@pytest.mark.asyncio
+async def test_limit_settles_at_standin_capacity():
+    """Test the limit grows while the stand-in is fast and backs off once its latency climbs"""
+    stand_in = StandIn(capacity=4)
+    limiter = AdaptiveLimiter("standin", initial=1, max_limit=32, target_latency=0.02)
+    limits = []
+
+    async def worker(client):
+        for _ in range(25):
+            try:
+                async with limiter.slot():
+                    response = await client.post("http://standin/publish")
+                    response.raise_for_status()
+            except httpx.HTTPStatusError:
+                pass
+            limits.append(limiter.limit)
+
+    # 16 callers offer four times the concurrency the stand-in absorbs
+    async with httpx.AsyncClient(transport=httpx.MockTransport(stand_in)) as client:
+        await asyncio.gather(*(worker(client) for _ in range(16)))
+
+    assert max(limits) >= stand_in.capacity
+    assert stand_in.peak <= 2 * stand_in.capacity
+    assert stand_in.throttled == 0
+    settled = limits[len(limits) // 2:]
+    assert 2 <= sum(settled) / len(settled) <= 8
+
+@pytest.mark.asyncio
+@respx.mock
+async def test_publish_429_cuts_publish_limit(monkeypatch):
+    """Test a throttled QStash publish halves the crawler's limit and updates the gauge"""
+    monkeypatch.setenv("QSTASH_URL", "https://qstash.test/v2/publish/target")
+    monkeypatch.setenv("QSTASH_TOKEN", "token")
+    limiter = AdaptiveLimiter("qstash_publish", initial=8, on_change=crawler.publish_limit.set)
+    monkeypatch.setattr(crawler, "publish_limiter", limiter)
+    respx.post("https://qstash.test/v2/publish/target").mock(return_value=httpx.Response(429))
+
+    with pytest.raises(httpx.HTTPStatusError):
+        await crawler.publish_to_qstash("https://example.com/a")
+
+    assert limiter.limit == 4
+    assert limiter.inflight == 0
+    assert crawler.publish_limit._value.get() == 4
+
+if __name__ == "__main__":
+    pytest.main([__file__])
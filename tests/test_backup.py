@@ -0,0 +1,187 @@
+#!/usr/bin/env python3
+"""
+Unit tests for the incremental backup pipeline against a moto S3 stand-in
+"""
+
+import io
+import os
+import pytest
+import sys
+from datetime import datetime, timedelta, timezone
+
+import numpy as np
+
+boto3 = pytest.importorskip("boto3")
+moto = pytest.importorskip("moto")
+
+# Add backup service to path
+sys.path.append('services/backup')
+from backup import BackupRepository, FilesystemSource, WeaviateBackupSource
+from chunking import Chunker, gear_hashes
+
+BUCKET = "trading-backups"
+
+def random_bytes(n, seed=0):
+    return np.random.default_rng(seed).integers(0, 256, n, dtype=np.uint8).tobytes()
+
+def small_chunker():
+    return Chunker(min_size=256, avg_size=1024, max_size=4096, read_size=8192)
+
+def write_tree(root, files):
+    for relpath, data in files.items():
+        path = root / relpath
+        path.parent.mkdir(parents=True, exist_ok=True)
+        path.write_bytes(data)
+
+def read_tree(root):
+    return {
+        os.path.relpath(os.path.join(d, n), root): open(os.path.join(d, n), "rb").read()
+        for d, _, names in os.walk(root) for n in names
+    }
+
+@pytest.fixture
+def repo():
+    with moto.mock_aws():
+        s3 = boto3.client("s3", region_name="us-east-1")
+        s3.create_bucket(Bucket=BUCKET)
+        yield BackupRepository(s3, BUCKET, chunker=small_chunker(), workers=4, pack_size=16 * 1024)
+
+def test_chunk_boundaries_survive_insertions():
+    """Test cut points depend on content, not on offsets or read sizes"""
+    data = random_bytes(200_000)
+    chunker = small_chunker()
+    chunks = list(chunker.chunks(io.BytesIO(data)))
+
+    assert b"".join(chunks) == data
+    assert all(256 <= len(c) <= 4096 for c in chunks[:-1])
+    assert list(Chunker(256, 1024, 4096, read_size=1).chunks(io.BytesIO(data))) == chunks
+
+    shifted = list(chunker.chunks(io.BytesIO(data[:100] + b"inserted" + data[100:])))
+    assert len(set(chunks) & set(shifted)) >= len(chunks) - 2
+
+def test_gear_hash_matches_rolling_definition():
+    """Test the vectorised hash equals the byte-at-a-time gear hash"""
+    from chunking import GEAR
+    data = random_bytes(100)
+    expected, h = [], 0
+    for i, byte in enumerate(data):
+        h = ((h << 1) + int(GEAR[byte])) & 0xFFFFFFFF
+        expected.append(h)
+    # Bits shifted out of 32 make the window 32 bytes, same as the rolling form
+    assert gear_hashes(data).tolist() == expected
+
+def test_backup_and_restore_round_trip(repo, tmp_path):
+    """Test a restored tree is byte-identical and excludes temp files"""
+    files = {"db/segment-1.db": random_bytes(30_000, 1), "db/empty": b"", "schema.json": b'{"classes": []}'}
+    write_tree(tmp_path / "data", files)
+    write_tree(tmp_path / "data", {"db/write.lock": b"x"})
+
+    stats = repo.backup(FilesystemSource(str(tmp_path / "data")), backup_id="2024-06-01_02-00-00")
+    assert stats["files"] == 3
+    assert stats["new_bytes"] == stats["bytes"]
+    assert stats["packs"] >= 2
+
+    repo.restore(str(tmp_path / "restored"))
+    assert read_tree(tmp_path / "restored") == files
+
+def test_second_backup_uploads_only_changed_chunks(repo, tmp_path):
+    """Test unchanged data is deduplicated against earlier backups"""
+    base = random_bytes(60_000, 2)
+    write_tree(tmp_path / "data", {"a.db": base, "b.db": base})
+    first = repo.backup(FilesystemSource(str(tmp_path / "data")), backup_id="2024-06-01_02-00-00")
+    # Identical files share chunks within one backup
+    assert first["new_bytes"] == len(base)
+
+    write_tree(tmp_path / "data", {"a.db": base[:30_000] + b"appended row" + base[30_000:]})
+    second = repo.backup(FilesystemSource(str(tmp_path / "data")), backup_id="2024-06-02_02-00-00")
+    assert 0 < second["new_bytes"] < 3 * 4096
+    assert second["dedup_ratio"] > 0.9
+
+    repo.restore(str(tmp_path / "restored"), backup_id="2024-06-02_02-00-00")
+    assert read_tree(tmp_path / "restored")["a.db"] == base[:30_000] + b"appended row" + base[30_000:]
+
+def test_point_in_time_resolution(repo, tmp_path):
+    """Test restore picks the latest complete backup at or before a time"""
+    write_tree(tmp_path / "data", {"a.db": b"v1"})
+    repo.backup(FilesystemSource(str(tmp_path / "data")), backup_id="2024-06-01_02-00-00")
+    write_tree(tmp_path / "data", {"a.db": b"v2"})
+    repo.backup(FilesystemSource(str(tmp_path / "data")), backup_id="2024-06-02_02-00-00")
+    # A legacy rclone copy (no manifest) is not a restorable backup
+    repo.client.put_object(Bucket=BUCKET, Key="weaviate-data/2024-06-03_02-00-00/a.db", Body=b"old")
+
+    assert repo.backup_ids() == ["2024-06-01_02-00-00", "2024-06-02_02-00-00"]
+    assert repo.resolve(at=datetime(2024, 6, 1, 12, tzinfo=timezone.utc)) == "2024-06-01_02-00-00"
+    assert repo.resolve() == "2024-06-02_02-00-00"
+    with pytest.raises(ValueError):
+        repo.resolve(at=datetime(2024, 5, 1, tzinfo=timezone.utc))
+
+    repo.restore(str(tmp_path / "restored"), at=datetime(2024, 6, 1, 12, tzinfo=timezone.utc))
+    assert read_tree(tmp_path / "restored") == {"a.db": b"v1"}
+
+def test_prune_keeps_packs_that_newer_backups_reference(repo, tmp_path):
+    """Test retiring old backups frees only unreferenced packs and every kept backup still restores"""
+    base = random_bytes(60_000, 3)
+    versions = {
+        "2024-06-01_02-00-00": {"a.db": base, "old.db": random_bytes(40_000, 4)},
+        "2024-06-02_02-00-00": {"a.db": base + b"row 2"},
+        "2024-06-03_02-00-00": {"a.db": base + b"row 2" + b"row 3"},
+    }
+    for backup_id, files in versions.items():
+        (tmp_path / "data").mkdir(exist_ok=True)
+        for path in (tmp_path / "data").iterdir():
+            path.unlink()
+        write_tree(tmp_path / "data", files)
+        repo.backup(FilesystemSource(str(tmp_path / "data")), backup_id=backup_id)
+    packs_before = set(repo._list("weaviate-data/"))
+
+    dry = repo.prune(keep_last=2, dry_run=True)
+    assert dry["retired"] == ["2024-06-01_02-00-00"] and dry["packs_deleted"] > 0
+    assert set(repo._list("weaviate-data/")) == packs_before
+
+    stats = repo.prune(keep_last=2)
+    assert stats["packs_deleted"] == dry["packs_deleted"]
+    assert repo.backup_ids() == ["2024-06-02_02-00-00", "2024-06-03_02-00-00"]
+    # The retired prefix keeps the packs holding `base`, which later manifests point at
+    assert "2024-06-01_02-00-00" in repo.stored_ids()
+    for backup_id in repo.backup_ids():
+        repo.restore(str(tmp_path / backup_id), backup_id=backup_id)
+        assert read_tree(tmp_path / backup_id) == versions[backup_id]
+
+    # Retained chunks still deduplicate; chunks in deleted packs are uploaded again
+    write_tree(tmp_path / "data", {"old.db": versions["2024-06-01_02-00-00"]["old.db"]})
+    again = repo.backup(FilesystemSource(str(tmp_path / "data")), backup_id="2024-06-04_02-00-00")
+    assert 0 < again["new_bytes"] <= 40_000
+
+    now = datetime(2024, 6, 4, 3, tzinfo=timezone.utc)
+    assert repo.prune(keep_within=timedelta(days=2), now=now)["retired"] == ["2024-06-02_02-00-00"]
+    repo.restore(str(tmp_path / "latest"))
+    assert read_tree(tmp_path / "latest")["a.db"] == base + b"row 2" + b"row 3"
+
+def test_weaviate_source_uses_backup_api(repo, tmp_path):
+    """Test the Weaviate source snapshots through the API without stopping it"""
+    httpx = pytest.importorskip("httpx")
+    respx = pytest.importorskip("respx")
+    backup_id = "2024-06-01_02-00-00"
+
+    with respx.mock(base_url="http://weaviate:8080") as api:
+        def create(request):
+            # Weaviate writes the snapshot into the shared backup path
+            write_tree(tmp_path / backup_id, {"node1/classes.db": b"snapshot"})
+            return httpx.Response(200, json={"id": backup_id, "status": "STARTED"})
+
+        create_route = api.post("/v1/backups/filesystem").mock(side_effect=create)
+        api.get(f"/v1/backups/filesystem/{backup_id}").mock(side_effect=[
+            httpx.Response(200, json={"status": "TRANSFERRING"}),
+            httpx.Response(200, json={"status": "SUCCESS"}),
+        ])
+        client = httpx.Client(base_url="http://weaviate:8080")
+        source = WeaviateBackupSource(client, str(tmp_path), poll_interval=0)
+        stats = repo.backup(source, backup_id=backup_id)
+
+    assert create_route.call_count == 1
+    assert stats["files"] == 1
+    # The local snapshot is removed once it is in R2
+    assert not (tmp_path / backup_id).exists()
+
+if __name__ == "__main__":
+    pytest.main([__file__])
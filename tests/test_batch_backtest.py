@@ -0,0 +1,93 @@
+#!/usr/bin/env python3
+"""
+Unit tests for multi-symbol batched backtests
+"""
+
+import pytest
+import sys
+import zlib
+import numpy as np
+import pandas as pd
+
+# Add validator service to path
+sys.path.append('services/validator')
+from batch import align_prices, chunk_symbols, fetch_prices, group_by_calendar, run_batch_backtest
+
+def fake_fetch(symbol, period="1y"):
+    """Deterministic closes per symbol; BAD-* symbols fail like a delisted ticker"""
+    if symbol.startswith("BAD"):
+        raise ValueError(f"No data available for {symbol}")
+    rng = np.random.default_rng(zlib.crc32(symbol.encode()))
+    index = pd.date_range("2024-01-01", periods=120, freq="D")
+    if symbol.endswith("-EQ"):
+        # Equities skip weekends
+        index = index[index.dayofweek < 5]
+    return pd.Series(100 * np.cumprod(1 + rng.normal(0, 0.01, len(index))), index=index)
+
+def test_chunk_symbols():
+    """Test symbols are split into at most N roughly equal groups"""
+    groups = chunk_symbols(["A", "B", "C", "D", "E"], 2)
+    assert groups == [["A", "B", "C"], ["D", "E"]]
+    assert chunk_symbols(["A"], 8) == [["A"]]
+
+def test_fetch_prices_collects_errors():
+    """Test a failing symbol is recorded instead of raised"""
+    prices, errors = fetch_prices(["BTC-USD", "BAD-1"], fetch=fake_fetch)
+    assert list(prices) == ["BTC-USD"]
+    assert "BAD-1" in errors
+
+def test_align_prices_wide_frame():
+    """Test crypto and equity calendars align with interior gaps forward-filled"""
+    prices = {"BTC-USD": fake_fetch("BTC-USD"), "SPY-EQ": fake_fetch("SPY-EQ")}
+    wide = align_prices(prices)
+
+    assert list(wide.columns) == ["BTC-USD", "SPY-EQ"]
+    assert len(wide) == 120
+    saturday = wide.index[wide.index.dayofweek == 5][0]
+    assert wide.loc[saturday, "SPY-EQ"] == wide["SPY-EQ"].loc[:saturday].iloc[-2]
+
+def test_run_batch_backtest_in_process():
+    """Test a single-worker batch matches per-symbol results"""
+    import vectorbt as vbt
+
+    batch = run_batch_backtest(["BTC-USD", "ETH-USD"], initial_cash=1000, max_workers=1, fetch=fake_fetch)
+
+    assert batch["errors"] == {}
+    assert [r["symbol"] for r in batch["results"]] == ["BTC-USD", "ETH-USD"]
+    single = vbt.Portfolio.from_holding(fake_fetch("ETH-USD"), init_cash=1000, freq="1D")
+    assert batch["results"][1]["total_return"] == pytest.approx(single.total_return())
+
+def test_mixed_calendars_match_single_symbol_runs():
+    """Test equities batched with crypto keep their own bars (no zero-return weekends)"""
+    import vectorbt as vbt
+
+    symbols = ["BTC-USD", "SPY-EQ", "ETH-USD", "QQQ-EQ"]
+    prices, _ = fetch_prices(symbols, fetch=fake_fetch)
+    assert [sorted(group) for group in group_by_calendar(prices)] == [["BTC-USD", "ETH-USD"], ["QQQ-EQ", "SPY-EQ"]]
+
+    for engine in ("vectorbt", "numba"):
+        batch = run_batch_backtest(symbols, initial_cash=1000, max_workers=1, fetch=fake_fetch, engine=engine)
+        assert [r["symbol"] for r in batch["results"]] == symbols
+        for result in batch["results"]:
+            single = vbt.Portfolio.from_holding(fake_fetch(result["symbol"]), init_cash=1000, freq="1D")
+            assert result["sharpe_ratio"] == pytest.approx(single.sharpe_ratio(), rel=1e-9)
+            assert result["max_drawdown"] == pytest.approx(single.max_drawdown(), rel=1e-9)
+
+def test_run_batch_backtest_process_pool_isolates_failures():
+    """Test failures in one symbol do not stop the rest of the batch"""
+    symbols = ["BTC-USD", "BAD-1", "ETH-USD", "SPY-EQ", "BAD-2", "QQQ-EQ"]
+    batch = run_batch_backtest(symbols, max_workers=2, fetch=fake_fetch)
+
+    assert batch["workers"] == 2
+    assert batch["groups"] == 2
+    assert [r["symbol"] for r in batch["results"]] == ["BTC-USD", "ETH-USD", "SPY-EQ", "QQQ-EQ"]
+    assert set(batch["errors"]) == {"BAD-1", "BAD-2"}
+    assert all(r["final_value"] > 0 for r in batch["results"])
+
+def test_run_batch_backtest_requires_symbols():
+    """Test an empty symbol list is rejected"""
+    with pytest.raises(ValueError, match="No symbols"):
+        run_batch_backtest([])
+
+if __name__ == "__main__":
+    pytest.main([__file__])
@@ -0,0 +1,83 @@
+#!/usr/bin/env python3
+"""
+Unit tests for bulk concept ingestion into the crawler's start_urls queue
+"""
+
+import json
+import pytest
+import sys
+import time
+from unittest.mock import patch
+
+fakeredis = pytest.importorskip("fakeredis")
+from fastapi.testclient import TestClient
+
+sys.path.append('services/orchestrator')
+import main as orchestrator
+from ingest import ConceptIngester, concept_urls
+from messages import decode_start_url
+
+def test_concept_urls_match_edge_worker():
+    """Test templates and encodeURIComponent escaping match services/edge-worker/index.js"""
+    urls = concept_urls("Mean Reversion & RSI")
+
+    assert len(urls) == 9
+    assert urls[:3] == [
+        "https://example.com/search?q=Mean%20Reversion%20%26%20RSI%20trading&result=1",
+        "https://docs.example.com/mean reversion & rsi/trading-guide",
+        "https://forum.example.com/discussion/mean reversion & rsi",
+    ]
+    assert urls[6] == "https://example.com/search?q=Mean%20Reversion%20%26%20RSI%20pdf&result=1"
+
+@pytest.mark.asyncio
+async def test_ingester_dedupes_and_pushes_in_chunks():
+    """Test URLs are deduplicated within the request and pushed in order with chunked RPUSH"""
+    redis_client = fakeredis.aioredis.FakeRedis(decode_responses=True)
+    ingester = ConceptIngester(redis_client, chunk_size=4, chunks_per_pipeline=2)
+    for concept in ["momentum", "carry", "momentum", "  "]:
+        await ingester.add(concept)
+    await ingester.flush()
+
+    assert ingester.summary() == {
+        "concepts": 3, "queued": 10, "duplicates": 17, "counts": {"momentum": 5, "carry": 5},
+    }
+    queued = [decode_start_url(entry) for entry in await redis_client.lrange("start_urls", 0, -1)]
+    assert [entry.url for entry in queued[:5]] == list(dict.fromkeys(concept_urls("momentum")))
+    assert {entry.concept for entry in queued[:5]} == {"momentum"}
+    assert {entry.concept for entry in queued[5:]} == {"carry"}
+    assert len({entry.url for entry in queued}) == 10
+
+@pytest.mark.asyncio
+async def test_ten_thousand_concepts_take_seconds():
+    """Test 10k concepts (50k URLs) are expanded and queued quickly"""
+    redis_client = fakeredis.aioredis.FakeRedis()
+    ingester = ConceptIngester(redis_client)
+    start_time = time.perf_counter()
+    for i in range(10000):
+        await ingester.add(f"concept {i}")
+    await ingester.flush()
+
+    assert await redis_client.llen("start_urls") == 50000
+    assert time.perf_counter() - start_time < 10
+
+def test_endpoint_accepts_json_and_ndjson():
+    """Test both request formats queue URLs and report per-concept counts"""
+    redis_client = fakeredis.aioredis.FakeRedis(decode_responses=True)
+    client = TestClient(orchestrator.app)
+    with patch.object(orchestrator, "redis_client", redis_client):
+        response = client.post("/api/concepts", json={"concepts": ["momentum", "carry"]})
+        assert response.status_code == 200
+        assert response.json()["counts"] == {"momentum": 5, "carry": 5}
+
+        body = "\n".join([json.dumps({"concept": "value"}), "", json.dumps("quality")])
+        response = client.post("/api/concepts", content=body.encode(),
+                               headers={"Content-Type": "application/x-ndjson"})
+        assert response.status_code == 200
+        assert (response.json()["concepts"], response.json()["queued"]) == (2, 10)
+
+        assert client.post("/api/concepts", json={"concepts": "momentum"}).status_code == 400
+        assert client.post("/api/concepts", content=b"[1]\n",
+                           headers={"Content-Type": "application/x-ndjson"}).status_code == 400
+
+if __name__ == "__main__":
+    pytest.main([__file__])
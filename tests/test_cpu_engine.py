@@ -0,0 +1,91 @@
+#!/usr/bin/env python3
+"""
+Unit tests for the Numba CPU engine kernels
+"""
+
+import pytest
+import sys
+import numpy as np
+import pandas as pd
+
+# Add validator service to path
+sys.path.append('services/validator')
+import cpu_engine
+from cpu_engine import ann_factor, holding_metrics, holding_value_nb, value_metrics
+
+@pytest.fixture
+def prices():
+    """Random-walk closes with a late listing and a trading halt"""
+    rng = np.random.default_rng(7)
+    values = 100 * np.cumprod(1 + rng.normal(0, 0.02, (250, 6)), axis=0)
+    frame = pd.DataFrame(values, index=pd.date_range("2024-01-01", periods=250, freq="D"))
+    frame.iloc[:20, 2] = np.nan
+    frame.iloc[100:105, 4] = np.nan
+    return frame
+
+def test_ann_factor():
+    """Test annualization matches vectorbt's 365-day year"""
+    assert ann_factor("1D") == 365
+    assert ann_factor("1h") == 365 * 24
+
+def test_holding_value_enters_on_first_valid_price():
+    """Test cash is held until the first valid price, then fully invested"""
+    price = np.array([[np.nan], [50.0], [np.nan], [100.0]])
+    value = holding_value_nb(price, 1000.0)
+    np.testing.assert_allclose(value[:, 0], [1000.0, 1000.0, 1000.0, 2000.0])
+
+def test_value_metrics_known_series():
+    """Test metrics on a hand-computed value series"""
+    value = pd.DataFrame({"a": [100.0, 120.0, 90.0, 108.0]})
+    metrics = value_metrics(value, init_cash=100, freq="1D").loc["a"]
+
+    assert metrics["total_return"] == pytest.approx(0.08)
+    assert metrics["max_drawdown"] == pytest.approx(-0.25)
+    returns = np.array([0.0, 0.2, -0.25, 0.2])
+    assert metrics["sharpe_ratio"] == pytest.approx(returns.mean() / returns.std(ddof=1) * np.sqrt(365))
+
+def test_holding_metrics_match_vectorbt(prices):
+    """Test the parallel kernels reproduce vectorbt's from_holding metrics"""
+    import vectorbt as vbt
+
+    metrics = holding_metrics(prices, init_cash=1000)
+    portfolio = vbt.Portfolio.from_holding(prices.ffill(), init_cash=1000, freq="1D")
+
+    np.testing.assert_allclose(metrics["total_return"], portfolio.total_return(), rtol=1e-9)
+    np.testing.assert_allclose(metrics["sharpe_ratio"], portfolio.sharpe_ratio(), rtol=1e-9)
+    np.testing.assert_allclose(metrics["max_drawdown"], portfolio.max_drawdown(), rtol=1e-9)
+    np.testing.assert_allclose(metrics["final_value"], portfolio.final_value(), rtol=1e-9)
+    assert list(metrics["trades_count"]) == [1] * 6
+
+def test_engine_info_reports_cpu_execution():
+    """Test the engine describes itself honestly and uses the cache directory"""
+    cpu_engine.warmup()
+    info = cpu_engine.engine_info()
+
+    assert info["engine"] == "numba"
+    assert info["device"] == "cpu"
+    assert info["threads"] >= 1
+    assert info["cache_dir"]
+    assert info["cache_hits"] + info["cache_misses"] >= 2
+
+def test_batch_numba_engine_matches_vectorbt():
+    """Test the batch API produces identical results on either engine"""
+    from batch import run_batch_backtest
+
+    def fetch(symbol, period="1y"):
+        rng = np.random.default_rng(len(symbol))
+        return pd.Series(100 * np.cumprod(1 + rng.normal(0, 0.02, 90)),
+                         index=pd.date_range("2024-01-01", periods=90, freq="D"))
+
+    symbols = ["BTC-USD", "ETH"]
+    numba_run = run_batch_backtest(symbols, max_workers=1, fetch=fetch, engine="numba")
+    vbt_run = run_batch_backtest(symbols, max_workers=1, fetch=fetch, engine="vectorbt")
+
+    for fast, reference in zip(numba_run["results"], vbt_run["results"]):
+        assert fast["engine"] == "numba"
+        assert fast["total_return"] == pytest.approx(reference["total_return"])
+        assert fast["sharpe_ratio"] == pytest.approx(reference["sharpe_ratio"])
+        assert fast["max_drawdown"] == pytest.approx(reference["max_drawdown"])
+
+if __name__ == "__main__":
+    pytest.main([__file__])
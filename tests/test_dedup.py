@@ -0,0 +1,75 @@
+#!/usr/bin/env python3
+"""
+Unit tests for parser near-duplicate detection (MinHash + LSH in Redis)
+"""
+
+import importlib.util
+import pytest
+import sys
+from unittest.mock import patch
+
+fakeredis = pytest.importorskip("fakeredis")
+msgspec = pytest.importorskip("msgspec")
+
+sys.path.append('services/parser')
+# By path: at the repo root a bare `import main` may resolve to another service's main
+_spec = importlib.util.spec_from_file_location("parser_main", "services/parser/main.py")
+parser = importlib.util.module_from_spec(_spec)
+_spec.loader.exec_module(parser)
+from dedup import DedupIndex, minhash, shingle_hashes, similarity
+from messages import ParseResult
+
+FORUM = (
+    "<html><body><h1>Discussion: {concept}</h1><p>Welcome to the trading forum. Members share strategies, "
+    "backtests and market commentary every day. Please read the community guidelines before posting, "
+    "search existing threads first, and keep discussions civil. Popular threads this week cover position "
+    "sizing, risk management, volatility regimes and execution costs for retail traders.</p></body></html>"
+)
+
+@pytest.fixture
+def index():
+    return DedupIndex(fakeredis.FakeRedis(), threshold=0.8)
+
+def test_minhash_estimates_jaccard():
+    """Test signature agreement tracks shingle overlap"""
+    a = parser.strip_tags(FORUM.format(concept="momentum"))
+    b = parser.strip_tags(FORUM.format(concept="mean reversion"))
+    unrelated = "Ethereum gas fees rose sharply as smart contract activity spiked across DeFi lending markets today"
+
+    assert similarity(minhash(shingle_hashes(a)), minhash(shingle_hashes(a))) == 1.0
+    assert similarity(minhash(shingle_hashes(a)), minhash(shingle_hashes(b))) > 0.8
+    assert similarity(minhash(shingle_hashes(a)), minhash(shingle_hashes(unrelated))) < 0.2
+
+def test_minhash_chunks_match_single_pass():
+    """Test the chunked running minimum gives the same signature as one pass over all shingles"""
+    hashes = shingle_hashes(" ".join(f"token{i % 977} word{i % 31}" for i in range(5000)))
+    assert len(hashes) > 1000
+    assert (minhash(hashes, chunk=7) == minhash(hashes, chunk=len(hashes))).all()
+
+def test_near_duplicates_link_to_canonical(index):
+    """Test the first page is canonical, near-identical pages link to it, distinct pages do not"""
+    page = lambda concept: parser.strip_tags(FORUM.format(concept=concept))
+
+    assert index.check("forum/momentum", page("momentum")) is None
+    match = index.check("forum/carry", page("carry"))
+    assert (match.canonical, match.similarity > 0.8) == ("forum/momentum", True)
+    assert index.check("news/eth", "Ethereum gas fees rose sharply as smart contract activity spiked") is None
+
+    stats = index.stats()
+    assert (stats["docs"], stats["duplicates"]) == (3, 1)
+    assert stats["dedup_rate"] == pytest.approx(1 / 3)
+    assert stats["mean_lookup_ms"] > 0
+
+def test_duplicates_skip_embedding(index):
+    """Test a near-duplicate is returned without computing an embedding"""
+    parser.process_content(FORUM.format(concept="momentum"), dedup=index, doc_id="forum/momentum")
+    with patch.object(parser, "get_model", side_effect=AssertionError("embedded a duplicate")):
+        fields = parser.process_content(FORUM.format(concept="value"), dedup=index, doc_id="forum/value")
+
+    result = msgspec.convert(fields, ParseResult)
+    assert (result.embedding, result.duplicate_of, result.doc_id) == (None, "forum/momentum", "forum/value")
+    with pytest.raises(msgspec.ValidationError, match="exactly one"):
+        msgspec.convert({**fields, "duplicate_of": None}, ParseResult)
+
+if __name__ == "__main__":
+    pytest.main([__file__])
@@ -0,0 +1,165 @@
+#!/usr/bin/env python3
+"""
+Unit tests for the local delayed queue transport and its dispatcher
+"""
+
+import pytest
+import sys
+from unittest.mock import AsyncMock
+
+fakeredis = pytest.importorskip("fakeredis")
+pytest.importorskip("msgspec")
+
+from delayed_queue import DelayedQueue, Dispatcher, decode_entry
+from messages import CrawlMessage
+
+sys.path.append('services/crawler')
+import main as crawler
+
+class Clock:
+    def __init__(self, now=1000.0):
+        self.now = now
+
+    def __call__(self):
+        return self.now
+
+@pytest.fixture
+def redis_client():
+    return fakeredis.aioredis.FakeRedis()
+
+@pytest.fixture
+def clock():
+    return Clock()
+
+@pytest.fixture
+def queue(redis_client, clock):
+    return DelayedQueue(redis_client, delay=60, max_attempts=3, backoff=5, clock=clock)
+
+@pytest.mark.asyncio
+async def test_messages_are_held_until_due(queue, clock):
+    """Test nothing is claimable before the delay, and a due entry is claimed once"""
+    await queue.publish(CrawlMessage(id="m1", url="https://example.com"))
+    assert await queue.claim() == []
+
+    clock.now += 60
+    claimed = await queue.claim()
+    assert [entry.message.id for _, entry in claimed] == ["m1"]
+    assert await queue.claim() == []
+    assert await queue.depth() == {"queued": 0, "inflight": 1, "dead": 0}
+
+    await queue.ack(claimed[0][0])
+    assert await queue.depth() == {"queued": 0, "inflight": 0, "dead": 0}
+
+class Interleaved:
+    """Redis client that runs `hook` once, right after a claim has read the due members"""
+
+    def __init__(self, redis, hook):
+        self.redis = redis
+        self.hook = hook
+
+    def after_read(self, read):
+        async def zrangebyscore(*args, **kwargs):
+            members = await read(*args, **kwargs)
+            hook, self.hook = self.hook, None
+            if hook is not None:
+                await hook()
+            return members
+        return zrangebyscore
+
+    def pipeline(self, *args, **kwargs):
+        pipe = self.redis.pipeline(*args, **kwargs)
+        pipe.zrangebyscore = self.after_read(pipe.zrangebyscore)
+        return pipe
+
+    def zrangebyscore(self, *args, **kwargs):
+        return self.after_read(self.redis.zrangebyscore)(*args, **kwargs)
+
+    def __getattr__(self, name):
+        return getattr(self.redis, name)
+
+@pytest.mark.asyncio
+async def test_entry_claimed_and_acked_elsewhere_is_not_reclaimed(queue, clock, redis_client):
+    """Test a dispatcher that read an entry another dispatcher then claimed and acked leaves no in-flight orphan"""
+    await queue.publish(CrawlMessage(id="m1", url="https://example.com"), delay=0)
+
+    async def other_dispatcher():
+        (member, _), = await queue.claim()
+        await queue.ack(member)
+
+    racing = DelayedQueue(Interleaved(redis_client, other_dispatcher), delay=60, clock=clock)
+    assert await racing.claim() == []
+    assert await queue.depth() == {"queued": 0, "inflight": 0, "dead": 0}
+
+    clock.now += 3600
+    assert await queue.recover() == 0
+
+@pytest.mark.asyncio
+async def test_failures_back_off_then_dead_letter(queue, clock, redis_client):
+    """Test failed deliveries are retried with growing delays and dead-lettered after max attempts"""
+    handler = AsyncMock(side_effect=RuntimeError("weaviate down"))
+    dispatcher = Dispatcher(queue, handler)
+    await queue.publish(CrawlMessage(id="m1", url="https://example.com"), delay=0)
+
+    assert await dispatcher.dispatch_once() == 1
+    clock.now += 4
+    assert await dispatcher.dispatch_once() == 0  # first retry after 5s
+    clock.now += 1
+    assert await dispatcher.dispatch_once() == 1
+    clock.now += 9
+    assert await dispatcher.dispatch_once() == 0  # second retry after 10s
+    clock.now += 1
+    assert await dispatcher.dispatch_once() == 1
+
+    assert dispatcher.stats == {"delivered": 0, "retried": 2, "dead": 1}
+    assert await queue.depth() == {"queued": 0, "inflight": 0, "dead": 1}
+    [member] = await redis_client.zrange(queue.dead_key, 0, -1)
+    entry = decode_entry(member)
+    assert (entry.message.id, entry.attempts, entry.error) == ("m1", 3, "weaviate down")
+
+@pytest.mark.asyncio
+async def test_dispatcher_delivers_and_acks(queue, clock):
+    """Test successful deliveries reach the handler once and leave nothing in flight"""
+    handler = AsyncMock()
+    dispatcher = Dispatcher(queue, handler, concurrency=2)
+    for i in range(5):
+        await queue.publish(CrawlMessage(id=f"m{i}", url=f"https://example.com/{i}"), delay=0)
+
+    assert await dispatcher.dispatch_once() == 5
+    assert sorted(call.args[0].id for call in handler.await_args_list) == [f"m{i}" for i in range(5)]
+    assert await queue.depth() == {"queued": 0, "inflight": 0, "dead": 0}
+
+@pytest.mark.asyncio
+async def test_expired_leases_are_recovered(queue, clock):
+    """Test entries claimed by a dispatcher that died go back to the queue"""
+    await queue.publish(CrawlMessage(id="m1", url="https://example.com"), delay=0)
+    assert len(await queue.claim()) == 1
+
+    assert await queue.recover() == 0
+    clock.now += queue.lease
+    assert await queue.recover() == 1
+    assert [entry.message.id for _, entry in await queue.claim()] == ["m1"]
+
+@pytest.mark.asyncio
+async def test_local_step_moves_urls_to_queue(redis_client, queue, clock):
+    """Test the crawler's local transport enqueues each popped URL without touching QStash"""
+    await redis_client.rpush("start_urls", "https://a.example", '{"url":"https://b.example","concept":"carry"}')
+
+    assert await crawler.local_step(redis_client, queue, batch_size=10) == 0.0
+    assert await crawler.local_step(redis_client, queue, batch_size=10) == 1.0
+
+    clock.now += 60
+    assert sorted((entry.message.url, entry.message.concept) for _, entry in await queue.claim()) == [
+        ("https://a.example", None), ("https://b.example", "carry"),
+    ]
+
+def test_make_transport_validates_name(redis_client, monkeypatch):
+    """Test transport selection rejects unknown names and missing QStash credentials"""
+    monkeypatch.delenv("QSTASH_URL", raising=False)
+    assert isinstance(crawler.make_transport("redis", redis_client), crawler.LocalQueueTransport)
+    with pytest.raises(ValueError, match="QSTASH_URL"):
+        crawler.make_transport("qstash", redis_client)
+    with pytest.raises(ValueError, match="Unknown"):
+        crawler.make_transport("sqs", redis_client)
+
+if __name__ == "__main__":
+    pytest.main([__file__])
@@ -0,0 +1,104 @@
+#!/usr/bin/env python3
+"""
+Unit tests for the dead-letter replay tool
+"""
+
+import base64
+import pytest
+import sys
+
+fakeredis = pytest.importorskip("fakeredis")
+respx = pytest.importorskip("respx")
+import httpx
+
+from delayed_queue import DelayedQueue, QueueEntry, encode_entry
+from messages import CrawlMessage, encode
+
+sys.path.append('services/crawler')
+from replay import (
+    Checkpoint, LocalDeadLetters, QStashDeadLetters, QuotaExhausted, ReplayFilter, Replayer,
+)
+
+class Publisher:
+    def __init__(self, fail_at=None):
+        self.ids = []
+        self.fail_at = fail_at
+
+    async def __call__(self, message):
+        if self.fail_at is not None and len(self.ids) == self.fail_at:
+            self.fail_at = None
+            raise QuotaExhausted()
+        self.ids.append(message.id)
+
+async def dead_letter_queue(failed_at):
+    queue = DelayedQueue(fakeredis.aioredis.FakeRedis())
+    for i, ts in enumerate(failed_at):
+        entry = QueueEntry(message=CrawlMessage(id=f"m{i}", url=f"https://site{i % 2}.example/{i}"),
+                           enqueued_at=0.0, attempts=5, error="weaviate down" if i else "HTTP 400", failed_at=ts)
+        await queue.redis.zadd(queue.dead_key, {encode_entry(entry): ts})
+    return queue
+
+def make_replayer(source, publish, tmp_path, replay_filter=None, **kwargs):
+    replay_filter = replay_filter or ReplayFilter()
+    checkpoint = Checkpoint(str(tmp_path / "replay.json"), source.name, replay_filter)
+    return Replayer(source, publish, checkpoint, replay_filter, rate=0, concurrency=1, **kwargs)
+
+@pytest.mark.asyncio
+async def test_local_replay_filters_and_removes_replayed(tmp_path):
+    """Test only matching entries are republished and removed from the dead-letter set"""
+    queue = await dead_letter_queue([1, 2, 3, 4, 5])
+    publish = Publisher()
+    replay_filter = ReplayFilter(since=2, error="weaviate", url=r"site0\.")
+
+    stats = await make_replayer(LocalDeadLetters(queue, page_size=2), publish, tmp_path, replay_filter).run()
+
+    assert publish.ids == ["m2", "m4"]
+    assert stats == {"scanned": 5, "matched": 2, "replayed": 2, "failed": 0}
+    assert await queue.redis.zcard(queue.dead_key) == 3
+    assert Checkpoint(str(tmp_path / "replay.json"), "local", replay_filter).load()["complete"]
+
+@pytest.mark.asyncio
+async def test_interrupted_replay_resumes_from_checkpoint(tmp_path):
+    """Test a replay stopped mid-way resumes after the last completed page, across equal failure times"""
+    queue = await dead_letter_queue([1, 2, 2, 2, 3])
+    source = LocalDeadLetters(queue, page_size=2)
+    publish = Publisher(fail_at=2)
+
+    await make_replayer(source, publish, tmp_path, keep=True).run()
+    assert publish.ids == ["m0", "m1"]
+
+    stats = await make_replayer(source, publish, tmp_path, keep=True).run()
+    assert publish.ids == ["m0", "m1", "m2", "m3", "m4"]
+    assert stats["replayed"] == 5
+    assert await queue.redis.zcard(queue.dead_key) == 5
+
+@pytest.mark.asyncio
+@respx.mock
+async def test_qstash_dlq_pages_and_deletes(tmp_path):
+    """Test the QStash DLQ is followed by cursor and replayed entries are deleted"""
+    body = encode(CrawlMessage(id="q1", url="https://example.com/a"))
+    respx.get("https://qstash.test/v2/dlq", params={"cursor": "c2"}).mock(return_value=httpx.Response(200, json={
+        "messages": [{"dlqId": "d3", "body": "not json", "createdAt": 3000, "responseStatus": 500}],
+    }))
+    respx.get("https://qstash.test/v2/dlq").mock(return_value=httpx.Response(200, json={
+        "cursor": "c2",
+        "messages": [
+            {"dlqId": "d1", "bodyBase64": base64.b64encode(body).decode(), "createdAt": 1000,
+             "responseStatus": 502, "responseBody": "bad gateway"},
+            {"dlqId": "d2", "body": encode(CrawlMessage(id="q2", url="https://example.com/b")).decode(),
+             "createdAt": 2000, "responseStatus": 400},
+        ],
+    }))
+    delete = respx.delete(url__regex=r"https://qstash\.test/v2/dlq/d\d").mock(return_value=httpx.Response(200))
+    publish = Publisher()
+
+    async with httpx.AsyncClient() as client:
+        source = QStashDeadLetters(client, "token", api_url="https://qstash.test")
+        stats = await make_replayer(source, publish, tmp_path, ReplayFilter(error=r"HTTP 5\d\d")).run()
+
+    assert publish.ids == ["q1"]
+    assert stats == {"scanned": 3, "matched": 1, "replayed": 1, "failed": 0}
+    assert [call.request.url.path for call in delete.calls] == ["/v2/dlq/d1"]
+
+if __name__ == "__main__":
+    pytest.main([__file__])
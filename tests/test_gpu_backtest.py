@@ -40,7 +40,9 @@ def test_run_backtest_gpu_if_available():
     try:
         results = run_backtest(symbol="BTC-USD", backend="gpu", initial_cash=1000)
         
-        assert results["gpu_accelerated"] is True
+        # No GPU engine exists for these metrics, so execution is reported as CPU
+        assert results["gpu_accelerated"] is False
+        assert results["gpu_available"] is True
         assert results["initial_cash"] == 1000
         assert results["symbol"] == "BTC-USD"
         assert "total_return" in results
@@ -120,6 +122,26 @@ def test_run_backtest_auto_backend():
             assert "gpu_accelerated" in results
             assert results["symbol"] == "ETH-USD"
 
+def test_run_backtest_numba_engine():
+    """Test the Numba CPU engine reports what actually executed"""
+    mock_data = MagicMock()
+    mock_data.empty = False
+    
+    import pandas as pd
+    mock_prices = pd.Series([100.0, 110.0, 99.0, 121.0], name="Close")
+    mock_data.__getitem__.return_value = mock_prices
+    
+    with patch('yfinance.download', return_value=mock_data):
+        results = run_backtest(symbol="TEST", backend="cpu", initial_cash=1000, engine="numba")
+    
+    assert results["engine"] == "numba"
+    assert results["backend"] == "cpu"
+    assert results["gpu_accelerated"] is False
+    assert results["final_value"] == pytest.approx(1210.0)
+    assert results["total_return"] == pytest.approx(0.21)
+    assert results["max_drawdown"] == pytest.approx(-0.1)
+    assert results["trades_count"] == 1
+
 def test_save_results():
     """Test saving backtest results to pickle file"""
     test_results = {
@@ -0,0 +1,32 @@
+#!/usr/bin/env python3
+"""
+Import-time budgets: importing a service must not load heavy dependencies or connect to anything
+"""
+
+import pytest
+
+import import_budget
+
+def test_parse_importtime():
+    """Test -X importtime lines are parsed into (module, self, cumulative)"""
+    stderr = (
+        "import time: self [us] | cumulative | imported package\n"
+        "import time:       120 |        120 |   json.decoder\n"
+        "import time:       300 |        420 | json\n"
+        "some other output\n"
+    )
+    assert import_budget.parse_importtime(stderr) == [("json.decoder", 120, 120), ("json", 300, 420)]
+
+@pytest.mark.parametrize("service", sorted(import_budget.BUDGETS))
+def test_service_import_within_budget(service):
+    """Test each service's entry module imports within its budget"""
+    report = import_budget.check([service], repeat=1, top=5)[service]
+    if "error" in report:
+        if report["error"].startswith("ModuleNotFoundError"):
+            pytest.skip(f"{service} dependencies not installed: {report['error']}")
+        pytest.fail(f"Importing {service} failed: {report['error']}")
+    assert report["ok"], f"{service} imports in {report['import_ms']:.0f} ms (budget {report['budget_ms']} ms); " \
+                         f"slowest: {report['slowest']}"
+
+if __name__ == "__main__":
+    pytest.main([__file__])
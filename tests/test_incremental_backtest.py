@@ -0,0 +1,92 @@
+#!/usr/bin/env python3
+"""
+Unit tests for incremental buy-and-hold updates (no network)
+"""
+
+import pytest
+import sys
+import numpy as np
+import pandas as pd
+
+# Add validator service to path
+sys.path.append('services/validator')
+from incremental import IncrementalBacktester, StateStore
+from market_data import MarketDataStore
+
+def bars(close):
+    """Daily OHLCV bars in yfinance's column layout around the given closes"""
+    return pd.DataFrame({
+        "Open": close, "High": close, "Low": close, "Close": close, "Adj Close": close, "Volume": 1000.0,
+    }, index=close.index.rename("Date"))
+
+@pytest.fixture
+def close():
+    """300 random-walk closes ending today, with a late listing and a trading halt"""
+    rng = np.random.default_rng(11)
+    index = pd.date_range(end=pd.Timestamp.now().normalize(), periods=300, freq="D")
+    close = pd.Series(100 * np.cumprod(1 + rng.normal(0, 0.02, 300)), index=index)
+    close.iloc[:15] = np.nan
+    close.iloc[120:125] = np.nan
+    return close
+
+@pytest.fixture
+def backtester(tmp_path):
+    store = MarketDataStore(tmp_path / "market_data")
+    return IncrementalBacktester(StateStore(tmp_path / "state"), store=store)
+
+def assert_matches_vectorbt(result, close):
+    import vectorbt as vbt
+
+    portfolio = vbt.Portfolio.from_holding(close.ffill(), init_cash=1000, freq="1D")
+    assert result["total_return"] == pytest.approx(portfolio.total_return(), rel=1e-9)
+    assert result["sharpe_ratio"] == pytest.approx(portfolio.sharpe_ratio(), rel=1e-9)
+    assert result["max_drawdown"] == pytest.approx(portfolio.max_drawdown(), rel=1e-9)
+    assert result["final_value"] == pytest.approx(portfolio.final_value(), rel=1e-9)
+
+def test_incremental_updates_match_full_recompute(backtester, close):
+    """Test metrics updated from new bars only match vbt.Portfolio over the whole window at every step"""
+    store = backtester.store
+    store.append("TEST", bars(close.iloc[:200]))
+    first = backtester.run("TEST", initial_cash=1000)
+    assert (first["update"], first["bars_processed"]) == ("full", 200)
+    assert_matches_vectorbt(first, close.iloc[:200])
+
+    # The last bar was still forming: its close is revised when the next bars arrive
+    revised = close.copy()
+    revised.iloc[199] *= 1.01
+    last = 200
+    for end in (201, 230, 300):
+        store.append("TEST", bars(revised.iloc[last - 1:end]))
+        result = backtester.run("TEST", initial_cash=1000)
+        assert result["update"] == "incremental"
+        assert result["bars_processed"] == end - last + 1  # the new bars plus the re-applied last bar
+        assert_matches_vectorbt(result, revised.iloc[:end])
+        last = end
+
+    unchanged = backtester.run("TEST", initial_cash=1000)
+    assert (unchanged["update"], unchanged["bars_processed"]) == ("incremental", 1)
+    assert unchanged["final_value"] == pytest.approx(result["final_value"], rel=1e-12)
+
+def test_fallback_to_full_recompute(backtester, close):
+    """Test changed parameters, revised history and an explicit request rebuild the state"""
+    store = backtester.store
+    store.append("TEST", bars(close.iloc[:250]))
+    backtester.run("TEST", initial_cash=1000)
+
+    changed = backtester.run("TEST", initial_cash=2000)
+    assert (changed["update"], changed["update_reason"]) == ("full", "parameters changed")
+
+    older = close.iloc[:250].copy()
+    older.iloc[248] *= 0.9
+    store.append("TEST", bars(older.iloc[248:249]))
+    store.append("TEST", bars(close.iloc[250:260]))
+    revised = backtester.run("TEST", initial_cash=2000)
+    assert (revised["update"], revised["update_reason"]) == ("full", "history revised")
+    assert revised["bars_processed"] == 260
+
+    forced = backtester.run("TEST", initial_cash=1000, full=True)
+    assert (forced["update"], forced["update_reason"]) == ("full", "requested")
+    assert_matches_vectorbt(forced, pd.concat([older.iloc[:249], close.iloc[249:260]]))
+
+if __name__ == "__main__":
+    pytest.main([__file__])
@@ -0,0 +1,70 @@
+#!/usr/bin/env python3
+"""
+Unit tests for the shared JSON / queued / sampled logging setup
+"""
+
+import io
+import json
+import logging
+import sys
+
+import pytest
+
+from log_config import JsonFormatter, SAMPLED, SamplingFilter, payload, setup_logging, stop_logging
+
+def record(level=logging.INFO, msg="hello %s", args=("world",), **extra):
+    rec = logging.makeLogRecord({"name": "svc", "levelno": level, "levelname": logging.getLevelName(level),
+                                 "msg": msg, "args": args})
+    rec.__dict__.update(extra)
+    return rec
+
+def test_json_formatter_includes_extras_and_exceptions():
+    """Test records become one JSON object with service, extra fields and the traceback"""
+    try:
+        raise ValueError("boom")
+    except ValueError:
+        rec = record(level=logging.ERROR, exc_info=sys.exc_info(), job_id="j1")
+
+    entry = json.loads(JsonFormatter("crawler").format(rec))
+    assert (entry["service"], entry["level"], entry["msg"], entry["job_id"]) == ("crawler", "ERROR", "hello world", "j1")
+    assert "ValueError: boom" in entry["exc"]
+
+def test_sampling_keeps_rate_and_all_warnings():
+    """Test marked records are kept at the sample rate; unmarked and WARNING+ always pass"""
+    sampler = SamplingFilter(0.25)
+
+    kept = [sampler.filter(record(sampled=True)) for _ in range(100)]
+    assert sum(kept) == 25
+    assert all(sampler.filter(record(level=logging.ERROR, sampled=True)) for _ in range(10))
+    assert all(sampler.filter(record()) for _ in range(10))
+
+def test_payload_is_lazy_and_capped():
+    """Test payloads render only when formatted, and are truncated to the limit"""
+    class Exploding:
+        def __repr__(self):
+            raise AssertionError("rendered eagerly")
+
+    payload(Exploding())  # no rendering until str()
+    assert str(payload(b"x" * 20, limit=5)) == "xxxxx... (20 chars)"
+    assert str(payload("short")) == "short"
+
+def test_setup_logging_writes_json_through_queue():
+    """Test the root logger writes sampled JSON lines via the background listener"""
+    stream = io.StringIO()
+    root_level = logging.getLogger().level
+    setup_logging("orchestrator", level="INFO", fmt="json", sample_rate=0.0, stream=stream)
+    try:
+        logger = logging.getLogger("orchestrator.test")
+        logger.info("per message %s", payload("a" * 2000, limit=10), extra=SAMPLED)
+        logger.info("startup")
+        logger.error("failed %s", "m1", extra=SAMPLED)
+        logger.debug("below level")
+    finally:
+        stop_logging()
+        logging.getLogger().setLevel(root_level)
+
+    lines = [json.loads(line) for line in stream.getvalue().splitlines()]
+    assert [(e["level"], e["msg"]) for e in lines] == [("INFO", "startup"), ("ERROR", "failed m1")]
+
+if __name__ == "__main__":
+    pytest.main([__file__])
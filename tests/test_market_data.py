@@ -0,0 +1,140 @@
+#!/usr/bin/env python3
+"""
+Unit tests for the local market-data store (no network)
+"""
+
+import pytest
+import sys
+import numpy as np
+import pandas as pd
+
+# Add validator service to path
+sys.path.append('services/validator')
+from market_data import (
+    LocalFileProvider,
+    MarketDataProvider,
+    MarketDataStore,
+    normalize_bars,
+    period_to_offset,
+)
+
+def make_bars(start, periods):
+    """Synthetic daily OHLCV bars in yfinance's column layout"""
+    index = pd.date_range(start, periods=periods, freq="D", name="Date")
+    close = 100 + np.arange(periods, dtype=float)
+    return pd.DataFrame({
+        "Open": close - 0.5,
+        "High": close + 1,
+        "Low": close - 1,
+        "Close": close,
+        "Adj Close": close,
+        "Volume": 1000.0,
+    }, index=index)
+
+class CountingProvider(MarketDataProvider):
+    """In-memory provider that records every requested range"""
+
+    def __init__(self, bars):
+        self.bars = normalize_bars(bars)
+        self.calls = []
+
+    def fetch(self, symbol, start, end, interval="1d"):
+        self.calls.append((symbol, start, end))
+        return self.bars[(self.bars.index >= start) & (self.bars.index < end)]
+
+def test_period_to_offset():
+    """Test yfinance-style periods"""
+    end = pd.Timestamp("2024-12-31")
+    assert end - period_to_offset("1y") == pd.Timestamp("2023-12-31")
+    assert end - period_to_offset("30d") == pd.Timestamp("2024-12-01")
+    with pytest.raises(ValueError, match="Unsupported period"):
+        period_to_offset("forever")
+
+def test_normalize_bars_multiindex_columns():
+    """Test yfinance (Price, Ticker) columns are flattened"""
+    bars = make_bars("2024-01-01", 3)
+    bars.columns = pd.MultiIndex.from_product([bars.columns, ["BTC-USD"]])
+    normalized = normalize_bars(bars)
+
+    assert list(normalized.columns) == ["open", "high", "low", "close", "volume"]
+    assert normalized.index.name == "timestamp"
+
+def test_store_round_trip_partitions_by_year(tmp_path):
+    """Test bars spanning a year boundary land in separate Arrow partitions"""
+    store = MarketDataStore(tmp_path)
+    store.append("BTC-USD", make_bars("2023-12-25", 14))
+
+    series_dir = tmp_path / "symbol=BTC-USD" / "interval=1d"
+    assert sorted(p.name for p in series_dir.glob("*.arrow")) == ["year=2023.arrow", "year=2024.arrow"]
+
+    bars = store.read("BTC-USD", pd.Timestamp("2023-12-30"), pd.Timestamp("2024-01-03"))
+    assert list(bars.index.day) == [30, 31, 1, 2]
+    assert bars["close"].iloc[0] == 105.0
+
+def test_store_fetches_only_missing_ranges(tmp_path):
+    """Test incremental updates request only the uncovered head and tail"""
+    provider = CountingProvider(make_bars("2024-01-01", 60))
+    store = MarketDataStore(tmp_path, provider=provider)
+
+    first = store.get("ETH-USD", "2024-01-10", "2024-01-20")
+    assert len(first) == 10
+    assert len(provider.calls) == 1
+
+    # Fully covered except the newest bar, which is always refreshed
+    store.get("ETH-USD", "2024-01-10", "2024-01-19")
+    assert len(provider.calls) == 1
+
+    extended = store.get("ETH-USD", "2024-01-05", "2024-01-25")
+    assert len(extended) == 20
+    _, head_start, head_end = provider.calls[1]
+    _, tail_start, tail_end = provider.calls[2]
+    assert (head_start, head_end) == (pd.Timestamp("2024-01-05"), pd.Timestamp("2024-01-10"))
+    assert (tail_start, tail_end) == (pd.Timestamp("2024-01-19"), pd.Timestamp("2024-01-25"))
+
+def test_store_fills_gap_to_disjoint_requests(tmp_path):
+    """Test requests after or before the cached span also fetch the gap, so coverage has no holes"""
+    provider = CountingProvider(make_bars("2024-01-01", 120))
+    store = MarketDataStore(tmp_path, provider=provider)
+
+    store.get("BTC-USD", "2024-01-01", "2024-01-11")
+    later = store.get("BTC-USD", "2024-03-01", "2024-03-11")
+    assert len(later) == 10
+    assert provider.calls[1][1:] == (pd.Timestamp("2024-01-10"), pd.Timestamp("2024-03-11"))
+
+    offline = MarketDataStore(tmp_path)
+    assert len(offline.get("BTC-USD", "2024-01-01", "2024-03-11")) == 70
+
+    store = MarketDataStore(tmp_path / "left", provider=provider)
+    store.get("ETH-USD", "2024-03-01", "2024-03-11")
+    store.get("ETH-USD", "2024-01-01", "2024-01-11")
+    assert provider.calls[-1][1:] == (pd.Timestamp("2024-01-01"), pd.Timestamp("2024-03-01"))
+    assert len(MarketDataStore(tmp_path / "left").get("ETH-USD", "2024-01-01", "2024-03-11")) == 70
+
+def test_store_offline_read_only(tmp_path):
+    """Test a store without provider serves cached bars and fails on gaps"""
+    MarketDataStore(tmp_path).append("SPY", make_bars("2024-03-01", 5))
+    offline = MarketDataStore(tmp_path)
+
+    close = offline.get("SPY", "2024-03-01", "2024-03-06")["close"]
+    assert list(close) == [100.0, 101.0, 102.0, 103.0, 104.0]
+
+    with pytest.raises(ValueError, match="No data available"):
+        offline.get("QQQ", "2024-03-01", "2024-03-06")
+
+def test_local_file_provider_fixture(tmp_path):
+    """Test CSV fixtures feed the store without network access"""
+    fixtures = tmp_path / "fixtures"
+    fixtures.mkdir()
+    make_bars("2024-02-01", 10).to_csv(fixtures / "BTC-USD.csv")
+
+    store = MarketDataStore(tmp_path / "cache", provider=LocalFileProvider(fixtures))
+    close = store.get("BTC-USD", "2024-02-01", "2024-03-01")["close"]
+
+    assert len(close) == 10
+    assert close.iloc[-1] == 109.0
+
+    with pytest.raises(FileNotFoundError):
+        store.get("MISSING", "2024-02-01", "2024-02-05")
+
+if __name__ == "__main__":
+    pytest.main([__file__])
@@ -0,0 +1,89 @@
+#!/usr/bin/env python3
+"""
+Unit tests for the shared msgspec message models
+"""
+
+import json
+import pytest
+from datetime import datetime
+
+msgspec = pytest.importorskip("msgspec")
+
+from messages import (
+    BacktestResult, CrawlMessage, ParseResult, StartURL, ValidationJob, decode_crawl_message, decode_start_url,
+    encode, to_dict,
+)
+
+def test_crawl_message_round_trip():
+    """Test crawl messages encode without unset fields and decode back typed"""
+    message = CrawlMessage(id="m1", url="https://example.com", ts=datetime(2024, 6, 1, 12, 0))
+    payload = encode(message)
+
+    assert json.loads(payload) == {"id": "m1", "url": "https://example.com", "ts": "2024-06-01T12:00:00"}
+    assert decode_crawl_message(payload) == message
+
+def test_crawl_message_requires_exactly_one_target():
+    """Test messages with neither or both of url/urls are rejected"""
+    with pytest.raises(msgspec.ValidationError, match="exactly one"):
+        decode_crawl_message(b'{"id": "m1"}')
+    with pytest.raises(msgspec.ValidationError, match="exactly one"):
+        decode_crawl_message(b'{"id": "m1", "url": "a", "urls": ["b"]}')
+    with pytest.raises(msgspec.ValidationError, match=r"\$.urls\[1\]"):
+        decode_crawl_message(b'{"id": "m1", "urls": ["a", 2]}')
+    with pytest.raises(msgspec.DecodeError):
+        decode_crawl_message(b"not json")
+
+def test_batched_message_expands_per_url():
+    """Test a batched message becomes one single-URL message per URL"""
+    message = decode_crawl_message(b'{"id": "b1", "urls": ["u1", "u2"], "concept": "momentum", "extra": 1}')
+
+    assert [(m.id, m.url, m.concept) for m in message.expand()] == [
+        ("b1-0", "u1", "momentum"), ("b1-1", "u2", "momentum"),
+    ]
+
+    mixed = decode_crawl_message(b'{"id": "b2", "urls": ["u1", "u2"], "concepts": ["momentum", null]}')
+    assert [m.concept for m in mixed.expand()] == ["momentum", None]
+    with pytest.raises(msgspec.ValidationError, match="one entry per URL"):
+        decode_crawl_message(b'{"id": "b3", "urls": ["u1"], "concepts": ["a", "b"]}')
+
+def test_start_url_entries():
+    """Test queue entries carry their concept and bare URLs from older producers still decode"""
+    entry = StartURL(url="https://example.com/a", concept="momentum")
+    assert decode_start_url(encode(entry)) == entry
+    assert decode_start_url(b"https://example.com/b") == StartURL(url="https://example.com/b")
+
+def test_parse_result_checks_embedding_dimension():
+    """Test parse results must carry a full gte-small embedding"""
+    fields = {"text": "t", "embedding": [0.0] * 384, "processed_at": "2024-06-01T00:00:00", "text_length": 1}
+    result = msgspec.convert(fields, ParseResult)
+
+    assert result.processed_at == datetime(2024, 6, 1)
+    assert "url" not in to_dict(result)
+    with pytest.raises(msgspec.ValidationError, match="embedding"):
+        msgspec.convert({**fields, "embedding": [0.0] * 3}, ParseResult)
+
+def test_validation_job_coerces_stream_strings():
+    """Test numeric job fields arriving as Redis strings are typed, symbols required"""
+    job = msgspec.convert(
+        {"id": "1-0", "enqueued_at": 0.001, "symbols": ["AAPL"], "initial_cash": "5000", "top_n": "3"},
+        ValidationJob, strict=False,
+    )
+    assert (job.initial_cash, job.top_n, job.strategy) == (5000.0, 3, "buy_and_hold")
+    with pytest.raises(msgspec.ValidationError):
+        msgspec.convert({"id": "1-0", "enqueued_at": 0.0, "symbols": []}, ValidationJob)
+
+def test_backtest_result_rejects_bad_types():
+    """Test result rows are type-checked before they reach Arrow"""
+    row = {
+        "portfolio_id": "p", "run_id": "r", "concept": None, "mode": "backtest", "strategy": "buy_and_hold",
+        "params": "{}", "initial_cash": 10000.0, "final_value": 11000.0, "total_return": 0.1,
+        "sharpe_ratio": None, "max_drawdown": -0.05, "trades_count": 1, "engine": "numba",
+        "gpu_accelerated": False, "computation_time": 0.01, "processed_at": datetime(2024, 6, 1),
+        "date": "2024-06-01", "symbol": "AAPL",
+    }
+    assert msgspec.convert(row, BacktestResult).symbol == "AAPL"
+    with pytest.raises(msgspec.ValidationError, match="total_return"):
+        msgspec.convert({**row, "total_return": "lots"}, BacktestResult)
+
+if __name__ == "__main__":
+    pytest.main([__file__])
@@ -0,0 +1,111 @@
+#!/usr/bin/env python3
+"""
+Unit tests for the vectorized parameter-sweep engine
+"""
+
+import pytest
+import sys
+import numpy as np
+import pandas as pd
+
+# Add validator service to path
+sys.path.append('services/validator')
+from sweep import build_param_grid, ma_crossover_signals, rsi_threshold_signals, run_sweep
+
+@pytest.fixture
+def price():
+    """Synthetic random-walk daily closes"""
+    rng = np.random.default_rng(42)
+    values = 100 * np.cumprod(1 + rng.normal(0.0005, 0.02, 300))
+    return pd.Series(values, index=pd.date_range("2024-01-01", periods=300, freq="D"))
+
+def test_build_param_grid_with_constraint():
+    """Test cartesian product expansion with a validity constraint"""
+    combos = build_param_grid(
+        {"fast_window": [5, 20], "slow_window": [10, 30]},
+        constraint=lambda c: c["fast_window"] < c["slow_window"],
+    )
+    assert combos == [
+        {"fast_window": 5, "slow_window": 10},
+        {"fast_window": 5, "slow_window": 30},
+        {"fast_window": 20, "slow_window": 30},
+    ]
+
+def test_build_param_grid_empty():
+    """Test that a grid with no valid combinations is rejected"""
+    with pytest.raises(ValueError, match="no valid combinations"):
+        build_param_grid({"a": [1]}, constraint=lambda c: False)
+
+def test_ma_crossover_signal_matrix_shape(price):
+    """Test one signal column per valid (fast, slow) pair"""
+    entries, exits = ma_crossover_signals(price, {"fast_window": [5, 10, 50], "slow_window": [20, 40]})
+
+    assert entries.shape == (300, 4)
+    assert exits.shape == entries.shape
+    assert list(entries.columns.names) == ["fast_window", "slow_window"]
+    assert (50, 20) not in entries.columns
+    # A bar cannot be both an entry and an exit for the same column
+    assert not (entries.to_numpy() & exits.to_numpy()).any()
+
+def test_ma_crossover_matches_per_column_loop(price):
+    """Test the vectorized matrix against a straightforward per-pair computation"""
+    entries, _ = ma_crossover_signals(price, {"fast_window": [5], "slow_window": [20]})
+
+    fast = price.rolling(5).mean()
+    slow = price.rolling(20).mean()
+    above = fast > slow
+    expected = above & ~above.shift(1, fill_value=False)
+
+    np.testing.assert_array_equal(entries[(5, 20)].to_numpy(), expected.to_numpy())
+
+def test_rsi_threshold_signals(price):
+    """Test RSI threshold grid drops entry >= exit combinations"""
+    entries, exits = rsi_threshold_signals(price, {"window": [14], "entry": [30, 70], "exit": [50, 70]})
+
+    assert list(entries.columns) == [(14, 30, 50), (14, 30, 70)]
+    assert entries.to_numpy().any()
+
+def test_run_sweep_ranked_table(price):
+    """Test a full sweep returns a ranked metrics table and throughput"""
+    results = run_sweep(
+        price,
+        {"fast_window": [5, 10], "slow_window": [20, 40, 60]},
+        initial_cash=1000,
+    )
+
+    ranked = results["ranked"]
+    assert results["combinations"] == 6
+    assert len(ranked) == 6
+    assert list(ranked["rank"]) == [1, 2, 3, 4, 5, 6]
+    assert ranked["sharpe_ratio"].is_monotonic_decreasing
+    assert {"fast_window", "slow_window", "total_return", "max_drawdown", "trades_count"} <= set(ranked.columns)
+    assert results["combos_per_sec"] > 0
+
+def test_run_sweep_matches_single_portfolio(price):
+    """Test a sweep column reproduces a standalone from_signals run"""
+    import vectorbt as vbt
+
+    results = run_sweep(price, {"fast_window": [5, 10], "slow_window": [30]}, initial_cash=1000)
+    entries, exits = ma_crossover_signals(price, {"fast_window": [10], "slow_window": [30]})
+    single = vbt.Portfolio.from_signals(
+        price, entries[(10, 30)], exits[(10, 30)], init_cash=1000, freq="1D"
+    )
+
+    row = results["ranked"].set_index(["fast_window", "slow_window"]).loc[(10, 30)]
+    assert row["total_return"] == pytest.approx(single.total_return())
+
+def test_run_sweep_top_n_and_invalid_rank(price):
+    """Test top_n truncation and rank metric validation"""
+    results = run_sweep(
+        price,
+        {"fast_window": [5, 10], "slow_window": [20, 40]},
+        rank_by="total_return",
+        top_n=2,
+    )
+    assert len(results["ranked"]) == 2
+
+    with pytest.raises(ValueError, match="Cannot rank by"):
+        run_sweep(price, {"fast_window": [5], "slow_window": [20]}, rank_by="alpha")
+
+if __name__ == "__main__":
+    pytest.main([__file__])
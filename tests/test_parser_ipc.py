@@ -123,13 +123,14 @@ def test_parser_script_integration():
     """Test the parser script end-to-end integration"""
     html_input = "<html><body><h1>Integration Test</h1><p>Testing the complete parser pipeline</p></body></html>"
     
-    # Run the parser script
+    # Run the parser script (a page this short would be skipped by the relevance prefilter)
     process = subprocess.Popen(
         ["python", "main.py"],
         stdin=subprocess.PIPE,
         stdout=subprocess.PIPE,
         stderr=subprocess.PIPE,
-        cwd="services/parser"
+        cwd="services/parser",
+        env={**os.environ, "PREFILTER_ENABLED": "false"}
     )
     
     stdout, stderr = process.communicate(input=html_input.encode())
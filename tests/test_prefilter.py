@@ -0,0 +1,82 @@
+#!/usr/bin/env python3
+"""
+Unit tests for the parser's relevance prefilter
+"""
+
+import importlib.util
+import json
+import pytest
+import sys
+from unittest.mock import patch
+
+fakeredis = pytest.importorskip("fakeredis")
+msgspec = pytest.importorskip("msgspec")
+
+sys.path.append('services/parser')
+# By path: at the repo root a bare `import main` may resolve to another service's main
+_spec = importlib.util.spec_from_file_location("parser_main", "services/parser/main.py")
+parser = importlib.util.module_from_spec(_spec)
+_spec.loader.exec_module(parser)
+from bench_prefilter import ARTICLE, COOKIES, GERMAN, LOGIN, OFF_TOPIC, STUB, run_benchmark, sample_corpus
+from messages import ParseResult
+from prefilter import Prefilter
+
+def text(template, concept="momentum"):
+    return parser.strip_tags(template.format(concept=concept))
+
+def test_skip_reasons():
+    """Test each cheap check rejects its kind of page and trading content is kept"""
+    prefilter = Prefilter()
+
+    verdicts = {name: prefilter.verdict(text(template)) for name, template in
+                [("article", ARTICLE), ("login", LOGIN), ("cookies", COOKIES), ("stub", STUB),
+                 ("recipe", OFF_TOPIC), ("german", GERMAN)]}
+
+    assert verdicts["article"].keep and verdicts["article"].score > 0.9
+    assert verdicts["article"].language == "en"
+    assert {name: v.reason for name, v in verdicts.items() if not v.keep} == {
+        "login": "boilerplate", "cookies": "boilerplate", "stub": "too_short", "recipe": "low_relevance",
+        "german": "language",
+    }
+    assert Prefilter(languages=("en", "de")).verdict(text(GERMAN)).reason == "low_relevance"
+
+def test_vocabulary_and_threshold_are_configurable(tmp_path):
+    """Test a vocabulary file replaces the default weights and the threshold is explicit"""
+    vocab = tmp_path / "vocab.json"
+    vocab.write_text(json.dumps({"bias": -1.0, "weights": {"bread": 1.5, "whole wheat": 1.0}}))
+    recipe = text(OFF_TOPIC)
+
+    baking = Prefilter.from_vocab_file(str(vocab))
+    assert baking.verdict(recipe).keep
+    assert not baking.verdict(text(ARTICLE)).keep
+    score = baking.verdict(recipe).score
+    assert Prefilter.from_vocab_file(str(vocab), threshold=score + 0.01).verdict(recipe).reason == "low_relevance"
+    with pytest.raises(ValueError, match="one or two words"):
+        Prefilter(weights={"moving average crossover": 1.0})
+
+def test_skipped_pages_are_not_encoded_and_counted():
+    """Test a skipped page bypasses model.encode and dedup, and the skip is counted in Redis"""
+    prefilter = Prefilter(redis=fakeredis.FakeRedis())
+    dedup = object()  # any use would fail
+
+    with patch.object(parser, "get_model", side_effect=AssertionError("encoded a skipped page")):
+        fields = parser.process_content(LOGIN.format(concept="x"), dedup=dedup, doc_id="login/x",
+                                        prefilter=prefilter)
+
+    result = msgspec.convert(fields, ParseResult)
+    assert (result.embedding, result.skipped, result.doc_id) == (None, "boilerplate", "login/x")
+    parser.process_content(ARTICLE.format(concept="carry"), prefilter=prefilter)
+    stats = prefilter.stats()
+    assert (stats["docs"], stats["skipped"], stats["by_reason"]) == (2, 1, {"boilerplate": 1})
+    assert prefilter.counts["skipped:boilerplate"] == 1
+
+def test_sample_corpus_skips_junk_without_false_skips():
+    """Test the bench corpus splits cleanly: every junk page skipped, no relevant page lost"""
+    report = run_benchmark(sample_corpus(), Prefilter(), encode=lambda page: None)
+
+    assert report["relevant_skipped"] == 0
+    assert report["skipped"] == report["docs"] - report["relevant"]
+    assert set(report["skipped_by_reason"]) == {"boilerplate", "too_short", "language", "low_relevance"}
+
+if __name__ == "__main__":
+    pytest.main([__file__])
@@ -0,0 +1,185 @@
+#!/usr/bin/env python3
+"""
+Unit tests for the shared QStash quota budget and crawler publish pacing
+"""
+
+import asyncio
+import pytest
+import sys
+from datetime import datetime, timezone
+from unittest.mock import AsyncMock, patch
+
+fakeredis = pytest.importorskip("fakeredis")
+
+# Import from crawler service
+sys.path.append('services/crawler')
+import main as crawler
+from adaptive import AdaptiveLimiter
+from quota import QuotaBudget, QuotaThrottle, budget_key, seconds_until_reset
+
+NOON = datetime(2024, 6, 1, 12, 0, tzinfo=timezone.utc).timestamp()
+
+class Clock:
+    def __init__(self, now=NOON):
+        self.now = now
+
+    def __call__(self):
+        return self.now
+
+@pytest.fixture
+def redis_client():
+    return fakeredis.aioredis.FakeRedis(decode_responses=True)
+
+def test_seconds_until_reset():
+    """Test the budget resets at UTC midnight"""
+    assert seconds_until_reset(NOON) == 12 * 3600
+    assert budget_key(NOON) == "qstash:budget:2024-06-01"
+
+@pytest.mark.asyncio
+async def test_acquire_is_bounded_and_refundable(redis_client):
+    """Test the budget never goes below zero and refunds restore units"""
+    budget = QuotaBudget(redis_client, daily_limit=2, clock=Clock())
+
+    assert await budget.acquire() == 1
+    assert await budget.acquire() == 0
+    assert await budget.acquire() is None
+    assert await budget.remaining() == 0
+
+    await budget.refund()
+    assert await budget.remaining() == 1
+
+@pytest.mark.asyncio
+async def test_new_day_starts_a_fresh_budget(redis_client):
+    """Test a new UTC day seeds the full daily limit"""
+    clock = Clock()
+    budget = QuotaBudget(redis_client, daily_limit=5, clock=clock)
+    await budget.acquire(5)
+
+    clock.now += 12 * 3600
+    assert await budget.remaining() == 5
+
+def test_throttle_spreads_budget_until_reset():
+    """Test the publish interval spreads what is left over the rest of the day"""
+    clock = Clock()
+    throttle = QuotaThrottle(daily_limit=500, clock=clock)
+
+    assert throttle.interval(240) == pytest.approx(180.0)
+    assert throttle.mode(400) == throttle.SINGLE
+    assert throttle.mode(50) == throttle.BATCH
+    assert throttle.mode(0) == throttle.DEFER
+
+    throttle.record(240)
+    assert throttle.wait_time() == pytest.approx(180.0)
+
+def test_projected_exhaustion_from_recent_rate():
+    """Test exhaustion is projected from publishes in the trailing window"""
+    clock = Clock()
+    throttle = QuotaThrottle(clock=clock)
+    assert throttle.projected_exhaustion(100) is None
+
+    for _ in range(60):
+        clock.now += 60
+        throttle.record(100)
+    # 60 publishes/hour with 100 left -> 100 minutes from now
+    assert throttle.projected_exhaustion(100) == pytest.approx(clock.now + 6000)
+    # Far more budget than the rate can use before midnight -> no exhaustion today
+    assert throttle.projected_exhaustion(10000) is None
+
+@pytest.mark.asyncio
+async def test_crawl_step_batches_when_budget_is_low(redis_client):
+    """Test a low budget packs several URLs into one publish"""
+    clock = Clock()
+    budget = QuotaBudget(redis_client, daily_limit=500, clock=clock)
+    throttle = QuotaThrottle(daily_limit=500, batch_size=3, clock=clock)
+    await redis_client.hset(budget_key(clock()), mapping={"remaining": 10, "limit": 500})
+    await redis_client.rpush("start_urls", "u1", "u2", "u3", "u4")
+
+    with patch.object(crawler, "publish_batch_to_qstash", new=AsyncMock()) as publish_batch:
+        wait = await crawler.crawl_step(redis_client, budget, throttle)
+
+    publish_batch.assert_awaited_once_with(["u1", "u2", "u3"], [None, None, None])
+    assert await budget.remaining() == 9
+    assert wait == pytest.approx(12 * 3600 / 9)
+    # One publish in the trailing hour with 9 left -> 9 hours, before the reset
+    assert float(await redis_client.hget(budget_key(clock()), "projected_exhaustion")) == clock() + 9 * 3600
+
+@pytest.mark.asyncio
+async def test_crawl_step_defers_when_exhausted(redis_client):
+    """Test an exhausted budget leaves URLs queued"""
+    clock = Clock()
+    budget = QuotaBudget(redis_client, daily_limit=500, clock=clock)
+    throttle = QuotaThrottle(clock=clock)
+    await redis_client.hset(budget_key(clock()), mapping={"remaining": 0, "limit": 500})
+    await redis_client.rpush("start_urls", "u1")
+
+    with patch.object(crawler, "publish_to_qstash", new=AsyncMock()) as publish:
+        wait = await crawler.crawl_step(redis_client, budget, throttle)
+
+    publish.assert_not_awaited()
+    assert wait == 60.0
+    assert await redis_client.lrange("start_urls", 0, -1) == ["u1"]
+
+@pytest.mark.asyncio
+async def test_failed_publish_refunds_budget(redis_client):
+    """Test a failed publish gives its unit back and keeps its URLs queued"""
+    clock = Clock()
+    budget = QuotaBudget(redis_client, daily_limit=500, clock=clock)
+    throttle = QuotaThrottle(clock=clock)
+    await redis_client.rpush("start_urls", "u1", "u2")
+
+    failing = AsyncMock(side_effect=RuntimeError("boom"))
+    with patch.object(crawler, "publish_to_qstash", new=failing):
+        await crawler.crawl_step(redis_client, budget, throttle)
+
+    failing.assert_awaited_once_with("u1", None)
+    assert await budget.remaining() == 500
+    assert await redis_client.lrange("start_urls", 0, -1) == ["u1", "u2"]
+
+@pytest.mark.asyncio
+async def test_crawl_step_keeps_concepts_of_queued_entries(redis_client):
+    """Test concept-tagged entries from /api/concepts reach the published batch, next to bare URLs"""
+    clock = Clock()
+    budget = QuotaBudget(redis_client, daily_limit=500, clock=clock)
+    throttle = QuotaThrottle(daily_limit=500, batch_size=3, clock=clock)
+    await redis_client.hset(budget_key(clock()), mapping={"remaining": 10, "limit": 500})
+    await redis_client.rpush("start_urls", '{"url":"u1","concept":"momentum"}', "{not json", "u2",
+                             '{"url":"u3","concept":"carry"}')
+
+    with patch.object(crawler, "publish_batch_to_qstash", new=AsyncMock()) as publish_batch:
+        await crawler.crawl_step(redis_client, budget, throttle)
+
+    publish_batch.assert_awaited_once_with(["u1", "u2"], ["momentum", None])
+    assert await redis_client.lrange("start_urls", 0, -1) == ['{"url":"u3","concept":"carry"}']
+
+@pytest.mark.asyncio
+async def test_transport_overlaps_publishes_up_to_the_limit(redis_client, monkeypatch):
+    """Test paced steps do not wait on QStash round trips, but never exceed the adaptive limit in flight"""
+    clock = Clock()
+    monkeypatch.setattr(crawler, "publish_limiter", AdaptiveLimiter("qstash_publish", initial=2))
+    transport = crawler.QStashTransport(redis_client)
+    transport.budget = QuotaBudget(redis_client, daily_limit=500, clock=clock)
+    transport.throttle = QuotaThrottle(daily_limit=500, clock=clock)
+    await redis_client.rpush("start_urls", "u1", "u2", "u3", "u4", "u5")
+
+    inflight, peak, published = 0, 0, []
+
+    async def slow_publish(url, concept=None):
+        nonlocal inflight, peak
+        inflight += 1
+        peak = max(peak, inflight)
+        await asyncio.sleep(0.01)
+        inflight -= 1
+        published.append(url)
+
+    with patch.object(crawler, "publish_to_qstash", new=slow_publish):
+        for _ in range(5):
+            clock.now += await transport.step(redis_client)
+        assert len(transport.inflight) <= 2
+        await transport.drain()
+
+    assert peak == 2
+    assert sorted(published) == ["u1", "u2", "u3", "u4", "u5"]
+    assert await transport.budget.remaining() == 495
+
+if __name__ == "__main__":
+    pytest.main([__file__])
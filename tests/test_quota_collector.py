@@ -0,0 +1,176 @@
+#!/usr/bin/env python3
+"""
+Unit tests for the async quota collector (respx for QStash, moto for R2)
+"""
+
+import asyncio
+import pytest
+import random
+import sys
+import time
+from unittest.mock import patch
+
+import httpx
+import respx
+
+boto3 = pytest.importorskip("boto3")
+moto = pytest.importorskip("moto")
+
+# Add quota exporter to path
+sys.path.append('monitor/quota-exporter')
+import exporter
+from collector import AsyncCollector, Source, source_last_success, source_stale
+
+def gauge_value(gauge, **labels):
+    return gauge.labels(**labels)._value.get() if labels else gauge._value.get()
+
+def test_next_delay_jitter_and_backoff():
+    """Test interval jitter on success and capped exponential backoff on failure"""
+    collector = AsyncCollector([], rng=random.Random(0))
+    source = Source("s", None, interval=100, backoff=5, max_backoff=60, jitter=0.1)
+
+    assert all(90 <= collector.next_delay(source) <= 110 for _ in range(50))
+
+    for failures, ceiling in ((1, 5), (2, 10), (3, 20), (4, 40), (5, 60), (9, 60)):
+        source.failures = failures
+        delays = [collector.next_delay(source) for _ in range(50)]
+        assert all(0 <= d <= ceiling for d in delays)
+        assert max(delays) > ceiling / 2
+
+@pytest.mark.asyncio
+async def test_timeout_counts_as_failure():
+    """Test a collection exceeding its timeout is abandoned and backs off"""
+    async def hang():
+        await asyncio.sleep(10)
+
+    source = Source("hang", hang, interval=60, timeout=0.05)
+    collector = AsyncCollector([source])
+
+    assert await collector.collect_once(source) is False
+    assert source.failures == 1
+
+@pytest.mark.asyncio
+async def test_slow_source_does_not_delay_fast_source():
+    """Test sources run concurrently on their own schedules"""
+    runs = {"fast": 0, "slow": 0}
+
+    async def fast():
+        runs["fast"] += 1
+
+    async def slow():
+        runs["slow"] += 1
+        await asyncio.sleep(10)
+
+    collector = AsyncCollector([
+        Source("fast", fast, interval=0.02, jitter=0),
+        Source("slow", slow, interval=0.02, timeout=0.5),
+    ])
+    task = asyncio.create_task(collector.run())
+    await asyncio.sleep(0.3)
+    collector.stop()
+    await asyncio.wait_for(task, timeout=2)
+
+    assert runs["slow"] == 1
+    assert runs["fast"] >= 5
+
+@pytest.mark.asyncio
+async def test_stale_sources_are_flagged():
+    """Test the last-success timestamp and stale flag follow the clock"""
+    now = [1000.0]
+
+    async def ok():
+        pass
+
+    source = Source("clocked", ok, interval=30)
+    collector = AsyncCollector([source], clock=lambda: now[0])
+
+    assert collector.mark_stale() == ["clocked"]
+    await collector.collect_once(source)
+    assert gauge_value(source_last_success, source="clocked") == 1000.0
+    assert collector.mark_stale() == []
+
+    now[0] += 61
+    assert collector.mark_stale() == ["clocked"]
+    assert gauge_value(source_stale, source="clocked") == 1
+
+@pytest.mark.asyncio
+async def test_qstash_source_against_fake_http():
+    """Test QStash usage is parsed from the API and HTTP errors raise"""
+    with patch.dict('os.environ', {'QSTASH_TOKEN': 'test-token'}, clear=False):
+        quota = exporter.QuotaExporter()
+
+    with respx.mock:
+        route = respx.get(f"{exporter.QSTASH_API_URL}/v2/usage")
+        route.mock(return_value=httpx.Response(200, json={"dailyRemaining": 420}))
+        async with httpx.AsyncClient() as client:
+            await quota.collect_qstash(client)
+
+            assert route.calls.last.request.headers["Authorization"] == "Bearer test-token"
+            assert gauge_value(exporter.qstash_daily_remaining) == 420
+            assert gauge_value(exporter.qstash_messages_sent_total) == 80
+
+            route.mock(return_value=httpx.Response(503))
+            with pytest.raises(httpx.HTTPStatusError):
+                await quota.collect_qstash(client)
+
+@pytest.mark.asyncio
+async def test_r2_source_against_fake_s3(tmp_path):
+    """Test the R2 source scans a moto bucket off the event loop"""
+    env = {'R2_ACCOUNT_ID': 'acct', 'R2_KEY': 'key', 'R2_SECRET': 'secret',
+           'R2_USAGE_SNAPSHOT': str(tmp_path / 'r2.json')}
+    with moto.mock_aws(), patch.dict('os.environ', env, clear=False):
+        s3 = boto3.client("s3", region_name="us-east-1")
+        s3.create_bucket(Bucket="trading-backups")
+        s3.put_object(Bucket="trading-backups", Key="weaviate-data/2024-06-01/a", Body=b"x" * 64)
+
+        quota = exporter.QuotaExporter()
+        quota.r2_scanner.client = s3
+        names = [source.name for source in quota.sources(client=None)]
+        await quota.collect_r2()
+
+    assert names[0] == "r2"
+    assert gauge_value(exporter.r2_storage_bytes) == 64
+    assert gauge_value(exporter.r2_prefix_objects, prefix="weaviate-data/2024-06-01/") == 1
+
+@pytest.mark.asyncio
+async def test_timed_out_r2_scan_is_joined_not_repeated():
+    """Test a collection after a timeout waits for the scan still running instead of starting a second one"""
+    quota = exporter.QuotaExporter()
+    calls = []
+
+    def slow_scan():
+        calls.append(1)
+        time.sleep(0.3)
+        return {'total_bytes': 1, 'total_objects': 1, 'prefixes': {}, 'mode': 'full', 'duration': 0.3,
+                'prefixes_listed': 0}
+
+    quota.r2_scanner = type("Scanner", (), {"scan": staticmethod(slow_scan)})()
+    source = Source("r2", quota.collect_r2, timeout=0.1)
+    collector = AsyncCollector([source])
+
+    assert not await collector.collect_once(source)
+    source.timeout = 5
+    assert await collector.collect_once(source)
+    assert len(calls) == 1
+    await quota.collect_r2()
+    assert len(calls) == 2
+
+def test_sync_budget_keeps_lower_count():
+    """Test the exporter shares QStash remaining quota without undoing crawler spend"""
+    fakeredis = pytest.importorskip("fakeredis")
+    quota = exporter.QuotaExporter()
+    quota.redis = fakeredis.FakeRedis(decode_responses=True)
+    noon = 1717243200.0  # 2024-06-01T12:00:00Z
+    key = "qstash:budget:2024-06-01"
+
+    assert quota.sync_budget(400, now=noon) == 400
+    quota.redis.hset(key, mapping={"remaining": 380, "projected_exhaustion": noon + 3600})
+    assert quota.sync_budget(390, now=noon) == 380
+    assert quota.sync_budget(300, now=noon) == 300
+
+    assert gauge_value(exporter.qstash_budget_remaining) == 300
+    assert gauge_value(exporter.qstash_projected_exhaustion) == noon + 3600
+    assert quota.sync_budget(500, now=noon + 86400) == 500
+
+if __name__ == "__main__":
+    pytest.main([__file__])
@@ -0,0 +1,117 @@
+#!/usr/bin/env python3
+"""
+Unit tests for paginated, incremental R2 usage accounting (moto S3 stand-in)
+"""
+
+import pytest
+import sys
+
+boto3 = pytest.importorskip("boto3")
+moto = pytest.importorskip("moto")
+
+# Add quota exporter to path
+sys.path.append('monitor/quota-exporter')
+from r2_usage import R2UsageScanner
+
+BUCKET = "trading-backups"
+
+@pytest.fixture
+def s3():
+    with moto.mock_aws():
+        client = boto3.client("s3", region_name="us-east-1")
+        client.create_bucket(Bucket=BUCKET)
+        yield client
+
+def put(client, key, size):
+    client.put_object(Bucket=BUCKET, Key=key, Body=b"x" * size)
+
+class CountingClient:
+    """Wraps an S3 client and counts ListObjectsV2 pages per prefix"""
+
+    def __init__(self, client):
+        self.client = client
+        self.listed = []
+
+    def get_paginator(self, name):
+        paginator = self.client.get_paginator(name)
+        listed = self.listed
+
+        class Paginator:
+            def paginate(self, **kwargs):
+                for page in paginator.paginate(**kwargs):
+                    listed.append((kwargs.get("Prefix"), kwargs.get("Delimiter")))
+                    yield page
+
+        return Paginator()
+
+    def head_object(self, **kwargs):
+        return self.client.head_object(**kwargs)
+
+def test_full_scan_paginates_beyond_one_page(s3):
+    """Test more than 1,000 objects are all counted"""
+    for i in range(1005):
+        put(s3, f"weaviate-data/2024-06-01/obj-{i:04d}", 2)
+
+    usage = R2UsageScanner(s3, BUCKET).scan()
+    assert usage["total_objects"] == 1005
+    assert usage["total_bytes"] == 2010
+    assert usage["prefixes"] == {"weaviate-data/2024-06-01/": {"bytes": 2010, "objects": 1005}}
+
+def test_per_prefix_usage_includes_loose_objects(s3):
+    """Test leaves are reported per prefix and shallower objects by their parent"""
+    put(s3, "weaviate-data/2024-06-01/a", 10)
+    put(s3, "weaviate-data/2024-06-02/a", 20)
+    put(s3, "weaviate-data/2024-06-02/b", 5)
+    put(s3, "weaviate-data/README", 1)
+    put(s3, "marker.txt", 3)
+
+    usage = R2UsageScanner(s3, BUCKET, depth=2).scan()
+    assert usage["prefixes"] == {
+        "weaviate-data/2024-06-01/": {"bytes": 10, "objects": 1},
+        "weaviate-data/2024-06-02/": {"bytes": 25, "objects": 2},
+        "weaviate-data/": {"bytes": 1, "objects": 1},
+        "": {"bytes": 3, "objects": 1},
+    }
+    assert usage["total_bytes"] == 39
+
+def test_incremental_scan_lists_only_new_prefixes(s3, tmp_path):
+    """Test a second scan lists new leaves and the tail, reusing the snapshot"""
+    for day in ("01", "02", "03"):
+        put(s3, f"weaviate-data/2024-06-{day}/a", 10)
+    snapshot = tmp_path / "r2_usage.json"
+    R2UsageScanner(s3, BUCKET, snapshot_path=str(snapshot)).scan()
+
+    put(s3, "weaviate-data/2024-06-03/b", 7)
+    put(s3, "weaviate-data/2024-06-04/a", 100)
+    counting = CountingClient(s3)
+    usage = R2UsageScanner(counting, BUCKET, snapshot_path=str(snapshot)).scan()
+
+    assert usage["mode"] == "incremental"
+    assert usage["prefixes_listed"] == 1
+    assert usage["total_bytes"] == 137
+    full_listings = {prefix for prefix, delimiter in counting.listed if delimiter is None}
+    assert full_listings == {"weaviate-data/2024-06-03/", "weaviate-data/2024-06-04/"}
+
+def test_changed_etag_rescans_tail(s3):
+    """Test an overwritten last-seen key forces a full listing of that prefix"""
+    put(s3, "weaviate-data/2024-06-01/a", 10)
+    scanner = R2UsageScanner(s3, BUCKET)
+    scanner.scan()
+
+    put(s3, "weaviate-data/2024-06-01/a", 40)
+    assert scanner.scan()["total_bytes"] == 40
+
+def test_full_scan_interval_drops_deleted_objects(s3):
+    """Test the periodic full rescan corrects for deletions inside known prefixes"""
+    put(s3, "weaviate-data/2024-06-01/a", 10)
+    put(s3, "weaviate-data/2024-06-01/b", 10)
+    put(s3, "weaviate-data/2024-06-02/a", 10)
+    scanner = R2UsageScanner(s3, BUCKET, full_scan_interval=3600)
+    assert scanner.scan()["mode"] == "full"
+
+    s3.delete_object(Bucket=BUCKET, Key="weaviate-data/2024-06-01/b")
+    assert scanner.scan()["total_bytes"] == 30
+    assert scanner.scan(full=True)["total_bytes"] == 20
+
+if __name__ == "__main__":
+    pytest.main([__file__])
@@ -0,0 +1,123 @@
+#!/usr/bin/env python3
+"""
+Unit tests for the columnar backtest results store
+"""
+
+import json
+import pytest
+import sys
+import pandas as pd
+from unittest.mock import MagicMock
+
+# Add validator service to path
+sys.path.append('services/validator')
+from results_store import ResultsStore, WeaviateResultsWriter, rows_from_results
+
+def backtest_result(symbol, sharpe, processed_at="2024-06-01T12:00:00"):
+    return {
+        "portfolio_id": f"{symbol}_{processed_at}",
+        "symbol": symbol,
+        "initial_cash": 10000,
+        "final_value": 11000.0,
+        "total_return": 0.1,
+        "sharpe_ratio": sharpe,
+        "max_drawdown": -0.05,
+        "trades_count": 1,
+        "gpu_accelerated": False,
+        "engine": "numba",
+        "computation_time": 0.01,
+        "processed_at": processed_at,
+    }
+
+@pytest.fixture
+def store(tmp_path):
+    store = ResultsStore(tmp_path / "results")
+    store.append(rows_from_results({"results": [
+        backtest_result("AAPL", 1.5),
+        backtest_result("MSFT", 0.5),
+    ]}))
+    store.append(rows_from_results(backtest_result("AAPL", 2.5, "2024-06-02T09:00:00")))
+    return store
+
+def test_append_partitions_by_date_and_symbol(store):
+    """Test rows land in hive date=/symbol= partitions"""
+    partitions = sorted(
+        str(p.relative_to(store.root)) for p in store.root.glob("date=*/symbol=*")
+    )
+    assert partitions == [
+        "date=2024-06-01/symbol=AAPL",
+        "date=2024-06-01/symbol=MSFT",
+        "date=2024-06-02/symbol=AAPL",
+    ]
+
+def test_top_n_by_sharpe(store):
+    """Test the best results across runs are ranked by Sharpe"""
+    top = store.top_n(2)
+    assert list(top["sharpe_ratio"]) == [2.5, 1.5]
+    assert list(top["symbol"]) == ["AAPL", "AAPL"]
+
+def test_query_filters_and_projects(store):
+    """Test symbol/date filters prune rows and only requested columns are read"""
+    frame = store.query(columns=["symbol", "sharpe_ratio"], symbol="AAPL", start="2024-06-02")
+    assert list(frame.columns) == ["symbol", "sharpe_ratio"]
+    assert frame["sharpe_ratio"].tolist() == [2.5]
+
+    frame = store.query(columns=["symbol"], end="2024-06-01")
+    assert sorted(frame["symbol"]) == ["AAPL", "MSFT"]
+
+def test_query_empty_store(tmp_path):
+    """Test querying before anything was written returns an empty frame"""
+    assert ResultsStore(tmp_path).top_n(5).empty
+
+def test_sweep_rows_carry_params():
+    """Test each ranked sweep combination becomes a row with its parameters"""
+    ranked = pd.DataFrame({
+        "rank": [1, 2],
+        "fast_window": [5, 10],
+        "slow_window": [50, 100],
+        "total_return": [0.2, 0.1],
+        "sharpe_ratio": [1.2, 0.8],
+        "max_drawdown": [-0.1, -0.2],
+        "final_value": [12000.0, 11000.0],
+        "trades_count": [4, 2],
+    })
+    rows = rows_from_results({
+        "portfolio_id": "BTC-USD_sweep",
+        "symbol": "BTC-USD",
+        "initial_cash": 10000,
+        "strategy": "ma_crossover",
+        "combinations": 2,
+        "ranked": ranked,
+        "computation_time": 1.0,
+        "processed_at": "2024-06-01T00:00:00",
+    })
+
+    assert [row["mode"] for row in rows] == ["sweep", "sweep"]
+    assert json.loads(rows[0]["params"]) == {"fast_window": 5, "slow_window": 50}
+    assert rows[1]["portfolio_id"] == "BTC-USD_sweep_10_100"
+
+def test_compact_merges_partition_files(store):
+    """Test compaction leaves one file per partition without losing rows"""
+    store.append(rows_from_results(backtest_result("AAPL", 0.1)))
+    partition = store.root / "date=2024-06-01" / "symbol=AAPL"
+    assert len(list(partition.glob("*.parquet"))) == 2
+
+    store.compact("2024-06-01")
+    assert len(list(partition.glob("*.parquet"))) == 1
+    assert len(store.query(symbol="AAPL", end="2024-06-01")) == 2
+
+def test_weaviate_writer_batches():
+    """Test rows are added to Weaviate as BacktestResult objects in one batch"""
+    client = MagicMock()
+    batch = client.batch.__enter__.return_value
+    rows = rows_from_results({"results": [backtest_result("AAPL", 1.0), backtest_result("MSFT", 2.0)]})
+
+    assert WeaviateResultsWriter(client, batch_size=50).write(rows) == 2
+    client.batch.configure.assert_called_once_with(batch_size=50)
+    assert batch.add_data_object.call_count == 2
+    kwargs = batch.add_data_object.call_args.kwargs
+    assert kwargs["class_name"] == "BacktestResult"
+    assert kwargs["data_object"]["processed_at"] == "2024-06-01T12:00:00Z"
+
+if __name__ == "__main__":
+    pytest.main([__file__])
@@ -0,0 +1,94 @@
+#!/usr/bin/env python3
+"""
+Unit tests for walk-forward and Monte Carlo validation
+"""
+
+import pytest
+import sys
+import numpy as np
+import pandas as pd
+
+# Add validator service to path
+sys.path.append('services/validator')
+from cpu_engine import returns_metrics
+from robustness import bootstrap_indices, monte_carlo, walk_forward, walk_forward_splits
+
+@pytest.fixture
+def returns():
+    """Two-combination returns: 'steady' wins early, 'late' wins afterwards"""
+    rng = np.random.default_rng(3)
+    index = pd.date_range("2023-01-01", periods=300, freq="D")
+    steady = rng.normal(0.002, 0.01, 300)
+    late = rng.normal(-0.002, 0.01, 300)
+    late[150:] += 0.006
+    columns = pd.MultiIndex.from_tuples([(5, 50), (10, 100)], names=["fast_window", "slow_window"])
+    return pd.DataFrame(np.column_stack([steady, late]), index=index, columns=columns)
+
+def test_walk_forward_splits():
+    """Test rolling train/test windows stay inside the history"""
+    starts = walk_forward_splits(100, train_size=40, test_size=20)
+    assert list(starts) == [0, 20, 40]
+
+    with pytest.raises(ValueError, match="exceeds"):
+        walk_forward_splits(50, train_size=40, test_size=20)
+
+def test_walk_forward_matches_per_split_loop(returns):
+    """Test the vectorized pass equals scoring each split separately"""
+    result = walk_forward(returns, train_size=60, test_size=30)
+    per_split = result["per_split"]
+
+    assert result["splits"] == len(per_split) == 8
+    for row in per_split.itertuples():
+        start = row.split * 30
+        train = returns_metrics(returns.iloc[start:start + 60])
+        best = train["sharpe_ratio"].to_numpy().argmax()
+        assert (row.fast_window, row.slow_window) == returns.columns[best]
+
+        test = returns_metrics(returns.iloc[start + 60:start + 90, [best]])
+        assert row.oos_total_return == pytest.approx(test["total_return"].iloc[0])
+        assert row.oos_sharpe_ratio == pytest.approx(test["sharpe_ratio"].iloc[0])
+
+def test_walk_forward_distribution(returns):
+    """Test per-split out-of-sample metrics are summarized as distributions"""
+    distribution = walk_forward(returns, train_size=60, test_size=30)["distribution"]
+
+    assert list(distribution.index) == ["total_return", "sharpe_ratio", "max_drawdown"]
+    assert {"mean", "std", "p5", "p50", "p95"} <= set(distribution.columns)
+    assert distribution.loc["max_drawdown", "p95"] <= 0
+
+def test_bootstrap_indices_blocks():
+    """Test block bootstrap draws contiguous (circular) runs of bars"""
+    index = bootstrap_indices(np.random.default_rng(0), n_bars=50, horizon=12, n_resamples=4, block_size=4)
+
+    assert index.shape == (12, 4)
+    steps = np.diff(index[:4], axis=0) % 50
+    assert (steps == 1).all()
+
+def test_monte_carlo_constant_returns():
+    """Test resampling a constant series gives a degenerate distribution"""
+    result = monte_carlo(np.full(100, 0.001), n_resamples=500, chunk_size=128, seed=1)
+
+    distribution = result["distribution"]
+    expected = (1.001 ** 100) - 1
+    assert distribution.loc["total_return", "p5"] == pytest.approx(expected)
+    assert distribution.loc["total_return", "p95"] == pytest.approx(expected)
+    assert result["probability_of_loss"] == 0.0
+
+def test_monte_carlo_10k_resamples_reports_throughput(returns):
+    """Test 10k resamples run in chunks and report timing"""
+    result = monte_carlo(returns.iloc[:, 0], n_resamples=10000, block_size=5, chunk_size=2500, seed=7)
+
+    assert result["n_resamples"] == 10000
+    assert result["horizon"] == 300
+    assert result["computation_time"] > 0
+    assert result["resamples_per_sec"] > 0
+    assert 0.0 <= result["probability_of_loss"] <= 1.0
+
+def test_monte_carlo_seeded_reproducible(returns):
+    """Test the same seed yields the same distribution"""
+    first = monte_carlo(returns.iloc[:, 1], n_resamples=300, seed=11)["distribution"]
+    second = monte_carlo(returns.iloc[:, 1], n_resamples=300, seed=11)["distribution"]
+    pd.testing.assert_frame_equal(first, second)
+
+if __name__ == "__main__":
+    pytest.main([__file__])
@@ -0,0 +1,190 @@
+#!/usr/bin/env python3
+"""
+Unit tests for orchestrator vector search and its query-result cache
+"""
+
+import pytest
+import sys
+from datetime import datetime
+from unittest.mock import MagicMock
+
+from fastapi.testclient import TestClient
+
+# Add orchestrator to path
+sys.path.append('services/orchestrator')
+import main as orchestrator
+from messages import ParseResult, encode
+from search import SearchCache, SearchService, build_where, cache_key, search_cache_hit_ratio
+
+class Clock:
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+class FakeEmbedder:
+    executor = None
+
+    def __init__(self):
+        self.calls = []
+
+    async def embed(self, text):
+        self.calls.append(text)
+        return [0.1] * 384
+
+def fake_weaviate(results):
+    client = MagicMock()
+    query = client.query.get.return_value
+    for method in ("with_near_vector", "with_limit", "with_additional", "with_where"):
+        getattr(query, method).return_value = query
+    query.do.return_value = {"data": {"Get": {"ParsedDocument": results}}}
+    return client, query
+
+def test_cache_key_normalizes_query_and_filters():
+    """Test equivalent queries share a cache entry"""
+    assert cache_key("  Momentum   Strategy ") == cache_key("momentum strategy")
+    assert cache_key("q", filters={"a": 1, "b": 2}) == cache_key("q", filters={"b": 2, "a": 1})
+    assert cache_key("q", concept="momentum") != cache_key("q")
+    assert cache_key("q", limit=5) != cache_key("q", limit=10)
+
+def test_build_where():
+    """Test filters become Weaviate equality operands"""
+    assert build_where() is None
+    assert build_where(concept="momentum") == {"path": ["concept"], "operator": "Equal", "valueText": "momentum"}
+    where = build_where(concept="momentum", filters={"year": 2024})
+    assert where["operator"] == "And"
+    assert {"path": ["year"], "operator": "Equal", "valueInt": 2024} in where["operands"]
+
+def test_lru_eviction_and_ttl():
+    """Test least recently used entries are evicted and entries expire"""
+    clock = Clock()
+    cache = SearchCache(maxsize=2, ttl=10, clock=clock)
+    cache.put("a", [1])
+    cache.put("b", [2])
+    assert cache.get("a") == [1]
+    cache.put("c", [3])
+
+    assert cache.get("b") is None
+    assert cache.get("a") == [1]
+
+    clock.now = 11
+    assert cache.get("a") is None
+    assert len(cache) == 1
+
+def test_invalidation_by_concept():
+    """Test a write drops results for its concept and unscoped results only"""
+    cache = SearchCache()
+    cache.put("momentum", [1], concept="momentum")
+    cache.put("value", [2], concept="value")
+    cache.put("all", [3])
+
+    assert cache.invalidate("momentum") == 2
+    assert cache.get("momentum") is None
+    assert cache.get("all") is None
+    assert cache.get("value") == [2]
+
+@pytest.mark.asyncio
+async def test_search_serves_repeat_queries_from_cache():
+    """Test only the first of two equivalent queries embeds and hits Weaviate"""
+    client, query = fake_weaviate([{"url": "https://example.com", "_additional": {"distance": 0.1}}])
+    embedder = FakeEmbedder()
+    service = SearchService(client, embedder, SearchCache())
+
+    results, cached = await service.search("Momentum", concept="momentum", limit=5)
+    assert not cached
+    assert results[0]["url"] == "https://example.com"
+    query.with_limit.assert_called_once_with(5)
+    query.with_where.assert_called_once_with(build_where(concept="momentum"))
+
+    results, cached = await service.search("  momentum ", concept="momentum", limit=5)
+    assert cached
+    assert embedder.calls == ["momentum"]
+    assert query.do.call_count == 1
+    assert 0 < search_cache_hit_ratio._value.get() <= 1
+
+    service.cache.invalidate("momentum")
+    _, cached = await service.search("momentum", concept="momentum", limit=5)
+    assert not cached
+    assert query.do.call_count == 2
+
+@pytest.mark.asyncio
+async def test_results_read_before_a_write_are_not_cached(monkeypatch):
+    """Test a miss whose query overlaps an invalidation returns its results but does not cache them"""
+    client, query = fake_weaviate([{"url": "https://old.example"}])
+    cache = SearchCache()
+    service = SearchService(client, FakeEmbedder(), cache)
+
+    def write_during_query():
+        # A momentum document is stored while the query is in flight
+        cache.invalidate("momentum")
+        return {"data": {"Get": {"ParsedDocument": []}}}
+
+    query.do.side_effect = write_during_query
+
+    await service.search("momentum", concept="momentum")
+    await service.search("anything")
+    await service.search("value", concept="value")
+    assert len(cache) == 1
+    assert cache.get(cache_key("value", concept="value")) == []
+
+    query.do.side_effect = None
+    _, cached = await service.search("momentum", concept="momentum")
+    assert not cached
+    _, cached = await service.search("momentum", concept="momentum")
+    assert cached
+
+def test_put_skips_stale_generations():
+    """Test results are only cached if no invalidation touched their scope since generation() was read"""
+    cache = SearchCache()
+    momentum, value, unscoped = cache.generation("momentum"), cache.generation("value"), cache.generation()
+    cache.invalidate("momentum")
+
+    assert not cache.put("m", [1], concept="momentum", generation=momentum)
+    assert not cache.put("all", [2], generation=unscoped)
+    assert cache.put("v", [3], concept="value", generation=value)
+    cache.clear()
+    assert not cache.put("v", [3], concept="value", generation=value)
+
+@pytest.mark.asyncio
+async def test_search_errors_are_not_cached():
+    """Test a failed Weaviate query raises and leaves the cache empty"""
+    client, query = fake_weaviate([])
+    query.do.return_value = {"errors": [{"message": "boom"}]}
+    service = SearchService(client, FakeEmbedder(), SearchCache())
+
+    with pytest.raises(RuntimeError):
+        await service.search("anything")
+    assert len(service.cache) == 0
+
+def test_parsed_documents_are_stored_with_vectors_and_invalidate_their_concept(monkeypatch):
+    """Test /api/documents writes embedded results to the search class and drops stale cached results"""
+    writes = []
+    monkeypatch.setattr(orchestrator, "write_objects",
+                        lambda objects, class_name, vectors: writes.append((objects, class_name, vectors)))
+    cache = SearchCache()
+    monkeypatch.setattr(orchestrator, "search_cache", cache)
+    cache.put("momentum", [1], concept="momentum")
+    cache.put("value", [2], concept="value")
+    cache.put("all", [3])
+
+    parsed = dict(text="Momentum strategies buy recent winners", processed_at=datetime(2024, 6, 1), text_length=38)
+    body = b"\n".join([
+        encode(ParseResult(**parsed, embedding=[0.1] * 384, url="https://a.example", concept="momentum")),
+        encode(ParseResult(**parsed, duplicate_of="https://a.example", url="https://b.example", concept="value")),
+    ])
+    response = TestClient(orchestrator.app).post("/api/documents", content=body)
+
+    assert response.json() == {"received": 2, "stored": 1}
+    (objects, class_name, vectors), = writes
+    assert class_name == "ParsedDocument"
+    assert objects == [{"url": "https://a.example", "text": parsed["text"], "concept": "momentum",
+                        "text_length": 38, "processed_at": "2024-06-01T00:00:00"}]
+    assert vectors == [[0.1] * 384]
+    assert (cache.get("momentum"), cache.get("all"), cache.get("value")) == (None, None, [2])
+
+    response = TestClient(orchestrator.app).post("/api/documents", content=b'{"text": "no embedding"}')
+    assert response.status_code == 400
+
+if __name__ == "__main__":
+    pytest.main([__file__])
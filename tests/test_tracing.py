@@ -0,0 +1,98 @@
+#!/usr/bin/env python3
+"""
+Unit tests for trace propagation, span export and the critical-path summary
+"""
+
+import json
+import sys
+
+import httpx
+import pytest
+respx = pytest.importorskip("respx")
+
+from tracing import (
+    critical_path, load_spans, parse_traceparent, record_span, setup_tracing, span, stop_tracing, summarize,
+    traceparent,
+)
+
+sys.path.append('services/crawler')
+import main as crawler
+
+@pytest.fixture
+def spans_file(tmp_path):
+    path = tmp_path / "spans.jsonl"
+    setup_tracing("test", export="jsonl", path=str(path))
+    yield path
+    stop_tracing()
+
+def test_spans_nest_and_export_as_jsonl(spans_file):
+    """Test nested spans inherit the trace, link to their parent and record errors; untraced spans are dropped"""
+    with span("parser.parse", "a" * 32, chars=10) as parse:
+        with span("parser.encode"):
+            pass
+        with pytest.raises(ValueError):
+            with span("parser.dedup"):
+                raise ValueError("redis down")
+    with span("untraced"):
+        pass
+    record_span("validator.queue_wait", "a" * 32, 100.0, 105.0, job_id="1-0")
+    stop_tracing()
+
+    spans = {s["name"]: s for s in load_spans(spans_file)}
+    assert set(spans) == {"parser.parse", "parser.encode", "parser.dedup", "validator.queue_wait"}
+    assert spans["parser.encode"]["parent_id"] == parse.span_id
+    assert spans["parser.encode"]["trace_id"] == "a" * 32
+    assert spans["parser.dedup"]["attrs"]["error"] == "ValueError: redis down"
+    assert spans["validator.queue_wait"]["duration"] == 5.0
+    assert spans["parser.parse"]["service"] == "test"
+
+    header = traceparent("a" * 32, "b" * 16)
+    assert parse_traceparent(header) == ("a" * 32, "b" * 16)
+    assert parse_traceparent("garbage") == (None, None)
+
+def stage(name, service, start, end, span_id, parent_id=None):
+    return {"trace_id": "t", "span_id": span_id, "parent_id": parent_id, "service": service, "name": name,
+            "start": start, "end": end, "duration": end - start, "attrs": {}}
+
+def test_critical_path_attributes_time_to_stages():
+    """Test the walk-back picks stages across services, skips nested spans and reports untraced gaps"""
+    trace = [
+        stage("crawler.publish", "crawler", 0.5, 1.0, "p"),
+        stage("transport.delay", "orchestrator", 0.0, 61.0, "d", parent_id="p"),
+        stage("orchestrator.webhook", "orchestrator", 61.0, 62.0, "w", parent_id="p"),
+        stage("orchestrator.weaviate_write", "orchestrator", 61.2, 61.9, "ww", parent_id="w"),
+        stage("parser.parse", "parser", 70.0, 75.0, "pp"),
+        stage("validator.queue_wait", "validator", 75.0, 80.0, "q"),
+        stage("validator.backtest", "validator", 80.0, 200.0, "b"),
+    ]
+
+    assert critical_path(trace) == [
+        ("transport.delay", 61.0), ("orchestrator.webhook", 1.0), ("untraced", 8.0), ("parser.parse", 5.0),
+        ("validator.queue_wait", 5.0), ("validator.backtest", 120.0),
+    ]
+    report = summarize(trace)
+    assert report["bottleneck"] == "validator.backtest"
+    assert report["critical_path_s"] == 200.0
+    assert report["stages"]["orchestrator.weaviate_write"]["critical_s"] == 0.0
+
+@pytest.mark.asyncio
+@respx.mock
+async def test_publish_forwards_trace_to_webhook(spans_file, monkeypatch):
+    """Test the crawler's trace id goes in the body and as a forwarded traceparent linked to its span"""
+    monkeypatch.setenv("QSTASH_URL", "https://qstash.test/v2/publish/target")
+    monkeypatch.setenv("QSTASH_TOKEN", "token")
+    route = respx.post("https://qstash.test/v2/publish/target").mock(
+        return_value=httpx.Response(200, json={"messageId": "m"})
+    )
+
+    await crawler.publish_to_qstash("https://example.com/a")
+    stop_tracing()
+
+    request = route.calls.last.request
+    trace_id = json.loads(request.content)["trace_id"]
+    (publish,) = load_spans(spans_file)
+    assert parse_traceparent(request.headers["Upstash-Forward-Traceparent"]) == (trace_id, publish["span_id"])
+    assert (publish["name"], publish["trace_id"], publish["attrs"]["status"]) == ("crawler.publish", trace_id, 200)
+
+if __name__ == "__main__":
+    pytest.main([__file__])
@@ -0,0 +1,61 @@
+#!/usr/bin/env python3
+"""
+Unit tests for validator startup: cached backend probe, lazy imports, warm-up
+"""
+
+import pytest
+import subprocess
+import sys
+from unittest.mock import patch
+
+# Add validator service to path
+sys.path.append('services/validator')
+import backend
+
+def test_import_does_not_load_heavy_dependencies():
+    """Test importing the validator leaves CuPy, vectorbt and yfinance unloaded"""
+    code = (
+        "import sys, main; "
+        "print(','.join(m for m in ('cupy', 'vectorbt', 'yfinance', 'numba') if m in sys.modules))"
+    )
+    result = subprocess.run(
+        [sys.executable, "-c", code],
+        capture_output=True,
+        text=True,
+        cwd="services/validator",
+        timeout=120,
+    )
+    assert result.returncode == 0, result.stderr
+    assert result.stdout.strip() == ""
+
+def test_get_backend_probes_once():
+    """Test the GPU probe runs once per process unless refreshed"""
+    with patch.object(backend, "_backend", None):
+        with patch.object(backend, "detect_gpu", return_value="cpu") as probe:
+            assert backend.get_backend() == "cpu"
+            assert backend.get_backend() == "cpu"
+            assert probe.call_count == 1
+
+            backend.get_backend(refresh=True)
+            assert probe.call_count == 2
+
+def test_warm_up_reports_cold_start_timings():
+    """Test warm-up compiles the requested engines and reports timings separately"""
+    with patch.object(backend, "detect_gpu", return_value="cpu"), patch.object(backend, "_backend", None):
+        report = backend.warm_up(engines=("numba", "vectorbt"))
+
+    assert report["backend"] == "cpu"
+    assert set(report["warmup"]) == {"numba", "vectorbt"}
+    assert report["import_time"] >= 0
+    assert report["cold_start_time"] >= sum(report["warmup"].values())
+    assert backend.is_warm("numba")
+    assert backend.is_warm("vectorbt")
+
+def test_warm_up_unknown_engine():
+    """Test unknown engines are rejected"""
+    with patch.object(backend, "detect_gpu", return_value="cpu"), patch.object(backend, "_backend", None):
+        with pytest.raises(ValueError, match="Unknown engine"):
+            backend.warm_up(engines=("cuda",))
+
+if __name__ == "__main__":
+    pytest.main([__file__])
@@ -0,0 +1,137 @@
+#!/usr/bin/env python3
+"""
+Unit tests for the Redis-stream validator worker (fakeredis, no network)
+"""
+
+import json
+import pytest
+import sys
+import numpy as np
+import pandas as pd
+
+fakeredis = pytest.importorskip("fakeredis")
+
+# Add validator service to path
+sys.path.append('services/validator')
+import worker
+from results_store import ResultsStore
+from worker import ValidationWorker, parse_job, submit_job
+
+class FakeMarketData:
+    """Deterministic closes per symbol; unknown symbols have no data"""
+
+    def fetch_close(self, symbol, period="1y"):
+        if symbol == "MISSING":
+            raise ValueError(f"No data available for {symbol}")
+        rng = np.random.default_rng(len(symbol))
+        index = pd.date_range("2023-01-01", periods=300, freq="D")
+        return pd.Series(100 + np.cumsum(rng.normal(0, 1, 300)), index=index, name=symbol)
+
+@pytest.fixture
+def slot(tmp_path, monkeypatch):
+    """Replace slot start-up with fakes and count how often it runs"""
+    calls = []
+
+    def fake_init(engines=(), offline=False):
+        calls.append(engines)
+        worker._state.update(market_data=FakeMarketData(), results=ResultsStore(tmp_path / "results"))
+
+    monkeypatch.setattr(worker, "init_slot", fake_init)
+    monkeypatch.setattr(worker, "_state", {})
+    return calls
+
+@pytest.fixture
+def client():
+    return fakeredis.FakeRedis(decode_responses=True)
+
+def test_parse_job_fields():
+    """Test JSON and comma-separated symbol lists and defaults"""
+    job = parse_job("1700000000000-0", {"concept": "momentum", "symbols": '["AAPL", "MSFT"]'})
+    assert job["symbols"] == ["AAPL", "MSFT"]
+    assert job["strategy"] == "buy_and_hold"
+    assert job["params"] is None
+    assert job["enqueued_at"] == 1700000000.0
+
+    job = parse_job(b"1-0", {b"symbols": b"AAPL, MSFT", b"strategy": b"ma_crossover",
+                             b"params": b'{"fast_window": [5]}', b"top_n": b"3"})
+    assert job["symbols"] == ["AAPL", "MSFT"]
+    assert job["params"] == {"fast_window": [5]}
+    assert job["top_n"] == 3
+
+    with pytest.raises(ValueError, match="no symbols"):
+        parse_job("1-0", {"symbols": ""})
+
+def test_worker_processes_jobs_and_publishes_results(client, slot):
+    """Test jobs are executed, stored, acknowledged and published with timings"""
+    submit_job(client, "momentum", ["AAPL", "MISSING"], engine="numba")
+    submit_job(client, "trend", ["MSFT"], strategy="ma_crossover",
+               params={"fast_window": [5, 10], "slow_window": [50]}, top_n=2)
+    submit_job(client, "empty", [])
+
+    worker_ = ValidationWorker(client, concurrency=1, block_ms=10)
+    assert worker_.run(max_jobs=3) == 3
+
+    published = {}
+    for _, fields in client.xrange(worker.RESULTS_STREAM):
+        summary = json.loads(fields["result"])
+        published[summary.get("concept") or fields["status"]] = summary
+
+    assert published["momentum"]["status"] == "completed"
+    assert published["momentum"]["rows"] == 1
+    assert "MISSING" in published["momentum"]["errors"]
+    assert published["momentum"]["timings"]["compute_time"] > 0
+    assert published["momentum"]["timings"]["queue_wait"] >= 0
+
+    assert published["trend"]["rows"] == 2
+    assert json.loads(published["trend"]["best"]["params"])["slow_window"] == 50
+    assert published["rejected"]["error"] == "Job has no symbols"
+
+    assert client.xpending(worker.JOBS_STREAM, worker.CONSUMER_GROUP)["pending"] == 0
+
+    stored = worker._state["results"].query(columns=["symbol", "concept", "mode"])
+    assert sorted(zip(stored["concept"], stored["symbol"])) == [
+        ("momentum", "AAPL"), ("trend", "MSFT"), ("trend", "MSFT"),
+    ]
+
+def test_slot_initialized_once_across_jobs(client, slot):
+    """Test libraries, stores and kernels are set up once, not per job"""
+    for concept in ("a", "b", "c"):
+        submit_job(client, concept, ["AAPL"])
+
+    ValidationWorker(client, concurrency=1, engines=("numba",), block_ms=10).run(max_jobs=3)
+    assert slot == [("numba",)]
+
+def test_failed_job_is_published_and_acked(client, slot, monkeypatch):
+    """Test an exception inside a job is reported instead of killing the worker"""
+    def boom(job):
+        raise RuntimeError("kernel crashed")
+
+    monkeypatch.setattr(worker, "run_job", boom)
+    submit_job(client, "broken", ["AAPL"])
+
+    ValidationWorker(client, concurrency=1, block_ms=10).run(max_jobs=1)
+    (_, fields), = client.xrange(worker.RESULTS_STREAM)
+    assert fields["status"] == "failed"
+    assert json.loads(fields["result"])["error"] == "kernel crashed"
+    assert client.xpending(worker.JOBS_STREAM, worker.CONSUMER_GROUP)["pending"] == 0
+
+def test_jobs_of_a_dead_consumer_are_reclaimed(client, slot):
+    """Test a job left pending by a crashed consumer is claimed and run, and a poison job is given up"""
+    submit_job(client, "orphaned", ["AAPL"])
+    ValidationWorker(client).ensure_group()
+    client.xreadgroup(worker.CONSUMER_GROUP, "dead", {worker.JOBS_STREAM: ">"}, count=1)
+
+    ValidationWorker(client, concurrency=1, block_ms=10, claim_idle_ms=0).run(max_jobs=1)
+    (_, fields), = client.xrange(worker.RESULTS_STREAM)
+    assert fields["status"] == "completed"
+    assert client.xpending(worker.JOBS_STREAM, worker.CONSUMER_GROUP)["pending"] == 0
+
+    submit_job(client, "poison", ["AAPL"])
+    client.xreadgroup(worker.CONSUMER_GROUP, "dead", {worker.JOBS_STREAM: ">"}, count=1)
+    ValidationWorker(client, concurrency=1, block_ms=10, claim_idle_ms=0, max_deliveries=1).run(max_jobs=1)
+    summary = json.loads(client.xrange(worker.RESULTS_STREAM)[-1][1]["result"])
+    assert (summary["status"], summary["error"]) == ("failed", "Gave up after 1 deliveries")
+    assert client.xpending(worker.JOBS_STREAM, worker.CONSUMER_GROUP)["pending"] == 0
+
+if __name__ == "__main__":
+    pytest.main([__file__])
@@ -0,0 +1,91 @@
+#!/usr/bin/env python3
+"""
+Unit tests for the Weaviate schema bootstrap
+"""
+
+import pytest
+import sys
+from unittest.mock import MagicMock, patch
+
+# Add orchestrator to path
+sys.path.append('services/orchestrator')
+from schema import IndexConfig, class_definitions, ensure_schema, index_config_from_env
+
+def fake_client(classes=()):
+    client = MagicMock()
+    client.schema.get.return_value = {"classes": list(classes)}
+    return client
+
+def test_class_definitions_never_vectorize():
+    """Test every class brings its own vectors and uses HNSW"""
+    definitions = {d["class"]: d for d in class_definitions(IndexConfig(ef=64))}
+
+    assert set(definitions) == {"RawURL", "ParsedDocument", "BacktestResult"}
+    for definition in definitions.values():
+        assert definition["vectorizer"] == "none"
+        assert definition["vectorIndexType"] == "hnsw"
+        assert definition["vectorIndexConfig"]["ef"] == 64
+        assert "pq" not in definition["vectorIndexConfig"]
+    assert "id" not in {p["name"] for p in definitions["RawURL"]["properties"]}
+
+def test_index_config_from_env():
+    """Test HNSW and PQ settings come from the environment"""
+    env = {"WEAVIATE_HNSW_EF": "128", "WEAVIATE_HNSW_EF_CONSTRUCTION": "256",
+           "WEAVIATE_HNSW_MAX_CONNECTIONS": "48", "WEAVIATE_PQ_ENABLED": "true",
+           "WEAVIATE_PQ_SEGMENTS": "48"}
+    with patch.dict('os.environ', env, clear=False):
+        config = index_config_from_env().vector_index_config()
+
+    assert (config["ef"], config["efConstruction"], config["maxConnections"]) == (128, 256, 48)
+    assert config["pq"] == {"enabled": True, "segments": 48, "centroids": 256, "trainingLimit": 100000}
+
+def test_ensure_schema_creates_missing_classes():
+    """Test a fresh Weaviate gets every class"""
+    client = fake_client()
+
+    created = ensure_schema(client, IndexConfig())
+
+    assert created == ["RawURL", "ParsedDocument", "BacktestResult"]
+    assert client.schema.create_class.call_count == 3
+    client.schema.update_config.assert_not_called()
+
+def test_ensure_schema_updates_existing_class_in_place():
+    """Test existing classes get missing properties and mutable index settings only"""
+    existing = {
+        "class": "RawURL",
+        "vectorizer": "none",
+        "properties": [{"name": "url", "dataType": ["text"]}],
+        "vectorIndexConfig": {"ef": -1, "efConstruction": 128, "maxConnections": 64,
+                              "pq": {"enabled": False, "segments": 0, "centroids": 256, "encoder": {}}},
+    }
+    client = fake_client([existing])
+
+    created = ensure_schema(client, IndexConfig(ef=96, pq_enabled=True))
+
+    assert "RawURL" not in created
+    added = {call.args[1]["name"] for call in client.schema.property.create.call_args_list}
+    assert added == {"messageId", "ts", "concept", "traceId"}
+    update = client.schema.update_config.call_args.args
+    assert update[0] == "RawURL"
+    assert update[1]["vectorIndexConfig"]["ef"] == 96
+    assert update[1]["vectorIndexConfig"]["pq"]["enabled"] is True
+    # maxConnections is immutable: never sent, only warned about
+    assert "maxConnections" not in update[1]["vectorIndexConfig"]
+
+def test_ensure_schema_is_idempotent():
+    """Test a matching schema is left untouched"""
+    config = IndexConfig(pq_enabled=True)
+    current = []
+    for definition in class_definitions(config):
+        index = dict(definition["vectorIndexConfig"])
+        index["pq"] = {**index["pq"], "encoder": {"type": "kmeans"}, "bitCompression": False}
+        current.append({**definition, "vectorIndexConfig": index})
+    client = fake_client(current)
+
+    assert ensure_schema(client, config) == []
+    client.schema.create_class.assert_not_called()
+    client.schema.property.create.assert_not_called()
+    client.schema.update_config.assert_not_called()
+
+if __name__ == "__main__":
+    pytest.main([__file__])